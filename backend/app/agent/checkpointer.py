@@ -0,0 +1,60 @@
+"""
+File-backed LangGraph checkpointer: состояние запуска переживает падение и перезапуск процесса.
+
+SqliteSaver из langgraph-checkpoint-sqlite над storage/checkpoints.sqlite. Завершённые запуски удаляются,
+так что в файле остаются только незаконченные — их продолжает следующий запуск с теми же входными данными.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from app.config import settings
+
+CHECKPOINTS_FILE = "checkpoints.sqlite"
+
+_saver: Optional[SqliteSaver] = None
+_saver_lock = threading.Lock()
+
+
+def get_checkpointer() -> SqliteSaver:
+    """Process-wide checkpointer over storage/checkpoints.sqlite (одно соединение, запись под блокировкой saver)."""
+    global _saver
+    with _saver_lock:
+        if _saver is None:
+            path = settings.storage_path / CHECKPOINTS_FILE
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _saver = SqliteSaver(sqlite3.connect(path, timeout=30, check_same_thread=False))
+            _saver.setup()
+        return _saver
+
+
+def thread_ids(saver: BaseCheckpointSaver, prefix: str) -> list[str]:
+    """Threads with saved checkpoints whose id starts with prefix (незаконченные запуски)."""
+    return sorted({
+        t.config["configurable"]["thread_id"]
+        for t in saver.list(None)
+        if t.config["configurable"]["thread_id"].startswith(prefix)
+    })
+
+
+def copy_thread(saver: BaseCheckpointSaver, source: str, target: str) -> None:
+    """
+    Copy all checkpoints of thread source with their pending writes to thread target
+    (SqliteSaver.copy_thread не реализован): готовые результаты прерванного шага переходят вместе с ними.
+    """
+    # list отдаёт от новых к старым; родитель должен быть записан раньше потомка
+    for t in reversed(list(saver.list({"configurable": {"thread_id": source}}))):
+        configurable = {"thread_id": target, "checkpoint_ns": t.config["configurable"].get("checkpoint_ns", "")}
+        if t.parent_config:
+            configurable["checkpoint_id"] = t.parent_config["configurable"]["checkpoint_id"]
+        config = saver.put({"configurable": configurable}, t.checkpoint, t.metadata, t.checkpoint["channel_versions"])
+        writes: dict[str, list] = {}
+        for task_id, channel, value in t.pending_writes or []:
+            writes.setdefault(task_id, []).append((channel, value))
+        for task_id, task_writes in writes.items():
+            saver.put_writes(config, task_writes, task_id)
@@ -0,0 +1,204 @@
+"""Token-budgeted packing of artifact blocks into the prompt: минимум каждому артефакту, остаток — по плотности информации."""
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Словаря модели в офлайн-контуре нет (у Qwen свой BPE, не cl100k), поэтому токены оцениваются по классам
+# символов — откалибровано на логах/JSON с запасом вверх: бюджет не переполняется, но используется не до конца
+_DIGIT_SPLIT_MODELS = ("qwen",)  # цифры режутся по одной
+_DIGIT_RUN = re.compile(r"\d+")
+_LATIN = re.compile(r"[A-Za-z]+")
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]+")
+_PUNCT = re.compile(r"[^\w\s]")
+_NEWLINE = re.compile(r"\n")
+_OTHER = re.compile(r"[^\x00-\x7FЀ-ӿ]")
+
+
+class TokenCounter:
+    """Token estimate for the configured model (эвристика по классам символов, не точный подсчёт словарём)."""
+
+    def __init__(self, llm_model: Optional[str] = None):
+        model = (llm_model or "").lower()
+        self.split_digits = any(m in model for m in _DIGIT_SPLIT_MODELS)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        latin = sum(math.ceil(len(w) / 4) for w in _LATIN.findall(text))
+        cyrillic = sum(math.ceil(len(w) / 2.5) for w in _CYRILLIC.findall(text))
+        runs = _DIGIT_RUN.findall(text)
+        digits = sum(len(r) for r in runs) if self.split_digits else sum(math.ceil(len(r) / 3) for r in runs)
+        punct = len(_PUNCT.findall(text)) * 0.8
+        return int(latin + cyrillic + digits + punct + len(_NEWLINE.findall(text)) + len(_OTHER.findall(text)) * 0.5) + 1
+
+
+@dataclass
+class ArtifactBlock:
+    """One artifact (или группа, как thread dump'ы теста) как кандидат в промпт."""
+
+    ids: list[int]
+    label: str
+    kind: str
+    header: str
+    text: str
+    # Пересобрать текст не длиннее max_chars (новая выдержка из файла, дайджест с меньшим лимитом); иначе — обрезка по строкам
+    fit: Optional[Callable[[int], str]] = None
+    tokens_needed: int = 0
+    tokens_allocated: int = 0
+    tokens_used: int = 0
+    density: float = 1.0
+    truncated: bool = False
+    chunks: int = 1  # map_reduce: на сколько map-вызовов разрезан текст
+    packed_text: str = field(default="", repr=False)
+
+    def allocation(self) -> dict:
+        return {
+            "tokens_needed": self.tokens_needed,
+            "tokens_allocated": self.tokens_allocated,
+            "tokens_used": self.tokens_used,
+            "density": round(self.density, 3),
+            "truncated": self.truncated,
+            "chunks": self.chunks,
+        }
+
+
+def information_density(text: str, sample_chars: int = 200_000) -> float:
+    """Доля, остающаяся после zlib: повторяющиеся логи ~0.05–0.15, сводки и уникальные данные — 0.3–0.6."""
+    raw = text[:sample_chars].encode("utf-8", errors="replace")
+    if not raw:
+        return 0.0
+    return min(1.0, max(0.02, len(zlib.compress(raw, 6)) / len(raw)))
+
+
+def truncate_lines(text: str, max_chars: int) -> str:
+    """Head of the text cut at a line boundary with a note (дайджесты упорядочены по важности — начало ценнее)."""
+    if len(text) <= max_chars:
+        return text
+    note = "\n... [обрезано по бюджету контекста]"
+    head = text[: max(0, max_chars - len(note))]
+    cut = head.rfind("\n")
+    if cut > len(head) // 2:
+        head = head[:cut]
+    return head + note
+
+
+def _fit_block(block: ArtifactBlock, counter: TokenCounter, tokens: int) -> str:
+    """Text of the block within `tokens` (с заголовком): 2–3 итерации пересчёта символов на токен."""
+    header_tokens = counter.count(block.header) + 1
+    target = max(0, tokens - header_tokens)
+    text = block.text
+    text_tokens = block.tokens_needed - header_tokens
+    for _ in range(3):
+        if text_tokens <= target:
+            break
+        chars_per_token = len(text) / max(1, text_tokens)
+        max_chars = int(target * chars_per_token * 0.97)
+        text = block.fit(max_chars) if block.fit else truncate_lines(block.text, max_chars)
+        if len(text) > max_chars:
+            text = truncate_lines(text, max_chars)
+        text_tokens = counter.count(text)
+    return text
+
+
+def split_block(block: ArtifactBlock, counter: TokenCounter, max_tokens: int) -> list[str]:
+    """
+    Text of the block in parts of at most max_tokens (с заголовком) по границам строк — для map-вызовов;
+    строка длиннее лимита режется по символам.
+    """
+    header_tokens = counter.count(block.header) + 1
+    limit = max(1, max_tokens - header_tokens)
+    block.tokens_needed = header_tokens + counter.count(block.text)
+    if block.tokens_needed <= max_tokens:
+        block.chunks = 1
+        return [block.text]
+    parts: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for line in block.text.splitlines():
+        line_tokens = counter.count(line) + 1
+        if line_tokens > limit:
+            step = max(1, int(len(line) * limit / line_tokens * 0.95))
+            pieces = [line[i:i + step] for i in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = line_tokens if len(pieces) == 1 else counter.count(piece) + 1
+            if current and current_tokens + piece_tokens > limit:
+                parts.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        parts.append("\n".join(current))
+    block.chunks = len(parts)
+    return parts
+
+
+def allocate(blocks: list[ArtifactBlock], budget: int, min_tokens: int) -> None:
+    """
+    Fill tokens_allocated: сначала каждому min(нужно, справедливый минимум), затем остаток
+    пропорционально плотности информации тем, кому не хватило (water-filling с ограничением сверху «нужно»).
+    """
+    if not blocks:
+        return
+    if sum(b.tokens_needed for b in blocks) <= budget:
+        for b in blocks:
+            b.tokens_allocated = b.tokens_needed
+        return
+    floor = min(min_tokens, budget // len(blocks))
+    for b in blocks:
+        b.tokens_allocated = min(b.tokens_needed, floor)
+    remaining = budget - sum(b.tokens_allocated for b in blocks)
+    while remaining > 0:
+        hungry = [b for b in blocks if b.tokens_allocated < b.tokens_needed]
+        if not hungry:
+            break
+        weight = sum(b.density for b in hungry) or float(len(hungry))
+        given = 0
+        for b in hungry:
+            share = int(remaining * (b.density or 1.0) / weight)
+            add = min(share, b.tokens_needed - b.tokens_allocated)
+            b.tokens_allocated += add
+            given += add
+        if given == 0:
+            # Остаток меньше, чем делится по долям: отдаём самому плотному
+            b = max(hungry, key=lambda x: x.density)
+            b.tokens_allocated += min(remaining, b.tokens_needed - b.tokens_allocated)
+            break
+        remaining -= given
+
+
+def pack_artifacts(
+    blocks: list[ArtifactBlock],
+    budget_tokens: int,
+    counter: TokenCounter,
+    min_tokens_per_artifact: int,
+) -> str:
+    """Joined artifact text within budget_tokens; распределение остаётся в полях блоков (для snapshot отчёта)."""
+    for b in blocks:
+        b.tokens_needed = counter.count(b.header) + 1 + counter.count(b.text)
+        b.density = information_density(b.text)
+    allocate(blocks, max(0, budget_tokens), min_tokens_per_artifact)
+    parts = []
+    for b in blocks:
+        text = b.text if b.tokens_allocated >= b.tokens_needed else _fit_block(b, counter, b.tokens_allocated)
+        b.truncated = text is not b.text
+        b.packed_text = f"{b.header}\n{text}"
+        b.tokens_used = counter.count(b.packed_text)
+        parts.append(b.packed_text)
+    logger.info(
+        "artifact_context_packed",
+        budget_tokens=budget_tokens,
+        needed=sum(b.tokens_needed for b in blocks),
+        used=sum(b.tokens_used for b in blocks),
+        truncated=[b.label for b in blocks if b.truncated],
+    )
+    return "\n\n".join(parts)
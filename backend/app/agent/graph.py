@@ -1,38 +1,116 @@
-"""LangGraph graph: collect -> analyze -> format report."""
-from typing import Any, Optional
+"""LangGraph graph: analyze -> format report (single) или summarize × N -> reduce -> format (map_reduce)."""
+import hashlib
+import json
+import threading
+import uuid
+from typing import Any, Callable, Optional
 
+import structlog
 from langgraph.graph import END, START, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Send
 
 from app.agent.state import AgentState
-from app.agent.nodes import analyze_artifacts, format_report_text
-from app.agent.llm_factory import get_llm
+from app.agent.nodes import analyze_artifacts, format_report_text, reduce_summaries, summarize_artifact
+from app.agent import registry
+from app.agent.checkpointer import copy_thread, get_checkpointer, thread_ids
+from app.agent.llm_cache import with_cache
+from app.agent.scheduler import DEFAULT_PRIORITY, with_scheduler
 from app.config import settings
 
+logger = structlog.get_logger()
+
 
 def create_agent_graph(
     llm_type: str = "ollama",
     llm_model: str = "qwen2.5:7b",
     llm_api_key: Optional[str] = None,
     llm_base_url: Optional[str] = None,
+    mode: str = "single",
+    use_cache: bool = True,
 ):
-    """Build compiled graph with given LLM."""
-    llm = get_llm(llm_type, llm_model, api_key=llm_api_key, base_url=llm_base_url or getattr(settings, "ollama_base_url", None))
+    """Build compiled graph with given LLM; mode=map_reduce — по map-вызову на артефакт (часть), затем reduce."""
+    llm = registry.get_llm_client(llm_type, llm_model, api_key=llm_api_key, base_url=llm_base_url or getattr(settings, "ollama_base_url", None))
+    # Кэш снаружи планировщика: ответ из кэша не ждёт очереди бэкенда
+    llm = with_cache(with_scheduler(llm, llm_type, llm_base_url), bypass=not use_cache)
 
     workflow = StateGraph(AgentState)
 
     def analyze_node(state: AgentState) -> AgentState:
         return analyze_artifacts(state, llm)
 
-    workflow.add_node("analyze", analyze_node)
     workflow.add_node("format", format_report_text)
+    if mode == "map_reduce":
+        max_words = max(50, settings.analysis_map_summary_tokens // 2)
+
+        def fan_out(state: AgentState) -> list[Send]:
+            shared = {"test_meta": state.get("test_meta"), "system_prompt": state.get("system_prompt")}
+            # Сводки, переданные во входе (неизменившиеся артефакты прошлого анализа), не пересчитываются
+            ready = {(p["index"], p.get("part") or 1) for p in state.get("partials") or []}
+            chunks = [c for c in state.get("artifact_chunks") or [] if (c["index"], c.get("part") or 1) not in ready]
+            return [Send("summarize", {**shared, "chunk": c}) for c in chunks] or ["reduce"]
+
+        def summarize_node(state: AgentState) -> AgentState:
+            return summarize_artifact(state, llm, max_words)
 
-    workflow.add_edge(START, "analyze")
-    workflow.add_edge("analyze", "format")
+        def reduce_node(state: AgentState) -> AgentState:
+            return reduce_summaries(state, llm)
+
+        workflow.add_node("summarize", summarize_node)
+        workflow.add_node("reduce", reduce_node)
+        workflow.add_conditional_edges(START, fan_out, ["summarize", "reduce"])
+        workflow.add_edge("summarize", "reduce")
+        workflow.add_edge("reduce", "format")
+    else:
+        workflow.add_node("analyze", analyze_node)
+        workflow.add_edge(START, "analyze")
+        workflow.add_edge("analyze", "format")
     workflow.add_edge("format", END)
 
-    memory = MemorySaver()
-    return workflow.compile(checkpointer=memory)
+    # Файловый checkpointer: прерванный запуск продолжается с последнего завершённого узла (и map-вызова)
+    checkpointer = get_checkpointer() if settings.analysis_checkpoints_enabled else MemorySaver()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def get_agent_graph(
+    llm_type: str = "ollama",
+    llm_model: str = "qwen2.5:7b",
+    llm_api_key: Optional[str] = None,
+    llm_base_url: Optional[str] = None,
+    mode: str = "single",
+    use_cache: bool = True,
+):
+    """Compiled graph from the registry (собирается при первом обращении); запуски различаются thread_id."""
+    key = (llm_type, llm_model, llm_base_url or "", registry.key_fingerprint(llm_api_key), mode, use_cache)
+    return registry.get_graph(
+        key,
+        lambda: create_agent_graph(llm_type, llm_model, llm_api_key, llm_base_url, mode=mode, use_cache=use_cache),
+    )
+
+
+# Поиск, перенос и удаление чужих потоков — под одной блокировкой: два запуска не заберут один прерванный поток
+_threads_lock = threading.Lock()
+
+
+def _take_over_interrupted(
+    checkpointer: Any, run_key: str, fingerprint: str, thread_id: str, run_finished: Optional[Callable[[str], bool]]
+) -> Optional[str]:
+    """
+    Copy an interrupted thread of run_key with the same inputs to thread_id; returns its id.
+    Потоки завершённых запусков удаляются (с другими входными данными их продолжать уже нельзя),
+    потоки выполняющихся запусков не трогаются.
+    """
+    resumed_from = None
+    with _threads_lock:
+        for tid in thread_ids(checkpointer, f"{run_key}-"):
+            owner_fingerprint, _, owner = tid[len(run_key) + 1:].partition("-")
+            if tid == thread_id or (run_finished is not None and not run_finished(owner)):
+                continue
+            if owner_fingerprint == fingerprint and resumed_from is None:
+                copy_thread(checkpointer, tid, thread_id)
+                resumed_from = tid
+            checkpointer.delete_thread(tid)
+    return resumed_from
 
 
 def run_analysis(
@@ -41,20 +119,52 @@ def run_analysis(
     artifact_labels: Optional[list] = None,
     system_prompt: Optional[str] = None,
     max_artifact_chars: Optional[int] = None,
+    pods_table: Optional[str] = None,
     llm_type: str = "ollama",
     llm_model: str = "qwen2.5:7b",
     llm_api_key: Optional[str] = None,
     llm_base_url: Optional[str] = None,
+    graph_mode: str = "single",
+    artifact_chunks: Optional[list] = None,
+    context_budget_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    use_cache: bool = True,
+    on_event: Optional[Callable[[str, dict], None]] = None,
+    run_key: Optional[str] = None,
+    run_id: Optional[str] = None,
+    run_finished: Optional[Callable[[str], bool]] = None,
+    llm_project: Optional[str] = None,
+    llm_priority: int = DEFAULT_PRIORITY,
+    cancel_event: Optional[threading.Event] = None,
+    partials: Optional[list] = None,
+    callbacks: Optional[list] = None,
 ) -> dict:
     """
     Run agent and return final state with report_text and report_sections.
     artifact_labels: список имён файлов (display_name), все должны быть учтены в отчёте.
+    graph_mode=map_reduce: artifact_chunks суммируются параллельно (не больше max_concurrency вызовов LLM),
+    сводки укладываются в context_budget_tokens финального промпта; partials — готовые сводки части chunks
+    (по index и part), для них map-вызова нет. В результате — partials: все сводки запуска, reduce_context —
+    распределение бюджета reduce-промпта между сводками артефактов.
+    use_cache=False: не брать ответы из кэша LLM (свежие ответы всё равно кэшируются).
+    on_event(event, data): по мере выполнения — "node" (start/end узла) и "token" (фрагменты ответа модели),
+    "resumed" — если запуск продолжает прерванный.
+    run_key (например, test-<id>), run_id (например, id задачи): поток checkpoint-ов запуска —
+    <run_key>-<отпечаток входных данных>-<run_id>. Запуск с теми же входными данными забирает поток упавшего
+    или отменённого запуска и продолжает его — заново выполняются только незавершённые узлы и map-вызовы.
+    run_finished(run_id) — завершён ли другой запуск: потоки незавершённых не продолжаются и не удаляются
+    (без run_finished завершёнными считаются все).
+    llm_project, llm_priority (меньше — раньше): место вызовов в очереди бэкенда LLM (app.agent.scheduler);
+    cancel_event — вызов, ждущий очереди, прекращает ожидание.
+    callbacks — обработчики LangChain на весь запуск (например, app.agent.telemetry.RunTelemetry).
     """
-    graph = create_agent_graph(
+    graph = get_agent_graph(
         llm_type=llm_type,
         llm_model=llm_model,
         llm_api_key=llm_api_key,
         llm_base_url=llm_base_url,
+        mode=graph_mode,
+        use_cache=use_cache,
     )
     initial: AgentState = {
         "test_meta": test_meta,
@@ -62,16 +172,77 @@ def run_analysis(
         "artifact_labels": artifact_labels or [],
         "system_prompt": system_prompt,
         "max_artifact_chars": max_artifact_chars,
+        "pods_table": pods_table,
     }
-    config = {"configurable": {"thread_id": "run_once"}}
-    final = None
-    for chunk in graph.stream(initial, config):
-        for v in chunk.values():
-            final = v
+    if graph_mode == "map_reduce":
+        initial.update(
+            artifact_chunks=artifact_chunks or [],
+            context_budget_tokens=context_budget_tokens,
+            llm_model=llm_model,
+            partials=partials or [],
+        )
+    # Граф общий для всех анализов: у каждого запуска свой поток в checkpointer, после успешного запуска он удаляется.
+    # С run_key в поток входит отпечаток входных данных: повтор того же анализа находит состояние прерванного.
+    run_id = run_id or uuid.uuid4().hex
+    thread_id = f"run-{run_id}"
+    fingerprint = None
+    if run_key:
+        fingerprint = hashlib.sha256(json.dumps(
+            {"state": initial, "mode": graph_mode, "llm": [llm_type, llm_model, llm_base_url]},
+            ensure_ascii=False, sort_keys=True, default=str,
+        ).encode("utf-8")).hexdigest()[:16]
+        thread_id = f"{run_key}-{fingerprint}-{run_id}"
+    config: dict = {"configurable": {
+        "thread_id": thread_id,
+        "llm_project": llm_project or "",
+        "llm_priority": llm_priority,
+        "llm_cancel_event": cancel_event,
+    }}
+    if callbacks:
+        config["callbacks"] = callbacks
+    if graph_mode == "map_reduce":
+        # В режиме "messages" LangGraph держит в том же пуле поток ожидания потока событий — ему отдельное место,
+        # иначе при max_concurrency=1 map-вызовам не остаётся потоков
+        config["max_concurrency"] = (max_concurrency or settings.analysis_map_concurrency) + (1 if on_event else 0)
+    checkpointer = graph.checkpointer
+    stream_input: Optional[AgentState] = initial
+    if run_key:
+        resumed_from = _take_over_interrupted(checkpointer, run_key, fingerprint, thread_id, run_finished)
+        # tasks — задачи незавершённого шага; next их не показывает, если все они уже записали результат
+        snapshot = graph.get_state(config)
+        if snapshot.tasks:
+            stream_input = None
+            pending = sorted({t.name for t in snapshot.tasks})
+            done_tasks = sum(1 for t in snapshot.tasks if t.result is not None)
+            logger.info(
+                "analysis_resumed",
+                thread_id=thread_id, resumed_from=resumed_from, next=pending, tasks_done=done_tasks, tasks=len(snapshot.tasks),
+            )
+            if on_event:
+                on_event("resumed", {"next": pending, "tasks_done": done_tasks, "tasks": len(snapshot.tasks)})
+    stream_mode = ["tasks", "messages"] if on_event else ["updates"]
+    completed = False
+    try:
+        for mode, payload in graph.stream(stream_input, config, stream_mode=stream_mode):
+            if mode == "tasks":
+                status = "start" if "input" in payload else ("error" if payload.get("error") else "end")
+                on_event("node", {"node": payload["name"], "status": status, "task": payload["id"]})
+            elif mode == "messages":
+                message, metadata = payload
+                if message.content:
+                    on_event("token", {"node": metadata.get("langgraph_node"), "id": message.id, "text": message.content})
+        # Итоговое состояние целиком (при продолжении часть узлов выполнилась в прошлом запуске)
+        final = graph.get_state(config).values
+        completed = True
+    finally:
+        if completed or not run_key:
+            checkpointer.delete_thread(thread_id)
     if final and final.get("error"):
         return {"error": final["error"], "report_text": "", "report_sections": {}}
     return {
         "report_text": (final or {}).get("report_text", ""),
         "report_sections": (final or {}).get("report_sections", {}),
         "error": (final or {}).get("error"),
+        "partials": (final or {}).get("partials") or [],
+        "reduce_context": (final or {}).get("reduce_context") or [],
     }
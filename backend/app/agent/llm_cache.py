@@ -0,0 +1,242 @@
+"""On-disk LLM response cache (SQLite): ключ — сервер, модель, параметры и точные сообщения; LRU по размеру и возрасту."""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import structlog
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.agent import telemetry
+from app.config import settings
+
+logger = structlog.get_logger()
+
+CACHE_FILE = "llm_cache.sqlite"
+# Параметры модели, от которых зависит ответ (таймауты, пулы соединений — не влияют); адрес сервера — отдельно:
+# одноимённые модели на разных серверах могут быть разными весами или квантизацией
+KEY_PARAMS = ("temperature", "num_ctx", "top_p", "top_k", "num_predict", "max_tokens", "seed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def model_params(llm: Any) -> dict:
+    """Model name and answer-affecting parameters of a LangChain chat model (обёртки вроде ScheduledChatModel — по .llm)."""
+    while hasattr(llm, "llm"):
+        llm = llm.llm
+    params = {"class": type(llm).__name__, "model": getattr(llm, "model", None) or getattr(llm, "model_name", None)}
+    base_url = getattr(llm, "base_url", None) or getattr(llm, "openai_api_base", None)
+    if base_url:
+        params["base_url"] = str(base_url).rstrip("/")
+    for name in KEY_PARAMS:
+        value = getattr(llm, name, None)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+def cache_key(params: dict, messages: list[BaseMessage]) -> str:
+    payload = {
+        "params": params,
+        "messages": [{"type": m.type, "content": m.content} for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Responses by key in one SQLite file. Вытеснение: записи старше max_age_days, затем давно не
+    читавшиеся — пока суммарный размер ответов больше max_bytes. Счётчики попаданий хранятся в том же файле.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, max_age_days: float):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение на операцию: map-вызовы идут из потоков графа
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model or "", response, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        evicted = 0
+        if self.max_age_seconds:
+            evicted += conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self.max_bytes and total > self.max_bytes:
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        if evicted:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('evictions', ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                (evicted, evicted),
+            )
+
+    def stats(self) -> dict:
+        with self._lock, self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "max_age_days": self.max_age_seconds / 86400,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+    def clear(self) -> int:
+        with self._lock, self._connect() as conn:
+            removed = conn.execute("DELETE FROM responses").rowcount
+            conn.execute("DELETE FROM counters")
+        return removed
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Process-wide cache or None, если LLM_CACHE_ENABLED=false."""
+    global _cache
+    if not settings.llm_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                settings.storage_path / CACHE_FILE,
+                max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+                max_age_days=settings.llm_cache_max_age_days,
+            )
+        return _cache
+
+
+class CachedChatModel(Runnable):
+    """
+    Chat model wrapper: ответ берётся из кэша по точному набору сообщений, иначе — вызов модели и запись.
+    bypass=True — не читать кэш (свежий ответ всё равно записывается и заменяет старый).
+    stream записывает ответ, только если поток дочитан до конца; batch, ainvoke и astream Runnable
+    выполняет через invoke.
+    """
+
+    def __init__(self, llm: Any, cache: LLMCache, bypass: bool = False):
+        self.llm = llm
+        self.cache = cache
+        self.bypass = bypass
+        self.params = model_params(llm)
+
+    def _key(self, input: Any) -> str:
+        messages = input if isinstance(input, list) else input.to_messages()
+        return cache_key(self.params, messages)
+
+    def _lookup(self, key: str, config: Optional[RunnableConfig]) -> Optional[str]:
+        if self.bypass:
+            return None
+        try:
+            cached = self.cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning("llm_cache_read_failed", error=str(e))
+            return None
+        if cached is not None:
+            logger.info("llm_cache_hit", model=self.params.get("model"), key=key[:12])
+            telemetry.emit("llm_cache_hit", {"model": self.params.get("model"), "completion_chars": len(cached)}, config)
+        return cached
+
+    def _store(self, key: str, content: Any) -> None:
+        if not isinstance(content, str):
+            return
+        try:
+            self.cache.put(key, self.params.get("model"), content)
+        except sqlite3.Error as e:
+            logger.warning("llm_cache_write_failed", error=str(e))
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = self._key(input)
+        cached = self._lookup(key, config)
+        if cached is not None:
+            return AIMessage(content=cached)
+        response = self.llm.invoke(input, config, **kwargs)
+        self._store(key, response.content if isinstance(response, BaseMessage) else str(response))
+        return response
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        key = self._key(input)
+        cached = self._lookup(key, config)
+        if cached is not None:
+            yield AIMessageChunk(content=cached)
+            return
+        parts = []
+        for chunk in self.llm.stream(input, config, **kwargs):
+            content = chunk.content if isinstance(chunk, BaseMessage) else str(chunk)
+            # Ответ с не текстовыми частями (tool calls, блоки) не кэшируется
+            parts.append(content if isinstance(content, str) else None)
+            yield chunk
+        if None not in parts:
+            self._store(key, "".join(parts))
+
+
+def with_cache(llm: Any, bypass: bool = False) -> Any:
+    """llm, обёрнутая кэшем, если он включён."""
+    cache = get_cache()
+    return CachedChatModel(llm, cache, bypass=bypass) if cache is not None else llm
@@ -1,5 +1,6 @@
 """LLM factory: Ollama (qwen2.5), GigaChat, OpenAI-compatible (cheap/free)."""
-from typing import Optional
+import threading
+from typing import Optional, Union
 
 from langchain_core.language_models import BaseChatModel
 
@@ -7,24 +8,77 @@ from app.config import settings
 from app.db.models import LLMType
 
 
+_http_lock = threading.Lock()
+_httpx_client = None
+_ollama_transport = None
+
+
+def shared_httpx_client():
+    """One httpx.Client для всех OpenAI-совместимых клиентов процесса."""
+    global _httpx_client
+    with _http_lock:
+        if _httpx_client is None:
+            import httpx
+
+            limits = httpx.Limits(max_connections=settings.llm_http_pool_size, max_keepalive_connections=settings.llm_http_pool_size)
+            _httpx_client = httpx.Client(limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+        return _httpx_client
+
+
+def shared_ollama_transport():
+    """One httpx transport (пул keep-alive соединений) для всех клиентов ChatOllama процесса и прогрева моделей."""
+    global _ollama_transport
+    with _http_lock:
+        if _ollama_transport is None:
+            import httpx
+
+            limits = httpx.Limits(max_connections=settings.llm_http_pool_size, max_keepalive_connections=settings.llm_http_pool_size)
+            _ollama_transport = httpx.HTTPTransport(limits=limits)
+        return _ollama_transport
+
+
+def close_http_clients() -> None:
+    global _httpx_client, _ollama_transport
+    with _http_lock:
+        if _httpx_client is not None:
+            _httpx_client.close()
+        if _ollama_transport is not None:
+            _ollama_transport.close()
+        _httpx_client = _ollama_transport = None
+
+
+def ollama_keep_alive(value: Optional[Union[str, int]] = None) -> Union[str, int]:
+    """keep_alive для Ollama: длительность ("30m", "2h") или число секунд (-1 — не выгружать, 0 — сразу)."""
+    value = settings.ollama_keep_alive if value is None else value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
 def get_llm(
     llm_type: str,
     model: str,
     api_key: Optional[str] = None,
     base_url: Optional[str] = None,
+    keep_alive: Optional[Union[str, int]] = None,
 ) -> BaseChatModel:
     """
     Return LangChain chat model for agent.
     llm_type: ollama | gigachat | openai
+    keep_alive (Ollama): сколько модель остаётся загруженной после вызова; по умолчанию settings.ollama_keep_alive.
     """
     if llm_type == LLMType.ollama.value:
-        from langchain_community.chat_models import ChatOllama
+        from langchain_ollama import ChatOllama
+
         # num_ctx: контекст по умолчанию 4096 — промпт 18k+ обрезается. Qwen2.5 поддерживает 32k.
         return ChatOllama(
             model=model or "qwen2.5:7b",
             base_url=base_url or "http://localhost:11434",
             temperature=0.2,
             num_ctx=settings.ollama_num_ctx,
+            keep_alive=ollama_keep_alive(keep_alive),
+            # Синхронный клиент (им пользуется граф) — через общий пул соединений
+            sync_client_kwargs={"transport": shared_ollama_transport()},
         )
     if llm_type == LLMType.gigachat.value:
         try:
@@ -44,5 +98,6 @@ def get_llm(
             api_key=api_key,
             base_url=base_url,
             temperature=0.2,
+            http_client=shared_httpx_client(),
         )
     raise ValueError(f"Unknown llm_type: {llm_type}")
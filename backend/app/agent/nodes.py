@@ -3,10 +3,14 @@ import json
 import re
 from typing import Any
 
+import httpx
 import structlog
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 
+from app.agent import telemetry
+from app.agent.context_packer import ArtifactBlock, TokenCounter, pack_artifacts
+from app.agent.scheduler import LLMQueueFull
 from app.agent.state import AgentState
 
 logger = structlog.get_logger()
@@ -29,10 +33,6 @@ test_type: тип теста (поиск максимума / подтвержд
 version: версия ПО (только если есть в артефактах)
 time_range: время проведения теста
 
-## PODS_TABLE
-Таблица подов — ТОЛЬКО если в артефактах есть данные о подах (например из k8s_pods / pods_list.json). Иначе напиши: "Данные о подах не предоставлены."
-Формат: Pod (группа) | Количество | Limits | Requests. Указывай источник: (данные из файла X).
-
 ## GOOD
 Что работает хорошо — только по фактам из артефактов. Для каждого пункта укажи: (по данным из файла «имя»).
 
@@ -50,34 +50,80 @@ time_range: время проведения теста
 """
 
 
+# Начало пользовательского сообщения отчёта — одинаковое для всех тестов (часть общего префикса)
+REPORT_USER_HEAD = 'Ниже — метаданные теста и содержимое артефактов (файлов). Каждый блок начинается с метки [АРТЕФАКТ: файл="..." ...]. Строй отчёт только по этим данным и для каждого вывода указывай имя файла-источника. В разделах SOURCES, GOOD, BAD, ERRORS и в FULL_REPORT должны быть учтены ВСЕ переданные файлы. Блоки [ФРАГМЕНТ: файл="..." строки ...] в конце — найденные поиском по полному тексту файлов места, относящиеся к разделу; ссылайся на файл из их метки.'
+
+
+MAP_SYSTEM = """Ты — эксперт по анализу результатов нагрузочного тестирования. Тебе передан ОДИН артефакт (файл) или его часть.
+
+Выпиши кратко, списком, только факты из этого артефакта, важные для отчёта по НТ:
+- ключевые метрики и цифры (времена ответа, пропускная способность, паузы GC, память, CPU, количество ошибок);
+- ошибки, исключения, аномалии и время их появления;
+- что выглядит хорошо и что плохо (с цифрами).
+Не придумывай ничего, чего нет в тексте. Если полезных данных нет — так и напиши одной строкой.
+Не пиши вступлений и общих рекомендаций. Объём сводки указан в конце сообщения."""
+
+
+ASK_SYSTEM = """Ты — эксперт по анализу результатов нагрузочного тестирования. Отвечаешь на вопрос инженера по артефактам теста.
+
+Тебе переданы фрагменты файлов, найденные поиском по вопросу: [ФРАГМЕНТ: файл="имя" строки A–B].
+Отвечай ТОЛЬКО по этим фрагментам, для каждого утверждения укажи файл и строки. Если во фрагментах ответа нет —
+так и напиши: «В найденных фрагментах ответа нет», не придумывай."""
+
+
+def build_ask_prompt(test_meta: dict, question: str, fragments: str) -> tuple[str, str]:
+    """Messages of a follow-up question: найденные фрагменты, затем вопрос."""
+    user = f"""Метаданные теста: {json.dumps(test_meta, ensure_ascii=False)}
+
+--- НАЙДЕННЫЕ ФРАГМЕНТЫ ---
+
+{fragments or "(по вопросу ничего не найдено)"}
+
+--- КОНЕЦ ФРАГМЕНТОВ ---
+
+Вопрос: {question}"""
+    return ASK_SYSTEM, user
+
+
+# Отмена ожидания в очереди и временная недоступность бэкенда — не результат узла: исключение уходит из графа,
+# задача остаётся незавершённой в checkpointer и выполняется заново при продолжении запуска
+TRANSIENT_ERRORS = (InterruptedError, LLMQueueFull, ConnectionError, TimeoutError, httpx.TransportError)
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for cancellation and backend-unavailable errors, в том числе обёрнутых клиентом LLM (__cause__)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
 def _extract_section(text: str, tag: str) -> str:
     m = re.search(rf"## {tag}\s*\n(.*?)(?=\n## |\Z)", text, re.DOTALL)
     return m.group(1).strip() if m else ""
 
 
-def analyze_artifacts(state: AgentState, llm: Any) -> AgentState:
-    """Node: run LLM over artifact_contents + system_prompt and fill report_sections + report_text."""
-    contents = state.get("artifact_contents") or ""
-    max_chars = state.get("max_artifact_chars") or 120_000
-    contents = contents[:max_chars]
-    if max_chars < len(state.get("artifact_contents") or ""):
-        logger.info("artifact_contents_truncated", max_chars=max_chars, original_len=len(state.get("artifact_contents") or ""))
-    artifact_labels = state.get("artifact_labels") or []
-    system_prompt = state.get("system_prompt") or ""
-    test_meta = state.get("test_meta") or {}
-
-    system = REPORT_SYSTEM
-    if system_prompt:
-        system += f"\n\nДополнительный контекст от инженера:\n{system_prompt}"
+def _engineer_context(system_prompt: str) -> str:
+    return f"Дополнительный контекст от инженера:\n{system_prompt}\n\n" if system_prompt else ""
 
+
+def build_prompt(test_meta: dict, artifact_labels: list, system_prompt: str, contents: str) -> tuple[str, str]:
+    """
+    System and user messages of the analysis call (с пустым contents — для расчёта бюджета контекста).
+    Неизменная часть — system и начало user — идёт первой, всё, что меняется от теста к тесту, — после:
+    общий префикс промпта Ollama берёт из KV-кэша, а не вычисляет заново.
+    """
     labels_line = ""
     if artifact_labels:
         labels_line = f"\nОБЯЗАТЕЛЬНО: В отчёте должны быть учтены ВСЕ {len(artifact_labels)} артефактов. Список файлов (каждый должен быть упомянут в SOURCES и в выводах): {', '.join(repr(f) for f in artifact_labels)}.\n"
 
-    user = f"""Метаданные теста: {json.dumps(test_meta, ensure_ascii=False)}
-{labels_line}
-Ниже — содержимое артефактов (файлов). Каждый блок начинается с метки [АРТЕФАКТ: файл="..." ...]. Строй отчёт только по этим данным и для каждого вывода указывай имя файла-источника. В разделах SOURCES, GOOD, BAD, ERRORS и в FULL_REPORT должны быть учтены ВСЕ переданные файлы.
+    user = f"""{REPORT_USER_HEAD}
 
+{_engineer_context(system_prompt)}Метаданные теста: {json.dumps(test_meta, ensure_ascii=False)}
+{labels_line}
 --- НАЧАЛО АРТЕФАКТОВ ---
 
 {contents}
@@ -85,17 +131,36 @@ def analyze_artifacts(state: AgentState, llm: Any) -> AgentState:
 --- КОНЕЦ АРТЕФАКТОВ ---
 
 Составь отчёт по приведённым выше данным. Не используй информацию, которой нет в блоках артефактов. Для каждого файла из списка артефактов сделай вывод или укажи «по файлу X: данных для выводов недостаточно»."""
+    return REPORT_SYSTEM, user
+
+
+def analyze_artifacts(state: AgentState, llm: Any) -> AgentState:
+    """Node: run LLM over artifact_contents + system_prompt and fill report_sections + report_text."""
+    contents = state.get("artifact_contents") or ""
+    # Содержимое уже уложено в бюджет токенов упаковщиком; срез по символам — только если лимит задан явно
+    max_chars = state.get("max_artifact_chars")
+    if max_chars and max_chars < len(contents):
+        logger.info("artifact_contents_truncated", max_chars=max_chars, original_len=len(contents))
+        telemetry.emit("context_truncated", {"stage": "max_artifact_chars", "chars_dropped": len(contents) - max_chars})
+        contents = contents[:max_chars]
+    system, user = build_prompt(
+        state.get("test_meta") or {},
+        state.get("artifact_labels") or [],
+        state.get("system_prompt") or "",
+        contents,
+    )
     messages = [SystemMessage(content=system), HumanMessage(content=user)]
     chain = llm | StrOutputParser()
     try:
         raw = chain.invoke(messages)
     except Exception as e:
+        if is_transient(e):
+            raise
         logger.exception("llm_invoke_failed", error=str(e))
         return {"error": str(e), "report_text": ""}
 
     report_sections = {
         "meta": _extract_section(raw, "META"),
-        "pods_table": _extract_section(raw, "PODS_TABLE"),
         "good": _extract_section(raw, "GOOD"),
         "bad": _extract_section(raw, "BAD"),
         "errors": _extract_section(raw, "ERRORS"),
@@ -109,18 +174,89 @@ def analyze_artifacts(state: AgentState, llm: Any) -> AgentState:
     }
 
 
+def build_map_prompt(test_meta: dict, chunk: dict, system_prompt: str, max_words: int) -> tuple[str, str]:
+    """Messages of one map call: один артефакт или его часть (MAP_SYSTEM не меняется — общий префикс всех вызовов)."""
+    part = f" (часть {chunk['part']} из {chunk['parts']})" if chunk.get("parts", 1) > 1 else ""
+    user = f"""{_engineer_context(system_prompt)}Метаданные теста: {json.dumps(test_meta, ensure_ascii=False)}
+
+Артефакт{part}:
+
+{chunk.get("header", "")}
+{chunk.get("text", "")}
+
+Объём сводки — не больше {max_words} слов."""
+    return MAP_SYSTEM, user
+
+
+# Поля map-входа, которые переходят в его сводку (ids — артефакты в БД, index — порядок в промпте)
+PARTIAL_KEYS = ("index", "ids", "label", "header", "part", "parts", "hash")
+
+
+def summarize_artifact(state: AgentState, llm: Any, max_words: int) -> AgentState:
+    """Map node (через Send): сводка одного артефакта или его части в partials."""
+    chunk = state.get("chunk") or {}
+    system, user = build_map_prompt(state.get("test_meta") or {}, chunk, state.get("system_prompt") or "", max_words)
+    chain = llm | StrOutputParser()
+    try:
+        summary = chain.invoke([SystemMessage(content=system), HumanMessage(content=user)]).strip()
+        error = None
+    except Exception as e:
+        if is_transient(e):
+            raise
+        logger.warning("llm_map_invoke_failed", label=chunk.get("label"), part=chunk.get("part"), error=str(e))
+        summary, error = "", str(e)
+    return {"partials": [{**{k: chunk.get(k) for k in PARTIAL_KEYS}, "summary": summary, "error": error}]}
+
+
+def reduce_summaries(state: AgentState, llm: Any) -> AgentState:
+    """
+    Reduce node: части одного артефакта склеиваются по порядку, сводки всех артефактов укладываются
+    в бюджет контекста и идут в обычный промпт отчёта вместо сырого содержимого.
+    """
+    partials = sorted(state.get("partials") or [], key=lambda p: (p["index"], p.get("part") or 1))
+    if partials and all(p["error"] for p in partials):
+        return {"error": partials[0]["error"], "report_text": ""}
+    by_artifact: dict[int, list[dict]] = {}
+    for p in partials:
+        by_artifact.setdefault(p["index"], []).append(p)
+    blocks = []
+    for index, parts in by_artifact.items():
+        texts = []
+        for p in parts:
+            prefix = f"[часть {p['part']} из {p['parts']}] " if (p.get("parts") or 1) > 1 else ""
+            texts.append(prefix + (p["summary"] if not p["error"] else f"[не удалось обработать: {p['error']}]"))
+        blocks.append(ArtifactBlock(
+            ids=list(parts[0].get("ids") or []),
+            label=parts[0]["label"],
+            kind="summary",
+            header=f"{parts[0]['header']} (сводка по файлу)",
+            text="\n".join(texts),
+        ))
+    budget = state.get("context_budget_tokens")
+    if not budget:
+        contents = "\n\n".join(f"{b.header}\n{b.text}" for b in blocks)
+        return analyze_artifacts({**state, "artifact_contents": contents, "max_artifact_chars": None}, llm)
+    counter = TokenCounter(state.get("llm_model"))
+    contents = pack_artifacts(blocks, budget, counter, max(1, budget // max(1, len(blocks))) // 2)
+    telemetry.emit("context_truncated", {"stage": "reduce", "chars_dropped": telemetry.dropped_chars(blocks)})
+    result = analyze_artifacts({**state, "artifact_contents": contents, "max_artifact_chars": None}, llm)
+    # Сколько бюджета досталось сводке каждого артефакта — для snapshot отчёта
+    return {**result, "reduce_context": [{"ids": b.ids, **b.allocation()} for b in blocks]}
+
+
 def format_report_text(state: AgentState) -> AgentState:
     """Node: build final plain text report from report_sections. Если секции пустые — подставляем сырой ответ LLM."""
     sections = state.get("report_sections") or {}
     meta = sections.get("meta", "").strip()
     sources = sections.get("sources", "").strip()
-    pods = sections.get("pods_table", "").strip()
+    # Таблица подов не генерируется моделью: инвентарь рассчитан по pods_list.json до анализа
+    pods = (state.get("pods_table") or "").strip()
     good = sections.get("good", "").strip()
     bad = sections.get("bad", "").strip()
     errors = sections.get("errors", "").strip()
     full = sections.get("full_report", "").strip()
     raw_analysis = (state.get("analysis") or "").strip()
-    all_empty = not any([meta, sources, pods, good, bad, errors, full])
+    all_empty = not any([meta, sources, good, bad, errors, full])
     if all_empty and raw_analysis:
         report_text = (
             "ОТЧЁТ ПО РЕЗУЛЬТАТАМ НАГРУЗОЧНОГО ТЕСТИРОВАНИЯ\n\n"
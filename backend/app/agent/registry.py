@@ -0,0 +1,114 @@
+"""Registry of LLM clients and compiled graphs: переиспользуются между анализами, простаивающие вытесняются."""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Short hash of the API key: ключ различает клиентов, но не хранится в реестре открытым текстом."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else ""
+
+
+@dataclass
+class _Entry:
+    value: Any
+    created_at: float
+    last_used: float
+    uses: int = 0
+
+
+class Registry:
+    """
+    Thread-safe keyed store: значение создаётся factory при первом обращении (под блокировкой — один раз),
+    записи без обращений дольше idle_seconds удаляются при следующем обращении к реестру.
+    """
+
+    def __init__(self, name: str, idle_seconds: Callable[[], float]):
+        self.name = name
+        self._idle_seconds = idle_seconds
+        self._entries: dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._entries[key] = _Entry(value=factory(), created_at=now, last_used=now)
+            else:
+                self.hits += 1
+            entry.last_used = now
+            entry.uses += 1
+            return entry.value
+
+    def _evict_idle(self, now: float) -> None:
+        idle = self._idle_seconds()
+        if not idle:
+            return
+        stale = [k for k, e in self._entries.items() if now - e.last_used > idle]
+        for k in stale:
+            del self._entries[k]
+        if stale:
+            self.evictions += len(stale)
+            logger.info("registry_evicted_idle", registry=self.name, evicted=len(stale), left=len(self._entries))
+
+    def evict_idle(self) -> None:
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _idle_seconds() -> float:
+    return settings.llm_registry_idle_seconds
+
+
+llm_clients = Registry("llm_clients", _idle_seconds)
+graphs = Registry("graphs", _idle_seconds)
+
+
+def get_llm_client(llm_type: str, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None) -> Any:
+    """LLM client by (llm_type, model, base_url, отпечаток ключа); HTTP-пул общий для всех клиентов."""
+    from app.agent.llm_factory import get_llm
+
+    key = (llm_type, model, base_url or "", key_fingerprint(api_key))
+    return llm_clients.get_or_create(key, lambda: get_llm(llm_type, model, api_key=api_key, base_url=base_url))
+
+
+def get_graph(key: Hashable, factory: Callable[[], Any]) -> Any:
+    return graphs.get_or_create(key, factory)
+
+
+def clear() -> None:
+    graphs.clear()
+    llm_clients.clear()
+
+
+def stats() -> dict:
+    return {"llm_clients": llm_clients.stats(), "graphs": graphs.stats()}
@@ -0,0 +1,217 @@
+"""
+LLM request scheduler: все вызовы модели из анализов проходят через очередь своего бэкенда.
+
+Бэкенд — (llm_type, base_url): одна Ollama, GigaChat, OpenAI-совместимый сервер. Одновременно выполняется не больше
+settings.llm_concurrency[llm_type] вызовов, остальные ждут. Из очереди первым выходит вызов с меньшим priority,
+при равном — проекта, у которого сейчас меньше выполняющихся вызовов, затем того, кого дольше не обслуживали
+(map-вызовы одного анализа не забивают бэкенд для остальных проектов), дальше — по порядку прихода. Если очередь полна, вызов (и новый анализ) сразу
+отклоняется LLMQueueFull, а не ждёт, пока сервер модели начнёт отвечать ошибками.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+import structlog
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+DEFAULT_PRIORITY = 5
+# Ожидание в очереди дольше этого попадает в лог
+_LOG_WAIT_SECONDS = 1.0
+
+
+class LLMQueueFull(RuntimeError):
+    """Queue of the LLM backend is full (или ожидание превысило llm_queue_timeout_seconds)."""
+
+
+@dataclass(eq=False)
+class _Ticket:
+    priority: int
+    seq: int
+    project: str
+    granted: bool = False
+
+
+class BackendScheduler:
+    """Limit of concurrent calls and fair priority queue of one LLM backend."""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._waiting: list[_Ticket] = []
+        self._running: dict[str, int] = defaultdict(int)
+        self._seq = itertools.count()
+        self._grants = itertools.count()
+        self._last_grant: dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_depth = 0
+        self._waits: deque[float] = deque(maxlen=1000)
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    def _pick(self) -> Optional[_Ticket]:
+        if not self._waiting or self.running >= self.limit:
+            return None
+        return min(
+            self._waiting,
+            key=lambda t: (t.priority, self._running[t.project], self._last_grant.get(t.project, -1), t.seq),
+        )
+
+    def _grant(self) -> None:
+        # Под self._cond: выдать освободившиеся слоты следующим по очереди
+        while (ticket := self._pick()) is not None:
+            self._waiting.remove(ticket)
+            self._running[ticket.project] += 1
+            self._last_grant[ticket.project] = next(self._grants)
+            ticket.granted = True
+        self._cond.notify_all()
+
+    def check_capacity(self) -> None:
+        """Reject early: очередь бэкенда уже полна (для новых анализов — до постановки задачи)."""
+        with self._cond:
+            if self.max_queue and len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                raise LLMQueueFull(f"LLM queue of {self.name} is full ({len(self._waiting)} waiting)")
+
+    def acquire(
+        self,
+        project: str = "",
+        priority: int = DEFAULT_PRIORITY,
+        timeout: Optional[float] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> float:
+        """Wait for a slot; возвращает время ожидания в секундах. cancelled() — прекратить ожидание (отмена задачи)."""
+        start = time.monotonic()
+        with self._cond:
+            if self.max_queue and len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                raise LLMQueueFull(f"LLM queue of {self.name} is full ({len(self._waiting)} waiting)")
+            ticket = _Ticket(priority=priority, seq=next(self._seq), project=project)
+            self._waiting.append(ticket)
+            self.max_depth = max(self.max_depth, len(self._waiting))
+            self._grant()
+            while not ticket.granted:
+                waited = time.monotonic() - start
+                if (timeout and waited >= timeout) or (cancelled and cancelled()):
+                    self._waiting.remove(ticket)
+                    if cancelled and cancelled():
+                        raise InterruptedError("LLM call cancelled while queued")
+                    self.timeouts += 1
+                    raise LLMQueueFull(f"LLM queue of {self.name}: no slot in {timeout:.0f} s")
+                # Просыпаемся и без уведомления — проверить отмену
+                self._cond.wait(timeout=1.0 if not timeout else min(1.0, timeout - waited))
+            self.admitted += 1
+            waited = time.monotonic() - start
+            self._waits.append(waited)
+        if waited >= _LOG_WAIT_SECONDS:
+            logger.info("llm_queue_wait", backend=self.name, project=project, priority=priority, wait_ms=round(waited * 1000))
+        return waited
+
+    def release(self, project: str = "") -> None:
+        with self._cond:
+            self._running[project] -= 1
+            if self._running[project] <= 0:
+                del self._running[project]
+            self._grant()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            by_project: dict[str, dict] = defaultdict(lambda: {"running": 0, "queued": 0})
+            for project, n in self._running.items():
+                by_project[project]["running"] = n
+            for t in self._waiting:
+                by_project[t.project]["queued"] += 1
+            return {
+                "limit": self.limit,
+                "running": self.running,
+                "queued": len(self._waiting),
+                "max_queue": self.max_queue,
+                "max_queue_depth": self.max_depth,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "wait_ms_p95": round(1000 * waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+                "wait_ms_max": round(1000 * waits[-1], 1) if waits else 0.0,
+                "projects": dict(by_project),
+            }
+
+
+_schedulers: dict[tuple[str, str], BackendScheduler] = {}
+_lock = threading.Lock()
+
+
+def get_scheduler(llm_type: str, base_url: Optional[str] = None) -> BackendScheduler:
+    key = (llm_type, (base_url or "").rstrip("/"))
+    with _lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            name = f"{llm_type}@{key[1]}" if key[1] else llm_type
+            scheduler = _schedulers[key] = BackendScheduler(
+                name, int(settings.llm_concurrency.get(llm_type, 1)), settings.llm_queue_max
+            )
+        return scheduler
+
+
+def stats() -> dict:
+    with _lock:
+        schedulers = list(_schedulers.values())
+    return {s.name: s.stats() for s in schedulers}
+
+
+class ScheduledChatModel(Runnable):
+    """
+    Chat model wrapper: вызов ждёт слот в очереди бэкенда. Проект, приоритет и отмена берутся из
+    config["configurable"] (llm_project, llm_priority, llm_cancel_event) — их задаёт run_analysis.
+    stream держит слот до конца потока; batch, ainvoke и astream Runnable выполняет через invoke —
+    каждый вызов тоже проходит очередь.
+    """
+
+    def __init__(self, llm: Any, scheduler: BackendScheduler):
+        self.llm = llm
+        self.scheduler = scheduler
+
+    @contextmanager
+    def _slot(self, config: Optional[RunnableConfig]) -> Iterator[None]:
+        configurable = ensure_config(config).get("configurable", {})
+        project = str(configurable.get("llm_project") or "")
+        cancel_event = configurable.get("llm_cancel_event")
+        self.scheduler.acquire(
+            project=project,
+            priority=int(configurable.get("llm_priority", DEFAULT_PRIORITY)),
+            timeout=settings.llm_queue_timeout_seconds or None,
+            cancelled=cancel_event.is_set if cancel_event is not None else None,
+        )
+        try:
+            yield
+        finally:
+            self.scheduler.release(project)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        with self._slot(config):
+            return self.llm.invoke(input, config, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        with self._slot(config):
+            yield from self.llm.stream(input, config, **kwargs)
+
+
+def with_scheduler(llm: Any, llm_type: str, base_url: Optional[str] = None) -> Any:
+    return ScheduledChatModel(llm, get_scheduler(llm_type, base_url))
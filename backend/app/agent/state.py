@@ -1,5 +1,6 @@
 """LangGraph agent state for NT report generation."""
-from typing import TypedDict, Optional, Any
+import operator
+from typing import Annotated, TypedDict, Optional, Any
 
 
 class AgentState(TypedDict, total=False):
@@ -10,7 +11,16 @@ class AgentState(TypedDict, total=False):
     artifact_contents: str
     artifact_labels: Optional[list]
     system_prompt: Optional[str]
-    max_artifact_chars: Optional[int]  # лимит символов контекста (для Ollama меньше)
+    pods_table: Optional[str]  # инвентарь подов, рассчитанный по pods_list.json (не моделью)
+    max_artifact_chars: Optional[int]  # жёсткий лимит символов (обычно None: артефакты уже упакованы в бюджет токенов)
+
+    # Map-reduce (analysis_graph_mode=map_reduce)
+    llm_model: Optional[str]
+    artifact_chunks: list  # [{index, ids, label, header, text, part, parts, hash}] — по одному map-вызову на элемент
+    chunk: dict  # вход одного map-вызова (Send)
+    partials: Annotated[list, operator.add]  # сводки map-вызовов (и готовые из прошлого анализа — во входе графа)
+    context_budget_tokens: Optional[int]  # бюджет на сводки в reduce-промпте
+    reduce_context: list  # распределение бюджета reduce-промпта: [{ids, tokens_needed, tokens_allocated, ...}] по артефактам
 
     # After analysis
     analysis: str
@@ -0,0 +1,267 @@
+"""
+LLM telemetry: узлы графа и вызовы модели одного анализа (callback LangChain) и накопленные метрики процесса.
+
+По каждому вызову: токены промпта и ответа, время до первого токена, скорость генерации, общее время; по узлу —
+время выполнения; по запуску — символы, отброшенные при укладке в контекст. Сводка запуска хранится в
+Report.llm_metrics, накопленные счётчики отдаёт GET /metrics (формат Prometheus).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler, dispatch_custom_event
+from langchain_core.outputs import LLMResult
+
+from app.agent import scheduler
+
+
+def emit(name: str, data: dict, config: Optional[dict] = None) -> None:
+    """Custom event для RunTelemetry из кода узла (кэш, обрезка); вне запуска графа — ничего не делает."""
+    try:
+        dispatch_custom_event(name, data, config=config)
+    except RuntimeError:
+        pass
+
+
+def dropped_chars(blocks: list) -> int:
+    """Chars cut from packed ArtifactBlock-ов (pack_artifacts) — разница между исходным и уложенным текстом."""
+    return sum(
+        max(0, len(b.header) + 1 + len(b.text) - len(b.packed_text or ""))
+        for b in blocks
+        if b.truncated
+    )
+
+
+def _usage(response: LLMResult) -> dict:
+    """Tokens and server timings: usage_metadata (OpenAI, новые клиенты), generation_info (Ollama), llm_output (OpenAI)."""
+    out: dict[str, Any] = {}
+    generation = response.generations[0][0] if response.generations and response.generations[0] else None
+    message = getattr(generation, "message", None)
+    usage = getattr(message, "usage_metadata", None) or {}
+    info = (generation.generation_info if generation else None) or {}
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    out["prompt_tokens"] = usage.get("input_tokens") or info.get("prompt_eval_count") or token_usage.get("prompt_tokens")
+    out["completion_tokens"] = usage.get("output_tokens") or info.get("eval_count") or token_usage.get("completion_tokens")
+    # Ollama: длительности в наносекундах — загрузка модели, обработка промпта, генерация
+    if info.get("eval_duration"):
+        out["server_load_ms"] = round(info.get("load_duration", 0) / 1e6, 1)
+        out["server_prompt_ms"] = round(info.get("prompt_eval_duration", 0) / 1e6, 1)
+        out["server_generation_ms"] = round(info["eval_duration"] / 1e6, 1)
+    if generation is not None:
+        out["completion_chars"] = len(generation.text or "")
+    return out
+
+
+class RunTelemetry(BaseCallbackHandler):
+    """Callback handler of one analysis run (передаётся в config["callbacks"] запуска графа)."""
+
+    def __init__(self, default_node: str = ""):
+        self.default_node = default_node
+        self._lock = threading.Lock()
+        self._nodes_started: dict[UUID, tuple[str, float]] = {}
+        self._calls_started: dict[UUID, dict] = {}
+        self.nodes: list[dict] = []
+        self.calls: list[dict] = []
+        self.cache_hits: list[dict] = []
+        self.truncated_chars: dict[str, int] = defaultdict(int)
+
+    # --- узлы графа: chain-run с именем узла
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node and not node.startswith("__"):
+            with self._lock:
+                self._nodes_started[run_id] = (node, time.perf_counter())
+
+    def _node_finished(self, run_id: UUID, error: Optional[str] = None) -> None:
+        with self._lock:
+            started = self._nodes_started.pop(run_id, None)
+            if started is not None:
+                node, start = started
+                self.nodes.append({"node": node, "wall_ms": round((time.perf_counter() - start) * 1000, 1), "error": error})
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_finished(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_finished(run_id, error=type(error).__name__)
+
+    # --- вызовы модели
+    def on_chat_model_start(self, serialized: Any, messages: list, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        with self._lock:
+            self._calls_started[run_id] = {
+                "node": metadata.get("langgraph_node") or self.default_node,
+                "model": metadata.get("ls_model_name"),
+                "prompt_chars": sum(len(str(m.content)) for batch in messages for m in batch),
+                "start": time.perf_counter(),
+                "first_token": None,
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            call = self._calls_started.get(run_id)
+            if call is not None and call["first_token"] is None:
+                call["first_token"] = time.perf_counter()
+
+    def _call_finished(self, run_id: UUID, response: Optional[LLMResult], error: Optional[str] = None) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            call = self._calls_started.pop(run_id, None)
+        if call is None:
+            return
+        start, first = call.pop("start"), call.pop("first_token")
+        record = {**call, "wall_ms": round((end - start) * 1000, 1), "error": error}
+        record.update(_usage(response) if response is not None else {})
+        if first is not None:
+            record["ttft_ms"] = round((first - start) * 1000, 1)
+            generation_s = end - first
+        elif record.get("server_generation_ms") is not None:
+            # Без стриминга: до первого токена — загрузка модели и обработка промпта на сервере
+            record["ttft_ms"] = round(record["server_load_ms"] + record["server_prompt_ms"], 1)
+            generation_s = record["server_generation_ms"] / 1000
+        else:
+            generation_s = None
+        if record.get("completion_tokens") and generation_s:
+            record["tokens_per_second"] = round(record["completion_tokens"] / generation_s, 1)
+        with self._lock:
+            self.calls.append(record)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._call_finished(run_id, response)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._call_finished(run_id, None, error=type(error).__name__)
+
+    # --- события из кода узлов (emit)
+    def on_custom_event(self, name: str, data: Any, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node") or self.default_node
+        with self._lock:
+            if name == "llm_cache_hit":
+                self.cache_hits.append({"node": node, **data})
+            elif name == "context_truncated" and int(data.get("chars_dropped") or 0) > 0:
+                self.truncated_chars[data.get("stage") or node or "unknown"] += int(data["chars_dropped"])
+
+    def add_truncation(self, stage: str, chars_dropped: int) -> None:
+        """Chars dropped outside the graph (упаковка артефактов в бюджет перед запуском)."""
+        if chars_dropped > 0:
+            with self._lock:
+                self.truncated_chars[stage] += chars_dropped
+
+    def summary(self) -> dict:
+        with self._lock:
+            calls, nodes = list(self.calls), list(self.nodes)
+            cache_hits, truncated = list(self.cache_hits), dict(self.truncated_chars)
+
+        def total(key: str) -> int:
+            return sum(c.get(key) or 0 for c in calls)
+
+        by_node: dict[str, dict] = {}
+        for n in nodes:
+            entry = by_node.setdefault(n["node"], {"runs": 0, "wall_ms": 0.0, "llm_calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            entry["runs"] += 1
+            entry["wall_ms"] = round(entry["wall_ms"] + n["wall_ms"], 1)
+        for c in calls:
+            entry = by_node.setdefault(c.get("node") or "", {"runs": 0, "wall_ms": 0.0, "llm_calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            entry["llm_calls"] += 1
+            entry["prompt_tokens"] += c.get("prompt_tokens") or 0
+            entry["completion_tokens"] += c.get("completion_tokens") or 0
+        for h in cache_hits:
+            by_node.setdefault(h.get("node") or "", {"runs": 0, "wall_ms": 0.0, "llm_calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0})["cache_hits"] += 1
+        ttfts = [c["ttft_ms"] for c in calls if c.get("ttft_ms") is not None]
+        speeds = [c["tokens_per_second"] for c in calls if c.get("tokens_per_second")]
+        return {
+            "totals": {
+                "llm_calls": len(calls),
+                "llm_errors": sum(1 for c in calls if c.get("error")),
+                "cache_hits": len(cache_hits),
+                "prompt_tokens": total("prompt_tokens"),
+                "completion_tokens": total("completion_tokens"),
+                "llm_wall_ms": round(sum(c["wall_ms"] for c in calls), 1),
+                "ttft_ms_avg": round(sum(ttfts) / len(ttfts), 1) if ttfts else None,
+                "tokens_per_second_avg": round(sum(speeds) / len(speeds), 1) if speeds else None,
+                "truncated_chars": sum(truncated.values()),
+            },
+            "nodes": by_node,
+            "truncated_chars": truncated,
+            "calls": calls,
+        }
+
+
+class _Metrics:
+    """Process-wide counters for GET /metrics (сбрасываются при перезапуске)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[tuple[str, tuple], float] = defaultdict(float)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def record_run(self, summary: dict, llm_type: str, model: str) -> None:
+        for c in summary["calls"]:
+            labels = {"node": c.get("node") or "", "llm_type": llm_type, "model": model}
+            self.inc("ntview_llm_calls_total", status="error" if c.get("error") else "ok", **labels)
+            self.inc("ntview_llm_prompt_tokens_total", c.get("prompt_tokens") or 0, **labels)
+            self.inc("ntview_llm_completion_tokens_total", c.get("completion_tokens") or 0, **labels)
+            self.inc("ntview_llm_call_seconds_sum", c["wall_ms"] / 1000, **labels)
+            self.inc("ntview_llm_call_seconds_count", 1, **labels)
+            if c.get("ttft_ms") is not None:
+                self.inc("ntview_llm_ttft_seconds_sum", c["ttft_ms"] / 1000, **labels)
+                self.inc("ntview_llm_ttft_seconds_count", 1, **labels)
+            if c.get("tokens_per_second") and c.get("completion_tokens"):
+                # Скорость генерации = rate(completion_tokens) / rate(generation_seconds)
+                self.inc("ntview_llm_generation_seconds_total", c["completion_tokens"] / c["tokens_per_second"], **labels)
+        for node, n in summary["nodes"].items():
+            if n["runs"]:
+                self.inc("ntview_node_seconds_sum", n["wall_ms"] / 1000, node=node)
+                self.inc("ntview_node_seconds_count", n["runs"], node=node)
+            if n["cache_hits"]:
+                self.inc("ntview_llm_cache_hits_total", n["cache_hits"], node=node)
+        for stage, chars in summary["truncated_chars"].items():
+            self.inc("ntview_context_truncated_chars_total", chars, stage=stage)
+
+    def prometheus(self, gauges: Optional[dict[tuple[str, tuple], float]] = None) -> str:
+        with self._lock:
+            values = {**self.counters, **(gauges or {})}
+        families: dict[str, list[tuple[str, tuple, float]]] = defaultdict(list)
+        for (name, labels), value in values.items():
+            # Семейство и тип по суффиксу: *_sum/*_count — summary, *_total — counter, остальное — gauge
+            family, _, suffix = name.rpartition("_")
+            families[family if suffix in ("sum", "count") else name].append((name, labels, value))
+        lines = []
+        for family in sorted(families):
+            samples = sorted(families[family])
+            kind = "summary" if samples[0][0] != family else ("counter" if family.endswith("_total") else "gauge")
+            lines.append(f"# TYPE {family} {kind}")
+            for name, labels, value in samples:
+                label_text = ",".join(f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+                sample = _sample_value(value)
+                lines.append(f"{name}{{{label_text}}} {sample}" if label_text else f"{name} {sample}")
+        return "\n".join(lines) + "\n"
+
+
+def _sample_value(value: float) -> str:
+    """Exact text of a sample: целые — без дробной части, остальные — repr (:g обрезал бы до 6 значащих цифр)."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+metrics = _Metrics()
+
+
+def prometheus_text() -> str:
+    """GET /metrics: накопленные счётчики и текущее состояние очередей бэкендов LLM."""
+    gauges: dict[tuple[str, tuple], float] = {}
+    for backend, st in scheduler.stats().items():
+        labels = (("backend", backend),)
+        gauges[("ntview_llm_queue_limit", labels)] = st["limit"]
+        gauges[("ntview_llm_queue_running", labels)] = st["running"]
+        gauges[("ntview_llm_queue_waiting", labels)] = st["queued"]
+        gauges[("ntview_llm_queue_rejected_total", labels)] = st["rejected"] + st["timeouts"]
+    return metrics.prometheus(gauges)
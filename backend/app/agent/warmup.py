@@ -0,0 +1,86 @@
+"""
+Warm-up of Ollama models at backend startup: модель загружается в память до первого анализа,
+а общий префикс промпта (системный промпт и неизменное начало сообщения) уже лежит в KV-кэше.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import httpx
+import structlog
+
+from app.agent.llm_factory import ollama_keep_alive, shared_ollama_transport
+from app.agent.nodes import MAP_SYSTEM, REPORT_SYSTEM, REPORT_USER_HEAD
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.models import LLMType, Project
+
+logger = structlog.get_logger()
+
+
+def configured_models() -> list[str]:
+    """Ollama models used for analysis: модель по умолчанию и модели проектов с llm_type=ollama."""
+    models = []
+    if settings.default_llm_type == LLMType.ollama.value and settings.default_llm_model:
+        models.append(settings.default_llm_model)
+    db = SessionLocal()
+    try:
+        rows = db.query(Project.llm_model).filter(Project.llm_type == LLMType.ollama.value).distinct().all()
+    finally:
+        db.close()
+    for (model,) in rows:
+        # qwen2.5vl анализ всё равно подменяет текстовой моделью (см. analysis_runner)
+        if model and model not in models and "qwen2.5vl" not in model.lower():
+            models.append(model)
+    return models
+
+
+def warm_up(model: str, base_url: str | None = None) -> None:
+    """
+    One minimal chat call (1 токен ответа) с тем же num_ctx, что у анализа: другой num_ctx заставил бы Ollama
+    перезагрузить модель при первом же анализе.
+    """
+    if settings.analysis_graph_mode == "map_reduce":
+        messages = [{"role": "system", "content": MAP_SYSTEM}]
+    else:
+        messages = [{"role": "system", "content": REPORT_SYSTEM}, {"role": "user", "content": REPORT_USER_HEAD}]
+    start = time.perf_counter()
+    # Через общий транспорт клиентов ChatOllama: соединение прогрева остаётся в пуле для анализа.
+    # Клиент не закрывается — это закрыло бы общий транспорт (его закрывает close_http_clients)
+    client = httpx.Client(transport=shared_ollama_transport(), timeout=httpx.Timeout(600.0, connect=10.0))
+    response = client.post(
+        f"{(base_url or settings.ollama_base_url).rstrip('/')}/api/chat",
+        json={
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": ollama_keep_alive(),
+            "options": {"num_ctx": settings.ollama_num_ctx, "num_predict": 1, "temperature": 0.2},
+        },
+    )
+    response.raise_for_status()
+    body = response.json()
+    logger.info(
+        "llm_warmup_done",
+        model=model,
+        load_ms=round(body.get("load_duration", 0) / 1e6),
+        prompt_tokens=body.get("prompt_eval_count"),
+        total_ms=round((time.perf_counter() - start) * 1000),
+    )
+
+
+def warm_up_all() -> None:
+    for model in configured_models():
+        try:
+            warm_up(model)
+        except Exception as e:
+            # Ollama может быть ещё не запущена — анализ тогда просто загрузит модель сам
+            logger.warning("llm_warmup_failed", model=model, error=str(e))
+
+
+def start_warmup() -> threading.Thread:
+    """Warm up in a background thread: старт приложения не ждёт загрузки моделей."""
+    thread = threading.Thread(target=warm_up_all, name="llm-warmup", daemon=True)
+    thread.start()
+    return thread
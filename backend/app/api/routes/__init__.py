@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import projects, tests, artifacts, reports, collect
+from app.api.routes import projects, tests, artifacts, reports, collect, llm, jobs
 
 api_router = APIRouter()
 api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
@@ -8,3 +8,5 @@ api_router.include_router(tests.router, prefix="/tests", tags=["tests"])
 api_router.include_router(artifacts.router, prefix="/artifacts", tags=["artifacts"])
 api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
 api_router.include_router(collect.router, prefix="/collect", tags=["collect"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(llm.router, prefix="/llm", tags=["llm"])
@@ -1,16 +1,17 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from pathlib import Path
-import zipfile
-import io
 
 from app.api.deps import get_db
 from app.api.schemas import ArtifactRead
+from app.config import settings
 from app.db import models
 from app.services.artifacts import ArtifactsService
+from app.services.preprocessing import preprocess_artifacts_job
 
 router = APIRouter()
 
@@ -27,6 +28,7 @@ def list_artifacts(test_id: int, db: Session = Depends(get_db)):
 @router.post("/test/{test_id}/upload", response_model=ArtifactRead)
 async def upload_artifact(
     test_id: int,
+    background_tasks: BackgroundTasks,
     kind: str = Form(...),
     display_name: Optional[str] = Form(None),
     file: UploadFile = File(...),
@@ -35,64 +37,263 @@ async def upload_artifact(
     t = db.query(models.Test).filter(models.Test.id == test_id).first()
     if not t:
         raise HTTPException(404, "Test not found")
-    content = await file.read()
     svc = ArtifactsService()
-    path_for_db, meta = svc.save_custom_artifact(
-        test_id=test_id,
-        kind=kind,
-        content=content,
+    # Потоковая запись чанками в пуле потоков: файл не читается в память целиком
+    path_for_db, meta = await run_in_threadpool(
+        svc.save_custom_artifact_stream,
+        test_id,
+        kind,
+        file.file,
         display_name=display_name or file.filename,
         metadata={"original_filename": file.filename},
     )
+    return _register_artifact(db, background_tasks, test_id, kind, display_name or file.filename, path_for_db, meta)
+
+
+@router.post("/test/{test_id}/upload-by-hash", response_model=ArtifactRead)
+def upload_artifact_by_hash(
+    test_id: int,
+    background_tasks: BackgroundTasks,
+    kind: str = Form(...),
+    sha256: str = Form(...),
+    display_name: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Register an artifact whose content is already stored (по sha256) — без повторной передачи файла.
+    Содержимое ищется только среди артефактов тестов того же проекта: знание sha256 не даёт доступа к файлам
+    других проектов.
+    """
+    t = _get_test_or_404(db, test_id)
+    existing = _project_artifact_with_content(db, t.project_id, sha256)
+    if existing is None:
+        raise HTTPException(404, "Content with this sha256 is not stored; upload the file")
+    svc = ArtifactsService()
+    try:
+        path_for_db, meta = svc.link_existing_blob(
+            test_id,
+            kind,
+            sha256,
+            display_name=display_name,
+            metadata={"original_filename": display_name},
+            size_bytes=(existing.metadata_ or {}).get("size_bytes"),
+        )
+    except FileNotFoundError:
+        raise HTTPException(404, "Content with this sha256 is not stored; upload the file")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return _register_artifact(db, background_tasks, test_id, kind, display_name, path_for_db, meta)
+
+
+@router.post("/test/{test_id}/uploads")
+def start_resumable_upload(test_id: int, db: Session = Depends(get_db)):
+    """Start a resumable upload. Чанки отправляются через PUT .../uploads/{upload_id}?offset=N."""
+    _get_test_or_404(db, test_id)
+    upload_id = ArtifactsService().start_upload(test_id)
+    return {"upload_id": upload_id, "offset": 0}
+
+
+@router.get("/test/{test_id}/uploads/{upload_id}")
+def get_resumable_upload(test_id: int, upload_id: str, db: Session = Depends(get_db)):
+    """Current offset of an interrupted upload — с него нужно продолжить отправку."""
+    _get_test_or_404(db, test_id)
+    try:
+        offset = ArtifactsService().upload_offset(test_id, upload_id)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(404, "Upload not found")
+    return {"upload_id": upload_id, "offset": offset}
+
+
+@router.put("/test/{test_id}/uploads/{upload_id}")
+async def append_resumable_upload(
+    test_id: int,
+    upload_id: str,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk"),
+    chunk: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    _get_test_or_404(db, test_id)
+    svc = ArtifactsService()
+    try:
+        new_offset = await run_in_threadpool(svc.append_upload, test_id, upload_id, offset, chunk.file)
+    except FileNotFoundError:
+        raise HTTPException(404, "Upload not found")
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    return {"upload_id": upload_id, "offset": new_offset}
+
+
+@router.post("/test/{test_id}/uploads/{upload_id}/complete", response_model=ArtifactRead)
+async def complete_resumable_upload(
+    test_id: int,
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    kind: str = Form(...),
+    display_name: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None, description="Expected sha256 of the whole file (optional check)"),
+    db: Session = Depends(get_db),
+):
+    _get_test_or_404(db, test_id)
+    svc = ArtifactsService()
+    try:
+        path_for_db, meta = await run_in_threadpool(
+            svc.finish_upload,
+            test_id,
+            upload_id,
+            kind,
+            display_name=display_name,
+            metadata={"original_filename": display_name, "upload_id": upload_id},
+            expected_sha256=sha256,
+        )
+    except FileNotFoundError:
+        raise HTTPException(404, "Upload not found")
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    return _register_artifact(db, background_tasks, test_id, kind, display_name, path_for_db, meta)
+
+
+@router.delete("/test/{test_id}/uploads/{upload_id}", status_code=204)
+def abort_resumable_upload(test_id: int, upload_id: str, db: Session = Depends(get_db)):
+    _get_test_or_404(db, test_id)
+    try:
+        ArtifactsService().abort_upload(test_id, upload_id)
+    except ValueError:
+        raise HTTPException(404, "Upload not found")
+    return Response(status_code=204)
+
+
+def _project_artifact_with_content(db: Session, project_id: int, sha256: str) -> Optional[models.Artifact]:
+    """Artifact of the project with this content — поиск по индексу artifacts.sha256."""
+    return (
+        db.query(models.Artifact)
+        .join(models.Test, models.Test.id == models.Artifact.test_id)
+        .filter(models.Test.project_id == project_id, models.Artifact.sha256 == sha256.lower())
+        .order_by(models.Artifact.id)
+        .first()
+    )
+
+
+def _get_test_or_404(db: Session, test_id: int) -> models.Test:
+    t = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not t:
+        raise HTTPException(404, "Test not found")
+    return t
+
+
+def _register_artifact(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    test_id: int,
+    kind: str,
+    display_name: Optional[str],
+    path_for_db: Path,
+    meta: dict,
+) -> models.Artifact:
     art = models.Artifact(
         test_id=test_id,
         kind=kind,
-        display_name=display_name or file.filename,
+        display_name=display_name,
         file_path=str(path_for_db),
         metadata_=meta,
+        sha256=meta.get("sha256"),
     )
     db.add(art)
     db.commit()
     db.refresh(art)
+    # Кодировка, строки, интервал времени и дайджест — после ответа клиенту; анализ возьмёт готовое
+    background_tasks.add_task(preprocess_artifacts_job, [art.id])
     return art
 
 
+@router.get("/{artifact_id}/download")
+def download_artifact(artifact_id: int, db: Session = Depends(get_db)):
+    """Stream one artifact file; сжатые при хранении (.zst) отдаются распакованными."""
+    a = db.query(models.Artifact).filter(models.Artifact.id == artifact_id).first()
+    if not a or not a.file_path:
+        raise HTTPException(404, "Artifact not found")
+    svc = ArtifactsService()
+    try:
+        svc.resolve_artifact_path(a.file_path)
+    except FileNotFoundError:
+        raise HTTPException(404, "Artifact file not found on disk")
+    name = svc.original_name(a.file_path)
+    return StreamingResponse(
+        svc.iter_artifact(a.file_path),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename={name}"},
+    )
+
+
 @router.get("/download-all/{test_id}")
 def download_all_artifacts(test_id: int, db: Session = Depends(get_db)):
-    """Return ZIP of all artifact files for the test."""
+    """Return ZIP of all artifact files for the test (архив формируется и отдаётся потоком)."""
     t = db.query(models.Test).filter(models.Test.id == test_id).first()
     if not t:
         raise HTTPException(404, "Test not found")
-    arts = db.query(models.Artifact).filter(models.Artifact.test_id == test_id).all()
+    arts = db.query(models.Artifact).filter(models.Artifact.test_id == test_id).order_by(models.Artifact.id).all()
     svc = ArtifactsService()
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for a in arts:
-            if not a.file_path:
-                continue
-            try:
-                data = svc.read_artifact(a.file_path)
-                name = Path(a.file_path).name
-                zf.writestr(name, data)
-            except Exception:
-                pass
-    buf.seek(0)
+    entries = _zip_entries(svc, test_id, arts)
     return StreamingResponse(
-        buf,
+        svc.iter_zip(entries),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=test_{test_id}_artifacts.zip"},
     )
 
 
+def _zip_entries(svc: ArtifactsService, test_id: int, arts: list[models.Artifact]) -> list[tuple[str, str]]:
+    """
+    (arcname, file_path) for every artifact file of the test.
+    Пути внутри архива: артефакты — относительно storage/artifacts/<test_id> (k8s/logs_*.txt),
+    срезы Grafana (PNG + JSON метаданных) — grafana_snapshots/<файл>.
+    """
+    roots = [
+        (settings.artifacts_path() / str(test_id), ""),
+        (settings.grafana_snapshots_path() / str(test_id), "grafana_snapshots/"),
+    ]
+    entries = []
+    seen = set()
+    seen_files = set()
+    for a in arts:
+        paths = [a.file_path]
+        if a.kind == "grafana_slice" and a.metadata_:
+            paths.append(a.metadata_.get("meta_path"))
+        for file_path in paths:
+            if not file_path:
+                continue
+            try:
+                resolved = svc.resolve_artifact_path(file_path).resolve()
+            except FileNotFoundError:
+                continue
+            # Повторная загрузка с тем же именем — несколько записей в БД на один файл
+            if resolved in seen_files:
+                continue
+            seen_files.add(resolved)
+            arcname = svc.original_name(file_path)
+            for root, prefix in roots:
+                try:
+                    rel = resolved.relative_to(root.resolve())
+                except ValueError:
+                    continue
+                arcname = prefix + rel.with_name(svc.original_name(rel.name)).as_posix()
+                break
+            if arcname in seen:
+                stem, dot, ext = arcname.rpartition(".")
+                arcname = f"{stem}_{a.id}.{ext}" if dot else f"{arcname}_{a.id}"
+            seen.add(arcname)
+            entries.append((arcname, file_path))
+    return entries
+
+
 @router.delete("/test/{test_id}/artifacts", status_code=204)
 def delete_test_artifacts(test_id: int, db: Session = Depends(get_db)):
     t = db.query(models.Test).filter(models.Test.id == test_id).first()
     if not t:
         raise HTTPException(404, "Test not found")
     arts = db.query(models.Artifact).filter(models.Artifact.test_id == test_id).all()
+    sha256s = [sha for sha in map(_artifact_sha256, arts) if sha]
     for a in arts:
         db.delete(a)
     svc = ArtifactsService()
-    svc.delete_test_artifacts(test_id)
+    svc.delete_test_artifacts(test_id, sha256s)
     db.commit()
     return Response(status_code=204)
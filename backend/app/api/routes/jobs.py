@@ -0,0 +1,57 @@
+import queue
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.api.schemas import JobRead
+from app.api.sse import sse_response
+from app.db import models
+from app.services import jobs
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[JobRead])
+def list_jobs(test_id: Optional[int] = None, status: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    q = db.query(models.Job).order_by(models.Job.id.desc())
+    if test_id is not None:
+        q = q.filter(models.Job.test_id == test_id)
+    if status is not None:
+        q = q.filter(models.Job.status == status)
+    return q.limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobRead)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Ожидающая задача снимается сразу; выполняющаяся останавливается в ближайшей точке проверки (status ещё running)."""
+    job = jobs.cancel(db, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@router.get("/{job_id}/stream")
+def stream_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Events of a job as SSE: job (статус), stage, progress, node (start/end узла графа), token (фрагменты ответа модели);
+    в конце — job со статусом done (report_id в result), failed или cancelled. Подписка не запускает задачу, поэтому
+    переподключение EventSource безопасно: уже отправленные события приходят первыми. Завершённая — одно событие job.
+    """
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(404, "Job not found")
+    events: queue.Queue = queue.Queue()
+    if not jobs.subscribe(job_id, events):
+        db.refresh(job)
+        events.put(None)
+    return sse_response(events, first=[("job", {"job_id": job.id, "status": job.status, "result": job.result, "error": job.error_message})])
@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+
+from app.agent import registry, scheduler
+from app.agent.llm_cache import get_cache
+
+router = APIRouter()
+
+
+@router.get("/cache")
+def get_llm_cache_stats():
+    """Кэш ответов LLM: записи, размер, попадания/промахи, вытеснения."""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get("/registry")
+def get_llm_registry_stats():
+    """Переиспользуемые клиенты LLM и графы: записи, попадания, вытеснения по простою."""
+    return registry.stats()
+
+
+@router.get("/scheduler")
+def get_llm_scheduler_stats():
+    """Очереди вызовов LLM по бэкендам: лимит, выполняются, ждут, отказы, время ожидания, разбивка по проектам."""
+    return scheduler.stats()
+
+
+@router.delete("/cache")
+def clear_llm_cache():
+    cache = get_cache()
+    return {"removed": cache.clear() if cache is not None else 0}
@@ -1,11 +1,14 @@
+from functools import partial
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
-from app.api.schemas import TestCreate, TestRead
+from app.api.schemas import AskRequest, AskResponse, JobRead, TestCreate, TestRead
+from app.agent.scheduler import DEFAULT_PRIORITY, LLMQueueFull, get_scheduler
 from app.db import models
+from app.services import jobs
 
 router = APIRouter()
 
@@ -44,16 +47,57 @@ def get_test(test_id: int, db: Session = Depends(get_db)):
     return t
 
 
-@router.post("/{test_id}/run-analysis")
-def run_test_analysis(test_id: int, db: Session = Depends(get_db)):
-    from app.services.analysis_runner import run_analysis_for_test
+def _submit_analysis(db: Session, test_id: int, no_cache: bool, priority: int) -> models.Job:
+    from app.services.analysis_runner import analysis_job, llm_base_url
+
+    test = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(404, "Test not found")
+    project = db.query(models.Project).filter(models.Project.id == test.project_id).first()
+    if project:
+        # Очередь бэкенда LLM полна — отказ сразу, а не задача, которая упадёт по таймауту очереди
+        try:
+            get_scheduler(project.llm_type, llm_base_url(project.llm_type)).check_capacity()
+        except LLMQueueFull as e:
+            raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+    return jobs.submit(
+        db,
+        "analysis",
+        partial(analysis_job, test_id=test_id, use_cache=not no_cache, priority=priority),
+        test_id=test_id,
+        params={"no_cache": no_cache, "priority": priority},
+        queued_test_status="queued",
+    )
+
+
+_PRIORITY = Query(DEFAULT_PRIORITY, ge=0, le=9, description="Приоритет вызовов LLM в очереди бэкенда (0 — самый высокий)")
+
+
+@router.post("/{test_id}/run-analysis", response_model=JobRead, status_code=202)
+def run_test_analysis(test_id: int, no_cache: bool = False, priority: int = _PRIORITY, db: Session = Depends(get_db)):
+    """
+    Start analysis as a background job and return it: фазы collecting -> analyzing -> pdf, прогресс и результат
+    (report_id) — GET /api/jobs/{id}, события и токены по мере генерации — GET /api/jobs/{id}/stream (SSE),
+    отмена — POST /api/jobs/{id}/cancel. no_cache=true — мимо кэша LLM.
+    503 — очередь бэкенда LLM переполнена, повторить позже.
+    """
+    return _submit_analysis(db, test_id, no_cache, priority)
+
+
+@router.post("/{test_id}/ask", response_model=AskResponse)
+def ask_test_question(test_id: int, body: AskRequest, db: Session = Depends(get_db)):
+    """
+    Follow-up question about the test: по вопросу из индекса артефактов (BM25 по полному тексту) берутся самые
+    релевантные фрагменты в пределах окна модели, ответ — с указанием файлов и строк. 503 — очередь LLM переполнена.
+    """
+    from app.services.analysis_runner import ask_test
+
+    if not db.query(models.Test).filter(models.Test.id == test_id).first():
+        raise HTTPException(404, "Test not found")
     try:
-        report, artifacts_used = run_analysis_for_test(db, test_id)
-        return {"status": "done", "report_id": report.id, "artifacts_used": artifacts_used}
-    except ValueError as e:
-        raise HTTPException(404, str(e))
-    except RuntimeError as e:
-        raise HTTPException(500, str(e))
+        return ask_test(db, test_id, body.question, top_k=body.top_k)
+    except LLMQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
 
 
 @router.delete("/{test_id}", status_code=204)
@@ -77,7 +77,39 @@ class ReportRead(BaseModel):
     report_text: str
     pdf_path: Optional[str] = None
     artifacts_used_snapshot: Optional[List[dict]] = None
+    llm_metrics: Optional[dict] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class JobRead(BaseModel):
+    id: int
+    test_id: Optional[int] = None
+    job_type: str
+    status: str
+    phase: Optional[str] = None
+    progress: float = 0.0
+    message: Optional[str] = None
+    params: Optional[dict] = None
+    result: Optional[Any] = None
+    error_message: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AskRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+
+
+class AskResponse(BaseModel):
+    answer: str
+    # Фрагменты, переданные модели: artifact_id, label, line_start, line_end, score
+    sources: List[dict]
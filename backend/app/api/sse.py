@@ -0,0 +1,36 @@
+"""Server-Sent Events helpers for job streams."""
+import json
+import queue
+from typing import Iterable
+
+from fastapi.responses import StreamingResponse
+
+# Комментарий-пинг в SSE, пока модель молчит (prefill длинного промпта): прокси не рвут соединение по простою
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: queue.Queue, first: Iterable[tuple[str, dict]] = ()) -> StreamingResponse:
+    """Stream (event, data) items from the queue until None; first — события, отправляемые сразу."""
+
+    def stream():
+        for item in first:
+            yield sse(*item)
+        while True:
+            try:
+                item = events.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if item is None:
+                return
+            yield sse(*item)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
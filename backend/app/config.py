@@ -18,16 +18,76 @@ class Settings(BaseSettings):
     artifacts_dir_name: str = "artifacts"
     reports_dir_name: str = "reports"
     grafana_snapshots_dir_name: str = "grafana_snapshots"
+    # Сжатие артефактов при хранении (zstd). Текстовые логи сжимаются в 10–20 раз; hprof/jfr — бинарные, не сжимаем.
+    artifacts_compress_kinds: list[str] = [
+        "custom_java_log",
+        "custom_gc",
+        "custom_thread_dump",
+        "custom_jvm_opts",
+        "k8s_logs",
+    ]
+    artifacts_zstd_level: int = 3
+    # Логи этих kind перед анализом сворачиваются в шаблоны (Drain): повторяющиеся строки -> шаблон с количеством.
+    # Пустой список — отправлять выдержку из сырых строк, как раньше.
+    log_template_kinds: list[str] = ["k8s_logs", "custom_java_log"]
+    # Лимит строк на один лог при майнинге шаблонов (дальше — выдержка не нужна, статистика уже устойчива)
+    log_template_max_lines: int = 2_000_000
+    # Предобработка артефактов (дайджесты) в пуле процессов: 0 — по числу ядер, 1 — в текущем процессе
+    preprocess_workers: int = 0
+    # Лимит памяти (куча) одного воркера, МБ; 0 — без лимита. mmap файлов hprof/jfr в лимит не входит
+    preprocess_worker_memory_mb: int = 2048
 
     # Default LLM (when not overridden by project). Для анализа логов — текстовая модель (qwen2.5:7b).
     # qwen2.5vl:7b — vision, тяжелее, может крашить runner (exit status 2).
     default_llm_type: str = "ollama"
     default_llm_model: str = "qwen2.5:7b"
     ollama_base_url: str = "http://localhost:11434"
-    # Ограничение контекста для Ollama (500 при переполнении). ~32k токенов ≈ 35k символов.
-    ollama_max_context_chars: int = 35_000
     # num_ctx — размер окна контекста Ollama в токенах. По умолчанию 4096, промпт обрезается. Qwen2.5 поддерживает 32768.
     ollama_num_ctx: int = 32_768
+    # Сколько модель остаётся в памяти Ollama после вызова ("30m", "2h"; -1 — не выгружать). По умолчанию Ollama — 5 минут
+    ollama_keep_alive: str = "30m"
+    # При старте backend загрузить модели Ollama (по умолчанию и из проектов) и прогреть общий префикс промпта
+    ollama_warmup_on_startup: bool = True
+    # Окно контекста в токенах для GigaChat / OpenAI-совместимых моделей (для Ollama — ollama_num_ctx)
+    llm_context_tokens: int = 32_768
+    # Бюджет артефактов = окно − системный промпт и обвязка − резерв под ответ модели
+    context_reserve_output_tokens: int = 4_096
+    # Каждый артефакт получает не меньше стольких токенов (если весь нужен — сколько нужно), остаток — по плотности
+    context_min_tokens_per_artifact: int = 1_500
+    # Граф анализа: single — все артефакты в одном промпте; map_reduce — сводка по каждому артефакту
+    # (большие режутся на части) параллельными вызовами, затем общий отчёт по сводкам
+    analysis_graph_mode: str = "single"
+    # Одновременных map-вызовов LLM (для Ollama имеет смысл при OLLAMA_NUM_PARALLEL > 1)
+    analysis_map_concurrency: int = 4
+    # Резерв под ответ одного map-вызова, токенов (сводка просится не длиннее ~половины в словах)
+    analysis_map_summary_tokens: int = 1_024
+    # map_reduce: сводки артефактов хранятся в БД (artifact_findings) по хэшу map-промпта; повторный анализ
+    # вызывает модель только для новых и изменившихся артефактов, затем заново пишет общий отчёт
+    analysis_incremental: bool = True
+    # Поиск по полному тексту артефактов (SQLite FTS5, BM25; индекс — storage/index/<test_id>.sqlite): в single-режиме
+    # в промпт добавляются найденные фрагменты под разделы отчёта (не больше retrieval_section_tokens на раздел),
+    # им же отвечает POST /tests/{id}/ask. Фрагмент индекса — подряд идущие строки, не длиннее retrieval_chunk_chars
+    retrieval_enabled: bool = True
+    retrieval_chunk_chars: int = 1_500
+    retrieval_top_k: int = 8
+    retrieval_section_tokens: int = 1_500
+    # Кэш ответов LLM (SQLite в storage/llm_cache.sqlite): повторный запуск с теми же сообщениями и моделью — без вызова
+    llm_cache_enabled: bool = True
+    llm_cache_max_mb: int = 256
+    llm_cache_max_age_days: float = 30
+    # Клиенты LLM и собранные графы переиспользуются между анализами; без обращений дольше стольких секунд — удаляются
+    llm_registry_idle_seconds: int = 1_800
+    # Соединений в общем HTTP-пуле клиентов LLM (keep-alive)
+    llm_http_pool_size: int = 16
+    # Состояние запусков графа — в storage/checkpoints.sqlite: повтор прерванного анализа продолжает с места остановки
+    analysis_checkpoints_enabled: bool = True
+    # Планировщик вызовов LLM: одновременных вызовов на бэкенд по llm_type (Ollama — как OLLAMA_NUM_PARALLEL сервера),
+    # ожидающих в очереди бэкенда не больше llm_queue_max (дальше — отказ, новый анализ — 503), ожидание не дольше таймаута
+    llm_concurrency: dict[str, int] = {"ollama": 2, "gigachat": 4, "openai": 8}
+    llm_queue_max: int = 64
+    llm_queue_timeout_seconds: float = 900
+    # Фоновые задачи: одновременно выполняющихся по типу, остальные ждут в очереди (JSON в .env)
+    job_concurrency: dict[str, int] = {"analysis": 2, "collect_grafana": 2, "collect_kubernetes": 2}
 
     def artifacts_path(self) -> Path:
         return self.storage_path / self.artifacts_dir_name
@@ -44,6 +44,44 @@ def _migrate_reports_artifacts_snapshot() -> None:
             conn.commit()
 
 
+def _migrate_reports_llm_metrics() -> None:
+    """Добавить колонку llm_metrics в reports, если её нет."""
+    with engine.connect() as conn:
+        if settings.database_url.startswith("sqlite"):
+            cur = conn.execute(text("PRAGMA table_info(reports)"))
+            cols = [row[1] for row in cur]
+            if "llm_metrics" not in cols:
+                conn.execute(text("ALTER TABLE reports ADD COLUMN llm_metrics TEXT"))
+                conn.commit()
+        else:
+            conn.execute(text("ALTER TABLE reports ADD COLUMN IF NOT EXISTS llm_metrics JSON"))
+            conn.commit()
+
+
+def _migrate_artifacts_sha256() -> None:
+    """Добавить колонку sha256 с индексом в artifacts и заполнить её из metadata, если её нет."""
+    with engine.connect() as conn:
+        if settings.database_url.startswith("sqlite"):
+            cols = [row[1] for row in conn.execute(text("PRAGMA table_info(artifacts)"))]
+            if "sha256" in cols:
+                return
+            conn.execute(text("ALTER TABLE artifacts ADD COLUMN sha256 VARCHAR(64)"))
+        else:
+            conn.execute(text("ALTER TABLE artifacts ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_artifacts_sha256 ON artifacts (sha256)"))
+        conn.commit()
+    from app.db.models import Artifact
+
+    db = SessionLocal()
+    try:
+        for a in db.query(Artifact).filter(Artifact.sha256.is_(None), Artifact.metadata_.isnot(None)):
+            meta = a.metadata_ or {}
+            a.sha256 = meta.get("sha256") or (meta.get("preprocessed") or {}).get("sha256")
+        db.commit()
+    finally:
+        db.close()
+
+
 def init_db() -> None:
     """Create tables and ensure storage directories exist."""
     Base.metadata.create_all(bind=engine)
@@ -51,6 +89,14 @@ def init_db() -> None:
         _migrate_reports_artifacts_snapshot()
     except Exception:
         pass
+    try:
+        _migrate_reports_llm_metrics()
+    except Exception:
+        pass
+    try:
+        _migrate_artifacts_sha256()
+    except Exception:
+        pass
     settings.storage_path.mkdir(parents=True, exist_ok=True)
     settings.artifacts_path().mkdir(parents=True, exist_ok=True)
     settings.reports_path().mkdir(parents=True, exist_ok=True)
@@ -75,7 +75,7 @@ class Test(Base):
     system_prompt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     status: Mapped[str] = mapped_column(String(32), default="pending")
-    # pending | collecting | analyzing | done | failed
+    # pending | queued | collecting | analyzing | done | failed | cancelled
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -83,6 +83,7 @@ class Test(Base):
     project: Mapped["Project"] = relationship("Project", back_populates="tests")
     artifacts: Mapped[list["Artifact"]] = relationship("Artifact", back_populates="test", cascade="all, delete-orphan")
     report: Mapped[Optional["Report"]] = relationship("Report", back_populates="test", uselist=False, cascade="all, delete-orphan")
+    findings: Mapped[list["ArtifactFinding"]] = relationship("ArtifactFinding", back_populates="test", cascade="all, delete-orphan")
 
 
 class Artifact(Base):
@@ -95,6 +96,8 @@ class Artifact(Base):
     display_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     file_path: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
     metadata_: Mapped[Optional[dict]] = mapped_column("metadata", JSON, nullable=True)
+    # sha256 содержимого (копия metadata_["sha256"]) — поиск уже сохранённого контента по хэшу без чтения JSON
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -111,7 +114,52 @@ class Report(Base):
     pdf_path: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
     # Снимок списка артефактов на момент формирования отчёта (id, kind, display_name, file_path)
     artifacts_used_snapshot: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)
+    # Телеметрия LLM запуска: токены, TTFT, скорость, время узлов, обрезка контекста (app.agent.telemetry)
+    llm_metrics: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     test: Mapped["Test"] = relationship("Test", back_populates="report")
+
+
+class ArtifactFinding(Base):
+    """Сводка map-вызова по артефакту (или его части): повторный анализ берёт её по content_hash вместо вызова LLM."""
+
+    __tablename__ = "artifact_findings"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    test_id: Mapped[int] = mapped_column(ForeignKey("tests.id", ondelete="CASCADE"), nullable=False, index=True)
+    # sha256 модели и точного текста map-промпта (дайджест артефакта, метаданные теста, контекст инженера)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    label: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
+    part: Mapped[int] = mapped_column(default=1)
+    parts: Mapped[int] = mapped_column(default=1)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    test: Mapped["Test"] = relationship("Test", back_populates="findings")
+
+
+class Job(Base):
+    """Фоновая задача (анализ, сбор Grafana/K8s): статус, фаза и прогресс для опроса клиентом."""
+
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    test_id: Mapped[Optional[int]] = mapped_column(ForeignKey("tests.id", ondelete="CASCADE"), nullable=True)
+    job_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    # queued | running | done | failed | cancelled
+    status: Mapped[str] = mapped_column(String(32), default="queued")
+    # Фаза внутри running: collecting | analyzing | pdf (анализ), collecting | preprocessing (сбор)
+    phase: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    progress: Mapped[float] = mapped_column(default=0.0)
+    message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    params: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    result: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    cancel_requested: Mapped[bool] = mapped_column(default=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
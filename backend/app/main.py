@@ -3,18 +3,28 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import PlainTextResponse, Response
 
 from app.config import settings
 from app.db.database import init_db
 from app.api.routes import api_router
+from app.agent.llm_factory import close_http_clients
+from app.agent.telemetry import prometheus_text
+from app.agent.warmup import start_warmup
+from app.services import jobs
+from app.services.preprocessing import shutdown_pool
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    jobs.recover_interrupted()
+    if settings.ollama_warmup_on_startup:
+        start_warmup()
     yield
-    # shutdown if needed
+    jobs.shutdown()
+    shutdown_pool()
+    close_http_clients()
 
 
 app = FastAPI(
@@ -37,6 +47,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики LLM в формате Prometheus: токены, время вызовов и узлов, TTFT, обрезка контекста, очереди."""
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/favicon.ico", include_in_schema=False)
 def favicon():
     """Отдаём пустой ответ, чтобы браузер не слал 404 в лог."""
@@ -1,76 +1,234 @@
 """Orchestrate artifact collection and LangGraph analysis for a test."""
 from pathlib import Path
 from datetime import datetime
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
+import hashlib
 import json
+import threading
 import structlog
 
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.db.models import Project, Test, Artifact, Report, ArtifactKind
+from app.db.models import Project, Test, Artifact, ArtifactFinding, Report, ArtifactKind
 from app.services.grafana import GrafanaService
 from app.services.kubernetes import KubernetesService
 from app.services.artifacts import ArtifactsService
 from app.services.report_generator import ReportGeneratorService
+from app.services import preprocessing, retrieval
+from app.services import jobs
+from app.services.jobs import JobContext
+from app.services.digests import pod_inventory
+from app.agent.context_packer import ArtifactBlock, TokenCounter, pack_artifacts, split_block
 from app.agent.graph import run_analysis
+from app.agent import registry, telemetry
+from app.agent.llm_cache import with_cache
+from app.agent.nodes import PARTIAL_KEYS, build_ask_prompt, build_map_prompt, build_prompt
+from app.agent.scheduler import DEFAULT_PRIORITY, with_scheduler
 
 logger = structlog.get_logger()
 
 
-def _parse_pods_table(text: str) -> list[list[str]]:
-    """Convert PODS_TABLE section (markdown-like) to rows for PDF table."""
-    rows = [["Pod / группа", "Количество", "Limits", "Requests"]]
-    for line in (text or "").strip().split("\n"):
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        # Split by | or tabs
-        cells = [c.strip() for c in line.replace("|", "\t").split("\t") if c.strip()]
-        if len(cells) >= 4:
-            rows.append(cells[:4])
-        elif len(cells) == 1 and "—" in line:
-            continue
-        elif cells:
-            rows.append(cells + [""] * (4 - len(cells)))
-    return rows
+def pod_inventory_for_test(art_service: ArtifactsService, pods_artifacts: list[Artifact], records: dict[int, dict]) -> dict | None:
+    """
+    Pod inventory of the test: готовый дайджест pods_list.json; при нескольких сборах — заново
+    по всем спискам, чтобы один и тот же под не считался дважды.
+    """
+    ready = [records[a.id]["digest"] for a in pods_artifacts if a.id in records and records[a.id]["digest"]["type"] == "pod_inventory"]
+    if not ready:
+        return None
+    if len(ready) == 1:
+        return ready[0]["data"]
+    pods: list[dict] = []
+    for a in pods_artifacts:
+        try:
+            with art_service.open_artifact(a.file_path) as f:
+                pods.extend(pod_inventory.load_pods(f))
+        except (OSError, ValueError) as e:
+            logger.warning("pods_list_read_failed", artifact_id=a.id, error=str(e))
+    return pod_inventory.inventory_digest(pod_inventory.build_inventory(pods))
 
 
-def build_artifact_contents(db: Session, test_id: int) -> str:
-    """Load all artifacts for test from DB and storage into one text for the agent."""
+def collect_artifact_blocks(db: Session, test_id: int) -> tuple[list[ArtifactBlock], dict | None]:
+    """
+    Load all artifacts for test as prompt candidates from their preprocessed digests, и инвентарь подов.
+    Артефакты без готового дайджеста (загружены до конвейера, сменилась версия парсера) предобрабатываются здесь.
+    """
     artifacts = db.query(Artifact).filter(Artifact.test_id == test_id).order_by(Artifact.id).all()
-    parts = []
+    blocks: list[ArtifactBlock] = []
     art_service = ArtifactsService()
     base = Path(art_service.base).resolve()
     logger.info("artifact_load_start", test_id=test_id, artifacts_base=str(base), db_paths=[a.file_path for a in artifacts if a.file_path])
+    records = preprocessing.preprocess_artifacts(db, artifacts)
     for a in artifacts:
-        if not a.file_path:
-            continue
+        if a.file_path and a.id not in records:
+            logger.warning("artifact_read_failed", artifact_id=a.id, path=a.file_path, full_path=str(base / a.file_path))
+    dumps = [a for a in artifacts if a.id in records and a.kind == ArtifactKind.custom_thread_dump.value]
+    digested_ids: set[int] = set()
+    if dumps:
         try:
-            full_path = base / a.file_path
-            raw = art_service.read_artifact(a.file_path)
-            try:
-                text = raw.decode("utf-8", errors="replace")
-            except Exception:
-                text = raw.decode("latin-1", errors="replace")
-            if len(text) > 50000:
-                text = text[:50000] + "\n... [обрезано]"
-            label = a.display_name or Path(a.file_path).name or f"{a.kind}_{a.id}"
-            parts.append(f"[АРТЕФАКТ: файл=\"{label}\" kind={a.kind} id={a.id}]\n{text}")
-            logger.info("artifact_loaded", artifact_id=a.id, path=a.file_path, size=len(raw))
+            digest_text = preprocessing.thread_dumps_digest_text(art_service, dumps, [records[a.id] for a in dumps])
+            if digest_text is not None:
+                labels = ", ".join(a.display_name or Path(a.file_path).name for a in dumps)
+                ids = ",".join(str(a.id) for a in dumps)
+                blocks.append(ArtifactBlock(
+                    ids=[a.id for a in dumps],
+                    label=labels,
+                    kind=ArtifactKind.custom_thread_dump.value,
+                    header=f"[АРТЕФАКТ: файлы=\"{labels}\" kind={ArtifactKind.custom_thread_dump.value} id={ids}]",
+                    text=digest_text,
+                ))
+                digested_ids.update(a.id for a in dumps)
+                logger.info("thread_dumps_digest_loaded", artifact_ids=[a.id for a in dumps], chars=len(digest_text))
         except Exception as e:
-            logger.warning("artifact_read_failed", artifact_id=a.id, path=a.file_path, full_path=str(base / a.file_path), error=str(e))
-    out = "\n\n".join(parts)
-    if not out and artifacts:
+            logger.warning("thread_dump_digest_failed", artifact_ids=[a.id for a in dumps], error=str(e))
+    for a in artifacts:
+        if a.id not in records or a.id in digested_ids:
+            continue
+        digest = records[a.id]["digest"]
+        label = a.display_name or Path(a.file_path).name or f"{a.kind}_{a.id}"
+        blocks.append(ArtifactBlock(
+            ids=[a.id],
+            label=label,
+            kind=a.kind,
+            header=f"[АРТЕФАКТ: файл=\"{label}\" kind={a.kind} id={a.id}]",
+            text=digest["text"],
+            fit=preprocessing.digest_fit(digest),
+        ))
+        logger.info("artifact_digest_loaded", artifact_id=a.id, path=a.file_path, kind=a.kind, digest_type=digest["type"], chars=len(digest["text"]))
+    if not blocks and artifacts:
         logger.warning("no_artifact_content_loaded", test_id=test_id, artifact_ids=[a.id for a in artifacts])
-    return out
+    pods_artifacts = [a for a in artifacts if a.kind == ArtifactKind.k8s_pods.value]
+    return blocks, pod_inventory_for_test(art_service, pods_artifacts, records)
+
+
+def build_artifact_contents(db: Session, test_id: int) -> str:
+    """Load all artifacts for test from DB and storage into one text for the agent (без бюджета токенов)."""
+    blocks, _ = collect_artifact_blocks(db, test_id)
+    return "\n\n".join(f"{b.header}\n{b.text}" for b in blocks)
+
+
+def _context_window(llm_type: str) -> int:
+    return settings.ollama_num_ctx if llm_type == "ollama" else settings.llm_context_tokens
+
+
+def context_budget_tokens(counter: TokenCounter, llm_type: str, test_meta: dict, artifact_labels: list, system_prompt: str | None) -> int:
+    """Tokens left for artifacts: окно модели − системный промпт и обвязка пользовательского сообщения − резерв под ответ."""
+    system, user = build_prompt(test_meta, artifact_labels, system_prompt or "", "")
+    overhead = counter.count(system) + counter.count(user)
+    return _context_window(llm_type) - overhead - settings.context_reserve_output_tokens
+
+
+def map_chunks(blocks: list[ArtifactBlock], counter: TokenCounter, llm_type: str, test_meta: dict, system_prompt: str | None) -> list[dict]:
+    """
+    Inputs of the map calls: каждый артефакт целиком, если влезает в окно одного вызова
+    (окно − обвязка map-промпта − резерв под сводку), иначе — частями по строкам.
+    """
+    max_words = max(50, settings.analysis_map_summary_tokens // 2)
+    system, user = build_map_prompt(test_meta, {"parts": 2, "part": 1}, system_prompt or "", max_words)
+    budget = _context_window(llm_type) - counter.count(system) - counter.count(user) - settings.analysis_map_summary_tokens
+    chunks = []
+    for index, b in enumerate(blocks):
+        parts = split_block(b, counter, budget)
+        for n, text in enumerate(parts, 1):
+            chunks.append({"index": index, "ids": list(b.ids), "label": b.label, "header": b.header, "text": text, "part": n, "parts": len(parts)})
+    logger.info("analysis_map_chunks", artifacts=len(blocks), chunks=len(chunks), chunk_budget_tokens=budget)
+    return chunks
+
+
+def attach_finding_hashes(chunks: list[dict], test_meta: dict, system_prompt: str | None, llm_type: str, llm_model: str) -> None:
+    """chunk["hash"] — sha256 модели и точного текста map-промпта: совпал — сводка прошлого анализа годится как есть."""
+    max_words = max(50, settings.analysis_map_summary_tokens // 2)
+    for chunk in chunks:
+        system, user = build_map_prompt(test_meta, chunk, system_prompt or "", max_words)
+        key = json.dumps([llm_type, llm_model, system, user], ensure_ascii=False)
+        chunk["hash"] = hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def reuse_findings(db: Session, test_id: int, chunks: list[dict]) -> list[dict]:
+    """Partials for chunks whose hash matches a stored finding (неизменившиеся артефакты)."""
+    hashes = {c["hash"] for c in chunks}
+    stored = {
+        f.content_hash: f
+        for f in db.query(ArtifactFinding).filter(ArtifactFinding.test_id == test_id).all()
+        if f.content_hash in hashes
+    }
+    return [
+        {**{k: c.get(k) for k in PARTIAL_KEYS}, "summary": stored[c["hash"]].summary, "error": None}
+        for c in chunks if c["hash"] in stored
+    ]
+
+
+def save_findings(db: Session, test_id: int, chunks: list[dict], partials: list[dict]) -> None:
+    """Keep findings of the current chunks only: новые сводки добавляются, сводки удалённых и изменившихся артефактов — удаляются."""
+    current = {c["hash"] for c in chunks}
+    known = set()
+    for f in db.query(ArtifactFinding).filter(ArtifactFinding.test_id == test_id).all():
+        if f.content_hash in current:
+            known.add(f.content_hash)
+        else:
+            db.delete(f)
+    for p in partials:
+        if p.get("error") or not p.get("summary") or p.get("hash") not in current or p["hash"] in known:
+            continue
+        db.add(ArtifactFinding(
+            test_id=test_id, content_hash=p["hash"], label=p.get("label"), part=p.get("part") or 1, parts=p.get("parts") or 1, summary=p["summary"]
+        ))
+        known.add(p["hash"])
+
+
+def llm_base_url(llm_type: str) -> Optional[str]:
+    """Base URL the analysis passes to the LLM client (и по нему — очередь бэкенда в планировщике)."""
+    return settings.ollama_base_url if llm_type == "ollama" else None
+
 
+def _test_meta(test: Test, project: Project) -> dict:
+    return {
+        "project_name": project.name,
+        "test_type": test.test_type,
+        "version": getattr(project, "version", "") or "—",
+        "time_range": f"{test.started_at} — {test.ended_at}" if test.started_at and test.ended_at else "—",
+    }
 
-def run_analysis_for_test(db: Session, test_id: int) -> Tuple[Report, List[dict]]:
+
+def _analysis_model(project: Project) -> str:
+    llm_model = project.llm_model or settings.default_llm_model
+    if project.llm_type == "ollama" and llm_model and "qwen2.5vl" in llm_model.lower():
+        logger.warning(
+            "ollama_qwen2vl_unsafe",
+            requested=llm_model,
+            using="qwen2.5:7b",
+            reason="qwen2.5vl крашит runner (RoPE/exit 2); для анализа логов достаточно текстовой модели",
+        )
+        llm_model = "qwen2.5:7b"
+    return llm_model
+
+
+def _run_finished(run_id: str) -> bool:
+    """Checkpoint-ы другого анализа теста можно продолжать и удалять, только если его задача завершилась."""
+    return not run_id.isdigit() or jobs.is_finished(int(run_id))
+
+
+def run_analysis_for_test(
+    db: Session,
+    test_id: int,
+    use_cache: bool = True,
+    on_event: Optional[Callable[[str, dict], None]] = None,
+    priority: int = DEFAULT_PRIORITY,
+    cancel_event: Optional[threading.Event] = None,
+    job_id: Optional[int] = None,
+) -> Tuple[Report, List[dict]]:
     """
     Load test and project, build artifact_contents from DB artifacts,
     run LangGraph agent, save report text + PDF, create Report row.
+    use_cache=False — все вызовы LLM заново, мимо кэша ответов.
+    on_event(event, data) — ход выполнения для стриминга: "stage", затем "node"/"token" из графа.
+    priority — приоритет вызовов LLM в очереди бэкенда (0 — самый высокий), cancel_event — отмена ожидания в ней.
+    job_id — задача анализа: её id входит в поток checkpoint-ов, прерванный анализ продолжает следующая задача.
     """
+    emit = on_event or (lambda event, data: None)
     test = db.query(Test).filter(Test.id == test_id).first()
     if not test:
         raise ValueError(f"Test {test_id} not found")
@@ -82,51 +240,113 @@ def run_analysis_for_test(db: Session, test_id: int) -> Tuple[Report, List[dict]
     db.commit()
 
     try:
+        emit("stage", {"stage": "artifacts"})
         artifacts = db.query(Artifact).filter(Artifact.test_id == test_id).order_by(Artifact.id).all()
         artifacts_used = [
             {"id": a.id, "kind": a.kind, "display_name": a.display_name, "file_path": a.file_path}
             for a in artifacts if a.file_path
         ]
-        artifact_contents = build_artifact_contents(db, test_id)
-        if not artifact_contents.strip():
+        blocks, inventory = collect_artifact_blocks(db, test_id)
+        if not blocks:
             raise ValueError(
                 "Не удалось прочитать ни один артефакт. Проверьте, что файлы существуют в storage/artifacts/ (пути в БД: "
                 + ", ".join(a.file_path for a in artifacts if a.file_path) + ")."
             )
-        test_meta = {
-            "project_name": project.name,
-            "test_type": test.test_type,
-            "version": getattr(project, "version", "") or "—",
-            "time_range": f"{test.started_at} — {test.ended_at}" if test.started_at and test.ended_at else "—",
-        }
+        test_meta = _test_meta(test, project)
         artifact_labels = [a.get("display_name") or Path(a.get("file_path") or "").name for a in artifacts_used]
-        max_chars = settings.ollama_max_context_chars if project.llm_type == "ollama" else None
-        llm_model = project.llm_model or settings.default_llm_model
-        if project.llm_type == "ollama" and llm_model and "qwen2.5vl" in llm_model.lower():
-            logger.warning(
-                "ollama_qwen2vl_unsafe",
-                requested=llm_model,
-                using="qwen2.5:7b",
-                reason="qwen2.5vl крашит runner (RoPE/exit 2); для анализа логов достаточно текстовой модели",
+        llm_model = _analysis_model(project)
+        counter = TokenCounter(llm_model)
+        budget = context_budget_tokens(counter, project.llm_type, test_meta, artifact_labels, test.system_prompt)
+        graph_mode = settings.analysis_graph_mode
+        # Токены, время узлов и вызовов LLM, обрезка контекста — в Report.llm_metrics и GET /metrics
+        run_telemetry = telemetry.RunTelemetry()
+        reused: list[dict] = []
+        fragment_sources: list[dict] = []
+        if graph_mode == "map_reduce":
+            # Сырые дайджесты идут в map-вызовы; в финальный промпт — только сводки (их укладывает reduce)
+            artifact_chunks = map_chunks(blocks, counter, project.llm_type, test_meta, test.system_prompt)
+            artifact_contents = ""
+            attach_finding_hashes(artifact_chunks, test_meta, test.system_prompt, project.llm_type, llm_model)
+            # Повторный анализ: сводки неизменившихся артефактов — из прошлого запуска, заново только новые и изменённые
+            if use_cache and settings.analysis_incremental:
+                reused = reuse_findings(db, test_id, artifact_chunks)
+            logger.info("analysis_incremental", test_id=test_id, chunks=len(artifact_chunks), reused=len(reused))
+        else:
+            artifact_chunks = None
+            fragments = ""
+            if settings.retrieval_enabled:
+                # Фрагменты полного текста под разделы (ошибки, память, деградация) — часть бюджета, остальное дайджестам
+                index = retrieval.get_test_index(db, test_id)
+                fragment_budget = min(settings.retrieval_section_tokens * len(retrieval.SECTION_QUERIES), budget // 2)
+                fragments, fragment_sources = retrieval.section_fragments(index, counter, fragment_budget)
+                budget -= counter.count(fragments)
+            artifact_contents = pack_artifacts(blocks, budget, counter, settings.context_min_tokens_per_artifact)
+            run_telemetry.add_truncation("pack", telemetry.dropped_chars(blocks))
+            if fragments:
+                artifact_contents += "\n\n" + fragments
+        # Сколько контекста досталось каждому артефакту — в snapshot отчёта
+        allocation = {i: b.allocation() for b in blocks for i in b.ids}
+        for item in artifacts_used:
+            item["context"] = allocation.get(item["id"])
+            fragments_used = sum(1 for f in fragment_sources if f["artifact_id"] == item["id"])
+            if fragments_used:
+                item["fragments"] = fragments_used
+        emit("stage", {
+            "stage": "llm",
+            "graph_mode": graph_mode,
+            "artifacts": len(blocks),
+            "chunks": len(artifact_chunks or []) - len(reused),
+            "reused": len(reused),
+        })
+        try:
+            result = run_analysis(
+                test_meta=test_meta,
+                artifact_contents=artifact_contents,
+                artifact_labels=artifact_labels,
+                system_prompt=test.system_prompt,
+                pods_table=pod_inventory.format_inventory(inventory) if inventory else None,
+                llm_type=project.llm_type,
+                llm_model=llm_model,
+                llm_api_key=project.llm_api_key,
+                llm_base_url=llm_base_url(project.llm_type),
+                graph_mode=graph_mode,
+                artifact_chunks=artifact_chunks,
+                context_budget_tokens=budget,
+                use_cache=use_cache,
+                on_event=on_event,
+                run_key=f"test-{test_id}",
+                run_id=str(job_id) if job_id is not None else None,
+                run_finished=_run_finished,
+                llm_project=str(project.id),
+                llm_priority=priority,
+                cancel_event=cancel_event,
+                partials=reused,
+                callbacks=[run_telemetry],
             )
-            llm_model = "qwen2.5:7b"
-        result = run_analysis(
-            test_meta=test_meta,
-            artifact_contents=artifact_contents,
-            artifact_labels=artifact_labels,
-            system_prompt=test.system_prompt,
-            max_artifact_chars=max_chars,
-            llm_type=project.llm_type,
-            llm_model=llm_model,
-            llm_api_key=project.llm_api_key,
-            llm_base_url=settings.ollama_base_url if project.llm_type == "ollama" else None,
-        )
+        finally:
+            llm_metrics = run_telemetry.summary()
+            telemetry.metrics.record_run(llm_metrics, project.llm_type, llm_model)
+        logger.info("analysis_llm_telemetry", test_id=test_id, **llm_metrics["totals"])
         if result.get("error"):
             test.status = "failed"
             test.error_message = result["error"]
             db.commit()
             raise RuntimeError(result["error"])
 
+        if artifact_chunks is not None:
+            save_findings(db, test_id, artifact_chunks, result.get("partials") or [])
+            # map_reduce: в промпт отчёта попадает сводка, а не сам артефакт — в snapshot её доля бюджета reduce,
+            # а исходный размер и число map-частей — отдельными полями
+            reduce_context = {i: c for c in result.get("reduce_context") or [] for i in c["ids"]}
+            for item in artifacts_used:
+                source, summary = item.get("context"), reduce_context.get(item["id"])
+                if source and summary:
+                    item["context"] = {
+                        **{k: v for k, v in summary.items() if k != "ids"},
+                        "chunks": source["chunks"],
+                        "source_tokens": source["tokens_needed"],
+                    }
+        emit("stage", {"stage": "report"})
         report_text = result.get("report_text") or ""
         sections = result.get("report_sections") or {}
         gen = ReportGeneratorService()
@@ -138,7 +358,7 @@ def run_analysis_for_test(db: Session, test_id: int) -> Tuple[Report, List[dict]
             "version": test_meta["version"],
             "time_range": test_meta["time_range"],
         }
-        table_rows = _parse_pods_table(sections.get("pods_table", ""))
+        table_rows = pod_inventory.inventory_table_rows(inventory) if inventory else []
         pdf_path = gen.build_pdf(
             test_id=test_id,
             title="Отчёт по результатам НТ",
@@ -157,12 +377,14 @@ def run_analysis_for_test(db: Session, test_id: int) -> Tuple[Report, List[dict]
             report.report_text = report_text
             report.pdf_path = str(pdf_path)
             report.artifacts_used_snapshot = artifacts_used
+            report.llm_metrics = llm_metrics
         else:
             report = Report(
                 test_id=test_id,
                 report_text=report_text,
                 pdf_path=str(pdf_path),
                 artifacts_used_snapshot=artifacts_used,
+                llm_metrics=llm_metrics,
             )
             db.add(report)
         test.status = "done"
@@ -176,3 +398,76 @@ def run_analysis_for_test(db: Session, test_id: int) -> Tuple[Report, List[dict]
         test.error_message = str(e)
         db.commit()
         raise
+
+
+# stage из run_analysis_for_test -> (фаза задачи, прогресс на её начало)
+ANALYSIS_PHASES = {"artifacts": ("collecting", 0.02), "llm": ("analyzing", 0.1), "report": ("pdf", 0.9)}
+
+
+def analysis_job(ctx: JobContext, db: Session, test_id: int, use_cache: bool = True, priority: int = DEFAULT_PRIORITY) -> dict:
+    """Body of the analysis job: фазы collecting -> analyzing -> pdf; в map_reduce прогресс — по готовым сводкам."""
+    chunks = {"total": 0, "done": 0}
+
+    def on_event(event: str, data: dict) -> None:
+        if event == "stage":
+            phase, progress = ANALYSIS_PHASES[data["stage"]]
+            chunks["total"] = data.get("chunks") or 0
+            ctx.progress(phase, progress)
+        elif event == "node" and data["status"] == "end":
+            if data["node"] == "summarize" and chunks["total"]:
+                chunks["done"] += 1
+                ctx.progress("analyzing", 0.1 + 0.7 * chunks["done"] / chunks["total"], f"сводки: {chunks['done']}/{chunks['total']}")
+            elif data["node"] in ("analyze", "reduce"):
+                ctx.progress("analyzing", 0.85)
+        ctx.emit(event, data)
+
+    try:
+        report, artifacts_used = run_analysis_for_test(
+            db, test_id, use_cache=use_cache, on_event=on_event, priority=priority, cancel_event=ctx.cancel_event,
+            job_id=ctx.job_id,
+        )
+    except InterruptedError:
+        # Вызов LLM снят с очереди отменой: задача отменена, а не упала (состояние графа сохранено для продолжения)
+        ctx.check_cancelled()
+        raise
+    return {"report_id": report.id, "artifacts_used": artifacts_used}
+
+
+# Вопрос по тесту — интерактивный: в очереди бэкенда LLM впереди анализов с приоритетом по умолчанию
+ASK_PRIORITY = 2
+
+
+def ask_test(db: Session, test_id: int, question: str, top_k: Optional[int] = None) -> dict:
+    """
+    Answer a follow-up question about the test: фрагменты артефактов по BM25 (индекс теста), уложенные в окно модели,
+    и один вызов LLM. Возвращает answer и sources (какие фрагменты видела модель).
+    """
+    test = db.query(Test).filter(Test.id == test_id).first()
+    if not test:
+        raise ValueError(f"Test {test_id} not found")
+    project = db.query(Project).filter(Project.id == test.project_id).first()
+    if not project:
+        raise ValueError("Project not found")
+    llm_model = _analysis_model(project)
+    counter = TokenCounter(llm_model)
+    test_meta = _test_meta(test, project)
+    system, user = build_ask_prompt(test_meta, question, "")
+    budget = _context_window(project.llm_type) - counter.count(system) - counter.count(user) - settings.context_reserve_output_tokens
+    hits = retrieval.get_test_index(db, test_id).search(question, budget, counter, top_k)
+    system, user = build_ask_prompt(test_meta, question, "\n\n".join(h.format() for h in hits))
+    base_url = llm_base_url(project.llm_type)
+    llm = registry.get_llm_client(project.llm_type, llm_model, api_key=project.llm_api_key, base_url=base_url)
+    chain = with_cache(with_scheduler(llm, project.llm_type, base_url)) | StrOutputParser()
+    ask_telemetry = telemetry.RunTelemetry(default_node="ask")
+    try:
+        answer = chain.invoke(
+            [SystemMessage(content=system), HumanMessage(content=user)],
+            config={
+                "configurable": {"llm_project": str(project.id), "llm_priority": ASK_PRIORITY},
+                "callbacks": [ask_telemetry],
+            },
+        )
+    finally:
+        telemetry.metrics.record_run(ask_telemetry.summary(), project.llm_type, llm_model)
+    logger.info("test_question_answered", test_id=test_id, fragments=len(hits), answer_chars=len(answer))
+    return {"answer": answer.strip(), "sources": [h.source() for h in hits]}
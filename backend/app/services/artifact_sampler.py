@@ -0,0 +1,293 @@
+"""Bounded excerpts of oversized artifacts: head + tail + windows with the most errors, without loading the file."""
+from __future__ import annotations
+
+import heapq
+import mmap
+import re
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO
+
+# Маркеры проблем в Java/GC/pod-логах, по которым выбираются окна из середины файла
+ERROR_PATTERN = re.compile(
+    rb"ERROR|FATAL|SEVERE|Exception|Caused by|OutOfMemory|StackOverflow|Full GC|to-space exhausted|"
+    rb"Deadlock|deadlock|panic|Traceback|Killed|OOMKilled"
+)
+# Доли бюджета: начало файла, конец (там обычно падение) и окна с ошибками
+HEAD_SHARE = 0.2
+TAIL_SHARE = 0.3
+WINDOW_BYTES = 4096
+# Середина файла не сканируется целиком: PROBES проб по PROBE_BYTES, равномерно по файлу
+PROBES = 256
+PROBE_BYTES = 128 * 1024
+# Сколько байт максимум искать до ближайшего перевода строки при выравнивании окна
+LINE_ALIGN_BYTES = 1024
+# Длина пометки "... [пропущено N байт] ..." с запасом — учитывается в бюджете resample_excerpt
+_MARKER_CHARS = 40
+_ERROR_TEXT = re.compile(ERROR_PATTERN.pattern.decode())
+
+
+def sample_file(path: Path, max_bytes: int) -> tuple[str, dict]:
+    """
+    Excerpt of a plain file within max_bytes, using mmap.
+    Returns (text, info): info — size_bytes, excerpt_bytes, skipped_bytes, probed_bytes, segments
+    (с позициями text_start/text_end в тексте — по ним resample_excerpt уменьшает выдержку без чтения файла).
+    Память и время зависят от max_bytes и числа проб, а не от размера файла.
+    """
+    size = path.stat().st_size
+    if size <= max_bytes:
+        text = _decode(path.read_bytes())
+        return text, _info(size, [(0, size, "full")], probed=size, spans=[(0, len(text))])
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        head_end = _align_forward(mm, int(max_bytes * HEAD_SHARE))
+        tail_start = _align_backward(mm, size - int(max_bytes * TAIL_SHARE))
+        segments = [(0, head_end, "head")]
+        window_budget = max_bytes - head_end - (size - tail_start)
+        windows, probed = _error_windows(mm, head_end, tail_start, window_budget)
+        segments.extend(windows)
+        # Неиспользованный бюджет окон (ошибок мало) отдаём хвосту — там обычно причина падения
+        unused = window_budget - sum(e - s for s, e, _ in windows)
+        if unused > 0:
+            tail_start = _align_backward(mm, max(head_end, tail_start - unused))
+        segments.append((tail_start, size, "tail"))
+        segments = _merge(segments)
+        text, spans = _render(segments, lambda s, e: _decode(mm[s:e]))
+    return text, _info(size, segments, probed=probed, spans=spans)
+
+
+def sample_stream(stream: BinaryIO, max_bytes: int, chunk_size: int = 1024 * 1024) -> tuple[str, dict]:
+    """
+    Same excerpt for a non-mmappable stream (e.g. zstd-compressed artifact), in one pass.
+    Память ограничена max_bytes (голова, кольцевой буфер хвоста, top-N окон); время — линейное от размера.
+    """
+    head_limit = int(max_bytes * HEAD_SHARE)
+    tail_limit = int(max_bytes * TAIL_SHARE)
+    n_windows = max(0, (max_bytes - head_limit - tail_limit) // WINDOW_BYTES)
+    full: bytearray | None = bytearray()  # весь поток, пока он укладывается в max_bytes
+    head = b""
+    tail: deque[tuple[int, bytes]] = deque()
+    tail_len = 0
+    top: list[tuple[int, int, bytes]] = []  # min-heap (errors, offset, window)
+    offset = 0
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if full is not None:
+            full += chunk
+            if len(full) > max_bytes:
+                head = bytes(full[:head_limit])
+                full = None
+        buf = pending + chunk
+        pos = 0
+        while len(buf) - pos >= WINDOW_BYTES:
+            window = buf[pos : pos + WINDOW_BYTES]
+            pos += WINDOW_BYTES
+            _push_window(top, n_windows, offset, window, head_limit)
+            tail.append((offset, window))
+            tail_len += len(window)
+            while tail_len - len(tail[0][1]) >= tail_limit:
+                tail_len -= len(tail.popleft()[1])
+            offset += len(window)
+        pending = buf[pos:]
+    if full is not None:
+        text = _decode(bytes(full))
+        return text, _info(len(full), [(0, len(full), "full")], probed=len(full), spans=[(0, len(text))])
+    if pending:
+        tail.append((offset, pending))
+        offset += len(pending)
+    size = offset
+
+    # Выравниваем голову и хвост по границам строк
+    nl = head.rfind(b"\n", max(0, len(head) - LINE_ALIGN_BYTES))
+    if nl != -1:
+        head = head[: nl + 1]
+    tail_start = tail[0][0]
+    tail_bytes = b"".join(w for _, w in tail)
+    nl = tail_bytes.find(b"\n", 0, LINE_ALIGN_BYTES)
+    if nl != -1:
+        tail_bytes = tail_bytes[nl + 1 :]
+        tail_start += nl + 1
+
+    blocks = [(0, head, "head")]
+    for errors, o, w in sorted(top, key=lambda x: x[1]):
+        if o >= len(head) and o + len(w) <= tail_start:
+            blocks.append((o, w, f"errors={errors}"))
+    blocks.append((tail_start, tail_bytes, "tail"))
+    segments = _merge([(o, o + len(data), reason) for o, data, reason in blocks])
+
+    def read(start: int, end: int) -> bytes:
+        out = bytearray()
+        for o, data, _reason in blocks:
+            lo, hi = max(start, o), min(end, o + len(data))
+            if lo < hi:
+                out += data[lo - o : hi - o]
+        return bytes(out)
+
+    text, spans = _render(segments, lambda s, e: _decode(read(s, e)))
+    return text, _info(size, segments, probed=size, spans=spans)
+
+
+def resample_excerpt(text: str, info: dict, max_chars: int) -> tuple[str, dict]:
+    """
+    Smaller excerpt from an already rendered one (text и info от sample_file/sample_stream), без чтения файла:
+    голова и хвост укорачиваются по границам строк, из средних окон остаются те, где больше маркеров ошибок.
+    """
+    segments = info["segments"]
+    if not segments or segments[-1]["text_end"] <= max_chars:
+        return text[: segments[-1]["text_end"]] if segments else "", info
+    size = info["size_bytes"]
+    pieces = [(s["start"], s["end"], s["reason"], text[s["text_start"] : s["text_end"]]) for s in segments]
+    first, last = pieces[0], pieces[-1]
+    head_chars = int(max_chars * HEAD_SHARE)
+    tail_chars = int(max_chars * TAIL_SHARE)
+    head = _cut_head(first[3], head_chars) if first[0] == 0 else ""
+    budget = max_chars - len(head) - tail_chars - 2 * _MARKER_CHARS
+    # Средние окна — по убыванию числа маркеров ошибок, пока помещаются
+    middle = pieces[1:-1] if len(pieces) > 1 else []
+    windows = []
+    for piece in sorted(middle, key=lambda p: len(_ERROR_TEXT.findall(p[3])), reverse=True):
+        cost = len(piece[3]) + _MARKER_CHARS
+        if cost <= budget and _ERROR_TEXT.search(piece[3]):
+            windows.append(piece)
+            budget -= cost
+    # Неиспользованный бюджет окон — хвосту, как в sample_file
+    tail_source = last[3] if len(pieces) > 1 else first[3][len(head) :]
+    tail = _cut_tail(tail_source, tail_chars + max(0, budget)) if last[1] == size else ""
+    out = []
+    if head:
+        out.append((first[0], first[0] + len(head.encode()), "head", head))
+    out.extend(sorted(windows))
+    if tail:
+        out.append((last[1] - len(tail.encode()), last[1], "tail", tail))
+    kept = [(s, e, reason) for s, e, reason, _chunk in out]
+    chunks = {s: chunk for s, _e, _reason, chunk in out}
+    resampled, spans = _render(kept, lambda s, e: chunks[s])
+    return resampled, _info(size, kept, probed=info["probed_bytes"], spans=spans)
+
+
+def _cut_head(text: str, max_chars: int) -> str:
+    head = text[:max_chars]
+    nl = head.rfind("\n", max(0, len(head) - LINE_ALIGN_BYTES))
+    return head[: nl + 1] if nl != -1 and len(head) < len(text) else head
+
+
+def _cut_tail(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    tail = text[len(text) - max_chars :]
+    nl = tail.find("\n", 0, LINE_ALIGN_BYTES)
+    return tail[nl + 1 :] if nl != -1 else tail
+
+
+def _push_window(top: list, n_windows: int, offset: int, window: bytes, head_limit: int) -> None:
+    if n_windows <= 0 or offset < head_limit:
+        return
+    errors = len(ERROR_PATTERN.findall(window))
+    if not errors:
+        return
+    item = (errors, offset, window)
+    if len(top) < n_windows:
+        heapq.heappush(top, item)
+    elif item[0] > top[0][0]:
+        heapq.heapreplace(top, item)
+
+
+def _error_windows(mm: mmap.mmap, start: int, end: int, budget: int) -> tuple[list[tuple[int, int, str]], int]:
+    """Probe the middle of the file and pick up to budget // WINDOW_BYTES windows with the most error markers."""
+    n_windows = budget // WINDOW_BYTES
+    middle = end - start
+    if n_windows <= 0 or middle <= 0:
+        return [], 0
+    if middle <= PROBES * PROBE_BYTES:
+        probe_starts = range(start, end, WINDOW_BYTES)
+        probe_len = WINDOW_BYTES
+    else:
+        step = middle // PROBES
+        probe_starts = range(start, end - PROBE_BYTES, step)
+        probe_len = PROBE_BYTES
+    candidates = []
+    probed = 0
+    for ps in probe_starts:
+        pe = min(ps + probe_len, end)
+        matches = [m.start() for m in ERROR_PATTERN.finditer(mm, ps, pe)]
+        probed += pe - ps
+        if not matches:
+            continue
+        # Окно — вокруг медианного совпадения пробы; ранжируем по числу маркеров в самом окне
+        center = matches[len(matches) // 2]
+        ws = max(start, center - WINDOW_BYTES // 2)
+        we = min(end, ws + WINDOW_BYTES)
+        errors = sum(1 for m in matches if ws <= m < we)
+        candidates.append((errors, ws, we))
+    best = heapq.nlargest(n_windows, candidates)
+    windows = []
+    for errors, ws, we in best:
+        ws = _align_backward(mm, ws)
+        we = _align_forward(mm, we)
+        windows.append((ws, we, f"errors={errors}"))
+    return windows, probed
+
+
+def _align_forward(mm: mmap.mmap, pos: int) -> int:
+    """Move pos to just after the next newline (если он близко), чтобы не резать строку."""
+    if pos >= len(mm):
+        return len(mm)
+    nl = mm.find(b"\n", pos, min(len(mm), pos + LINE_ALIGN_BYTES))
+    return nl + 1 if nl != -1 else pos
+
+
+def _align_backward(mm: mmap.mmap, pos: int) -> int:
+    if pos <= 0:
+        return 0
+    nl = mm.rfind(b"\n", max(0, pos - LINE_ALIGN_BYTES), pos)
+    return nl + 1 if nl != -1 else pos
+
+
+def _merge(segments: list[tuple[int, int, str]]) -> list[tuple[int, int, str]]:
+    merged: list[tuple[int, int, str]] = []
+    for s, e, reason in sorted(segments):
+        if merged and s <= merged[-1][1]:
+            ps, pe, preason = merged[-1]
+            merged[-1] = (ps, max(pe, e), preason if reason == preason else f"{preason}+{reason}")
+        else:
+            merged.append((s, e, reason))
+    return merged
+
+
+def _render(segments: list[tuple[int, int, str]], read) -> tuple[str, list[tuple[int, int]]]:
+    """Text of the segments (read(start, end) -> str) with skip markers and the position of each segment in it."""
+    parts = []
+    spans = []
+    pos = 0
+    prev_end = 0
+    for s, e, _reason in segments:
+        if s > prev_end:
+            marker = f"\n... [пропущено {s - prev_end} байт] ...\n"
+            parts.append(marker)
+            pos += len(marker)
+        chunk = read(s, e)
+        parts.append(chunk)
+        spans.append((pos, pos + len(chunk)))
+        pos += len(chunk)
+        prev_end = e
+    return "".join(parts), spans
+
+
+def _info(size: int, segments: list[tuple[int, int, str]], probed: int, spans: list[tuple[int, int]] | None = None) -> dict:
+    excerpt = sum(e - s for s, e, _ in segments)
+    info = {
+        "size_bytes": size,
+        "excerpt_bytes": excerpt,
+        "skipped_bytes": size - excerpt,
+        "probed_bytes": probed,
+        "segments": [{"start": s, "end": e, "reason": r} for s, e, r in segments],
+    }
+    for seg, (ts, te) in zip(info["segments"], spans or []):
+        seg["text_start"], seg["text_end"] = ts, te
+    return info
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
@@ -1,14 +1,57 @@
 """Store and retrieve custom artifacts (Java logs, GC, thread-dump, heapdump, JVM opts, JFR)."""
+import fcntl
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterable, Iterator, Optional
 from uuid import uuid4
 import structlog
+import zstandard
 
 from app.config import settings
 from app.db.models import ArtifactKind
+from app.services.artifact_sampler import sample_file, sample_stream
 
 logger = structlog.get_logger()
 
+# Размер чанка при потоковой записи: память на загрузку не зависит от размера файла
+CHUNK_SIZE = 1024 * 1024
+UPLOADS_DIR_NAME = ".uploads"
+# Content-addressed хранилище: .blobs/<sha[:2]>/<sha>; файлы тестов — hardlink на blob
+BLOBS_DIR_NAME = ".blobs"
+# Суффикс файлов, сжатых zstd при хранении (см. settings.artifacts_compress_kinds)
+ZSTD_SUFFIX = ".zst"
+# Уже сжатые форматы кладутся в ZIP без повторного сжатия (ZIP_STORED)
+ZIP_STORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".hprof", ".jfr", ".gz", ".zip", ".zst"}
+# Результат предобработки артефакта рядом с файлом: <имя>.digest.json (сводка hprof/jfr, шаблоны лога, статистика)
+DIGEST_SUFFIX = ".digest.json"
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink for zipfile: накопленные байты забираются через drain()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 
 class ArtifactsService:
     """Save engineer-provided artifacts with a structured path and metadata."""
@@ -28,20 +71,395 @@ class ArtifactsService:
         Save raw bytes to storage. Kind should be one of ArtifactKind (custom_*).
         Returns (path_for_db, metadata). path_for_db — путь относительно artifacts_path для хранения в БД.
         """
-        self.base.mkdir(parents=True, exist_ok=True)
+        return self.save_custom_artifact_stream(
+            test_id, kind, io.BytesIO(content), display_name=display_name, metadata=metadata
+        )
+
+    def save_custom_artifact_stream(
+        self,
+        test_id: int,
+        kind: str,
+        stream: BinaryIO,
+        display_name: Optional[str] = None,
+        metadata: Optional[dict] = None,
+    ) -> tuple[Path, dict]:
+        """
+        Same as save_custom_artifact, but reads the file object in chunks (CHUNK_SIZE).
+        Пишет во временный файл рядом с целевым, считает sha256 и размер по ходу записи,
+        затем атомарно переименовывает. Память не зависит от размера файла.
+        """
+        compressed = self.is_compressed_kind(kind)
+        tmp = self._test_dir(test_id) / f".{uuid4().hex}.tmp"
+        try:
+            sha256, size = self._write_stream(stream, tmp, compressed)
+            return self._commit_file(test_id, kind, tmp, sha256, size, display_name, metadata, compressed)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def is_compressed_kind(self, kind: str) -> bool:
+        """Хранить ли артефакты этого kind сжатыми (текстовые логи — да, hprof/jfr — нет)."""
+        return kind in settings.artifacts_compress_kinds
+
+    def _write_stream(self, stream: BinaryIO, out_path: Path, compress: bool) -> tuple[str, int]:
+        """
+        Copy stream to out_path chunk by chunk, optionally through a zstd compressor.
+        sha256 и размер считаются по исходным (несжатым) байтам. Returns (sha256, size).
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        with out_path.open("wb") as raw_out:
+            out = (
+                zstandard.ZstdCompressor(level=settings.artifacts_zstd_level).stream_writer(raw_out, closefd=False)
+                if compress
+                else raw_out
+            )
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            if compress:
+                out.close()
+        return hasher.hexdigest(), size
+
+    # --- Resumable uploads: partial-файл растёт чанками по offset, затем finish_upload ---
+
+    def start_upload(self, test_id: int) -> str:
+        """Create an empty partial file for a resumable upload. Returns upload_id."""
+        upload_id = uuid4().hex
+        part = self._upload_part_path(test_id, upload_id)
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.touch()
+        return upload_id
+
+    def upload_offset(self, test_id: int, upload_id: str) -> int:
+        """Number of bytes already received for upload_id (offset to resume from)."""
+        part = self._upload_part_path(test_id, upload_id)
+        if not part.exists():
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+        return part.stat().st_size
+
+    @contextmanager
+    def _locked_part(self, test_id: int, upload_id: str) -> Iterator[BinaryIO]:
+        """
+        Partial file opened under an exclusive flock: проверка offset и запись одного чанка не пересекаются
+        с другими запросами к тому же upload_id (в том числе из других воркеров uvicorn).
+        """
+        part = self._upload_part_path(test_id, upload_id)
+        try:
+            # r+b, не ab: несуществующий partial-файл не создаётся
+            f = part.open("r+b")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+        with f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            # Пока ждали блокировку, загрузку могли завершить или отменить (файл удалён)
+            if not part.exists():
+                raise FileNotFoundError(f"Upload not found: {upload_id}")
+            yield f
+
+    def append_upload(self, test_id: int, upload_id: str, offset: int, stream: BinaryIO) -> int:
+        """
+        Append chunk from stream at offset. offset должен совпадать с текущим размером partial-файла
+        (иначе ValueError — клиент должен запросить upload_offset и продолжить с него).
+        Returns new offset.
+        """
+        with self._locked_part(test_id, upload_id) as out:
+            current = os.fstat(out.fileno()).st_size
+            if offset != current:
+                raise ValueError(f"Offset mismatch: expected {current}, got {offset}")
+            out.seek(current)
+            shutil.copyfileobj(stream, out, CHUNK_SIZE)
+            out.flush()
+            return os.fstat(out.fileno()).st_size
+
+    def finish_upload(
+        self,
+        test_id: int,
+        upload_id: str,
+        kind: str,
+        display_name: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        expected_sha256: Optional[str] = None,
+    ) -> tuple[Path, dict]:
+        """Hash the partial file chunk by chunk and atomically move it into place."""
+        with self._locked_part(test_id, upload_id):
+            return self._finish_locked_upload(test_id, upload_id, kind, display_name, metadata, expected_sha256)
+
+    def _finish_locked_upload(
+        self,
+        test_id: int,
+        upload_id: str,
+        kind: str,
+        display_name: Optional[str],
+        metadata: Optional[dict],
+        expected_sha256: Optional[str],
+    ) -> tuple[Path, dict]:
+        part = self._upload_part_path(test_id, upload_id)
+        compressed = self.is_compressed_kind(kind)
+        src = part
+        if compressed:
+            src = part.with_suffix(".zst.tmp")
+            with part.open("rb") as f:
+                digest, size = self._write_stream(f, src, compress=True)
+        else:
+            hasher = hashlib.sha256()
+            size = 0
+            with part.open("rb") as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+        try:
+            if expected_sha256 and expected_sha256.lower() != digest:
+                raise ValueError(f"sha256 mismatch: expected {expected_sha256}, got {digest}")
+            result = self._commit_file(test_id, kind, src, digest, size, display_name, metadata, compressed)
+        finally:
+            if compressed and src.exists():
+                src.unlink()
+        if part.exists():
+            part.unlink()
+        return result
+
+    def abort_upload(self, test_id: int, upload_id: str) -> None:
+        try:
+            with self._locked_part(test_id, upload_id):
+                self._upload_part_path(test_id, upload_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _upload_part_path(self, test_id: int, upload_id: str) -> Path:
+        if not upload_id.isalnum():
+            raise ValueError(f"Invalid upload_id: {upload_id}")
+        # Внутри каталога теста: os.replace из partial в итоговый файл — в пределах одной ФС.
+        # Каталог создаёт только start_upload: запросы к несуществующей загрузке ничего не создают
+        return self.base / str(test_id) / UPLOADS_DIR_NAME / f"{upload_id}.part"
+
+    def _test_dir(self, test_id: int) -> Path:
         test_dir = self.base / str(test_id)
         test_dir.mkdir(parents=True, exist_ok=True)
-        ext = self._extension_for_kind(kind)
+        return test_dir
+
+    def _commit_file(
+        self,
+        test_id: int,
+        kind: str,
+        src: Path,
+        sha256: str,
+        size: int,
+        display_name: Optional[str],
+        metadata: Optional[dict],
+        compressed: bool = False,
+    ) -> tuple[Path, dict]:
+        """
+        Put a fully written file into the blob store and link it to its final name.
+        Если blob с таким sha256 уже есть — src отбрасывается (дедупликация).
+        compressed — src уже сжат zstd: к имени добавляется ZSTD_SUFFIX.
+        """
+        ext = self._extension_for_kind(kind) + (ZSTD_SUFFIX if compressed else "")
         name = display_name or f"{kind}_{uuid4().hex[:8]}"
         safe_name = "".join(c if c.isalnum() or c in ".-_" else "_" for c in name)[:200]
-        path = test_dir / f"{safe_name}{ext}"
-        path.write_bytes(content)
+        path = self._test_dir(test_id) / f"{safe_name}{ext}"
+        stored_size = src.stat().st_size
+        deduplicated = self._store_blob(src, sha256, compressed)
+        try:
+            self._link_blob(sha256, path, compressed)
+        except FileNotFoundError:
+            # blob удалён сборщиком между проверкой и созданием ссылки — кладём src заново
+            deduplicated = self._store_blob(src, sha256, compressed)
+            self._link_blob(sha256, path, compressed)
+        except OSError:
+            # Ссылку создать нельзя: только что положенный blob ни на что не ссылается — убираем
+            blob = self._blob_path(sha256, compressed)
+            if not deduplicated and blob.exists():
+                self._gc_blobs({self._inode(blob)}, [sha256])
+            raise
+        if src.exists():
+            src.unlink()
         meta = metadata or {}
         meta["kind"] = kind
         meta["original_name"] = display_name
+        meta["sha256"] = sha256
+        meta["size_bytes"] = size
+        meta["compression"] = "zstd" if compressed else None
+        meta["stored_size_bytes"] = stored_size
+        meta["deduplicated"] = deduplicated
+        logger.info(
+            "artifact_saved",
+            test_id=test_id,
+            kind=kind,
+            path=str(path),
+            size=size,
+            sha256=sha256,
+            deduplicated=deduplicated,
+        )
         rel_path = path.relative_to(self.base)
         return rel_path, meta
 
+    def link_existing_blob(
+        self,
+        test_id: int,
+        kind: str,
+        sha256: str,
+        display_name: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        size_bytes: Optional[int] = None,
+    ) -> tuple[Path, dict]:
+        """
+        Register an artifact from an already stored blob without transferring the bytes again.
+        size_bytes — размер содержимого из метаданных существующего артефакта; без него сжатый blob распаковывается.
+        FileNotFoundError, если blob с таким sha256 нет — тогда файл нужно загрузить.
+        """
+        sha256 = sha256.lower()
+        compressed = self.is_compressed_kind(kind)
+        blob = self._blob_path(sha256, compressed)
+        if not blob.exists():
+            # Тот же контент мог быть сохранён другим kind — в другом виде (сжатым или нет)
+            compressed = not compressed
+            blob = self._blob_path(sha256, compressed)
+        if not blob.exists():
+            raise FileNotFoundError(f"Blob not found: {sha256}")
+        tmp = self._test_dir(test_id) / f".{uuid4().hex}.tmp"
+        try:
+            os.link(blob, tmp)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Blob not found: {sha256}")
+        try:
+            if size_bytes is not None:
+                size = size_bytes
+            else:
+                size = self._content_size(blob) if compressed else blob.stat().st_size
+            return self._commit_file(test_id, kind, tmp, sha256, size, display_name, metadata, compressed)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def _content_size(self, path: Path) -> int:
+        """Uncompressed size of a .zst file without keeping it in memory."""
+        size = 0
+        with path.open("rb") as f, zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as r:
+            while True:
+                chunk = r.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+        return size
+
+    def has_blob(self, sha256: str) -> bool:
+        sha256 = sha256.lower()
+        return self._blob_path(sha256).exists() or self._blob_path(sha256, compressed=True).exists()
+
+    def blob_refcount(self, sha256: str) -> int:
+        """Number of artifact files referencing the blob (hardlinks besides the blob itself)."""
+        refs = 0
+        for compressed in (False, True):
+            blob = self._blob_path(sha256.lower(), compressed)
+            if blob.exists():
+                refs += blob.stat().st_nlink - 1
+        return refs
+
+    def _blob_path(self, sha256: str, compressed: bool = False) -> Path:
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise ValueError(f"Invalid sha256: {sha256}")
+        return self.base / BLOBS_DIR_NAME / sha256[:2] / (sha256 + (ZSTD_SUFFIX if compressed else ""))
+
+    def _store_blob(self, src: Path, sha256: str, compressed: bool = False) -> bool:
+        """Move src into the blob store. Returns True if the blob already existed (src dropped)."""
+        blob = self._blob_path(sha256, compressed)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.exists():
+            return True
+        os.replace(src, blob)
+        return False
+
+    def _link_blob(self, sha256: str, path: Path, compressed: bool = False) -> None:
+        """
+        Atomically point path at the blob (hardlink через временное имя + os.replace).
+        Счётчик ссылок — st_nlink blob-файла, поэтому без hardlink хранить нельзя: копия выглядела бы для сборщика
+        неиспользуемым blob-ом. ФС без hardlink — OSError (storage нужно держать на ФС с их поддержкой).
+        """
+        blob = self._blob_path(sha256, compressed)
+        tmp = path.parent / f".{uuid4().hex}.link"
+        try:
+            os.link(blob, tmp)
+        except FileNotFoundError:
+            raise
+        except OSError as e:
+            logger.error("artifact_blob_link_failed", sha256=sha256, path=str(path), error=str(e))
+            raise OSError(f"Artifact storage requires hard links ({self.base}): {e}") from e
+        replaced = self._blob_inode(path)
+        replaced_sha256 = self._recorded_sha256(path) if replaced is not None else None
+        os.replace(tmp, path)
+        if replaced is not None:
+            self._gc_blobs({replaced}, [replaced_sha256] if replaced_sha256 else [])
+
+    @staticmethod
+    def _inode(path: Path) -> tuple[int, int]:
+        st = path.stat()
+        return st.st_dev, st.st_ino
+
+    def _blob_inode(self, path: Path) -> Optional[tuple[int, int]]:
+        """(st_dev, st_ino) of path if it may be a hardlink to a blob."""
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+
+    @staticmethod
+    def _recorded_sha256(path: Path) -> Optional[str]:
+        """sha256 of an artifact file from its digest next to it (пишет предобработка), если он уже есть."""
+        try:
+            data = json.loads(path.with_name(path.name + DIGEST_SUFFIX).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        sha256 = data.get("sha256")
+        return sha256 if isinstance(sha256, str) else None
+
+    def _gc_blobs(self, inodes: set[tuple[int, int]], sha256s: Iterable[str] = ()) -> int:
+        """
+        Remove blobs among inodes that no artifact file references any more (st_nlink == 1).
+        Проверяются только blob-ы sha256s (из метаданных артефактов или их дайджестов); каталог .blobs обходится,
+        лишь если для части inode sha256 неизвестен (файлы, сохранённые до записи sha256).
+        """
+        blobs_dir = self.base / BLOBS_DIR_NAME
+        if not inodes or not blobs_dir.exists():
+            return 0
+        pending = set(inodes)
+        removed = 0
+        for sha256 in set(sha256s):
+            for compressed in (False, True):
+                try:
+                    blob = self._blob_path(sha256.lower(), compressed)
+                    st = blob.stat()
+                except (ValueError, FileNotFoundError):
+                    continue
+                if (st.st_dev, st.st_ino) not in pending:
+                    continue
+                pending.discard((st.st_dev, st.st_ino))
+                if st.st_nlink == 1:
+                    blob.unlink()
+                    removed += 1
+        if pending:
+            logger.info("artifact_blobs_gc_scan", unknown=len(pending))
+            for sub in os.scandir(blobs_dir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    st = entry.stat()
+                    if (st.st_dev, st.st_ino) in pending and st.st_nlink == 1:
+                        os.unlink(entry.path)
+                        removed += 1
+        if removed:
+            logger.info("artifact_blobs_removed", count=removed)
+        return removed
+
     def _extension_for_kind(self, kind: str) -> str:
         m = {
             "custom_java_log": ".log",
@@ -55,33 +473,197 @@ class ArtifactsService:
         return m.get(kind, ".bin")
 
     def read_artifact(self, file_path: str) -> bytes:
-        """Read artifact bytes. Поддерживает: путь относительно base (1/file.log), полный от cwd (storage/artifacts/1/file.log), абсолютный."""
+        """Read artifact bytes (сжатые zstd файлы распаковываются прозрачно)."""
+        with self.open_artifact(file_path) as f:
+            return f.read()
+
+    def open_artifact(self, file_path: str) -> BinaryIO:
+        """Open artifact for streaming read; *.zst распаковывается на лету."""
+        path = self.resolve_artifact_path(file_path)
+        f = path.open("rb")
+        if path.suffix == ZSTD_SUFFIX:
+            return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+        return f
+
+    def iter_artifact(self, file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield decompressed artifact content in chunks (для StreamingResponse)."""
+        with self.open_artifact(file_path) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def sample_artifact(self, file_path: str, max_bytes: int) -> tuple[str, dict]:
+        """
+        Bounded text excerpt of an artifact (голова, хвост и окна с ошибками) и сведения о пропущенном.
+        Несжатые файлы читаются через mmap без загрузки целиком; .zst — одним потоковым проходом.
+        """
+        path = self.resolve_artifact_path(file_path)
+        if path.suffix == ZSTD_SUFFIX:
+            with self.open_artifact(file_path) as f:
+                return sample_stream(f, max_bytes)
+        return sample_file(path, max_bytes)
+
+    @contextmanager
+    def map_artifact(self, file_path: str) -> Iterator[mmap.mmap | bytes]:
+        """
+        Read-only mmap of the artifact content for binary parsers (hprof): страницы подгружаются ОС по мере чтения.
+        .zst сначала распаковывается во временный файл рядом с хранилищем.
+        """
+        path = self.resolve_artifact_path(file_path)
+        tmp = None
+        try:
+            if path.suffix == ZSTD_SUFFIX:
+                fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=self.base)
+                tmp = Path(tmp_name)
+                with self.open_artifact(file_path) as src, os.fdopen(fd, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                path = tmp
+            if path.stat().st_size == 0:
+                yield b""
+                return
+            with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+        finally:
+            if tmp is not None and tmp.exists():
+                tmp.unlink()
+
+    def content_sha256(self, file_path: str) -> str:
+        """sha256 of the (decompressed) artifact content, for artifacts without it in metadata."""
+        h = hashlib.sha256()
+        for chunk in self.iter_artifact(file_path):
+            h.update(chunk)
+        return h.hexdigest()
+
+    def digest_path(self, file_path: str, suffix: str = DIGEST_SUFFIX) -> Path:
+        path = self.resolve_artifact_path(file_path)
+        return path.with_name(path.name + suffix)
+
+    def load_digest(self, file_path: str, sha256: str, parser_version, suffix: str = DIGEST_SUFFIX) -> Optional[dict]:
+        """Stored digest if it was built from the same content by the same parser version, else None."""
+        try:
+            data = json.loads(self.digest_path(file_path, suffix).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get("sha256") != sha256 or data.get("parser_version") != parser_version:
+            return None
+        return data.get("digest")
+
+    def save_digest(self, file_path: str, sha256: str, parser_version, digest: dict, suffix: str = DIGEST_SUFFIX) -> Path:
+        """Write digest next to the artifact (атомарно, через временный файл)."""
+        target = self.digest_path(file_path, suffix)
+        tmp = target.with_name(f".{uuid4().hex}.tmp")
+        tmp.write_text(
+            json.dumps({"sha256": sha256, "parser_version": parser_version, "digest": digest}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp, target)
+        return target
+
+    def iter_zip(self, entries: list[tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Build a ZIP archive on the fly from (arcname, file_path) pairs and yield it piece by piece.
+        Файлы читаются чанками (сжатые .zst — распаковываются), первый байт уходит клиенту сразу;
+        PNG/hprof/jfr пишутся без повторного сжатия. Нечитаемые файлы пропускаются с warning.
+        """
+        sink = _ZipStreamBuffer()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+            for arcname, file_path in entries:
+                try:
+                    path = self.resolve_artifact_path(file_path)
+                except FileNotFoundError as e:
+                    logger.warning("artifact_zip_entry_skipped", path=file_path, error=str(e))
+                    continue
+                compress_type = (
+                    zipfile.ZIP_STORED if Path(arcname).suffix.lower() in ZIP_STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                )
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = compress_type
+                # Размер распакованного .zst заранее неизвестен — ZIP64 «с запасом»
+                force_zip64 = path.suffix == ZSTD_SUFFIX or path.stat().st_size > 2**31
+                with self.open_artifact(file_path) as src, zf.open(info, "w", force_zip64=force_zip64) as dst:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+        yield sink.drain()
+
+    def resolve_artifact_path(self, file_path: str) -> Path:
+        """Путь к файлу на диске. Поддерживает: путь относительно base (1/file.log), полный от cwd (storage/artifacts/1/file.log), абсолютный."""
         if not file_path:
             raise FileNotFoundError("file_path is empty")
         p = Path(file_path)
         if p.is_absolute() and p.exists():
-            return p.read_bytes()
+            return p
         # Относительно base (например "1/gc_with_problems.log.log")
         from_base = self.base / file_path
         if from_base.exists():
-            return from_base.read_bytes()
+            return from_base
         # Как путь от текущей рабочей директории (например storage/artifacts/1/file.log)
         if p.exists():
-            return p.read_bytes()
+            return p
         raise FileNotFoundError(f"Artifact file not found: {file_path} (tried base/{file_path} and cwd/{file_path})")
 
+    @staticmethod
+    def original_name(file_path: str) -> str:
+        """File name as the engineer sees it: без суффикса хранения .zst."""
+        name = Path(file_path).name
+        return name[: -len(ZSTD_SUFFIX)] if name.endswith(ZSTD_SUFFIX) else name
+
+    def compress_file(self, file_path: str, kind: str) -> str:
+        """
+        Compress an already written file in place (e.g. k8s logs_*.txt after collect) if kind is configured for it.
+        Returns new file_path (с суффиксом .zst) или исходный, если сжатие для kind выключено.
+        """
+        path = Path(file_path)
+        if not self.is_compressed_kind(kind) or path.suffix == ZSTD_SUFFIX:
+            return file_path
+        target = path.with_name(path.name + ZSTD_SUFFIX)
+        tmp = path.with_name(f".{uuid4().hex}.tmp")
+        try:
+            with path.open("rb") as f:
+                self._write_stream(f, tmp, compress=True)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        path.unlink()
+        return str(target)
+
     def list_test_artifacts(self, test_id: int) -> list[Path]:
         """List all files under test's artifact directory."""
         test_dir = self.base / str(test_id)
         if not test_dir.exists():
             return []
-        return list(test_dir.rglob("*"))
+        return [
+            p for p in test_dir.rglob("*")
+            if UPLOADS_DIR_NAME not in p.relative_to(test_dir).parts and not p.name.endswith(DIGEST_SUFFIX)
+        ]
 
-    def delete_test_artifacts(self, test_id: int) -> None:
-        """Remove test artifact directory and all contents."""
+    def delete_test_artifacts(self, test_id: int, sha256s: Iterable[str] = ()) -> None:
+        """
+        Remove test artifact directory and all contents; drop blobs nothing else references.
+        sha256s — содержимое артефактов теста (из БД): сборщик проверяет только эти blob-ы.
+        """
         test_dir = self.base / str(test_id)
         if test_dir.exists():
+            inodes = set()
+            known = set(sha256s)
             for f in test_dir.rglob("*"):
                 if f.is_file():
-                    f.unlink()
-            test_dir.rmdir()
+                    ino = self._blob_inode(f)
+                    if ino is not None:
+                        inodes.add(ino)
+                        sha256 = self._recorded_sha256(f)
+                        if sha256:
+                            known.add(sha256)
+            shutil.rmtree(test_dir)
+            self._gc_blobs(inodes, known)
@@ -0,0 +1,141 @@
+"""Collect artifacts from Grafana and Kubernetes for a test as background jobs (see app.services.jobs)."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import models
+from app.services import preprocessing
+from app.services.artifacts import ArtifactsService
+from app.services.grafana import GrafanaService
+from app.services.jobs import JobContext
+from app.services.kubernetes import KubernetesService
+
+
+def parse_ts(s: str) -> datetime:
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+def grafana_source(project: models.Project, index: int) -> tuple[str, str]:
+    """(url, token) of project.grafana_sources[index]; ValueError — чего-то не хватает."""
+    sources = project.grafana_sources or []
+    if not sources:
+        raise ValueError("Project has no Grafana sources")
+    if index >= len(sources):
+        raise ValueError("Invalid grafana_source_index")
+    src = sources[index]
+    url = src.get("url") or src.get("base_url")
+    token = src.get("token") or src.get("api_key")
+    if not url or not token:
+        raise ValueError("Grafana url and token required")
+    return url, token
+
+
+def _load(db: Session, test_id: int) -> tuple[models.Test, models.Project]:
+    test = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not test:
+        raise ValueError(f"Test {test_id} not found")
+    return test, db.query(models.Project).filter(models.Project.id == test.project_id).first()
+
+
+def _restore_status(db: Session, test: models.Test, status: str) -> None:
+    test.status = status
+    test.error_message = None
+    db.commit()
+
+
+def collect_grafana_job(
+    ctx: JobContext,
+    db: Session,
+    test_id: int,
+    from_ts: str,
+    to_ts: str,
+    dashboard_uid: str,
+    grafana_source_index: int = 0,
+) -> dict:
+    """Slice dashboard panels for [from_ts, to_ts] and save as artifacts; прогресс — по панелям."""
+    test, project = _load(db, test_id)
+    url, token = grafana_source(project, grafana_source_index)
+    previous_status = test.status
+    test.status = "collecting"
+    db.commit()
+    ctx.progress("collecting", 0.0)
+    save_dir = settings.grafana_snapshots_path() / str(test_id)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    svc = GrafanaService(base_url=url, token=token)
+    results = svc.slice_and_save_dashboard(
+        dashboard_uid,
+        parse_ts(from_ts),
+        parse_ts(to_ts),
+        save_dir,
+        on_progress=lambda done, total: ctx.progress("collecting", done / max(1, total), f"панели: {done}/{total}"),
+    )
+    for r in results:
+        db.add(models.Artifact(
+            test_id=test_id,
+            kind="grafana_slice",
+            display_name=r.get("title"),
+            file_path=r.get("image_path"),
+            metadata_={"meta_path": r.get("meta_path"), "panel_id": r.get("panel_id")},
+        ))
+    db.commit()
+    _restore_status(db, test, previous_status)
+    return {"collected": len(results), "artifacts": results}
+
+
+def collect_kubernetes_job(
+    ctx: JobContext,
+    db: Session,
+    test_id: int,
+    from_ts: str,
+    to_ts: str,
+    namespace: str | None = None,
+) -> dict:
+    """Save pods list and pod/container logs for time range as artifacts, затем предобработка (дайджесты)."""
+    test, project = _load(db, test_id)
+    if not project or not project.k8s_config:
+        raise ValueError("Project has no Kubernetes config")
+    previous_status = test.status
+    test.status = "collecting"
+    db.commit()
+    ctx.progress("collecting", 0.0)
+    save_dir = settings.artifacts_path() / str(test_id) / "k8s"
+    save_dir.mkdir(parents=True, exist_ok=True)
+    svc = KubernetesService(project.k8s_config)
+    out = svc.collect_and_save(
+        parse_ts(from_ts),
+        parse_ts(to_ts),
+        save_dir,
+        namespace=namespace,
+        on_progress=lambda done, total: ctx.progress("collecting", 0.7 * done / max(1, total), f"поды: {done}/{total}"),
+    )
+    # Логи подов хранятся сжатыми (settings.artifacts_compress_kinds)
+    art_svc = ArtifactsService()
+    for log_entry in out.get("logs", []):
+        log_entry["log_file"] = art_svc.compress_file(log_entry["log_file"], "k8s_logs")
+    pods_art = models.Artifact(
+        test_id=test_id,
+        kind="k8s_pods",
+        display_name="pods_list.json",
+        file_path=out["pods_file"],
+        metadata_={"pods_count": out["pods_count"]},
+    )
+    db.add(pods_art)
+    arts = [pods_art]
+    for log_entry in out.get("logs", []):
+        art = models.Artifact(
+            test_id=test_id,
+            kind="k8s_logs",
+            display_name=f"{log_entry['pod']}/{log_entry['container']}",
+            file_path=log_entry["log_file"],
+            metadata_=log_entry,
+        )
+        db.add(art)
+        arts.append(art)
+    db.commit()
+    ctx.progress("preprocessing", 0.7, f"дайджесты: {len(arts)} файлов")
+    preprocessing.preprocess_artifacts(db, arts)
+    _restore_status(db, test, previous_status)
+    return {"pods_file": out["pods_file"], "logs_count": len(out.get("logs", []))}
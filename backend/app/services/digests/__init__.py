@@ -0,0 +1 @@
+"""Kind-specific artifact digests: compact structured summaries that replace raw text in the prompt."""
@@ -0,0 +1,481 @@
+"""JDK unified GC logging (-Xlog:gc*) parser: columnar pause/heap/region data and a statistical digest."""
+from __future__ import annotations
+
+import io
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+import numpy as np
+
+PARSER_VERSION = 2
+
+# Регулярки применяются к целым чанкам текста (re.M), а не построчно в Python — так лог в несколько ГБ
+# разбирается за секунды. Сначала быстрый поиск кандидатов по литеральному префиксу ("Pause ", "Collection ("),
+# затем подробный разбор только найденных строк; uptime берётся из декораций строки ([0.354s][info][gc]...).
+_SIZE = r"(\d+(?:\.\d+)?)([KMGT]?)B?"
+_PAUSE_LINE = re.compile(r"Pause [^\n]*ms[ \t]*$", re.M)
+# G1/Parallel/Serial/Shenandoah: "GC(1) Pause Young (Normal) (G1 Evacuation Pause) 230.4G->307.2G(768.0G) 44.041ms"
+# ZGC: "GC(3) Pause Mark Start 0.012ms", generational ZGC: "GC(3) y: Pause Mark Start 0.011ms"
+_PAUSE = re.compile(
+    rf"GC\((\d+)\) (?:[YyOo]: )?(Pause .*?)(?: {_SIZE}->{_SIZE}\({_SIZE}\))? (\d+(?:\.\d+)?)ms[ \t]*$"
+)
+_ZGC_CYCLE_LINE = re.compile(r"Collection \([^\n]*%\)[ \t]*$", re.M)
+# ZGC: "GC(3) Garbage Collection (Warmup) 2048M(25%)->1024M(12%)"
+_ZGC_CYCLE = re.compile(
+    rf"GC\((\d+)\) (?:[YyOo]: )?(?:Major |Minor )?(?:Garbage )?Collection \((.+?)\) {_SIZE}\(\d+%\)->{_SIZE}\(\d+%\)"
+)
+_REGIONS = re.compile(
+    r"GC\((\d+)\) (Eden|Survivor|Old|Humongous) regions: (\d+)->(\d+)(?: \((\d+(?:\.\d+)?)([KMGT]?)B?->)?"
+)
+# -Xlog:gc+phases: "[gc,phases] GC(5)   Evacuate Collection Set: 40.1ms", Full GC: "GC(9) Phase 1: Mark live objects 12.3ms".
+# Только фазы верхнего уровня (отступ до двух пробелов); подфазы debug-уровня глубже и не берутся
+_PHASE = re.compile(r"\[gc,phases\s*\][^\n]*?GC\((\d+)\) {1,3}([A-Z][^\n]*?):? (\d+(?:\.\d+)?) ?ms[ \t]*$", re.M)
+_CONCURRENT = re.compile(r"GC\((\d+)\) Concurrent (?:Mark )?Cycle")
+_REGION_SIZE = re.compile(rf"Heap [Rr]egion [Ss]ize: {_SIZE}")
+_HUMONGOUS_REQ = re.compile(rf"Humongous allocation request: {_SIZE}")
+_ALLOC_STALL = re.compile(r"Allocation Stall \((.+?)\) (\d+(?:\.\d+)?)ms")
+_COLLECTOR = re.compile(r"Using (The Z Garbage Collector|G1|Parallel|Serial|Shenandoah|Epsilon)")
+_WARNING = re.compile(r"\[warning\s*\](?:\[[^\]\n]*\])*\s*([^\n]*)")
+_UPTIME = re.compile(r"\[(\d+(?:\.\d+)?)(s|ms)\]")
+_DECO_LINE = re.compile(r"^(?:\[[^\]\n]*\])+", re.M)
+_GC_ID = re.compile(r"GC\(\d+\)\s*")
+
+_UNIT_MB = {"": 1 / (1024 * 1024), "K": 1 / 1024, "M": 1.0, "G": 1024.0, "T": 1024.0 * 1024}
+
+# Коды типа паузы в колонке pause_kind
+PAUSE_KINDS = ("young", "mixed", "full", "remark", "cleanup", "other")
+
+
+def _mb(value: str, unit: str) -> float:
+    return float(value) * _UNIT_MB[unit]
+
+
+def _pause_kind(name: str) -> int:
+    n = name.lower()
+    if "full" in n:
+        return PAUSE_KINDS.index("full")
+    if "mixed" in n:
+        return PAUSE_KINDS.index("mixed")
+    if "young" in n:
+        return PAUSE_KINDS.index("young")
+    if "remark" in n or "mark end" in n:
+        return PAUSE_KINDS.index("remark")
+    if "cleanup" in n:
+        return PAUSE_KINDS.index("cleanup")
+    return PAUSE_KINDS.index("other")
+
+
+@dataclass
+class GcLogData:
+    """Columnar data extracted from a GC log (NumPy arrays, одна строка = одна пауза / одна запись)."""
+
+    collector: str | None
+    region_size_mb: float | None
+    # Паузы
+    gc_id: np.ndarray
+    uptime_s: np.ndarray
+    pause_ms: np.ndarray
+    pause_kind: np.ndarray
+    heap_before_mb: np.ndarray  # NaN, если в строке паузы нет размеров кучи (ZGC)
+    heap_after_mb: np.ndarray
+    heap_total_mb: np.ndarray
+    # Регионы G1 по GC(id): before/after, NaN если нет строки
+    region_gc_id: np.ndarray
+    regions: dict[str, tuple[np.ndarray, np.ndarray]]
+    # ZGC: циклы (uptime, before, after)
+    cycle_uptime_s: np.ndarray
+    cycle_before_mb: np.ndarray
+    cycle_after_mb: np.ndarray
+    humongous_requests_mb: np.ndarray
+    allocation_stalls_ms: np.ndarray
+    # Фазы пауз (gc+phases): GC(id), код фазы (индекс в phase_names), длительность
+    phase_names: tuple[str, ...]
+    phase_gc_id: np.ndarray
+    phase_code: np.ndarray
+    phase_ms: np.ndarray
+    first_uptime_s: float | None
+    last_uptime_s: float | None
+    concurrent_cycles: int
+    warnings: dict[str, int]
+    lines: int
+
+
+@dataclass
+class GcLogParser:
+    """Streaming parser: feed_text() получает куски лога; память — O(число GC событий), не O(размер лога)."""
+
+    collector: str | None = None
+    region_size_mb: float | None = None
+    lines: int = 0
+    first_uptime_s: float | None = None
+    last_uptime_s: float | None = None
+    warnings: dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._pending = ""
+        self._gc_id = array("q")
+        self._uptime = array("d")
+        self._pause = array("d")
+        self._kind = array("b")
+        self._before = array("d")
+        self._after = array("d")
+        self._total = array("d")
+        self._regions: dict[int, dict[str, tuple[int, int]]] = {}
+        self._eden_mb_before: dict[int, float] = {}
+        self._concurrent: set[int] = set()
+        self._cycle_uptime = array("d")
+        self._cycle_before = array("d")
+        self._cycle_after = array("d")
+        self._humongous = array("d")
+        self._stalls = array("d")
+        self._phase_codes: dict[str, int] = {}
+        self._phase_gc_id = array("q")
+        self._phase_code = array("h")
+        self._phase_ms = array("d")
+
+    def feed_text(self, text: str) -> None:
+        """Feed the next piece of the log; неполная последняя строка ждёт следующего куска."""
+        text = self._pending + text
+        cut = text.rfind("\n") + 1
+        self._pending = text[cut:]
+        if cut:
+            self._parse(text[:cut])
+
+    def close(self) -> None:
+        if self._pending:
+            self._parse(self._pending + "\n")
+            self._pending = ""
+
+    def _parse(self, chunk: str) -> None:
+        self.lines += chunk.count("\n")
+        self._track_uptime(chunk)
+        for line, uptime in _candidate_lines(_PAUSE_LINE, chunk):
+            m = _PAUSE.search(line)
+            if not m:
+                continue
+            has_heap = m.group(3) is not None
+            self._gc_id.append(int(m.group(1)))
+            self._uptime.append(uptime)
+            self._pause.append(float(m.group(9)))
+            self._kind.append(_pause_kind(m.group(2)))
+            self._before.append(_mb(m.group(3), m.group(4)) if has_heap else np.nan)
+            self._after.append(_mb(m.group(5), m.group(6)) if has_heap else np.nan)
+            self._total.append(_mb(m.group(7), m.group(8)) if has_heap else np.nan)
+        if "regions:" in chunk:
+            regions = self._regions
+            for gid, rtype, before, after, eden_mb, eden_unit in _REGIONS.findall(chunk):
+                gid = int(gid)
+                regions.setdefault(gid, {})[rtype] = (int(before), int(after))
+                if eden_mb and not self._eden_mb_before:
+                    self._eden_mb_before[gid] = _mb(eden_mb, eden_unit)
+        if "Collection (" in chunk:
+            for line, uptime in _candidate_lines(_ZGC_CYCLE_LINE, chunk):
+                m = _ZGC_CYCLE.search(line)
+                if m:
+                    self._cycle_uptime.append(uptime)
+                    self._cycle_before.append(_mb(m.group(3), m.group(4)))
+                    self._cycle_after.append(_mb(m.group(5), m.group(6)))
+        if "gc,phases" in chunk:
+            codes = self._phase_codes
+            for gid, name, ms in _PHASE.findall(chunk):
+                self._phase_gc_id.append(int(gid))
+                self._phase_code.append(codes.setdefault(name, len(codes)))
+                self._phase_ms.append(float(ms))
+        if "Concurrent" in chunk:
+            self._concurrent.update(int(g) for g in _CONCURRENT.findall(chunk))
+        if "Humongous allocation request" in chunk:
+            for value, unit in _HUMONGOUS_REQ.findall(chunk):
+                self._humongous.append(_mb(value, unit))
+        if "Allocation Stall" in chunk:
+            for _cause, ms in _ALLOC_STALL.findall(chunk):
+                self._stalls.append(float(ms))
+        if "warning" in chunk:
+            for msg in _WARNING.findall(chunk):
+                key = _GC_ID.sub("", msg).strip()[:120]
+                self.warnings[key] = self.warnings.get(key, 0) + 1
+        if self.collector is None:
+            m = _COLLECTOR.search(chunk)
+            if m:
+                self.collector = "ZGC" if m.group(1).startswith("The Z") else m.group(1)
+        if self.region_size_mb is None:
+            m = _REGION_SIZE.search(chunk)
+            if m:
+                self.region_size_mb = _mb(m.group(1), m.group(2))
+
+    def _track_uptime(self, chunk: str) -> None:
+        if self.first_uptime_s is None:
+            m = _DECO_LINE.search(chunk)
+            while m and np.isnan(_uptime(m.group(0))):
+                m = _DECO_LINE.search(chunk, m.end())
+            if m:
+                self.first_uptime_s = _uptime(m.group(0))
+        # Последняя строка с uptime — ищем с конца чанка
+        pos = len(chunk)
+        while pos > 0:
+            start = chunk.rfind("\n", 0, pos - 1) + 1
+            value = _uptime(chunk[start : min(pos, start + 128)]) if chunk.startswith("[", start) else np.nan
+            if not np.isnan(value):
+                self.last_uptime_s = value
+                break
+            pos = start
+
+    def result(self) -> GcLogData:
+        self.close()
+        region_ids = sorted(self._regions)
+        regions = {}
+        for rtype in ("Eden", "Survivor", "Old", "Humongous"):
+            before = np.array([self._regions[g].get(rtype, (np.nan, np.nan))[0] for g in region_ids], dtype=float)
+            after = np.array([self._regions[g].get(rtype, (np.nan, np.nan))[1] for g in region_ids], dtype=float)
+            regions[rtype.lower()] = (before, after)
+        region_size = self.region_size_mb
+        if region_size is None and self._eden_mb_before:
+            # Размер региона G1 из строки "Eden regions: 614->0 (76.8G->0)"
+            gid, eden_mb = next(iter(self._eden_mb_before.items()))
+            eden_regions = self._regions.get(gid, {}).get("Eden", (0, 0))[0]
+            if eden_regions:
+                region_size = eden_mb / eden_regions
+        return GcLogData(
+            collector=self.collector,
+            region_size_mb=region_size,
+            gc_id=np.frombuffer(self._gc_id, dtype=np.int64).copy(),
+            uptime_s=np.frombuffer(self._uptime, dtype=float).copy(),
+            pause_ms=np.frombuffer(self._pause, dtype=float).copy(),
+            pause_kind=np.frombuffer(self._kind, dtype=np.int8).copy(),
+            heap_before_mb=np.frombuffer(self._before, dtype=float).copy(),
+            heap_after_mb=np.frombuffer(self._after, dtype=float).copy(),
+            heap_total_mb=np.frombuffer(self._total, dtype=float).copy(),
+            region_gc_id=np.array(region_ids, dtype=np.int64),
+            regions=regions,
+            cycle_uptime_s=np.frombuffer(self._cycle_uptime, dtype=float).copy(),
+            cycle_before_mb=np.frombuffer(self._cycle_before, dtype=float).copy(),
+            cycle_after_mb=np.frombuffer(self._cycle_after, dtype=float).copy(),
+            humongous_requests_mb=np.frombuffer(self._humongous, dtype=float).copy(),
+            allocation_stalls_ms=np.frombuffer(self._stalls, dtype=float).copy(),
+            phase_names=tuple(self._phase_codes),
+            phase_gc_id=np.frombuffer(self._phase_gc_id, dtype=np.int64).copy(),
+            phase_code=np.frombuffer(self._phase_code, dtype=np.int16).copy(),
+            phase_ms=np.frombuffer(self._phase_ms, dtype=float).copy(),
+            first_uptime_s=self.first_uptime_s,
+            last_uptime_s=self.last_uptime_s,
+            concurrent_cycles=len(self._concurrent),
+            warnings=dict(self.warnings),
+            lines=self.lines,
+        )
+
+
+def _candidate_lines(pattern: re.Pattern, chunk: str):
+    """Yield (whole line, uptime) for lines where pattern matches (pattern должен заканчиваться на $)."""
+    for m in pattern.finditer(chunk):
+        start = chunk.rfind("\n", 0, m.start()) + 1
+        yield chunk[start : m.end()], _uptime(chunk[start : min(m.start(), start + 128)])
+
+
+def _uptime(deco: str) -> float:
+    m = _UPTIME.search(deco)
+    if not m:
+        return np.nan
+    value = float(m.group(1))
+    return value / 1000.0 if m.group(2) == "ms" else value
+
+
+def parse_gc_log(text: str) -> GcLogData:
+    parser = GcLogParser()
+    parser.feed_text(text)
+    return parser.result()
+
+
+def parse_gc_log_stream(stream: BinaryIO, chunk_chars: int = 4 * 1024 * 1024, encoding: str = "utf-8") -> GcLogData:
+    """Parse a binary stream chunk by chunk (в т.ч. распаковываемый zstd-поток)."""
+    parser = GcLogParser()
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    try:
+        while True:
+            chunk = text.read(chunk_chars)
+            if not chunk:
+                break
+            parser.feed_text(chunk)
+    finally:
+        text.detach()
+    return parser.result()
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    if values.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "total_ms": round(float(values.sum()), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def gc_digest(data: GcLogData, top_n: int = 5, max_phases: int = 12) -> dict:
+    """Statistical digest: перцентили пауз и их фаз, GC overhead, allocation/promotion rate, humongous, предупреждения."""
+    duration_s = None
+    if data.first_uptime_s is not None and data.last_uptime_s is not None:
+        duration_s = max(0.0, data.last_uptime_s - data.first_uptime_s)
+
+    pauses = _percentiles(data.pause_ms)
+    by_kind = {}
+    for code, name in enumerate(PAUSE_KINDS):
+        mask = data.pause_kind == code
+        if mask.any():
+            by_kind[name] = _percentiles(data.pause_ms[mask])
+
+    overhead = None
+    if duration_s:
+        overhead = round(float(data.pause_ms.sum()) / 1000.0 / duration_s * 100.0, 2)
+
+    # Allocation rate: прирост кучи между концом предыдущей паузы и началом следующей
+    allocation_rate = None
+    heap_mask = ~np.isnan(data.heap_before_mb) & ~np.isnan(data.uptime_s)
+    if heap_mask.sum() >= 2:
+        t = data.uptime_s[heap_mask]
+        before = data.heap_before_mb[heap_mask]
+        after = data.heap_after_mb[heap_mask]
+        allocated = np.clip(before[1:] - after[:-1], 0, None)
+        span = float(t[-1] - t[0])
+        if span > 0:
+            allocation_rate = round(float(allocated.sum()) / span, 2)
+    elif data.cycle_before_mb.size >= 2 and not np.isnan(data.cycle_uptime_s).any():
+        allocated = np.clip(data.cycle_before_mb[1:] - data.cycle_after_mb[:-1], 0, None)
+        span = float(data.cycle_uptime_s[-1] - data.cycle_uptime_s[0])
+        if span > 0:
+            allocation_rate = round(float(allocated.sum()) / span, 2)
+
+    # Promotion rate: рост Old regions в young/mixed паузах × размер региона
+    promotion_rate = None
+    old_before, old_after = data.regions.get("old", (np.array([]), np.array([])))
+    if data.region_size_mb and old_before.size and duration_s:
+        young_ids = data.gc_id[np.isin(data.pause_kind, [PAUSE_KINDS.index("young"), PAUSE_KINDS.index("mixed")])]
+        mask = np.isin(data.region_gc_id, young_ids) & ~np.isnan(old_before) & ~np.isnan(old_after)
+        promoted_regions = np.clip(old_after[mask] - old_before[mask], 0, None).sum()
+        promotion_rate = round(float(promoted_regions) * data.region_size_mb / duration_s, 2)
+
+    heap = {}
+    if heap_mask.any():
+        after = data.heap_after_mb[heap_mask]
+        heap = {
+            "max_total_mb": round(float(np.nanmax(data.heap_total_mb)), 1),
+            "after_gc_first_mb": round(float(after[0]), 1),
+            "after_gc_last_mb": round(float(after[-1]), 1),
+            "after_gc_max_mb": round(float(after.max()), 1),
+            "after_gc_p50_mb": round(float(np.median(after)), 1),
+        }
+        full_mask = heap_mask & (data.pause_kind == PAUSE_KINDS.index("full"))
+        if full_mask.any():
+            # Занятость после Full GC ≈ live set
+            heap["after_full_gc_max_mb"] = round(float(data.heap_after_mb[full_mask].max()), 1)
+        # Паузы, после которых куча выросла (эвакуация не освободила память)
+        heap["pauses_heap_grew"] = int((data.heap_after_mb[heap_mask] > data.heap_before_mb[heap_mask]).sum())
+
+    humongous_before, humongous_after = data.regions.get("humongous", (np.array([]), np.array([])))
+    humongous = {
+        "requests": int(data.humongous_requests_mb.size),
+        "requests_total_mb": round(float(data.humongous_requests_mb.sum()), 1),
+        "request_max_mb": round(float(data.humongous_requests_mb.max()), 1) if data.humongous_requests_mb.size else 0.0,
+    }
+    if humongous_after.size and not np.isnan(humongous_after).all():
+        humongous["regions_max"] = int(np.nanmax(humongous_after))
+
+    # Фазы — по суммарному времени: видно, куда уходит пауза (эвакуация, ссылки, Other)
+    phases = {name: _percentiles(data.phase_ms[data.phase_code == code]) for code, name in enumerate(data.phase_names)}
+    phases = dict(sorted(phases.items(), key=lambda kv: -kv[1]["total_ms"])[:max_phases])
+
+    order = np.argsort(data.pause_ms)[::-1][:top_n]
+    longest = [
+        {
+            "gc_id": int(data.gc_id[i]),
+            "uptime_s": None if np.isnan(data.uptime_s[i]) else round(float(data.uptime_s[i]), 3),
+            "kind": PAUSE_KINDS[int(data.pause_kind[i])],
+            "pause_ms": round(float(data.pause_ms[i]), 3),
+            "heap_before_mb": None if np.isnan(data.heap_before_mb[i]) else round(float(data.heap_before_mb[i]), 1),
+            "heap_after_mb": None if np.isnan(data.heap_after_mb[i]) else round(float(data.heap_after_mb[i]), 1),
+        }
+        for i in order
+    ]
+
+    return {
+        "parser_version": PARSER_VERSION,
+        "collector": data.collector,
+        "lines": data.lines,
+        "events": int(data.pause_ms.size + data.cycle_before_mb.size),
+        "duration_s": None if duration_s is None else round(duration_s, 3),
+        "region_size_mb": data.region_size_mb,
+        "pauses": pauses,
+        "pauses_by_kind": by_kind,
+        "phases": phases,
+        "full_gc_count": int((data.pause_kind == PAUSE_KINDS.index("full")).sum()),
+        "gc_overhead_pct": overhead,
+        "allocation_rate_mb_s": allocation_rate,
+        "promotion_rate_mb_s": promotion_rate,
+        "heap": heap,
+        "humongous": humongous,
+        "concurrent_cycles": data.concurrent_cycles,
+        "zgc_cycles": int(data.cycle_before_mb.size),
+        "allocation_stalls": _percentiles(data.allocation_stalls_ms),
+        "longest_pauses": longest,
+        "warnings": dict(sorted(data.warnings.items(), key=lambda kv: -kv[1])[:10]),
+    }
+
+
+def format_gc_digest(d: dict) -> str:
+    """Compact text for the prompt (вместо мегабайт сырого лога)."""
+    lines = [
+        "[СВОДКА GC-ЛОГА — рассчитана парсером по всему файлу]",
+        f"Сборщик: {d.get('collector') or 'не указан'}; строк: {d['lines']}; длительность лога: {d.get('duration_s')} s",
+    ]
+    p = d["pauses"]
+    if p.get("count"):
+        lines.append(
+            f"Паузы: {p['count']} шт., сумма {p['total_ms']} ms; p50 {p['p50_ms']} ms, p95 {p['p95_ms']} ms, "
+            f"p99 {p['p99_ms']} ms, max {p['max_ms']} ms"
+        )
+    for kind, s in d["pauses_by_kind"].items():
+        lines.append(f"  {kind}: {s['count']} шт., p50 {s['p50_ms']} ms, p99 {s['p99_ms']} ms, max {s['max_ms']} ms")
+    if d.get("phases"):
+        lines.append("Фазы пауз (gc+phases), по суммарному времени:")
+        for name, s in d["phases"].items():
+            lines.append(
+                f"  {name}: {s['count']} шт., сумма {s['total_ms']} ms; p50 {s['p50_ms']} ms, p99 {s['p99_ms']} ms, "
+                f"max {s['max_ms']} ms"
+            )
+    lines.append(f"Full GC: {d['full_gc_count']}")
+    lines.append(f"GC overhead: {d.get('gc_overhead_pct')} % времени в паузах")
+    lines.append(f"Allocation rate: {d.get('allocation_rate_mb_s')} MB/s; promotion rate: {d.get('promotion_rate_mb_s')} MB/s")
+    if d.get("heap"):
+        h = d["heap"]
+        lines.append(
+            f"Куча: максимум {h['max_total_mb']} MB; после GC: первая {h['after_gc_first_mb']} MB, последняя "
+            f"{h['after_gc_last_mb']} MB, max {h['after_gc_max_mb']} MB, медиана {h['after_gc_p50_mb']} MB; "
+            f"пауз с ростом кучи: {h['pauses_heap_grew']}"
+            + (f"; после Full GC (live set): до {h['after_full_gc_max_mb']} MB" if "after_full_gc_max_mb" in h else "")
+        )
+    hm = d["humongous"]
+    if hm["requests"] or hm.get("regions_max"):
+        lines.append(
+            f"Humongous: запросов {hm['requests']} на {hm['requests_total_mb']} MB (max {hm['request_max_mb']} MB)"
+            + (f", регионов до {hm['regions_max']}" if hm.get("regions_max") is not None else "")
+        )
+    if d.get("concurrent_cycles") or d.get("zgc_cycles"):
+        lines.append(f"Конкурентные циклы: {d.get('concurrent_cycles')}; циклы ZGC: {d.get('zgc_cycles')}")
+    if d["allocation_stalls"].get("count"):
+        s = d["allocation_stalls"]
+        lines.append(f"Allocation Stall (ZGC): {s['count']} шт., max {s['max_ms']} ms")
+    if d["longest_pauses"]:
+        lines.append("Самые длинные паузы:")
+        for x in d["longest_pauses"]:
+            heap = f", куча {x['heap_before_mb']}->{x['heap_after_mb']} MB" if x["heap_before_mb"] is not None else ""
+            lines.append(f"  GC({x['gc_id']}) {x['kind']} {x['pause_ms']} ms на {x['uptime_s']} s{heap}")
+    if d["warnings"]:
+        lines.append("Предупреждения:")
+        for msg, cnt in d["warnings"].items():
+            lines.append(f"  {cnt}× {msg}")
+    return "\n".join(lines)
@@ -0,0 +1,449 @@
+"""HPROF heap dump (jmap / -XX:+HeapDumpOnOutOfMemoryError) summarizer: class histogram, largest arrays, strings."""
+from __future__ import annotations
+
+import heapq
+import struct
+from array import array
+from typing import Optional
+
+import numpy as np
+
+PARSER_VERSION = 2
+
+# Верхнеуровневые записи HPROF
+TAG_UTF8 = 0x01
+TAG_LOAD_CLASS = 0x02
+TAG_HEAP_DUMP = 0x0C
+TAG_HEAP_DUMP_SEGMENT = 0x1C
+# Подзаписи HEAP DUMP
+SUB_CLASS_DUMP = 0x20
+SUB_INSTANCE_DUMP = 0x21
+SUB_OBJ_ARRAY_DUMP = 0x22
+SUB_PRIM_ARRAY_DUMP = 0x23
+
+# Тип значения HPROF -> размер в байтах (2 — ссылка, её размер = id size)
+_TYPE_SIZES = {4: 1, 5: 2, 6: 4, 7: 8, 8: 1, 9: 2, 10: 4, 11: 8}
+_PRIM_NAMES = {4: "boolean[]", 5: "char[]", 6: "float[]", 7: "double[]", 8: "byte[]", 9: "short[]", 10: "int[]", 11: "long[]"}
+_DESCRIPTOR_NAMES = {"Z": "boolean", "C": "char", "F": "float", "D": "double", "B": "byte", "S": "short", "I": "int", "J": "long"}
+TYPE_BYTE = 8
+TYPE_CHAR = 5
+
+# Корни GC и прочие подзаписи без данных об объектах: (число id, число дополнительных байт) для пропуска
+_SKIP_SUBRECORDS = {
+    0xFF: (1, 0),  # ROOT UNKNOWN
+    0x01: (2, 0),  # ROOT JNI GLOBAL
+    0x02: (1, 8),  # ROOT JNI LOCAL
+    0x03: (1, 8),  # ROOT JAVA FRAME
+    0x04: (1, 4),  # ROOT NATIVE STACK
+    0x05: (1, 0),  # ROOT STICKY CLASS
+    0x06: (1, 4),  # ROOT THREAD BLOCK
+    0x07: (1, 0),  # ROOT MONITOR USED
+    0x08: (1, 8),  # ROOT THREAD OBJECT
+    # Расширения Android
+    0x89: (1, 0),
+    0x8A: (1, 0),
+    0x8B: (1, 0),
+    0x8C: (1, 0),
+    0x8D: (1, 0),
+    0x8E: (1, 8),
+    0x90: (1, 0),
+    0xFE: (1, 4),
+}
+
+# Оценка shallow size для 64-битной JVM со сжатыми указателями: заголовок объекта 12 байт, массива 16, выравнивание 8
+OBJECT_HEADER = 12
+ARRAY_HEADER = 16
+# Содержимое byte[]/char[] больше этого размера не хешируется для поиска дубликатов строк
+STRING_HASH_MAX_BYTES = 64 * 1024
+STRING_PREVIEW_CHARS = 80
+# Поиск дубликатов строк — по выборке объектов: буферы не больше STRING_SAMPLE_MAX записей,
+# при переполнении выборка по id прореживается вдвое (id String.value и самого массива совпадают — выборка согласована)
+STRING_SAMPLE_MAX = 1 << 20
+_ID_MIX = 0x9E3779B97F4A7C15
+_U64 = (1 << 64) - 1
+
+
+class HprofError(ValueError):
+    """File is not an HPROF heap dump."""
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def pretty_class_name(name: str) -> str:
+    """java/lang/String -> java.lang.String, [B -> byte[], [[Lcom/x/Foo; -> com.x.Foo[][]."""
+    dims = len(name) - len(name.lstrip("["))
+    base = name[dims:]
+    if dims:
+        if base.startswith("L") and base.endswith(";"):
+            base = base[1:-1]
+        else:
+            base = _DESCRIPTOR_NAMES.get(base, base)
+    return base.replace("/", ".") + "[]" * dims
+
+
+class HprofSummarizer:
+    """
+    Один проход по записям HPROF поверх mmap (или bytes): память — O(число классов) плюс выборка
+    строк ограниченного размера, а не O(размер дампа). Объекты не материализуются: считаются гистограмма,
+    top-N массивов и хеши содержимого byte[]/char[] для поиска одинаковых строк.
+    """
+
+    def __init__(self, buf, top_n: int = 30, sample_max: int = STRING_SAMPLE_MAX):
+        self.buf = buf
+        self.size = len(buf)
+        self.top_n = top_n
+        self.version = ""
+        self.id_size = 0
+        self.timestamp_ms = 0
+        self.truncated = False
+        self.unknown_subrecord: Optional[int] = None
+        self.heap_segments = 0
+        self._utf8: dict[int, tuple[int, int]] = {}  # id -> (offset, length): строки декодируются по требованию
+        self._class_names: dict[int, int] = {}  # class object id -> name string id
+        self._string_class: Optional[int] = None
+        self._string_value_offset: Optional[int] = None
+        self._counts: dict[int, int] = {}
+        self._bytes: dict[int, int] = {}
+        self._prim_counts: dict[int, int] = {}
+        self._prim_bytes: dict[int, int] = {}
+        self._largest: list[tuple[int, int, int, int]] = []  # min-heap (bytes, array id, length, class/type key)
+        self._strings = 0
+        self._sample_max = sample_max
+        self._sample_mask = 0  # в выборке объекты с mix(id) & mask == 0, т. е. доля 1 / (mask + 1)
+        self._string_values = array("Q")
+        self._text_ids = array("Q")
+        self._text_hashes = array("q")
+        self._text_offsets = array("Q")
+        self._text_lengths = array("I")
+        self._text_types = array("B")
+
+    def run(self) -> dict:
+        self._header()
+        buf, size = self.buf, self.size
+        u4 = struct.Struct(">I").unpack_from
+        pos = self._records_start
+        while pos + 9 <= size:
+            tag = buf[pos]
+            (length,) = u4(buf, pos + 5)
+            body = pos + 9
+            end = body + length
+            if end > size:
+                # Дамп оборван (OOM при записи, не докачан) — разбираем то, что есть
+                self.truncated = True
+                end = size
+            if tag == TAG_UTF8:
+                self._utf8[self._id(body)] = (body + self.id_size, end - body - self.id_size)
+            elif tag == TAG_LOAD_CLASS:
+                self._load_class(body)
+            elif tag in (TAG_HEAP_DUMP, TAG_HEAP_DUMP_SEGMENT):
+                self.heap_segments += 1
+                try:
+                    self._heap(body, end)
+                except (struct.error, IndexError):
+                    # Последняя подзапись оборванного дампа выходит за конец файла
+                    self.truncated = True
+                    break
+            pos = end
+        return self._summary()
+
+    def _header(self) -> None:
+        nul = bytes(self.buf[:64]).find(b"\0")
+        if nul <= 0 or not bytes(self.buf[:nul]).startswith(b"JAVA PROFILE"):
+            raise HprofError("not an HPROF file")
+        self.version = bytes(self.buf[:nul]).decode("ascii", "replace")
+        self.id_size, self.timestamp_ms = struct.unpack_from(">IQ", self.buf, nul + 1)
+        if self.id_size not in (4, 8):
+            raise HprofError(f"unsupported identifier size {self.id_size}")
+        self._id_fmt = ">Q" if self.id_size == 8 else ">I"
+        self._records_start = nul + 1 + 12
+
+    def _id(self, pos: int) -> int:
+        return struct.unpack_from(self._id_fmt, self.buf, pos)[0]
+
+    def _utf8_str(self, string_id: int) -> Optional[str]:
+        loc = self._utf8.get(string_id)
+        if loc is None:
+            return None
+        off, n = loc
+        return bytes(self.buf[off : off + n]).decode("utf-8", "replace")
+
+    def _load_class(self, body: int) -> None:
+        class_id = self._id(body + 4)
+        name_id = self._id(body + 8 + self.id_size)
+        self._class_names[class_id] = name_id
+        if self._string_class is None and self._utf8_str(name_id) in ("java/lang/String", "java.lang.String"):
+            self._string_class = class_id
+
+    def class_name(self, class_id: int) -> str:
+        name = self._utf8_str(self._class_names.get(class_id, -1))
+        return pretty_class_name(name) if name else f"class@{class_id:#x}"
+
+    def _heap(self, p: int, end: int) -> None:
+        buf = self.buf
+        I = self.id_size
+        q = "Q" if I == 8 else "I"
+        inst = struct.Struct(f">{q}I{q}I")
+        prim = struct.Struct(f">{q}IIB")
+        objarr = struct.Struct(f">{q}II{q}")
+        inst_size, prim_size, objarr_size = inst.size, prim.size, objarr.size
+        counts, sizes = self._counts, self._bytes
+        string_class = self._string_class
+        largest = self._largest
+        top_n = self.top_n
+        skip = {k: n_ids * I + extra for k, (n_ids, extra) in _SKIP_SUBRECORDS.items()}
+        while p < end:
+            st = buf[p]
+            p += 1
+            if st == SUB_INSTANCE_DUMP:
+                _obj, _stack, cls, n = inst.unpack_from(buf, p)
+                data = p + inst_size
+                counts[cls] = counts.get(cls, 0) + 1
+                sizes[cls] = sizes.get(cls, 0) + _align(OBJECT_HEADER + n)
+                if cls == string_class and self._string_value_offset is not None:
+                    self._strings += 1
+                    value = self._id(data + self._string_value_offset)
+                    if not ((value * _ID_MIX & _U64) >> 32) & self._sample_mask:
+                        self._string_values.append(value)
+                        if len(self._string_values) > self._sample_max:
+                            self._thin_sample()
+                p = data + n
+            elif st == SUB_PRIM_ARRAY_DUMP:
+                obj, _stack, num, t = prim.unpack_from(buf, p)
+                data = p + prim_size
+                nbytes = num * _TYPE_SIZES.get(t, 1)
+                shallow = _align(ARRAY_HEADER + nbytes)
+                self._prim_counts[t] = self._prim_counts.get(t, 0) + 1
+                self._prim_bytes[t] = self._prim_bytes.get(t, 0) + shallow
+                if len(largest) < top_n:
+                    heapq.heappush(largest, (shallow, obj, num, -t))
+                elif shallow > largest[0][0]:
+                    heapq.heapreplace(largest, (shallow, obj, num, -t))
+                if (
+                    (t == TYPE_BYTE or t == TYPE_CHAR)
+                    and nbytes <= STRING_HASH_MAX_BYTES
+                    and not ((obj * _ID_MIX & _U64) >> 32) & self._sample_mask
+                ):
+                    self._text_ids.append(obj)
+                    self._text_hashes.append(hash(buf[data : data + nbytes]))
+                    self._text_offsets.append(data)
+                    self._text_lengths.append(nbytes)
+                    self._text_types.append(t)
+                    if len(self._text_ids) > self._sample_max:
+                        self._thin_sample()
+                p = data + nbytes
+            elif st == SUB_OBJ_ARRAY_DUMP:
+                obj, _stack, num, cls = objarr.unpack_from(buf, p)
+                shallow = _align(ARRAY_HEADER + num * I)
+                counts[cls] = counts.get(cls, 0) + 1
+                sizes[cls] = sizes.get(cls, 0) + shallow
+                if len(largest) < top_n:
+                    heapq.heappush(largest, (shallow, obj, num, cls))
+                elif shallow > largest[0][0]:
+                    heapq.heapreplace(largest, (shallow, obj, num, cls))
+                p += objarr_size + num * I
+            elif st == SUB_CLASS_DUMP:
+                p = self._class_dump(p)
+                string_class = self._string_class
+            elif st in skip:
+                p += skip[st]
+            else:
+                # Неизвестная подзапись: длина неизвестна, дальше сегмент разобрать нельзя
+                self.unknown_subrecord = st
+                return
+
+    def _thin_sample(self) -> None:
+        """Halve the sampling rate and drop buffered entries that fall out of the sample."""
+        self._sample_mask = self._sample_mask * 2 + 1
+        mask = np.uint64(self._sample_mask)
+
+        def sampled(ids: array) -> np.ndarray:
+            mixed = np.frombuffer(ids, dtype=np.uint64) * np.uint64(_ID_MIX)
+            return (mixed >> np.uint64(32)) & mask == 0
+
+        self._string_values = _compress(self._string_values, sampled(self._string_values))
+        keep = sampled(self._text_ids)
+        self._text_ids = _compress(self._text_ids, keep)
+        self._text_hashes = _compress(self._text_hashes, keep)
+        self._text_offsets = _compress(self._text_offsets, keep)
+        self._text_lengths = _compress(self._text_lengths, keep)
+        self._text_types = _compress(self._text_types, keep)
+
+    def _class_dump(self, p: int) -> int:
+        buf = self.buf
+        I = self.id_size
+        class_id = self._id(p)
+        p += I + 4 + 6 * I + 4  # stack serial, super, loader, signers, protection domain, 2 reserved, instance size
+        (n,) = struct.unpack_from(">H", buf, p)
+        p += 2
+        for _ in range(n):
+            t = buf[p + 2]
+            p += 3 + (I if t == 2 else _TYPE_SIZES.get(t, 0))
+        (n,) = struct.unpack_from(">H", buf, p)
+        p += 2
+        for _ in range(n):
+            t = buf[p + I]
+            p += I + 1 + (I if t == 2 else _TYPE_SIZES.get(t, 0))
+        (n,) = struct.unpack_from(">H", buf, p)
+        p += 2
+        if class_id == self._string_class:
+            # Смещение поля value в данных экземпляра String (поля самого класса идут первыми)
+            offset = 0
+            for i in range(n):
+                name = self._utf8_str(self._id(p + i * (I + 1)))
+                t = buf[p + i * (I + 1) + I]
+                if name == "value" and t == 2:
+                    self._string_value_offset = offset
+                    break
+                offset += I if t == 2 else _TYPE_SIZES.get(t, 0)
+        return p + n * (I + 1)
+
+    def _summary(self) -> dict:
+        classes = []
+        for cls, n in self._counts.items():
+            classes.append((self._bytes[cls], n, self.class_name(cls)))
+        for t, n in self._prim_counts.items():
+            classes.append((self._prim_bytes[t], n, _PRIM_NAMES.get(t, f"type{t}[]")))
+        total_bytes = sum(c[0] for c in classes)
+        total_objects = sum(c[1] for c in classes)
+        classes.sort(reverse=True)
+        histogram = [
+            {
+                "class": name,
+                "instances": n,
+                "shallow_bytes": b,
+                "percent": round(100.0 * b / total_bytes, 2) if total_bytes else 0.0,
+            }
+            for b, n, name in classes[: self.top_n]
+        ]
+        largest = [
+            {
+                "type": _PRIM_NAMES.get(-key, "?") if key <= 0 else self.class_name(key),
+                "id": f"{obj:#x}",
+                "length": num,
+                "shallow_bytes": b,
+            }
+            for b, obj, num, key in sorted(self._largest, reverse=True)
+        ]
+        return {
+            "parser_version": PARSER_VERSION,
+            "format": self.version,
+            "id_size": self.id_size,
+            "timestamp_ms": self.timestamp_ms,
+            "file_bytes": self.size,
+            "truncated": self.truncated,
+            "unknown_subrecord": self.unknown_subrecord,
+            "heap_segments": self.heap_segments,
+            "classes_loaded": len(self._class_names),
+            "objects": total_objects,
+            "shallow_bytes": total_bytes,
+            "histogram": histogram,
+            "largest_arrays": largest,
+            "strings": self._string_stats(),
+        }
+
+    def _string_stats(self, top_n: int = 10) -> dict:
+        stats = {"count": self._strings}
+        if not self._strings or not len(self._text_ids):
+            return stats
+        ids = np.frombuffer(self._text_ids, dtype=np.uint64)
+        is_value = np.isin(ids, np.frombuffer(self._string_values, dtype=np.uint64))
+        hashes = np.frombuffer(self._text_hashes, dtype=np.int64)[is_value]
+        lengths = np.frombuffer(self._text_lengths, dtype=np.uint32)[is_value].astype(np.int64)
+        rows = np.flatnonzero(is_value)
+        if hashes.size == 0:
+            return stats
+        uniq, first, sampled_copies = np.unique(hashes, return_index=True, return_counts=True)
+        # По выборке 1/scale: число копий значения — пропорционально числу попавших в выборку
+        scale = self._sample_mask + 1
+        copies = sampled_copies * scale
+        # Лишние копии: строка + её массив value на каждую копию сверх первой
+        per_copy = (lengths[first] + ARRAY_HEADER + 7) // 8 * 8 + _align(OBJECT_HEADER + 2 * self.id_size)
+        dup = sampled_copies > 1
+        wasted = int(((copies[dup] - 1) * per_copy[dup]).sum())
+        stats.update(
+            value_arrays=int(hashes.size) * scale,
+            value_bytes=int(lengths.sum()) * scale,
+            distinct=int(uniq.size) * scale,
+            duplicated_values=int(dup.sum()),
+            duplicate_copies=int((copies[dup] - 1).sum()),
+            wasted_bytes_estimate=wasted,
+            sample_rate=1 / scale,
+        )
+        order = np.argsort(-(copies - 1) * per_copy)[:top_n]
+        top = []
+        for i in order:
+            if sampled_copies[i] < 2:
+                break
+            row = rows[first[i]]
+            top.append(
+                {
+                    "copies": int(copies[i]),
+                    "wasted_bytes_estimate": int((copies[i] - 1) * per_copy[i]),
+                    "preview": self._preview(int(row)),
+                }
+            )
+        stats["top_duplicates"] = top
+        return stats
+
+    def _preview(self, row: int) -> str:
+        off, n, t = self._text_offsets[row], self._text_lengths[row], self._text_types[row]
+        data = bytes(self.buf[off : off + min(n, STRING_PREVIEW_CHARS * 2)])
+        if t == TYPE_CHAR:
+            text = data.decode("utf-16-be", "replace")
+        elif data.count(0) > len(data) // 4:
+            # byte[] строки в кодировке UTF16 (coder=1), порядок байт платформы
+            text = data.decode("utf-16-le", "replace")
+        else:
+            text = data.decode("latin-1")
+        text = text[:STRING_PREVIEW_CHARS]
+        return text + ("…" if len(text) == STRING_PREVIEW_CHARS else "")
+
+
+def _compress(values: array, keep: np.ndarray) -> array:
+    out = array(values.typecode)
+    out.frombytes(np.frombuffer(values, dtype=values.typecode)[keep].tobytes())
+    return out
+
+
+def summarize_hprof(buf, top_n: int = 30) -> dict:
+    """Summary of an HPROF buffer (mmap / bytes); HprofError, если это не HPROF."""
+    return HprofSummarizer(buf, top_n=top_n).run()
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def format_hprof_summary(d: dict, top_classes: int = 20) -> str:
+    """Compact text for the prompt (вместо байтов дампа)."""
+    lines = [
+        "[СВОДКА HEAP DUMP — рассчитана парсером HPROF; размеры — оценка shallow size]",
+        f"Файл: {_mb(d['file_bytes'])}, {d['format']}; классов загружено: {d['classes_loaded']}; "
+        f"объектов: {d['objects']}, shallow итого: {_mb(d['shallow_bytes'])}",
+    ]
+    if d["truncated"] or d["unknown_subrecord"] is not None:
+        lines.append("Внимание: дамп оборван или содержит неизвестные записи — цифры по прочитанной части.")
+    lines.append("Гистограмма классов (по shallow size):")
+    for c in d["histogram"][:top_classes]:
+        lines.append(f"  {_mb(c['shallow_bytes']):>10} {c['percent']:5.1f}% {c['instances']:>10} шт.  {c['class']}")
+    if d["largest_arrays"]:
+        lines.append("Самые большие массивы:")
+        for a in d["largest_arrays"][:10]:
+            lines.append(f"  {_mb(a['shallow_bytes']):>10} {a['type']} длины {a['length']} ({a['id']})")
+    s = d["strings"]
+    if s.get("count"):
+        line = f"Строки: {s['count']} шт."
+        if "value_bytes" in s:
+            line += (
+                f", содержимое {_mb(s['value_bytes'])}; уникальных {s['distinct']}; "
+                f"значений с дубликатами {s['duplicated_values']}, лишних копий {s['duplicate_copies']} "
+                f"(≈ {_mb(s['wasted_bytes_estimate'])} впустую)"
+            )
+            if s.get("sample_rate", 1) < 1:
+                line += f"; оценка по выборке 1/{round(1 / s['sample_rate'])} строк"
+        lines.append(line)
+        for x in s.get("top_duplicates", []):
+            lines.append(f"  {x['copies']}× (≈ {_mb(x['wasted_bytes_estimate'])}) {x['preview']!r}")
+    return "\n".join(lines)
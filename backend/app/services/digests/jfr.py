@@ -0,0 +1,633 @@
+"""JDK Flight Recorder (.jfr) parser: CPU samples, allocations, lock contention, GC pauses, thread park — per chunk."""
+from __future__ import annotations
+
+import struct
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+
+PARSER_VERSION = 1
+
+MAGIC = b"FLR\0"
+HEADER_SIZE = 68
+EVENT_METADATA = 0
+EVENT_CHECKPOINT = 1
+
+# Формат (JDK 11+, версия 2.x): файл — последовательность самодостаточных чанков; в каждом свои метаданные
+# (описание типов) и пулы констант (потоки, стеки, методы, классы). Чанк разбирается целиком, результат
+# сводится в счётчики по именам, пулы чанка отбрасываются — память O(размер чанка), время линейно по файлу.
+# События ненужных типов пропускаются по длине без разбора полей.
+_PRIMITIVES = {"boolean", "byte", "char", "short", "int", "long", "float", "double"}
+STRING_TYPE = "java.lang.String"
+
+EXECUTION_SAMPLE = "jdk.ExecutionSample"
+ALLOCATION_SAMPLE = "jdk.ObjectAllocationSample"
+ALLOCATION_IN_TLAB = "jdk.ObjectAllocationInNewTLAB"
+ALLOCATION_OUTSIDE_TLAB = "jdk.ObjectAllocationOutsideTLAB"
+MONITOR_ENTER = "jdk.JavaMonitorEnter"
+THREAD_PARK = "jdk.ThreadPark"
+GARBAGE_COLLECTION = "jdk.GarbageCollection"
+
+
+class JfrError(ValueError):
+    """File is not a JFR recording or uses an unsupported format."""
+
+
+@dataclass
+class _Field:
+    name: str
+    type_id: int
+    constant_pool: bool
+    array: bool
+
+
+@dataclass
+class _Type:
+    id: int
+    name: str
+    fields: list[_Field] = field(default_factory=list)
+
+
+class _ChunkReader:
+    """Чтение значений одного чанка: целые — LEB128 (compressed integers), строки — с байтом кодировки."""
+
+    def __init__(self, buf, compressed: bool):
+        self.buf = buf
+        self.pos = 0
+        self.compressed = compressed
+
+    def varint(self) -> int:
+        if not self.compressed:
+            return self.i8()
+        buf, pos = self.buf, self.pos
+        b = buf[pos]
+        if b < 0x80:
+            self.pos = pos + 1
+            return b
+        result = 0
+        shift = 0
+        for _ in range(8):
+            b = buf[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                self.pos = pos
+                return result - (1 << 64) if result >= 1 << 63 else result
+            shift += 7
+        result |= buf[pos] << 56  # девятый байт — все 8 бит
+        self.pos = pos + 1
+        return result - (1 << 64) if result >= 1 << 63 else result
+
+    def int_(self) -> int:
+        if not self.compressed:
+            (v,) = struct.unpack_from(">i", self.buf, self.pos)
+            self.pos += 4
+            return v
+        return self.varint()
+
+    def i8(self) -> int:
+        (v,) = struct.unpack_from(">q", self.buf, self.pos)
+        self.pos += 8
+        return v
+
+    def byte(self) -> int:
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+    def f4(self) -> float:
+        (v,) = struct.unpack_from(">f", self.buf, self.pos)
+        self.pos += 4
+        return v
+
+    def f8(self) -> float:
+        (v,) = struct.unpack_from(">d", self.buf, self.pos)
+        self.pos += 8
+        return v
+
+    def string(self):
+        """str, None или ссылка (type_id, key) на строку в пуле констант (кодировка 2)."""
+        enc = self.byte()
+        if enc == 0:
+            return None
+        if enc == 1:
+            return ""
+        if enc == 2:
+            return (STRING_TYPE, self.varint())
+        n = self.int_()
+        if enc == 3:
+            s = bytes(self.buf[self.pos : self.pos + n]).decode("utf-8", "replace")
+            self.pos += n
+            return s
+        if enc == 4:
+            return "".join(chr(self.int_() & 0xFFFF) for _ in range(n))
+        if enc == 5:
+            s = bytes(self.buf[self.pos : self.pos + n]).decode("latin-1")
+            self.pos += n
+            return s
+        raise JfrError(f"unknown string encoding {enc}")
+
+
+class _Chunk:
+    """Metadata + constant pools of one chunk and generic value decoding by type id."""
+
+    def __init__(self, buf, start: int):
+        if bytes(buf[start : start + 4]) != MAGIC:
+            raise JfrError("not a JFR chunk (bad magic)")
+        (
+            self.major,
+            self.minor,
+            self.size,
+            cp_offset,
+            meta_offset,
+            self.start_nanos,
+            self.duration_nanos,
+            _start_ticks,
+            self.ticks_per_second,
+        ) = struct.unpack_from(">HHqqqqqqq", buf, start + 4)
+        if self.major < 1:
+            raise JfrError(f"unsupported JFR version {self.major}.{self.minor}")
+        # JDK 11+ (2.x) всегда пишет целые в LEB128; 1.x (JDK 9/10) — фиксированной длины
+        self.start = start
+        self.reader = _ChunkReader(buf, compressed=self.major >= 2)
+        self.types: dict[int, _Type] = {}
+        self.names: dict[str, int] = {}
+        self.pools: dict[int, dict[int, object]] = {}
+        self._method_names: dict[int, str] = {}
+        self._class_names: dict[int, str] = {}
+        self._stacks: dict[int, list[str]] = {}
+        if self.size <= 0 or start + self.size > len(buf) or not meta_offset or not cp_offset:
+            raise JfrError("incomplete chunk (запись не завершена или файл оборван)")
+        self._read_metadata(start + meta_offset)
+        self._read_constant_pools(start + cp_offset)
+
+    # --- метаданные
+    def _read_metadata(self, pos: int) -> None:
+        r = self.reader
+        r.pos = pos
+        r.int_()  # size
+        if r.varint() != EVENT_METADATA:
+            raise JfrError("metadata event expected")
+        r.varint()  # start time
+        r.varint()  # duration
+        r.varint()  # metadata id
+        strings = [r.string() for _ in range(r.int_())]
+        root = self._read_element(strings)
+        for region in root[2]:
+            if region[0] != "metadata":
+                continue
+            for cls in region[2]:
+                if cls[0] != "class":
+                    continue
+                attrs = cls[1]
+                t = _Type(id=int(attrs["id"]), name=attrs["name"])
+                for f in cls[2]:
+                    if f[0] == "field":
+                        fa = f[1]
+                        t.fields.append(
+                            _Field(
+                                name=fa["name"],
+                                type_id=int(fa["class"]),
+                                constant_pool=fa.get("constantPool") == "true",
+                                array=fa.get("dimension") == "1",
+                            )
+                        )
+                self.types[t.id] = t
+                self.names[t.name] = t.id
+
+    def _read_element(self, strings: list) -> tuple[str, dict, list]:
+        r = self.reader
+        name = strings[r.int_()]
+        attrs = {}
+        for _ in range(r.int_()):
+            key = strings[r.int_()]
+            attrs[key] = strings[r.int_()]
+        children = [self._read_element(strings) for _ in range(r.int_())]
+        return name, attrs, children
+
+    # --- пулы констант: цепочка checkpoint-событий от последнего к первому через delta
+    def _read_constant_pools(self, pos: int) -> None:
+        r = self.reader
+        while True:
+            r.pos = pos
+            r.int_()  # size
+            if r.varint() != EVENT_CHECKPOINT:
+                raise JfrError("checkpoint event expected")
+            r.varint()  # start time
+            r.varint()  # duration
+            delta = r.varint()
+            r.byte()  # flush / type mask
+            for _ in range(r.int_()):
+                type_id = r.varint()
+                pool = self.pools.setdefault(type_id, {})
+                for _ in range(r.int_()):
+                    key = r.varint()
+                    pool[key] = self.read_value(type_id)
+            if delta == 0:
+                break
+            pos += delta
+
+    # --- значения
+    def read_value(self, type_id: int):
+        r = self.reader
+        t = self.types[type_id]
+        name = t.name
+        if name in _PRIMITIVES:
+            if name == "boolean" or name == "byte":
+                return r.byte()
+            if name == "float":
+                return r.f4()
+            if name == "double":
+                return r.f8()
+            return r.varint() if r.compressed else self._fixed_int(name)
+        if name == STRING_TYPE:
+            return r.string()
+        obj = {}
+        for f in t.fields:
+            if f.array:
+                obj[f.name] = [self._read_field(f) for _ in range(r.int_())]
+            else:
+                obj[f.name] = self._read_field(f)
+        return obj
+
+    def _fixed_int(self, name: str) -> int:
+        r = self.reader
+        fmt = {"char": ">H", "short": ">h", "int": ">i", "long": ">q"}[name]
+        (v,) = struct.unpack_from(fmt, r.buf, r.pos)
+        r.pos += struct.calcsize(fmt)
+        return v
+
+    def _read_field(self, f: _Field):
+        if f.constant_pool:
+            return (f.type_id, self.reader.varint())
+        return self.read_value(f.type_id)
+
+    def resolve(self, ref):
+        """Значение из пула констант по ссылке (type_id, key); не-ссылки возвращаются как есть."""
+        if isinstance(ref, tuple):
+            type_id, key = ref
+            if type_id == STRING_TYPE:
+                type_id = self.names.get(STRING_TYPE, -1)
+            return self.pools.get(type_id, {}).get(key)
+        return ref
+
+    def text(self, ref) -> Optional[str]:
+        v = self.resolve(ref)
+        if isinstance(v, dict) and len(v) == 1:
+            # Обёртки над строкой: jdk.types.Symbol {string}, jdk.types.GCName {name}, jdk.types.GCCause {cause}
+            v = self.resolve(next(iter(v.values())))
+        return v if isinstance(v, str) else None
+
+    def class_name(self, ref) -> str:
+        """java.lang.String по ссылке на jdk.types.Class (кешируется на чанк)."""
+        key = ref[1] if isinstance(ref, tuple) else None
+        name = self._class_names.get(key) if key is not None else None
+        if name is None:
+            cls = self.resolve(ref)
+            name = (self.text(cls.get("name")) or "?").replace("/", ".") if isinstance(cls, dict) else "?"
+            if key is not None:
+                self._class_names[key] = name
+        return name
+
+    def method_name(self, ref) -> str:
+        """pkg.Class.method по ссылке на jdk.types.Method (кешируется на чанк)."""
+        key = ref[1] if isinstance(ref, tuple) else None
+        name = self._method_names.get(key) if key is not None else None
+        if name is None:
+            m = self.resolve(ref)
+            name = f"{self.class_name(m.get('type'))}.{self.text(m.get('name')) or '?'}" if isinstance(m, dict) else "?"
+            if key is not None:
+                self._method_names[key] = name
+        return name
+
+    def frames(self, stack_ref) -> list[str]:
+        """Имена методов стека сверху вниз; стеки повторяются тысячами событий, поэтому кешируются на чанк."""
+        key = stack_ref[1] if isinstance(stack_ref, tuple) else None
+        frames = self._stacks.get(key) if key is not None else None
+        if frames is None:
+            st = self.resolve(stack_ref)
+            frames = (
+                [self.method_name(fr.get("method")) for fr in st.get("frames") or [] if isinstance(fr, dict)]
+                if isinstance(st, dict)
+                else []
+            )
+            if key is not None:
+                self._stacks[key] = frames
+        return frames
+
+    def ms(self, ticks) -> float:
+        return ticks * 1000.0 / self.ticks_per_second if isinstance(ticks, (int, float)) and self.ticks_per_second else 0.0
+
+    def plan(self, type_id: int, wanted: tuple[str, ...]) -> list[tuple[_Field, int]]:
+        """Поля события до последнего нужного: (поле, индекс в wanted или -1); хвост события пропускается по размеру."""
+        fields = self.types[type_id].fields
+        index = {name: i for i, name in enumerate(wanted)}
+        last = max((i for i, f in enumerate(fields) if f.name in index), default=-1)
+        return [(f, index.get(f.name, -1)) for f in fields[: last + 1]]
+
+    def _read_planned(self, plan: list[tuple[_Field, int]], n: int) -> list:
+        r = self.reader
+        out = [None] * n
+        for f, i in plan:
+            if f.array:
+                v = [self._read_field(f) for _ in range(r.int_())]
+            elif f.constant_pool:
+                v = (f.type_id, r.varint())
+            elif r.compressed and self.types[f.type_id].name in ("long", "int", "short", "char"):
+                v = r.varint()
+            else:
+                v = self.read_value(f.type_id)
+            if i >= 0:
+                out[i] = v
+        return out
+
+    def events(self, handlers: dict[int, tuple[list, int, Callable[[list], None]]]) -> int:
+        """
+        Walk events of the chunk: для типов из handlers читаются только нужные поля (план), остальные
+        события пропускаются по размеру без разбора.
+        """
+        r = self.reader
+        pos = self.start + HEADER_SIZE
+        end = self.start + self.size
+        n = 0
+        while pos < end:
+            r.pos = pos
+            size = r.int_()
+            if size <= 0:
+                break
+            handler = handlers.get(r.varint())
+            if handler is not None:
+                plan, n_wanted, callback = handler
+                callback(self._read_planned(plan, n_wanted))
+                n += 1
+            pos += size
+        return n
+
+
+@dataclass
+class _DurationStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, ms: float, count: int = 1, max_ms: Optional[float] = None) -> None:
+        self.count += count
+        self.total_ms += ms
+        peak = ms if max_ms is None else max_ms
+        if peak > self.max_ms:
+            self.max_ms = peak
+
+
+# Верхние фреймы ThreadPark — сама парковка; «место» события — первый фрейм вне них
+_PARK_FRAMES = ("jdk.internal.misc.Unsafe", "sun.misc.Unsafe", "java.util.concurrent.locks.LockSupport")
+
+
+class JfrDigestBuilder:
+    """
+    Accumulates counters over chunks: feed_chunk() по одному чанку, result() — итоговая сводка.
+    Внутри чанка события считаются по ссылкам пула (стек, класс), имена разрешаются один раз на
+    уникальный стек при сворачивании чанка.
+    """
+
+    def __init__(self, top_n: int = 15):
+        self.top_n = top_n
+        self.chunks = 0
+        self.incomplete_chunks = 0
+        self.events = 0
+        self.start_nanos: Optional[int] = None
+        self.end_nanos: Optional[int] = None
+        self.cpu_samples = 0
+        self.cpu_self: Counter = Counter()
+        self.cpu_total: Counter = Counter()
+        self.alloc_by_class: dict[str, Counter] = {"sample": Counter(), "tlab": Counter()}
+        self.alloc_by_frame: dict[str, Counter] = {"sample": Counter(), "tlab": Counter()}
+        self.monitor_by_class: dict[str, _DurationStats] = {}
+        self.monitor_by_frame: dict[str, _DurationStats] = {}
+        self.park_by_class: dict[str, _DurationStats] = {}
+        self.park_by_frame: dict[str, _DurationStats] = {}
+        self.gc_pauses: dict[str, array] = {}
+        self.gc_longest: dict[str, array] = {}
+        self.gc_causes: Counter = Counter()
+        self._reset_chunk()
+
+    def _reset_chunk(self) -> None:
+        self._cpu: Counter = Counter()
+        self._alloc: Counter = Counter()
+        self._monitor: dict[tuple, list] = {}
+        self._park: dict[tuple, list] = {}
+        self._gc: list = []
+
+    def feed_chunk(self, buf, start: int) -> int:
+        """Parse the chunk at start; returns its size (0 — чанк неполный, дальше читать нечего)."""
+        try:
+            chunk = _Chunk(buf, start)
+        except (JfrError, struct.error, IndexError, KeyError):
+            # Запись ещё идёт или файл оборван: последний чанк без метаданных/пулов не разобрать
+            self.incomplete_chunks += 1
+            return 0
+        handlers = {}
+        for name, wanted, callback in (
+            (EXECUTION_SAMPLE, ("stackTrace",), self._on_execution_sample),
+            (ALLOCATION_SAMPLE, ("objectClass", "stackTrace", "weight"), self._on_allocation_sample),
+            (ALLOCATION_IN_TLAB, ("objectClass", "stackTrace", "tlabSize"), self._on_allocation_tlab),
+            (ALLOCATION_OUTSIDE_TLAB, ("objectClass", "stackTrace", "allocationSize"), self._on_allocation_tlab),
+            (MONITOR_ENTER, ("monitorClass", "stackTrace", "duration"), self._on_monitor_enter),
+            (THREAD_PARK, ("parkedClass", "stackTrace", "duration"), self._on_thread_park),
+            (GARBAGE_COLLECTION, ("name", "cause", "sumOfPauses", "longestPause"), self._on_gc),
+        ):
+            type_id = chunk.names.get(name)
+            if type_id is not None:
+                handlers[type_id] = (chunk.plan(type_id, wanted), len(wanted), callback)
+        try:
+            self.events += chunk.events(handlers)
+        except (struct.error, IndexError) as e:
+            raise JfrError(f"corrupted chunk at offset {start}: {e}") from e
+        self._fold(chunk)
+        self.chunks += 1
+        end_nanos = chunk.start_nanos + chunk.duration_nanos
+        self.start_nanos = chunk.start_nanos if self.start_nanos is None else min(self.start_nanos, chunk.start_nanos)
+        self.end_nanos = end_nanos if self.end_nanos is None else max(self.end_nanos, end_nanos)
+        return chunk.size
+
+    # --- обработчики событий (значения — в порядке wanted; ссылки пула — (type_id, key))
+    def _on_execution_sample(self, v: list) -> None:
+        self._cpu[v[0]] += 1
+
+    def _on_allocation_sample(self, v: list) -> None:
+        self._alloc[("sample", v[0], v[1])] += v[2] or 0
+
+    def _on_allocation_tlab(self, v: list) -> None:
+        self._alloc[("tlab", v[0], v[1])] += v[2] or 0
+
+    def _on_monitor_enter(self, v: list) -> None:
+        _add_ticks(self._monitor, (v[0], v[1]), v[2])
+
+    def _on_thread_park(self, v: list) -> None:
+        _add_ticks(self._park, (v[0], v[1]), v[2])
+
+    def _on_gc(self, v: list) -> None:
+        self._gc.append(v)
+
+    def _fold(self, chunk: _Chunk) -> None:
+        """Свернуть счётчики чанка в итоговые по именам методов и классов."""
+        for stack, n in self._cpu.items():
+            frames = chunk.frames(stack)
+            if not frames:
+                continue
+            self.cpu_samples += n
+            self.cpu_self[frames[0]] += n
+            for method in set(frames):
+                self.cpu_total[method] += n
+        for (source, cls, stack), weight in self._alloc.items():
+            self.alloc_by_class[source][chunk.class_name(cls)] += weight
+            frames = chunk.frames(stack)
+            if frames:
+                self.alloc_by_frame[source][frames[0]] += weight
+        for acc, by_class, by_frame, skip in (
+            (self._monitor, self.monitor_by_class, self.monitor_by_frame, ()),
+            (self._park, self.park_by_class, self.park_by_frame, _PARK_FRAMES),
+        ):
+            for (cls, stack), (count, total, peak) in acc.items():
+                name = chunk.class_name(cls) if cls is not None else "—"
+                _stats(by_class, name).add(chunk.ms(total), count, chunk.ms(peak))
+                frame = next((f for f in chunk.frames(stack) if not skip or not f.startswith(skip)), None)
+                if frame:
+                    _stats(by_frame, frame).add(chunk.ms(total), count, chunk.ms(peak))
+        for name_ref, cause_ref, pauses, longest in self._gc:
+            name = chunk.text(name_ref) or "GC"
+            self.gc_pauses.setdefault(name, array("d")).append(chunk.ms(pauses))
+            self.gc_longest.setdefault(name, array("d")).append(chunk.ms(longest))
+            cause = chunk.text(cause_ref)
+            if cause:
+                self.gc_causes[cause] += 1
+        self._reset_chunk()
+
+    # --- сводка
+    def result(self) -> dict:
+        n = self.top_n
+        alloc_source = "sample" if self.alloc_by_class["sample"] else "tlab"
+        gc = {}
+        for name, pauses in self.gc_pauses.items():
+            p = np.frombuffer(pauses, dtype=np.float64)
+            longest = np.frombuffer(self.gc_longest[name], dtype=np.float64)
+            gc[name] = {
+                "count": int(p.size),
+                "total_pause_ms": round(float(p.sum()), 3),
+                "p50_pause_ms": round(float(np.percentile(p, 50)), 3),
+                "p99_pause_ms": round(float(np.percentile(p, 99)), 3),
+                "max_pause_ms": round(float(longest.max()), 3),
+            }
+        duration_s = (self.end_nanos - self.start_nanos) / 1e9 if self.start_nanos is not None else None
+        return {
+            "parser_version": PARSER_VERSION,
+            "chunks": self.chunks,
+            "incomplete_chunks": self.incomplete_chunks,
+            "events_parsed": self.events,
+            "duration_s": round(duration_s, 3) if duration_s is not None else None,
+            "cpu": {
+                "samples": self.cpu_samples,
+                "top_self": _shares(self.cpu_self, self.cpu_samples, n),
+                "top_total": _shares(self.cpu_total, self.cpu_samples, n),
+            },
+            "allocation": {
+                "source": ALLOCATION_SAMPLE if alloc_source == "sample" else f"{ALLOCATION_IN_TLAB}/{ALLOCATION_OUTSIDE_TLAB}",
+                "total_bytes": sum(self.alloc_by_class[alloc_source].values()),
+                "by_class": self.alloc_by_class[alloc_source].most_common(n),
+                "by_frame": self.alloc_by_frame[alloc_source].most_common(n),
+            },
+            "monitor_enter": {"by_class": _top_durations(self.monitor_by_class, n), "by_frame": _top_durations(self.monitor_by_frame, n)},
+            "thread_park": {"by_class": _top_durations(self.park_by_class, n), "by_frame": _top_durations(self.park_by_frame, n)},
+            "gc": gc,
+            "gc_causes": self.gc_causes.most_common(n),
+        }
+
+
+def _add_ticks(acc: dict[tuple, list], key: tuple, ticks) -> None:
+    ticks = ticks or 0
+    s = acc.get(key)
+    if s is None:
+        acc[key] = [1, ticks, ticks]
+    else:
+        s[0] += 1
+        s[1] += ticks
+        if ticks > s[2]:
+            s[2] = ticks
+
+
+def _stats(d: dict[str, _DurationStats], key: str) -> _DurationStats:
+    s = d.get(key)
+    if s is None:
+        s = d[key] = _DurationStats()
+    return s
+
+
+def _shares(counter: Counter, total: int, n: int) -> list[dict]:
+    return [{"method": m, "samples": c, "percent": round(100.0 * c / total, 1)} for m, c in counter.most_common(n)]
+
+
+def _top_durations(d: dict[str, _DurationStats], n: int) -> list[dict]:
+    top = sorted(d.items(), key=lambda kv: -kv[1].total_ms)[:n]
+    return [
+        {"name": k, "count": s.count, "total_ms": round(s.total_ms, 3), "max_ms": round(s.max_ms, 3)}
+        for k, s in top
+    ]
+
+
+def parse_jfr(buf, top_n: int = 15) -> dict:
+    """Digest of a whole recording (mmap / bytes), chunk by chunk; JfrError, если это не JFR."""
+    if bytes(buf[:4]) != MAGIC:
+        raise JfrError("not a JFR recording")
+    builder = JfrDigestBuilder(top_n=top_n)
+    pos = 0
+    while pos + HEADER_SIZE <= len(buf):
+        size = builder.feed_chunk(buf, pos)
+        if size <= 0:
+            break
+        pos += size
+    return builder.result()
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def format_jfr_digest(d: dict, top: int = 10) -> str:
+    """Compact text for the prompt (вместо бинарной записи)."""
+    lines = [
+        "[СВОДКА JFR — рассчитана парсером записи]",
+        f"Чанков: {d['chunks']}"
+        + (f" (+{d['incomplete_chunks']} неполных)" if d["incomplete_chunks"] else "")
+        + f"; длительность записи: {d['duration_s']} s; разобрано событий: {d['events_parsed']}",
+    ]
+    cpu = d["cpu"]
+    if cpu["samples"]:
+        lines.append(f"CPU (jdk.ExecutionSample, {cpu['samples']} сэмплов) — методы на вершине стека:")
+        lines.extend(f"  {x['percent']:5.1f}% {x['method']}" for x in cpu["top_self"][:top])
+        lines.append("  включая вызванные (total):")
+        lines.extend(f"  {x['percent']:5.1f}% {x['method']}" for x in cpu["top_total"][:top])
+    alloc = d["allocation"]
+    if alloc["total_bytes"]:
+        lines.append(f"Аллокации ({alloc['source']}, всего ≈ {_mb(alloc['total_bytes'])}) по классам:")
+        lines.extend(f"  {_mb(b):>10} {cls}" for cls, b in alloc["by_class"][:top])
+        lines.append("  по месту аллокации:")
+        lines.extend(f"  {_mb(b):>10} {frame}" for frame, b in alloc["by_frame"][:top])
+    for key, title in (("monitor_enter", "Ожидание входа в monitor (jdk.JavaMonitorEnter)"), ("thread_park", "Парковка потоков (jdk.ThreadPark)")):
+        x = d[key]
+        if x["by_class"]:
+            lines.append(f"{title} по классу:")
+            lines.extend(f"  {s['count']}× сумма {s['total_ms']} ms, max {s['max_ms']} ms — {s['name']}" for s in x["by_class"][:top])
+            lines.append("  по месту вызова:")
+            lines.extend(f"  {s['count']}× сумма {s['total_ms']} ms, max {s['max_ms']} ms — {s['name']}" for s in x["by_frame"][:top])
+    if d["gc"]:
+        lines.append("GC (jdk.GarbageCollection):")
+        for name, s in d["gc"].items():
+            lines.append(
+                f"  {name}: {s['count']} шт., паузы сумма {s['total_pause_ms']} ms, p50 {s['p50_pause_ms']} ms, "
+                f"p99 {s['p99_pause_ms']} ms, max {s['max_pause_ms']} ms"
+            )
+        if d["gc_causes"]:
+            lines.append("  причины: " + ", ".join(f"{c} {n}" for c, n in d["gc_causes"]))
+    return "\n".join(lines)
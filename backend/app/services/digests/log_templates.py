@@ -0,0 +1,233 @@
+"""Drain-style log template mining: repeated Java/pod log lines collapse into templates with counts and samples."""
+from __future__ import annotations
+
+import io
+import re
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Optional
+
+PARSER_VERSION = 2
+
+# Метка времени в начале строки: 2025-02-15 10:00:00,123 / 2025-02-15T10:00:00.123Z / 10:00:00.123
+_TIMESTAMP = re.compile(
+    r"^\s*\[?((?:\d{4}-\d{2}-\d{2}[T ])?\d{2}:\d{2}:\d{2}(?:[.,]\d{1,9})?(?:Z|[+-]\d{2}:?\d{2})?)\]?\s*"
+)
+# Переменные части строки заменяются плейсхолдерами до кластеризации (число токенов не меняется)
+_MASKS = [
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{12,}\b"), "<HEX>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<NUM>"),
+]
+_LEVELS = {"TRACE", "DEBUG", "INFO", "WARN", "WARNING", "ERROR", "FATAL", "SEVERE", "CRITICAL"}
+ERROR_LEVELS = {"ERROR", "FATAL", "SEVERE", "CRITICAL"}
+WILDCARD = "<*>"
+# Шаблон строк, для которых не хватило лимита max_clusters
+OVERFLOW = "<прочие строки: лимит шаблонов исчерпан>"
+_HEX_PREFIXED = re.compile(r"\b0x[0-9a-fA-F]+\b")
+# Первая строка исключения без метки времени: java.lang.IllegalStateException: ...
+_EXCEPTION_LINE = re.compile(r"^[\w.$]+(?:Exception|Error|Throwable)\b")
+
+
+def _mask(text: str) -> str:
+    if "0x" in text:
+        text = _HEX_PREFIXED.sub("<HEX>", text)
+    for pattern, placeholder in _MASKS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+@dataclass
+class LogTemplate:
+    tokens: list[str]
+    level: Optional[str]
+    count: int = 0
+    first_seen: Optional[str] = None
+    last_seen: Optional[str] = None
+    samples: list[list[str]] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+
+class LogTemplateMiner:
+    """
+    Streaming Drain: дерево (число токенов, первые depth токенов) -> список кластеров;
+    строка присоединяется к самому похожему кластеру (доля совпадающих токенов >= similarity),
+    несовпавшие позиции шаблона становятся <*>. Кластеров не больше max_clusters: последнее место —
+    общему шаблону OVERFLOW, в него идут строки, которым не нашлось похожего кластера после исчерпания лимита.
+    """
+
+    def __init__(
+        self,
+        similarity: float = 0.5,
+        depth: int = 2,
+        max_clusters: int = 2000,
+        max_samples: int = 3,
+        max_params: int = 5,
+    ):
+        self.similarity = similarity
+        self.depth = depth
+        self.max_clusters = max_clusters
+        self.max_samples = max_samples
+        self.max_params = max_params
+        self.lines = 0
+        self.levels: dict[str, int] = {}
+        self._tree: dict[tuple, list[LogTemplate]] = {}
+        self._clusters: list[LogTemplate] = []
+        self._overflow: Optional[LogTemplate] = None
+        self._prev_level: Optional[str] = None
+
+    def add(self, line: str) -> None:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            return
+        self.lines += 1
+        ts = None
+        m = _TIMESTAMP.match(line)
+        if m:
+            ts = m.group(1)
+            line = line[m.end():]
+        raw_tokens = line.split()
+        if not raw_tokens:
+            return
+        tokens = _mask(line).split()
+        if len(tokens) != len(raw_tokens):
+            tokens = [_mask(t) for t in raw_tokens]
+        level = self._level(line, raw_tokens, continuation=ts is None)
+        if level:
+            self.levels[level] = self.levels.get(level, 0) + 1
+
+        # Токен целиком из плейсхолдера не различает ветки дерева; "at com.x.Foo.bar(Foo.java:<NUM>)" — различает
+        key = (len(tokens),) + tuple(
+            WILDCARD if t.startswith("<") and t.endswith(">") else t for t in tokens[: self.depth]
+        )
+        cluster, sim = self._best(self._tree.get(key, []), tokens)
+        if cluster is None or sim < self.similarity:
+            if len(self._clusters) < self.max_clusters - 1:
+                cluster = LogTemplate(tokens=list(tokens), level=level)
+                self._tree.setdefault(key, []).append(cluster)
+                self._clusters.append(cluster)
+            else:
+                cluster = self._overflow_cluster()
+        else:
+            cluster.tokens = [a if a == b else WILDCARD for a, b in zip(cluster.tokens, tokens)]
+        if cluster.level is None and level and cluster is not self._overflow:
+            cluster.level = level
+        cluster.count += 1
+        if ts:
+            if cluster.first_seen is None:
+                cluster.first_seen = ts
+            cluster.last_seen = ts
+        if len(cluster.samples) < self.max_samples:
+            if cluster is self._overflow:
+                params = raw_tokens
+            else:
+                params = [r for r, t, c in zip(raw_tokens, tokens, cluster.tokens) if r != t or c == WILDCARD]
+            if params and params[: self.max_params] not in cluster.samples:
+                cluster.samples.append(params[: self.max_params])
+
+    def _overflow_cluster(self) -> LogTemplate:
+        if self._overflow is None:
+            self._overflow = LogTemplate(tokens=[OVERFLOW], level=None)
+            self._clusters.append(self._overflow)
+        return self._overflow
+
+    def add_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.add(line)
+
+    def _level(self, line: str, raw_tokens: list[str], continuation: bool) -> Optional[str]:
+        # Строки стектрейса ("\tat ...", "Caused by: ...", само исключение) наследуют уровень предыдущей записи
+        if continuation and (
+            line[:1] in (" ", "\t") or raw_tokens[0] in ("at", "Caused", "...") or _EXCEPTION_LINE.match(line)
+        ):
+            return self._prev_level
+        for tok in raw_tokens[:4]:
+            t = tok.strip("[]():|").upper()
+            if t in _LEVELS:
+                self._prev_level = "WARN" if t == "WARNING" else t
+                return self._prev_level
+        self._prev_level = None
+        return None
+
+    @staticmethod
+    def _best(leaf: list[LogTemplate], tokens: list[str]) -> tuple[Optional[LogTemplate], float]:
+        best, best_sim = None, -1.0
+        n = len(tokens)
+        for cluster in leaf:
+            same = sum(1 for a, b in zip(cluster.tokens, tokens) if a == b or a == WILDCARD)
+            sim = same / n
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+        return best, best_sim
+
+    def templates(self) -> list[LogTemplate]:
+        """Templates ordered for the prompt: ошибки, затем предупреждения, затем по частоте."""
+        def rank(c: LogTemplate):
+            severity = 0 if c.level in ERROR_LEVELS else 1 if c.level == "WARN" else 2
+            return severity, -c.count
+        return sorted(self._clusters, key=rank)
+
+
+def mine_stream(stream: BinaryIO, max_lines: Optional[int] = None, encoding: str = "utf-8", **kwargs) -> LogTemplateMiner:
+    """Mine templates from a binary stream (в т.ч. распаковываемого zstd) line by line."""
+    miner = LogTemplateMiner(**kwargs)
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace")
+    try:
+        for i, line in enumerate(text):
+            if max_lines is not None and i >= max_lines:
+                break
+            miner.add(line)
+    finally:
+        text.detach()
+    return miner
+
+
+def templates_digest(miner: LogTemplateMiner, max_templates: int = 200) -> dict:
+    templates = miner.templates()
+    return {
+        "parser_version": PARSER_VERSION,
+        "lines": miner.lines,
+        "templates_total": len(templates),
+        "levels": miner.levels,
+        "templates": [
+            {
+                "template": t.text,
+                "level": t.level,
+                "count": t.count,
+                "first_seen": t.first_seen,
+                "last_seen": t.last_seen,
+                "samples": t.samples,
+            }
+            for t in templates[:max_templates]
+        ],
+    }
+
+
+def format_templates_digest(d: dict, max_chars: int) -> str:
+    """Compact text within max_chars: шаблоны с количеством, временем и примерами параметров."""
+    levels = ", ".join(f"{k}: {v}" for k, v in sorted(d["levels"].items(), key=lambda kv: -kv[1]))
+    header = (
+        f"[ШАБЛОНЫ ЛОГА — {d['lines']} строк сгруппированы в {d['templates_total']} шаблонов; "
+        f"<*>, <NUM>, <UUID>, <IP>, <HEX> — переменные части]\n"
+        + (f"Уровни: {levels}\n" if levels else "")
+    )
+    out = [header]
+    size = len(header)
+    shown = 0
+    for t in d["templates"]:
+        when = ""
+        if t["first_seen"]:
+            when = f" [{t['first_seen']} … {t['last_seen']}]" if t["last_seen"] != t["first_seen"] else f" [{t['first_seen']}]"
+        samples = "; ".join(" | ".join(s) for s in t["samples"])
+        line = f"{t['count']}×{when} {t['template'][:400]}" + (f"  (примеры: {samples[:200]})" if samples else "") + "\n"
+        if size + len(line) > max_chars:
+            break
+        out.append(line)
+        size += len(line)
+        shown += 1
+    if shown < d["templates_total"]:
+        out.append(f"... ещё {d['templates_total'] - shown} редких шаблонов не показано\n")
+    return "".join(out)
@@ -0,0 +1,143 @@
+"""Pod inventory from pods_list.json: группы по владельцу (Deployment/StatefulSet/...), реплики, limits, requests, образы."""
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Optional
+
+PARSER_VERSION = 1
+TABLE_HEADER = ["Pod / группа", "Количество", "Limits", "Requests", "Образы"]
+
+# Имя пода без владельца в JSON (собран до появления поля owner): восстанавливаем группу по суффиксу имени
+_DEPLOYMENT_POD = re.compile(r"^(?P<name>.+)-[a-z0-9]{6,10}-[a-z0-9]{5}$")
+_STATEFULSET_POD = re.compile(r"^(?P<name>.+)-\d+$")
+_GENERATED_POD = re.compile(r"^(?P<name>.+)-[a-z0-9]{5}$")
+
+
+@dataclass
+class PodGroup:
+    namespace: str
+    kind: str
+    name: str
+    pods: int = 0
+    phases: Counter = field(default_factory=Counter)
+    # container -> набор различных значений (у реплик одного владельца обычно совпадают)
+    images: dict[str, set[str]] = field(default_factory=dict)
+    limits: dict[str, set[str]] = field(default_factory=dict)
+    requests: dict[str, set[str]] = field(default_factory=dict)
+
+    def add(self, pod: dict) -> None:
+        self.pods += 1
+        self.phases[pod.get("phase") or "Unknown"] += 1
+        for c in pod.get("containers") or []:
+            cname = c.get("name") or "?"
+            self.images.setdefault(cname, set()).add(c.get("image") or "—")
+            self.limits.setdefault(cname, set()).add(_resources(c.get("limits")))
+            self.requests.setdefault(cname, set()).add(_resources(c.get("requests")))
+
+
+def _resources(r: Optional[dict]) -> str:
+    if not r:
+        return "—"
+    return ", ".join(f"{k}={r[k]}" for k in sorted(r))
+
+
+def pod_owner(pod: dict) -> tuple[str, str]:
+    """(kind, name) владельца: ownerReferences из JSON, иначе по шаблону имени пода."""
+    owner = pod.get("owner")
+    if owner and owner.get("name"):
+        return owner.get("kind") or "?", owner["name"]
+    name = pod.get("name") or "?"
+    for pattern, kind in ((_DEPLOYMENT_POD, "Deployment"), (_STATEFULSET_POD, "StatefulSet"), (_GENERATED_POD, "?")):
+        m = pattern.match(name)
+        if m:
+            return kind, m.group("name")
+    return "Pod", name
+
+
+def build_inventory(pods: Iterable[dict]) -> list[PodGroup]:
+    """Groups ordered by namespace and name; один и тот же под (namespace, name) учитывается один раз."""
+    groups: dict[tuple[str, str, str], PodGroup] = {}
+    seen: set[tuple[str, str]] = set()
+    for pod in pods:
+        ns = pod.get("namespace") or "default"
+        key = (ns, pod.get("name") or "")
+        if key in seen:
+            continue
+        seen.add(key)
+        kind, name = pod_owner(pod)
+        group = groups.get((ns, kind, name))
+        if group is None:
+            group = groups[(ns, kind, name)] = PodGroup(namespace=ns, kind=kind, name=name)
+        group.add(pod)
+    return sorted(groups.values(), key=lambda g: (g.namespace, g.name, g.kind))
+
+
+def load_pods(stream: BinaryIO) -> list[dict]:
+    """pods_list.json (список подов KubernetesService.list_pods); ValueError, если формат другой."""
+    data = json.load(stream)
+    if isinstance(data, dict) and isinstance(data.get("items"), list):
+        data = data["items"]
+    if not isinstance(data, list) or not all(isinstance(p, dict) and "name" in p for p in data):
+        raise ValueError("not a pods list")
+    return data
+
+
+def _per_container(values: dict[str, set[str]]) -> str:
+    """"app: cpu=1, memory=2Gi; sidecar: —"; у одного контейнера без различий — без имени."""
+    if len(values) == 1:
+        return " | ".join(sorted(next(iter(values.values()))))
+    return "; ".join(f"{c}: {' | '.join(sorted(v))}" for c, v in values.items())
+
+
+def inventory_digest(groups: list[PodGroup]) -> dict:
+    return {
+        "parser_version": PARSER_VERSION,
+        "pods": sum(g.pods for g in groups),
+        "groups": [
+            {
+                "namespace": g.namespace,
+                "kind": g.kind,
+                "name": g.name,
+                "pods": g.pods,
+                "phases": dict(g.phases),
+                "limits": _per_container(g.limits),
+                "requests": _per_container(g.requests),
+                "images": _per_container(g.images),
+            }
+            for g in groups
+        ],
+    }
+
+
+def _label(g: dict, namespaces: int) -> str:
+    kind = "" if g["kind"] == "?" else f"{g['kind']} "
+    return f"{kind}{g['namespace'] + '/' if namespaces > 1 else ''}{g['name']}"
+
+
+def _count(g: dict) -> str:
+    not_running = {p: n for p, n in g["phases"].items() if p != "Running"}
+    return str(g["pods"]) + (" (" + ", ".join(f"{p}: {n}" for p, n in not_running.items()) + ")" if not_running else "")
+
+
+def inventory_table_rows(d: dict) -> list[list[str]]:
+    """Rows for ReportGeneratorService.build_pdf: заголовок, группы, итог."""
+    namespaces = len({g["namespace"] for g in d["groups"]})
+    rows = [TABLE_HEADER]
+    for g in d["groups"]:
+        rows.append([_label(g, namespaces), _count(g), g["limits"], g["requests"], g["images"]])
+    rows.append(["Итого", str(d["pods"]), "", "", ""])
+    return rows
+
+
+def format_inventory(d: dict) -> str:
+    """Compact text for the prompt and the text report (вместо исходного JSON)."""
+    namespaces = len({g["namespace"] for g in d["groups"]})
+    lines = [f"[ИНВЕНТАРЬ ПОДОВ — {d['pods']} подов в {len(d['groups'])} группах, рассчитан по pods_list.json]"]
+    for g in d["groups"]:
+        lines.append(
+            f"{_label(g, namespaces)}: {_count(g)} шт.; limits {g['limits']}; requests {g['requests']}; образы {g['images']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,441 @@
+"""HotSpot thread dump (jstack / jcmd Thread.print) parser: stack groups, states, lock graph, deadlocks, stuck threads."""
+from __future__ import annotations
+
+import io
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Optional
+
+PARSER_VERSION = 1
+
+# Разбор построчный, один проход: регулярки только для заголовков потоков и строк с блокировками,
+# фреймы хранятся в общей таблице стеков (одинаковые стеки 10k потоков — один tuple).
+_DUMP_START = "Full thread dump"
+_DUMP_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\s*$")
+_HEADER = re.compile(r'^"(.*)" (.*)$')
+_NID = re.compile(r"\bnid=(\S+)")
+_LOCK = re.compile(r"<(0x[0-9a-fA-F]+)>(?: \(a ([^)]+)\))?")
+_JVM_DEADLOCK = re.compile(r"^Found (one|\d+) Java-level deadlock", re.I)
+
+# Стеки простаивающих потоков (пулы ждут задач, селекторы ждут событий): не «зависание», показываем отдельно
+IDLE_FRAMES = (
+    "ThreadPoolExecutor.getTask",
+    "ScheduledThreadPoolExecutor$DelayedWorkQueue.take",
+    "ForkJoinPool.awaitWork",
+    "ForkJoinPool.runWorker",
+    "LinkedBlockingQueue.take",
+    "LinkedBlockingQueue.poll",
+    "SynchronousQueue$TransferStack.awaitFulfill",
+    "ReferenceQueue.remove",
+    "Reference.waitForReferencePendingList",
+    "EPoll.wait",
+    "EPollArrayWrapper.epollWait",
+    "KQueue.poll",
+    "WindowsSelectorImpl",
+    "sun.nio.ch.SelectorImpl.select",
+    "TimerThread.mainLoop",
+    "NioEndpoint$Poller.run",
+)
+IDLE_DEPTH = 12
+TOP_FRAMES = 8
+
+
+@dataclass
+class ThreadInfo:
+    name: str
+    nid: Optional[str]
+    daemon: bool
+    state: Optional[str]  # None — системный поток без Java-стека (VM Thread, GC task thread)
+    stack_id: int
+    locked: list[str] = field(default_factory=list)
+    waiting_for: Optional[str] = None  # монитор или ownable synchronizer, который поток пытается захватить
+
+    @property
+    def key(self) -> tuple[str, Optional[str]]:
+        return self.name, self.nid
+
+
+@dataclass
+class ThreadDump:
+    timestamp: Optional[str]
+    source: Optional[str]
+    threads: list[ThreadInfo] = field(default_factory=list)
+    jvm_reported_deadlocks: int = 0
+
+
+@dataclass
+class ThreadDumpParser:
+    """Streaming parser: feed_line() по строкам; файл может содержать несколько дампов подряд."""
+
+    source: Optional[str] = None
+    dumps: list[ThreadDump] = field(default_factory=list)
+    stacks: list[tuple[str, ...]] = field(default_factory=list)
+    lock_classes: dict[str, str] = field(default_factory=dict)
+    lines: int = 0
+
+    def __post_init__(self):
+        self._stack_ids: dict[tuple[str, ...], int] = {}
+        self._frames: dict[str, str] = {}
+        self._timestamp: Optional[str] = None
+        self._dump: Optional[ThreadDump] = None
+        self._thread: Optional[ThreadInfo] = None
+        self._stack: list[str] = []
+        self._waiting_on: set[str] = set()
+        self._ownable = False
+
+    def feed_line(self, line: str) -> None:
+        self.lines += 1
+        s = line.strip()
+        if not s:
+            self._ownable = False
+            return
+        if line[0] == '"':
+            self._start_thread(line.rstrip("\r\n"))
+            return
+        if self._thread is not None:
+            if s.startswith("at "):
+                frame = s[3:]
+                self._stack.append(self._frames.setdefault(frame, frame))
+                return
+            if s[0] == "-":
+                self._lock_line(s)
+                return
+            if s.startswith("java.lang.Thread.State:"):
+                self._thread.state = s.split(":", 1)[1].split()[0]
+                return
+            if s.startswith("Locked ownable synchronizers"):
+                self._ownable = True
+                return
+        if s.startswith(_DUMP_START):
+            self._finish_thread()
+            self._dump = ThreadDump(timestamp=self._timestamp, source=self.source)
+            self.dumps.append(self._dump)
+            return
+        if _DUMP_TIMESTAMP.match(s):
+            self._timestamp = s
+            return
+        m = _JVM_DEADLOCK.match(s)
+        if m:
+            self._finish_thread()
+            if self._dump is not None:
+                self._dump.jvm_reported_deadlocks += 1 if m.group(1).lower() == "one" else int(m.group(1))
+            return
+        # Прочие строки (JNI global refs, SMR info, секция deadlock от JVM) завершают текущий поток
+        if not line[0].isspace():
+            self._finish_thread()
+
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.feed_line(line)
+
+    def close(self) -> None:
+        self._finish_thread()
+
+    def begin_file(self, source: Optional[str]) -> None:
+        """Start the next file of the same test: дампы копятся, таблица стеков общая."""
+        self.close()
+        self.source = source
+        self._dump = None
+        self._timestamp = None
+
+    def _start_thread(self, line: str) -> None:
+        self._finish_thread()
+        m = _HEADER.match(line)
+        if not m:
+            return
+        if self._dump is None:
+            # Дамп без заголовка "Full thread dump" (вырезан из лога) — считаем одним дампом
+            self._dump = ThreadDump(timestamp=self._timestamp, source=self.source)
+            self.dumps.append(self._dump)
+        rest = m.group(2)
+        nid = _NID.search(rest)
+        self._thread = ThreadInfo(
+            name=m.group(1),
+            nid=nid.group(1) if nid else None,
+            daemon=" daemon " in f" {rest} ",
+            state=None,
+            stack_id=-1,
+        )
+
+    def _lock_line(self, s: str) -> None:
+        t = self._thread
+        m = _LOCK.search(s)
+        if not m:
+            return
+        lock, cls = m.group(1), m.group(2)
+        if cls:
+            self.lock_classes.setdefault(lock, cls)
+        if self._ownable or s.startswith("- locked"):
+            t.locked.append(lock)
+        elif s.startswith("- waiting to lock") or s.startswith("- waiting to re-lock"):
+            t.waiting_for = lock
+        elif s.startswith("- parking to wait for") and not (cls or "").endswith("ConditionObject"):
+            # ReentrantLock и т.п.; await() на Condition — ожидание сигнала, а не захват блокировки
+            t.waiting_for = lock
+        elif s.startswith("- waiting on"):
+            # Object.wait(): монитор отпущен, хотя ниже по стеку он значится как "locked"
+            self._waiting_on.add(lock)
+
+    def _finish_thread(self) -> None:
+        t = self._thread
+        if t is None:
+            return
+        stack = tuple(self._stack)
+        stack_id = self._stack_ids.get(stack)
+        if stack_id is None:
+            stack_id = len(self.stacks)
+            self._stack_ids[stack] = stack_id
+            self.stacks.append(stack)
+        t.stack_id = stack_id
+        if self._waiting_on:
+            t.locked = [lk for lk in t.locked if lk not in self._waiting_on]
+        self._dump.threads.append(t)
+        self._thread = None
+        self._stack = []
+        self._waiting_on = set()
+        self._ownable = False
+
+    def result(self) -> list[ThreadDump]:
+        self.close()
+        return [d for d in self.dumps if d.threads]
+
+
+def parse_thread_dumps(text: str, source: Optional[str] = None) -> ThreadDumpParser:
+    parser = ThreadDumpParser(source=source)
+    parser.feed_lines(text.splitlines())
+    parser.close()
+    return parser
+
+
+def parse_thread_dump_stream(
+    stream: BinaryIO,
+    source: Optional[str] = None,
+    parser: Optional[ThreadDumpParser] = None,
+    encoding: str = "utf-8",
+) -> ThreadDumpParser:
+    """Parse a binary stream line by line; передайте parser, чтобы накопить несколько файлов с общей таблицей стеков."""
+    if parser is None:
+        parser = ThreadDumpParser(source=source)
+    else:
+        parser.begin_file(source)
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace")
+    try:
+        parser.feed_lines(text)
+    finally:
+        text.detach()
+    parser.close()
+    return parser
+
+
+def _is_idle(stack: tuple[str, ...]) -> bool:
+    if not stack:
+        return False
+    return any(marker in frame for frame in stack[:IDLE_DEPTH] for marker in IDLE_FRAMES)
+
+
+def find_deadlocks(dump: ThreadDump) -> list[list[ThreadInfo]]:
+    """
+    Cycles in the wait-for graph (поток -> владелец блокировки, которую он ждёт).
+    Каждый поток ждёт не больше одной блокировки, поэтому граф функциональный и обход линейный.
+    """
+    owner: dict[str, ThreadInfo] = {}
+    for t in dump.threads:
+        for lock in t.locked:
+            owner.setdefault(lock, t)
+    next_of: dict[int, ThreadInfo] = {}
+    for t in dump.threads:
+        if t.waiting_for:
+            o = owner.get(t.waiting_for)
+            if o is not None and o is not t:
+                next_of[id(t)] = o
+    state: dict[int, int] = {}  # 1 — на текущем пути, 2 — обработан
+    cycles = []
+    for t in dump.threads:
+        path = []
+        cur: Optional[ThreadInfo] = t
+        while cur is not None and id(cur) not in state:
+            state[id(cur)] = 1
+            path.append(cur)
+            cur = next_of.get(id(cur))
+        if cur is not None and state.get(id(cur)) == 1:
+            cycles.append(path[path.index(cur):])
+        for p in path:
+            state[id(p)] = 2
+    return cycles
+
+
+def _frames_text(stack: tuple[str, ...], limit: int = TOP_FRAMES) -> list[str]:
+    frames = list(stack[:limit])
+    if len(stack) > limit:
+        frames.append(f"... ещё {len(stack) - limit} фреймов")
+    return frames
+
+
+def thread_dump_digest(parser: ThreadDumpParser, top_n: int = 10) -> dict:
+    """Digest over all dumps of the test: по каждому дампу, группы стеков, блокировки, deadlock, зависшие потоки."""
+    dumps = parser.result()
+    stacks = parser.stacks
+    per_dump = []
+    groups: Counter = Counter()
+    group_names: dict[tuple, list[str]] = {}
+    deadlocks: dict[frozenset, dict] = {}
+    contended: dict[str, dict] = {}
+    runnable_top: Counter = Counter()
+    for n, dump in enumerate(dumps):
+        states = Counter(t.state or "NO_JAVA_STACK" for t in dump.threads)
+        owner: dict[str, ThreadInfo] = {}
+        for t in dump.threads:
+            for lock in t.locked:
+                owner.setdefault(lock, t)
+        waiters: dict[str, list[ThreadInfo]] = {}
+        for t in dump.threads:
+            if t.state is not None and stacks[t.stack_id]:
+                g = (t.state, t.stack_id)
+                groups[g] += 1
+                names = group_names.setdefault(g, [])
+                if len(names) < 3 and t.name not in names:
+                    names.append(t.name)
+                if t.state == "RUNNABLE" and not _is_idle(stacks[t.stack_id]):
+                    runnable_top[stacks[t.stack_id][0]] += 1
+            if t.waiting_for and (t.state == "BLOCKED" or t.waiting_for in owner):
+                waiters.setdefault(t.waiting_for, []).append(t)
+        # Одна и та же блокировка / один и тот же цикл в нескольких дампах — одна запись со списком дампов
+        for lock, ws in sorted(waiters.items(), key=lambda kv: -len(kv[1]))[:top_n]:
+            o = owner.get(lock)
+            c = contended.setdefault(lock, {"lock": lock, "class": parser.lock_classes.get(lock), "waiters": {}})
+            c["waiters"][n + 1] = len(ws)
+            c.update(
+                owner=o.name if o else None,
+                owner_state=o.state if o else None,
+                owner_frames=_frames_text(stacks[o.stack_id], 4) if o else [],
+            )
+        cycles = find_deadlocks(dump)
+        for cycle in cycles:
+            key = frozenset(t.key for t in cycle)
+            if key in deadlocks:
+                deadlocks[key]["dumps"].append(n + 1)
+                continue
+            deadlocks[key] = {
+                "dumps": [n + 1],
+                "threads": [
+                    {
+                        "name": t.name,
+                        "waiting_for": t.waiting_for,
+                        "class": parser.lock_classes.get(t.waiting_for or ""),
+                        "frames": _frames_text(stacks[t.stack_id], 4),
+                    }
+                    for t in cycle
+                ],
+            }
+        per_dump.append(
+            {
+                "dump": n + 1,
+                "timestamp": dump.timestamp,
+                "source": dump.source,
+                "threads": len(dump.threads),
+                "daemon": sum(1 for t in dump.threads if t.daemon),
+                "states": dict(states.most_common()),
+                "deadlocks": len(cycles),
+                "jvm_reported_deadlocks": dump.jvm_reported_deadlocks,
+            }
+        )
+
+    top_groups = []
+    idle_threads = 0
+    for (state, stack_id), count in groups.most_common():
+        if _is_idle(stacks[stack_id]):
+            idle_threads += count
+            continue
+        if len(top_groups) < top_n:
+            top_groups.append(
+                {
+                    "state": state,
+                    "threads": count,
+                    "per_dump": round(count / len(dumps), 1) if dumps else count,
+                    "names": group_names[(state, stack_id)],
+                    "frames": _frames_text(stacks[stack_id]),
+                }
+            )
+
+    stuck = _stuck_threads(dumps, stacks, top_n)
+    return {
+        "parser_version": PARSER_VERSION,
+        "dumps": per_dump,
+        "stack_groups_total": len(groups),
+        "top_groups": top_groups,
+        "idle_threads": idle_threads,
+        "runnable_top_frames": runnable_top.most_common(top_n),
+        "contended_locks": sorted(contended.values(), key=lambda c: -max(c["waiters"].values()))[:top_n],
+        "deadlocks": list(deadlocks.values())[:top_n],
+        "stuck": stuck,
+    }
+
+
+def _stuck_threads(dumps: list[ThreadDump], stacks: list[tuple[str, ...]], top_n: int) -> list[dict]:
+    """Потоки, которые во всех дампах (от двух) в одном и том же состоянии с одинаковым стеком и не простаивают."""
+    if len(dumps) < 2:
+        return []
+    first: dict[tuple, tuple[Optional[str], int]] = {}
+    same: dict[tuple, int] = {}
+    for t in dumps[0].threads:
+        if t.state is not None and stacks[t.stack_id] and not _is_idle(stacks[t.stack_id]):
+            first[t.key] = (t.state, t.stack_id)
+            same[t.key] = 1
+    for dump in dumps[1:]:
+        for t in dump.threads:
+            if first.get(t.key) == (t.state, t.stack_id) and t.key in same:
+                same[t.key] += 1
+    by_stack: dict[tuple[Optional[str], int], list[str]] = {}
+    for k, n in same.items():
+        if n == len(dumps):
+            by_stack.setdefault(first[k], []).append(k[0])
+    out = []
+    for (state, stack_id), names in sorted(by_stack.items(), key=lambda kv: -len(kv[1]))[:top_n]:
+        out.append({"state": state, "threads": len(names), "names": names[:3], "frames": _frames_text(stacks[stack_id])})
+    return out
+
+
+def format_thread_dump_digest(d: dict) -> str:
+    """Compact text for the prompt (вместо сырого jstack)."""
+    lines = [f"[СВОДКА THREAD DUMP — рассчитана парсером; дампов: {len(d['dumps'])}]"]
+    for x in d["dumps"]:
+        states = ", ".join(f"{k} {v}" for k, v in x["states"].items())
+        when = f" {x['timestamp']}" if x["timestamp"] else ""
+        src = f" ({x['source']})" if x["source"] else ""
+        jvm = f"; JVM сообщает о deadlock: {x['jvm_reported_deadlocks']}" if x["jvm_reported_deadlocks"] else ""
+        lines.append(
+            f"Дамп {x['dump']}{when}{src}: потоков {x['threads']} (daemon {x['daemon']}); {states}; "
+            f"циклов блокировок: {x['deadlocks']}{jvm}"
+        )
+    if d["deadlocks"]:
+        lines.append("DEADLOCK (цикл ожидания блокировок):")
+        for dl in d["deadlocks"]:
+            lines.append(f"  дампы {', '.join(map(str, dl['dumps']))}:")
+            for t in dl["threads"]:
+                lines.append(f"    \"{t['name']}\" ждёт <{t['waiting_for']}> ({t['class']})")
+                lines.extend(f"      at {f}" for f in t["frames"])
+    if d["stuck"]:
+        lines.append("Потоки с одинаковым стеком во всех дампах (возможное зависание):")
+        for g in d["stuck"]:
+            lines.append(f"  {g['threads']} потоков {g['state']}, например {', '.join(g['names'])}:")
+            lines.extend(f"    at {f}" for f in g["frames"])
+    if d["contended_locks"]:
+        lines.append("Самые конкурентные блокировки:")
+        for c in d["contended_locks"]:
+            owner = f"владелец \"{c['owner']}\" ({c['owner_state']})" if c["owner"] else "владелец не найден в дампе"
+            waiters = ", ".join(f"{w} в дампе {n}" for n, w in c["waiters"].items())
+            lines.append(f"  <{c['lock']}> ({c['class']}) — ждут {waiters}; {owner}")
+            lines.extend(f"    at {f}" for f in c["owner_frames"])
+    lines.append(
+        f"Группы потоков с одинаковым стеком (всего групп {d['stack_groups_total']}, "
+        f"простаивающих потоков пулов/селекторов {d['idle_threads']} — не показаны):"
+    )
+    for g in d["top_groups"]:
+        lines.append(f"  {g['threads']}× ({g['per_dump']} на дамп) {g['state']}, например {', '.join(g['names'])}:")
+        lines.extend(f"    at {f}" for f in g["frames"])
+    if d["runnable_top_frames"]:
+        lines.append("Верхние фреймы RUNNABLE-потоков:")
+        for frame, cnt in d["runnable_top_frames"]:
+            lines.append(f"  {cnt}× {frame}")
+    return "\n".join(lines)
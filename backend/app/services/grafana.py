@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 from datetime import datetime
 import structlog
 
@@ -92,10 +92,12 @@ class GrafanaService:
         to_ts: datetime,
         save_dir: Path,
         dashboard_title: Optional[str] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
     ) -> list[dict]:
         """
         For each panel in dashboard, render snapshot for [from_ts, to_ts] and save.
         Returns list of {panel_id, title, image_path, meta_path}.
+        on_progress(done, total) вызывается после каждой панели (исключение из него прерывает сбор).
         """
         save_dir = Path(save_dir)
         save_dir.mkdir(parents=True, exist_ok=True)
@@ -105,7 +107,9 @@ class GrafanaService:
             dashboard_title = dash.get("dashboard", {}).get("title", dashboard_uid)
 
         results = []
-        for p in panels:
+        for done, p in enumerate(panels):
+            if on_progress:
+                on_progress(done, len(panels))
             if p.get("type") == "row":
                 continue
             pid = p.get("id")
@@ -0,0 +1,263 @@
+"""
+Background jobs: анализ и сбор артефактов вне HTTP-запроса.
+
+Запуск возвращает id задачи сразу; задача выполняется в пуле потоков своего типа (лимит одновременных —
+settings.job_concurrency), пишет фазу и прогресс в таблицу jobs и поддерживает отмену: до старта — снимается
+с очереди, во время выполнения — в ближайшей точке проверки (событие графа, очередная панель или под).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Job, Test
+
+logger = structlog.get_logger()
+
+JOB_TYPES = ("analysis", "collect_grafana", "collect_kubernetes")
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+# Последние события задачи, которые получает подписчик, подключившийся после её запуска (POST, затем GET .../stream)
+REPLAY_EVENTS = 5000
+
+
+class JobCancelled(Exception):
+    """Raised at a checkpoint of a job whose cancellation was requested."""
+
+
+class JobContext:
+    """Handle passed to the job body: прогресс, события для подписчиков (SSE), проверка отмены."""
+
+    def __init__(self, job_id: int, job_type: str, test_id: Optional[int]):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.test_id = test_id
+        self.cancel_event = threading.Event()
+        self._listeners: list[queue.Queue] = []
+        self._history: deque = deque(maxlen=REPLAY_EVENTS)
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: queue.Queue) -> None:
+        """Add a listener; уже отправленные события (последние REPLAY_EVENTS) он получает первыми."""
+        with self._lock:
+            for item in self._history:
+                listener.put(item)
+            self._listeners.append(listener)
+
+    def publish(self, event: str, data: dict) -> None:
+        with self._lock:
+            self._history.append((event, data))
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener.put((event, data))
+
+    def emit(self, event: str, data: dict) -> None:
+        """Send an event to subscribers; заодно точка проверки отмены."""
+        self.publish(event, data)
+        self.check_cancelled()
+
+    def close(self) -> None:
+        with self._lock:
+            listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener.put(None)
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def progress(self, phase: str, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        fields: dict[str, Any] = {"phase": phase}
+        if progress is not None:
+            fields["progress"] = round(min(1.0, max(0.0, progress)), 3)
+        if message is not None:
+            fields["message"] = message
+        _update(self.job_id, **fields)
+        self.emit("progress", {"job_id": self.job_id, **fields})
+
+
+_lock = threading.Lock()
+_executors: dict[str, ThreadPoolExecutor] = {}
+_active: dict[int, tuple[JobContext, Future]] = {}
+
+
+def concurrency_limit(job_type: str) -> int:
+    return max(1, int(settings.job_concurrency.get(job_type, 1)))
+
+
+def _executor(job_type: str) -> ThreadPoolExecutor:
+    with _lock:
+        executor = _executors.get(job_type)
+        if executor is None:
+            executor = _executors[job_type] = ThreadPoolExecutor(
+                max_workers=concurrency_limit(job_type), thread_name_prefix=f"job-{job_type}"
+            )
+        return executor
+
+
+def _update(job_id: int, **fields: Any) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _set_test_status(db: Session, test_id: Optional[int], status: str, error: Optional[str] = None) -> None:
+    if test_id is None:
+        return
+    test = db.query(Test).filter(Test.id == test_id).first()
+    if test:
+        test.status = status
+        test.error_message = error
+        db.commit()
+
+
+def submit(
+    db: Session,
+    job_type: str,
+    target: Callable[[JobContext, Session], Any],
+    test_id: Optional[int] = None,
+    params: Optional[dict] = None,
+    queued_test_status: Optional[str] = None,
+) -> Job:
+    """
+    Create the job row and queue target(ctx, db) в пуле типа job_type; результат target — в job.result.
+    queued_test_status — статус теста, пока задача ждёт очереди (анализ: queued).
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    job = Job(job_type=job_type, test_id=test_id, status="queued", params=params or {})
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if queued_test_status:
+        _set_test_status(db, test_id, queued_test_status)
+    ctx = JobContext(job.id, job_type, test_id)
+    executor = _executor(job_type)
+    with _lock:
+        # Под блокировкой: _run снимает задачу с учёта тоже под ней, так что запись не переживёт задачу
+        _active[job.id] = (ctx, executor.submit(_run, ctx, target))
+    logger.info("job_submitted", job_id=job.id, job_type=job_type, test_id=test_id)
+    return job
+
+
+def _run(ctx: JobContext, target: Callable[[JobContext, Session], Any]) -> None:
+    db = SessionLocal()
+    status, error = "done", None
+    try:
+        ctx.check_cancelled()
+        _update(ctx.job_id, status="running", started_at=datetime.utcnow())
+        ctx.emit("job", {"job_id": ctx.job_id, "status": "running"})
+        result = target(ctx, db)
+        _update(ctx.job_id, status="done", progress=1.0, phase="done", result=result, finished_at=datetime.utcnow())
+        ctx.publish("job", {"job_id": ctx.job_id, "status": "done", "result": result})
+    except JobCancelled:
+        db.rollback()
+        status = "cancelled"
+        _update(ctx.job_id, status="cancelled", finished_at=datetime.utcnow())
+        _set_test_status(db, ctx.test_id, "cancelled")
+    except Exception as e:
+        db.rollback()
+        status, error = "failed", str(e)
+        logger.exception("job_failed", job_id=ctx.job_id, job_type=ctx.job_type, error=error)
+        _update(ctx.job_id, status="failed", error_message=error, finished_at=datetime.utcnow())
+        _set_test_status(db, ctx.test_id, "failed", error)
+    finally:
+        db.close()
+        with _lock:
+            _active.pop(ctx.job_id, None)
+        if status != "done":
+            ctx.publish("job", {"job_id": ctx.job_id, "status": status, "error": error})
+        ctx.close()
+        logger.info("job_finished", job_id=ctx.job_id, job_type=ctx.job_type, status=status)
+
+
+def cancel(db: Session, job_id: int) -> Optional[Job]:
+    """Request cancellation: задача из очереди снимается сразу, выполняющаяся — в ближайшей точке проверки."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if job is None or job.status in TERMINAL_STATUSES:
+        return job
+    job.cancel_requested = True
+    db.commit()
+    with _lock:
+        ctx, future = _active.get(job_id, (None, None))
+    if ctx is not None:
+        ctx.cancel_event.set()
+    else:
+        db.refresh(job)
+        if job.status in TERMINAL_STATUSES:
+            return job
+    if ctx is None or (future is not None and future.cancel()):
+        # Не начиналась (или осиротела после перезапуска): _run не вызовется — завершаем здесь
+        with _lock:
+            _active.pop(job_id, None)
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        _set_test_status(db, job.test_id, "cancelled")
+        if ctx is not None:
+            ctx.close()
+    db.refresh(job)
+    return job
+
+
+def is_finished(job_id: int) -> bool:
+    """True if the job is done, failed or cancelled (или её нет)."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        return job is None or job.status in TERMINAL_STATUSES
+    finally:
+        db.close()
+
+
+def subscribe(job_id: int, listener: queue.Queue) -> bool:
+    """Subscribe to events of an active job; False, если задача уже не выполняется."""
+    with _lock:
+        ctx, _ = _active.get(job_id, (None, None))
+    if ctx is None:
+        return False
+    ctx.subscribe(listener)
+    return True
+
+
+def recover_interrupted() -> None:
+    """At startup: задачи, прерванные остановкой процесса, помечаются failed (вместе со статусом теста)."""
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job).filter(Job.status.in_(("queued", "running"))).all()
+        for job in jobs:
+            job.status = "failed"
+            job.error_message = "Прервано перезапуском сервера"
+            job.finished_at = datetime.utcnow()
+            test = db.query(Test).filter(Test.id == job.test_id).first() if job.test_id else None
+            if test and test.status in ("queued", "collecting", "analyzing"):
+                test.status = "failed"
+                test.error_message = job.error_message
+        db.commit()
+        if jobs:
+            logger.warning("jobs_interrupted_by_restart", job_ids=[j.id for j in jobs])
+    finally:
+        db.close()
+
+
+def shutdown() -> None:
+    """Stop accepting jobs, отменить ожидающие и попросить выполняющиеся остановиться."""
+    with _lock:
+        active = list(_active.values())
+        executors = list(_executors.values())
+        _executors.clear()
+    for ctx, _ in active:
+        ctx.cancel_event.set()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -5,7 +5,7 @@ import base64
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 import structlog
 
 from kubernetes import client, config
@@ -92,10 +92,24 @@ class KubernetesService:
             "namespace": namespace,
             "name": p.metadata.name,
             "phase": p.status.phase if p.status else None,
+            "owner": self._pod_owner(p),
             "containers": containers,
             "created_at": p.metadata.creation_timestamp.isoformat() if p.metadata.creation_timestamp else None,
         }
 
+    @staticmethod
+    def _pod_owner(p: Any) -> Optional[dict]:
+        """Controller из ownerReferences; ReplicaSet Deployment'а сворачивается в Deployment (имя без pod-template-hash)."""
+        refs = p.metadata.owner_references or []
+        ref = next((r for r in refs if r.controller), refs[0] if refs else None)
+        if ref is None:
+            return None
+        kind, name = ref.kind, ref.name
+        pod_hash = (p.metadata.labels or {}).get("pod-template-hash")
+        if kind == "ReplicaSet" and pod_hash and name.endswith("-" + pod_hash):
+            kind, name = "Deployment", name[: -len(pod_hash) - 1]
+        return {"kind": kind, "name": name}
+
     def get_pod_logs(
         self,
         namespace: str,
@@ -119,10 +133,12 @@ class KubernetesService:
         to_ts: datetime,
         save_dir: Path,
         namespace: Optional[str] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
     ) -> dict:
         """
         List pods, save pods JSON; for each pod save container logs for time range.
         Returns {pods_file, logs: [{pod, container, log_file}]}.
+        on_progress(done, total) вызывается перед логами каждого пода (исключение из него прерывает сбор).
         """
         save_dir = Path(save_dir)
         save_dir.mkdir(parents=True, exist_ok=True)
@@ -133,7 +149,9 @@ class KubernetesService:
         pods_file.write_text(json.dumps(pods, ensure_ascii=False, indent=2), encoding="utf-8")
 
         log_entries = []
-        for pod_info in pods:
+        for done, pod_info in enumerate(pods):
+            if on_progress:
+                on_progress(done, len(pods))
             ns = pod_info["namespace"]
             name = pod_info["name"]
             for c in pod_info.get("containers", []):
@@ -0,0 +1,453 @@
+"""
+Ingest-time preprocessing of artifacts: кодировка, число строк, интервал времени и дайджест по kind.
+Выполняется один раз при загрузке / сборе; результат лежит рядом с файлом (<имя>.digest.json),
+ключ — sha256 содержимого + версия парсера, ссылка — Artifact.metadata_["preprocessed"].
+Анализ только читает готовые дайджесты.
+"""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Optional
+
+import structlog
+
+from app.config import settings
+from app.db.models import Artifact, ArtifactKind
+from app.services.artifact_sampler import resample_excerpt
+from app.services.artifacts import CHUNK_SIZE, DIGEST_SUFFIX, ArtifactsService
+from app.services.digests import gc_log, hprof, jfr, log_templates, pod_inventory, thread_dump
+
+logger = structlog.get_logger()
+
+# Версия самого конвейера (формат записи, статистика); версии парсеров добавляются по kind
+PREPROCESS_VERSION = 2
+# Сколько байт каждого артефакта попадает в промпт (голова + хвост + окна с ошибками)
+ARTIFACT_EXCERPT_BYTES = 50_000
+# Место под пометку о выдержке при её уменьшении упаковщиком
+EXCERPT_NOTE_CHARS = 160
+# Логи короче этого числа строк отдаются как есть: шаблоны выигрывают только на повторах
+LOG_TEMPLATE_MIN_LINES = 200
+# Бинарные артефакты: без определения кодировки и подсчёта строк
+BINARY_KINDS = {ArtifactKind.custom_heap_dump.value, ArtifactKind.custom_jfr.value, ArtifactKind.grafana_slice.value}
+# Общий дайджест нескольких thread dump'ов теста — рядом с первым из них
+GROUP_DIGEST_SUFFIX = ".group.digest.json"
+# Начало и конец файла, в которых ищутся первая и последняя метки времени
+EDGE_BYTES = 64 * 1024
+_DATETIME = re.compile(rb"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2}(?:[.,]\d{1,9})?)")
+
+
+def digest_version(kind: str) -> str:
+    """Version key of the stored digest: меняется при смене формата конвейера, парсера kind или его настроек."""
+    if kind == ArtifactKind.custom_heap_dump.value:
+        parser = f"hprof:{hprof.PARSER_VERSION}"
+    elif kind == ArtifactKind.custom_jfr.value:
+        parser = f"jfr:{jfr.PARSER_VERSION}"
+    elif kind == ArtifactKind.custom_gc.value:
+        parser = f"gc:{gc_log.PARSER_VERSION}"
+    elif kind == ArtifactKind.custom_thread_dump.value:
+        parser = f"thread_dump:{thread_dump.PARSER_VERSION}"
+    elif kind == ArtifactKind.k8s_pods.value:
+        parser = f"pod_inventory:{pod_inventory.PARSER_VERSION}"
+    elif kind in settings.log_template_kinds:
+        parser = f"log_templates:{log_templates.PARSER_VERSION}:{settings.log_template_max_lines}"
+    else:
+        parser = "excerpt"
+    return f"{PREPROCESS_VERSION}/{parser}/{ARTIFACT_EXCERPT_BYTES}"
+
+
+def _detect_encoding(head: bytes, utf8_ok: bool) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if utf8_ok:
+        return "utf-8"
+    # Не UTF-8: кириллица в cp1251 — в основном байты 0xC0–0xFF, латиница-1 — равномерно по верхней половине
+    high = [b for b in head if b >= 0x80]
+    if high and sum(1 for b in high if b >= 0xC0) / len(high) > 0.6:
+        return "cp1251"
+    return "latin-1"
+
+
+def _time_span(head: bytes, tail: bytes) -> Optional[dict]:
+    first = _DATETIME.search(head)
+    if first is None:
+        return None
+    last = None
+    for last in _DATETIME.finditer(tail):
+        pass
+    last = last or first
+    return {"first": _datetime_text(first), "last": _datetime_text(last)}
+
+
+def _datetime_text(m: re.Match) -> str:
+    return f"{m.group(1).decode()} {m.group(2).decode()}"
+
+
+def text_stats(art_service: ArtifactsService, file_path: str) -> dict:
+    """One streaming pass: sha256, размер, кодировка, строки, первая и последняя метка времени."""
+    hasher = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    utf8_ok = True
+    size = lines = 0
+    head = b""
+    tail = b""
+    last_byte = b""
+    for chunk in art_service.iter_artifact(file_path, CHUNK_SIZE):
+        hasher.update(chunk)
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+        last_byte = chunk[-1:]
+        if len(head) < EDGE_BYTES:
+            head += chunk[: EDGE_BYTES - len(head)]
+        tail = (tail + chunk)[-EDGE_BYTES:]
+        if utf8_ok:
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError:
+                utf8_ok = False
+    if size and last_byte != b"\n":
+        lines += 1
+    return {
+        "sha256": hasher.hexdigest(),
+        "size_bytes": size,
+        "encoding": _detect_encoding(head, utf8_ok),
+        "lines": lines,
+        "time_span": _time_span(head, tail),
+    }
+
+
+def excerpt_text(art_service: ArtifactsService, file_path: str, max_bytes: int) -> tuple[str, dict]:
+    """Bounded excerpt (голова, хвост, окна с ошибками) с пометкой о пропущенном."""
+    text, info = art_service.sample_artifact(file_path, max_bytes)
+    return text + _excerpt_note(info), info
+
+
+def _excerpt_note(info: dict) -> str:
+    if not info["skipped_bytes"]:
+        return ""
+    return (
+        f"\n... [выдержка: {info['excerpt_bytes']} из {info['size_bytes']} байт — начало, конец"
+        f" и фрагменты с ошибками; пропущено {info['skipped_bytes']} байт]"
+    )
+
+
+def build_digest(art_service: ArtifactsService, file_path: str, kind: str, encoding: str = "utf-8", source: str | None = None) -> dict:
+    """
+    Kind-specific digest: {"type", "text", "data"}; type="excerpt" — парсера нет или он ничего не нашёл.
+    data — структурированный результат, по которому текст можно пересобрать под меньший лимит.
+    """
+    if kind == ArtifactKind.custom_heap_dump.value:
+        try:
+            with art_service.map_artifact(file_path) as buf:
+                summary = hprof.summarize_hprof(buf)
+            return {"type": "hprof", "text": hprof.format_hprof_summary(summary), "data": summary}
+        except hprof.HprofError as e:
+            # Бинарный не-HPROF файл: байты в промпт не отдаём
+            logger.warning("heap_dump_not_recognized", path=file_path, error=str(e))
+            return {"type": "unrecognized", "text": f"[Файл не распознан как HPROF heap dump: {e}]", "data": None}
+    if kind == ArtifactKind.custom_jfr.value:
+        try:
+            with art_service.map_artifact(file_path) as buf:
+                summary = jfr.parse_jfr(buf)
+            return {"type": "jfr", "text": jfr.format_jfr_digest(summary), "data": summary}
+        except jfr.JfrError as e:
+            logger.warning("jfr_not_recognized", path=file_path, error=str(e))
+            return {"type": "unrecognized", "text": f"[Файл не распознан как JFR-запись: {e}]", "data": None}
+    if kind == ArtifactKind.custom_gc.value:
+        with art_service.open_artifact(file_path) as f:
+            digest = gc_log.gc_digest(gc_log.parse_gc_log_stream(f, encoding=encoding))
+        if digest["events"]:
+            return {"type": "gc", "text": gc_log.format_gc_digest(digest), "data": None}
+        # Не unified-лог (например JDK 8 -XX:+PrintGCDetails) — выдержка как раньше
+        logger.info("gc_log_not_recognized", path=file_path)
+    elif kind == ArtifactKind.custom_thread_dump.value:
+        with art_service.open_artifact(file_path) as f:
+            parser = thread_dump.parse_thread_dump_stream(f, source=source, encoding=encoding)
+        digest = thread_dump.thread_dump_digest(parser)
+        if digest["dumps"]:
+            return {"type": "thread_dump", "text": thread_dump.format_thread_dump_digest(digest), "data": None}
+        logger.info("thread_dump_not_recognized", path=file_path)
+    elif kind == ArtifactKind.k8s_pods.value:
+        try:
+            with art_service.open_artifact(file_path) as f:
+                pods = pod_inventory.load_pods(f)
+        except ValueError as e:
+            logger.info("pods_list_not_recognized", path=file_path, error=str(e))
+        else:
+            inventory = pod_inventory.inventory_digest(pod_inventory.build_inventory(pods))
+            return {"type": "pod_inventory", "text": pod_inventory.format_inventory(inventory), "data": inventory}
+    elif kind in settings.log_template_kinds:
+        with art_service.open_artifact(file_path) as f:
+            miner = log_templates.mine_stream(f, max_lines=settings.log_template_max_lines, encoding=encoding)
+        if miner.lines >= LOG_TEMPLATE_MIN_LINES:
+            digest = log_templates.templates_digest(miner)
+            if miner.lines >= settings.log_template_max_lines:
+                digest["note"] = f"\n... [обработаны первые {miner.lines} строк лога]"
+            return {"type": "log_templates", "text": _format_templates(digest, ARTIFACT_EXCERPT_BYTES), "data": digest}
+    # data — сегменты выдержки с позициями в тексте: упаковщик уменьшает её без повторного чтения файла
+    text, info = excerpt_text(art_service, file_path, ARTIFACT_EXCERPT_BYTES)
+    return {"type": "excerpt", "text": text, "data": info}
+
+
+def _format_templates(digest: dict, max_chars: int) -> str:
+    note = digest.get("note", "")
+    return log_templates.format_templates_digest(digest, max_chars=max(0, max_chars - len(note))) + note
+
+
+def preprocess_file(art_service: ArtifactsService, file_path: str, kind: str, sha256: str | None = None, source: str | None = None) -> dict:
+    """Stats + digest of one stored file, сохранённые рядом с ним. Returns the stored record."""
+    if kind in BINARY_KINDS:
+        stats = {
+            "sha256": sha256 or art_service.content_sha256(file_path),
+            "size_bytes": art_service.resolve_artifact_path(file_path).stat().st_size,
+            "encoding": None,
+            "lines": None,
+            "time_span": None,
+        }
+    else:
+        stats = text_stats(art_service, file_path)
+    version = digest_version(kind)
+    record = {
+        **stats,
+        "kind": kind,
+        "version": version,
+        "digest_path": f"{file_path}{DIGEST_SUFFIX}",
+        "digest": build_digest(art_service, file_path, kind, stats["encoding"] or "utf-8", source),
+    }
+    art_service.save_digest(file_path, stats["sha256"], version, record)
+    logger.info(
+        "artifact_preprocessed",
+        path=file_path,
+        kind=kind,
+        digest_type=record["digest"]["type"],
+        lines=stats["lines"],
+        digest_chars=len(record["digest"]["text"]),
+    )
+    return record
+
+
+def metadata_reference(record: dict) -> dict:
+    """What goes to Artifact.metadata_["preprocessed"]: ключ дайджеста и краткая статистика, без самого текста."""
+    return {
+        "digest_path": record["digest_path"],
+        "sha256": record["sha256"],
+        "version": record["version"],
+        "digest_type": record["digest"]["type"],
+        "encoding": record["encoding"],
+        "lines": record["lines"],
+        "time_span": record["time_span"],
+    }
+
+
+def _artifact_sha256(a: Artifact) -> Optional[str]:
+    meta = a.metadata_ or {}
+    return meta.get("sha256") or (meta.get("preprocessed") or {}).get("sha256")
+
+
+def load_preprocessed(art_service: ArtifactsService, a: Artifact) -> Optional[dict]:
+    """Ready record for the artifact, если он построен по тому же содержимому той же версией."""
+    sha256 = _artifact_sha256(a)
+    if not sha256:
+        return None
+    return art_service.load_digest(a.file_path, sha256, digest_version(a.kind))
+
+
+def _limit_worker_memory(memory_mb: int) -> None:
+    """Pool initializer: RLIMIT_DATA (куча, numpy), а не RLIMIT_AS — mmap больших hprof/jfr в лимит не входит."""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except (ImportError, ValueError, OSError, AttributeError):
+        # Windows / macOS без RLIMIT_DATA: воркер работает без лимита
+        pass
+
+
+def _preprocess_task(file_path: str, kind: str, sha256: Optional[str], source: Optional[str]) -> dict:
+    """Worker entry point (module-level — pickled by name)."""
+    return preprocess_file(ArtifactsService(), file_path, kind, sha256, source)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def preprocess_workers() -> int:
+    return settings.preprocess_workers or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: воркеры не наследуют потоки и соединения БД процесса API
+            _pool = ProcessPoolExecutor(
+                max_workers=preprocess_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_memory,
+                initargs=(settings.preprocess_worker_memory_mb,),
+            )
+            logger.info("preprocess_pool_started", workers=preprocess_workers(), memory_mb=settings.preprocess_worker_memory_mb)
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def preprocess_many(tasks: list[tuple[str, str, Optional[str], Optional[str]]]) -> list[dict | Exception]:
+    """
+    Preprocess (file_path, kind, sha256, source) tasks; результаты — в порядке задач, ошибка задачи — её исключение.
+    Несколько задач и workers > 1 — пул процессов (разбор CPU-bound, GIL не делится), иначе в текущем процессе.
+    Воркер, упавший по памяти (MemoryError при лимите, OOM kill), не роняет остальные задачи.
+    """
+    if len(tasks) < 2 or preprocess_workers() < 2:
+        results: list[dict | Exception] = []
+        for task in tasks:
+            try:
+                results.append(_preprocess_task(*task))
+            except Exception as e:
+                results.append(e)
+        return results
+    results = _run_in_pool(tasks)
+    broken = [i for i, r in enumerate(results) if isinstance(r, BrokenProcessPool)]
+    if broken:
+        # Гибель одного воркера (OOM kill) обрывает все незавершённые задачи: повторяем их по одной в новом пуле,
+        # чтобы упала только задача-виновник
+        logger.warning("preprocess_pool_broken", failed=len(broken))
+        for i in broken:
+            results[i] = _run_in_pool([tasks[i]])[0]
+    return results
+
+
+def _run_in_pool(tasks: list[tuple]) -> list[dict | Exception]:
+    pool = _get_pool()
+    futures = [pool.submit(_preprocess_task, *task) for task in tasks]
+    results: list[dict | Exception] = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    if any(isinstance(r, BrokenProcessPool) for r in results):
+        # Пул непригоден после гибели воркера: следующий вызов создаст новый
+        _reset_pool(pool)
+    return results
+
+
+def preprocess_artifacts(db, artifacts: list[Artifact]) -> dict[int, dict]:
+    """
+    Ready records for the artifacts: готовые читаются с диска, недостающие строятся (параллельно)
+    и записываются в Artifact.metadata_. Артефакты с ошибкой предобработки в результат не попадают.
+    """
+    art_service = ArtifactsService()
+    records: dict[int, dict] = {}
+    missing: list[Artifact] = []
+    for a in artifacts:
+        if not a.file_path:
+            continue
+        record = load_preprocessed(art_service, a)
+        if record is None:
+            missing.append(a)
+        else:
+            records[a.id] = record
+            if (a.metadata_ or {}).get("preprocessed") is None:
+                _reference(a, record)
+    tasks = [(a.file_path, a.kind, _artifact_sha256(a), a.display_name or Path(a.file_path).name) for a in missing]
+    for a, result in zip(missing, preprocess_many(tasks)):
+        if isinstance(result, Exception):
+            logger.warning("artifact_preprocess_failed", artifact_id=a.id, path=a.file_path, error=str(result) or type(result).__name__)
+            continue
+        records[a.id] = result
+        _reference(a, result)
+    db.commit()
+    return records
+
+
+def _reference(a: Artifact, record: dict) -> None:
+    # JSON-колонка: изменения отслеживаются только при присваивании нового dict
+    a.metadata_ = {**(a.metadata_ or {}), "sha256": record["sha256"], "preprocessed": metadata_reference(record)}
+    a.sha256 = record["sha256"]
+
+
+def preprocess_artifacts_job(artifact_ids: list[int]) -> None:
+    """Background task: предобработка после ответа клиенту, в своей сессии БД; ошибки не роняют загрузку."""
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        artifacts = db.query(Artifact).filter(Artifact.id.in_(artifact_ids)).order_by(Artifact.id).all()
+        preprocess_artifacts(db, artifacts)
+    except Exception as e:
+        db.rollback()
+        logger.warning("artifact_preprocess_job_failed", artifact_ids=artifact_ids, error=str(e))
+    finally:
+        db.close()
+
+
+def digest_fit(digest: dict) -> Optional[Callable[[int], str]]:
+    """
+    How to rebuild the digest text under a smaller char limit (для упаковщика контекста); None — обрезка по строкам.
+    Только из сохранённого дайджеста: файл артефакта при упаковке не читается.
+    """
+    if digest["type"] == "log_templates":
+        return lambda max_chars: _format_templates(digest["data"], max_chars)
+    if digest["type"] == "excerpt" and digest["data"]:
+        # Выдержка меньшего размера из сохранённой: голова, хвост и окна с ошибками пропорционально уменьшаются
+        def fit(max_chars: int) -> str:
+            text, info = resample_excerpt(digest["text"], digest["data"], max(0, max_chars - EXCERPT_NOTE_CHARS))
+            return text + _excerpt_note(info)
+
+        return fit
+    return None
+
+
+def thread_dumps_digest_text(art_service: ArtifactsService, dumps: list[Artifact], records: list[dict]) -> Optional[str]:
+    """
+    All thread dumps of the test in one digest: потоки, зависшие во всех дампах, видны только при совместном разборе.
+    Один дамп — готовый дайджест; несколько — общий разбор, кешируется рядом с первым по набору sha256.
+    """
+    if len(dumps) == 1:
+        digest = records[0]["digest"]
+        return digest["text"] if digest["type"] == "thread_dump" else None
+    group_key = hashlib.sha256("".join(r["sha256"] for r in records).encode()).hexdigest()
+    version = digest_version(ArtifactKind.custom_thread_dump.value)
+    cached = art_service.load_digest(dumps[0].file_path, group_key, version, suffix=GROUP_DIGEST_SUFFIX)
+    if cached is not None:
+        return cached["text"]
+    parser = thread_dump.ThreadDumpParser()
+    for a, r in zip(dumps, records):
+        with art_service.open_artifact(a.file_path) as f:
+            thread_dump.parse_thread_dump_stream(
+                f, source=a.display_name or Path(a.file_path).name, parser=parser, encoding=r["encoding"] or "utf-8"
+            )
+    digest = thread_dump.thread_dump_digest(parser)
+    text = thread_dump.format_thread_dump_digest(digest) if digest["dumps"] else None
+    if text is None:
+        logger.info("thread_dump_not_recognized", artifact_ids=[a.id for a in dumps])
+    art_service.save_digest(dumps[0].file_path, group_key, version, {"text": text}, suffix=GROUP_DIGEST_SUFFIX)
+    return text
@@ -41,7 +41,7 @@ class ReportGeneratorService:
         """
         meta: project_name, test_type, version, time_range
         sources: какие файлы использованы для отчёта
-        table_rows: [["Pod", "Count", "Limits", "Requests"], ...]
+        table_rows: [["Pod / группа", "Количество", "Limits", "Requests", "Образы"], ...] — инвентарь подов, первая строка — заголовок
         """
         path = self.reports_path / f"test_{test_id}_report.pdf"
         doc = SimpleDocTemplate(
@@ -69,7 +69,13 @@ class ReportGeneratorService:
         story.append(Spacer(1, 0.5 * cm))
 
         if table_rows:
-            t = Table(table_rows)
+            # Образы и ресурсы длинные: ячейки — абзацы с переносом, ширина колонок по доле страницы
+            style_cell = ParagraphStyle(name="Cell", parent=styles["Normal"], fontSize=7, leading=8)
+            style_head = ParagraphStyle(name="CellHead", parent=style_cell, textColor=colors.whitesmoke)
+            cells = [[Paragraph(str(v), style_head if i == 0 else style_cell) for v in row] for i, row in enumerate(table_rows)]
+            ncols = max(len(r) for r in table_rows)
+            shares = [0.22, 0.1, 0.22, 0.22, 0.24] if ncols == 5 else [1 / ncols] * ncols
+            t = Table(cells, colWidths=[doc.width * x for x in shares], repeatRows=1)
             t.setStyle(TableStyle([
                 ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
                 ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
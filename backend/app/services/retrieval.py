@@ -0,0 +1,265 @@
+"""
+Lexical retrieval over full artifact text: поиск фрагментов логов для разделов отчёта и вопросов по тесту.
+
+Индекс — SQLite FTS5 (ранжирование BM25, без внешних сервисов) в storage/index/<test_id>.sqlite. Текстовые
+артефакты режутся на фрагменты по строкам (не длиннее retrieval_chunk_chars), бинарные (hprof, jfr, Grafana)
+индексируются по дайджесту. Индекс строится один раз: при следующем обращении переиндексируются только
+артефакты с другим sha256 содержимого, удалённые из теста убираются.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.agent.context_packer import TokenCounter
+from app.config import settings
+from app.db.models import Artifact
+from app.services import preprocessing
+from app.services.artifacts import ArtifactsService
+
+logger = structlog.get_logger()
+
+# Меняется при смене разбиения на фрагменты или токенизатора — индекс перестраивается
+INDEX_VERSION = 1
+INDEX_DIR_NAME = "index"
+_INSERT_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed (
+    artifact_id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    label TEXT,
+    chunks INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    text,
+    artifact_id UNINDEXED,
+    label UNINDEXED,
+    line_start UNINDEXED,
+    line_end UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+# Запросы разделов отчёта: по ним в промпт добавляются найденные во всех логах фрагменты
+SECTION_QUERIES = {
+    "errors": (
+        "error exception failed failure fatal critical timeout refused reset rejected unavailable "
+        "outofmemoryerror stackoverflowerror caused ошибка исключение"
+    ),
+    "memory": (
+        "heap memory gc pause full allocation failure metaspace oldgen old young evacuation "
+        "outofmemoryerror oomkilled leak retained"
+    ),
+    "bad": (
+        "slow latency degraded warn warning retry throttled blocked deadlock waiting pool exhausted "
+        "queue full backpressure circuit"
+    ),
+}
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+_DIGITS = re.compile(r"\d+")
+
+
+@dataclass
+class Hit:
+    artifact_id: int
+    label: str
+    line_start: int
+    line_end: int
+    text: str
+    score: float
+
+    def format(self) -> str:
+        return f"[ФРАГМЕНТ: файл=\"{self.label}\" строки {self.line_start}–{self.line_end}]\n{self.text}"
+
+    def source(self) -> dict:
+        return {
+            "artifact_id": self.artifact_id,
+            "label": self.label,
+            "line_start": self.line_start,
+            "line_end": self.line_end,
+            "score": round(self.score, 3),
+        }
+
+
+def match_query(text: str) -> str:
+    """FTS5 MATCH expression: слова запроса через OR, каждое в кавычках (спецсимволы FTS5 не интерпретируются)."""
+    terms = []
+    for term in _TERM.findall(text.lower()):
+        if len(term) > 1 and term not in terms:
+            terms.append(term)
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def _line_chunks(f: io.TextIOBase, max_chars: int) -> Iterator[tuple[int, int, str]]:
+    """(первая строка, последняя строка, текст) подряд идущих строк, не длиннее max_chars (длинная строка — обрезается)."""
+    buf: list[str] = []
+    size = 0
+    start = 1
+    n = 0
+    for n, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")[:max_chars]
+        if buf and size + len(line) + 1 > max_chars:
+            if any(s.strip() for s in buf):
+                yield start, n - 1, "\n".join(buf)
+            buf, size, start = [], 0, n
+        buf.append(line)
+        size += len(line) + 1
+    if buf and any(s.strip() for s in buf):
+        yield start, n, "\n".join(buf)
+
+
+class ArtifactIndex:
+    """BM25 index of one test's artifacts (файл SQLite)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def sync(self, db: Session, test_id: int) -> dict:
+        """Bring the index in line with the test's artifacts; returns {indexed, reused, removed, chunks}."""
+        artifacts = db.query(Artifact).filter(Artifact.test_id == test_id).order_by(Artifact.id).all()
+        records = preprocessing.preprocess_artifacts(db, artifacts)
+        art_service = ArtifactsService()
+        stats = {"indexed": 0, "reused": 0, "removed": 0, "chunks": 0}
+        with self._connect() as conn:
+            stored = dict(conn.execute("SELECT artifact_id, key FROM indexed").fetchall())
+            for artifact_id in set(stored) - set(records):
+                self._drop(conn, artifact_id)
+                stats["removed"] += 1
+            for a in artifacts:
+                record = records.get(a.id)
+                if record is None:
+                    continue
+                key = f"{INDEX_VERSION}:{settings.retrieval_chunk_chars}:{record['sha256']}:{record['version']}"
+                if stored.get(a.id) == key:
+                    stats["reused"] += 1
+                    continue
+                self._drop(conn, a.id)
+                label = a.display_name or Path(a.file_path).name
+                count = self._index_artifact(conn, art_service, a, record, label)
+                conn.execute("INSERT INTO indexed VALUES (?, ?, ?, ?)", (a.id, key, label, count))
+                conn.commit()
+                stats["indexed"] += 1
+                stats["chunks"] += count
+        if stats["indexed"] or stats["removed"]:
+            logger.info("retrieval_index_synced", test_id=test_id, **stats)
+        return stats
+
+    @staticmethod
+    def _drop(conn: sqlite3.Connection, artifact_id: int) -> None:
+        conn.execute("DELETE FROM chunks WHERE artifact_id = ?", (artifact_id,))
+        conn.execute("DELETE FROM indexed WHERE artifact_id = ?", (artifact_id,))
+
+    def _index_artifact(self, conn: sqlite3.Connection, art_service: ArtifactsService, a: Artifact, record: dict, label: str) -> int:
+        max_chars = settings.retrieval_chunk_chars
+        if a.kind in preprocessing.BINARY_KINDS:
+            # Бинарные форматы — по дайджесту (классы кучи, события JFR, описание панели)
+            chunks: Iterator = _line_chunks(io.StringIO(record["digest"]["text"]), max_chars)
+            return self._insert(conn, a.id, label, chunks)
+        with art_service.open_artifact(a.file_path) as raw:
+            text = io.TextIOWrapper(raw, encoding=record.get("encoding") or "utf-8", errors="replace")
+            return self._insert(conn, a.id, label, _line_chunks(text, max_chars))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, artifact_id: int, label: str, chunks: Iterator[tuple[int, int, str]]) -> int:
+        count = 0
+        batch = []
+        for start, end, text in chunks:
+            batch.append((text, artifact_id, label, start, end))
+            if len(batch) >= _INSERT_BATCH:
+                conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", batch)
+            count += len(batch)
+        return count
+
+    def search(self, query: str, budget_tokens: int, counter: TokenCounter, top_k: Optional[int] = None) -> list[Hit]:
+        """
+        Top-k fragments by BM25 that fit in budget_tokens. Фрагменты, отличающиеся только числами (повторы одной
+        ошибки с разным временем), берутся один раз.
+        """
+        expr = match_query(query)
+        top_k = top_k or settings.retrieval_top_k
+        if not expr or budget_tokens <= 0:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT artifact_id, label, line_start, line_end, text, bm25(chunks) AS score "
+                "FROM chunks WHERE chunks MATCH ? ORDER BY score LIMIT ?",
+                (expr, top_k * 5),
+            ).fetchall()
+        hits: list[Hit] = []
+        seen: set[str] = set()
+        used = 0
+        for artifact_id, label, start, end, text, score in rows:
+            shape = hashlib.sha1(_DIGITS.sub("#", text).encode("utf-8")).hexdigest()
+            if shape in seen:
+                continue
+            hit = Hit(int(artifact_id), label, int(start), int(end), text, -score)
+            tokens = counter.count(hit.format()) + 2
+            if used + tokens > budget_tokens:
+                continue
+            seen.add(shape)
+            hits.append(hit)
+            used += tokens
+            if len(hits) >= top_k:
+                break
+        return hits
+
+
+_locks: dict[int, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def index_path(test_id: int) -> Path:
+    return settings.storage_path / INDEX_DIR_NAME / f"{test_id}.sqlite"
+
+
+def get_test_index(db: Session, test_id: int) -> ArtifactIndex:
+    """Index of the test, синхронизированный с его артефактами (одновременная сборка одного теста — по очереди)."""
+    with _locks_lock:
+        lock = _locks.setdefault(test_id, threading.Lock())
+    with lock:
+        index = ArtifactIndex(index_path(test_id))
+        index.sync(db, test_id)
+    return index
+
+
+def section_fragments(index: ArtifactIndex, counter: TokenCounter, budget_tokens: int) -> tuple[str, list[dict]]:
+    """
+    Fragments for every report section within budget_tokens (поровну на раздел); текст для промпта и источники.
+    Фрагмент, уже взятый для одного раздела, в другой не повторяется.
+    """
+    per_section = budget_tokens // max(1, len(SECTION_QUERIES))
+    parts: list[str] = []
+    sources: list[dict] = []
+    taken: set[tuple[int, int]] = set()
+    for section, query in SECTION_QUERIES.items():
+        hits = [h for h in index.search(query, per_section, counter) if (h.artifact_id, h.line_start) not in taken]
+        if not hits:
+            continue
+        taken.update((h.artifact_id, h.line_start) for h in hits)
+        parts.append(f"--- ФРАГМЕНТЫ ДЛЯ РАЗДЕЛА {section.upper()} (поиск по полному тексту артефактов) ---\n\n"
+                     + "\n\n".join(h.format() for h in hits))
+        sources.extend({**h.source(), "section": section} for h in hits)
+    return "\n\n".join(parts), sources
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: чтение артефактов, сжатых zstd при хранении, против несжатых файлов.
+
+Запуск (из каталога backend/):
+    python scripts/bench_artifact_compression.py                 # синтетический Java-лог ~200 МБ
+    python scripts/bench_artifact_compression.py --file app.log  # свой файл
+    python scripts/bench_artifact_compression.py --size-mb 50 --level 3
+
+Измеряет размер на диске, время записи и пропускную способность чтения
+через ArtifactsService (read_artifact целиком и iter_artifact чанками).
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def synthetic_java_log(size_mb: int) -> bytes:
+    """Java/Spring-like log: повторяющиеся шаблоны с меняющимися id, числами и временем."""
+    rnd = random.Random(42)
+    templates = [
+        "{ts} INFO  [http-nio-8080-exec-{t}] c.e.api.OrderController - GET /api/orders/{id} 200 {ms}ms",
+        "{ts} DEBUG [pool-{t}-thread-{t2}] c.e.cache.CacheService - cache miss key=order:{id}",
+        "{ts} WARN  [http-nio-8080-exec-{t}] c.e.db.Repository - slow query {ms}ms: SELECT * FROM orders WHERE id={id}",
+        "{ts} INFO  [kafka-consumer-{t}] c.e.events.Listener - consumed offset={id} partition={t2}",
+        "{ts} ERROR [http-nio-8080-exec-{t}] c.e.api.PaymentClient - call failed: java.net.SocketTimeoutException: Read timed out",
+    ]
+    target = size_mb * 1024 * 1024
+    buf = io.StringIO()
+    written = 0
+    sec = 0
+    while written < target:
+        sec += 1
+        ts = f"2025-02-15 10:{(sec // 60) % 60:02d}:{sec % 60:02d}.{rnd.randint(0, 999):03d}"
+        line = rnd.choice(templates).format(
+            ts=ts, t=rnd.randint(1, 200), t2=rnd.randint(1, 16), id=rnd.randint(1, 10**9), ms=rnd.randint(1, 3000)
+        ) + "\n"
+        buf.write(line)
+        written += len(line)
+    return buf.getvalue().encode("utf-8")
+
+
+def timed(fn) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, help="Existing log file to benchmark")
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of synthetic log (if --file not given)")
+    parser.add_argument("--level", type=int, default=3, help="zstd level")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["STORAGE_PATH"] = tmp
+        os.environ["ARTIFACTS_ZSTD_LEVEL"] = str(args.level)
+        from app.services.artifacts import ArtifactsService
+
+        data = args.file.read_bytes() if args.file else synthetic_java_log(args.size_mb)
+        size_mb = len(data) / 1024 / 1024
+        svc = ArtifactsService()
+
+        results = {}
+        for label, kind in (("raw", "custom_other"), ("zstd", "custom_java_log")):
+            write_s, (rel_path, meta) = timed(
+                lambda: svc.save_custom_artifact_stream(1, kind, io.BytesIO(data), display_name=f"bench_{label}")
+            )
+            read_all, read_iter = [], []
+            for _ in range(args.repeat):
+                t, content = timed(lambda: svc.read_artifact(str(rel_path)))
+                assert content == data
+                read_all.append(t)
+                t, _ = timed(lambda: sum(len(c) for c in svc.iter_artifact(str(rel_path))))
+                read_iter.append(t)
+            results[label] = {
+                "stored_mb": meta["stored_size_bytes"] / 1024 / 1024,
+                "write_s": write_s,
+                "read_all_s": min(read_all),
+                "read_iter_s": min(read_iter),
+            }
+            # Разный kind, но тот же sha256: удаляем тест, чтобы второй прогон не дедуплицировался
+            svc.delete_test_artifacts(1)
+
+    print(f"Input: {size_mb:.1f} MB, zstd level {args.level}, best of {args.repeat}")
+    print(f"{'':6} {'on disk, MB':>12} {'write, MB/s':>12} {'read_artifact, MB/s':>20} {'iter_artifact, MB/s':>20}")
+    for label, r in results.items():
+        print(
+            f"{label:6} {r['stored_mb']:12.1f} {size_mb / r['write_s']:12.0f} "
+            f"{size_mb / r['read_all_s']:20.0f} {size_mb / r['read_iter_s']:20.0f}"
+        )
+    print(f"Compression ratio: {results['raw']['stored_mb'] / results['zstd']['stored_mb']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: накладные расходы на анализ без реестра (новый клиент LLM, граф и соединение на каждый запуск)
+и с реестром (клиент и собранный граф переиспользуются, HTTP keep-alive через общий пул).
+
+Запуск (из каталога backend/):
+    python scripts/bench_llm_registry.py                 # 50 запусков против встроенной заглушки Ollama
+    python scripts/bench_llm_registry.py --runs 200 --latency-ms 2
+    python scripts/bench_llm_registry.py --llm-type openai  # клиент ChatOpenAI (httpx) вместо ChatOllama
+
+Заглушка отвечает в формате Ollama /api/chat (и OpenAI /v1/chat/completions) сразу (или через --latency-ms),
+поэтому разница во времени запуска — это именно обвязка: сборка графа, создание клиента, TCP-соединение.
+С реальной моделью время генерации добавляется одинаково в обоих режимах.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+REPORT = "<<<META>>>\nbench<<<END>>>\n<<<GOOD>>>\n-<<<END>>>\n<<<BAD>>>\n-<<<END>>>\n<<<ERRORS>>>\n-<<<END>>>\n<<<SOURCES>>>\n-<<<END>>>\n<<<FULL_REPORT>>>\nok<<<END>>>"
+
+
+def stub_ollama(latency_ms: float) -> tuple[ThreadingHTTPServer, set]:
+    """Ollama /api/chat (один JSON-чанк с done=true) и OpenAI /v1/chat/completions; считает клиентские соединения."""
+    connections: set = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Заголовки и тело уходят разными send: без TCP_NODELAY keep-alive упирается в delayed ACK (~40 мс)
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            connections.add(self.client_address)
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            message = {"role": "assistant", "content": REPORT}
+            if self.path.startswith("/v1/"):
+                body = json.dumps({
+                    "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": "bench",
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }).encode()
+            else:
+                body = (json.dumps({"model": "bench", "message": message, "done": True}) + "\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, connections
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Server-side delay per call")
+    parser.add_argument("--llm-type", choices=["ollama", "openai"], default="ollama")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["STORAGE_PATH"] = tmp
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        from app.agent import graph, registry
+        from app.agent import llm_factory
+
+        server, connections = stub_ollama(args.latency_ms)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}" + ("/v1" if args.llm_type == "openai" else "")
+
+        def run_once() -> float:
+            start = time.perf_counter()
+            result = graph.run_analysis(
+                {"project_name": "bench"}, "[АРТЕФАКТ: файл=a]\nx", ["a"],
+                llm_type=args.llm_type, llm_model="bench", llm_api_key="bench", llm_base_url=base_url,
+            )
+            assert not result.get("error"), result
+            return time.perf_counter() - start
+
+        run_once()  # импорт модулей LangChain/LangGraph — не в счёт
+        print(f"Runs: {args.runs}, client: {args.llm_type}, server latency: {args.latency_ms} ms")
+        print(f"{'mode':>10} {'mean, ms':>9} {'p50, ms':>8} {'p95, ms':>8} {'connections':>12}")
+        results = {}
+        for mode in ("fresh", "registry"):
+            registry.clear()
+            llm_factory.close_http_clients()
+            connections.clear()
+            times = []
+            for _ in range(args.runs):
+                if mode == "fresh":
+                    # Как до реестра: новый клиент и граф, новое соединение на каждый запуск
+                    registry.clear()
+                    llm_factory.close_http_clients()
+                times.append(run_once() * 1000)
+            times.sort()
+            results[mode] = statistics.mean(times)
+            print(
+                f"{mode:>10} {results[mode]:9.2f} {times[len(times) // 2]:8.2f} "
+                f"{times[int(len(times) * 0.95) - 1]:8.2f} {len(connections):>12}"
+            )
+        print(f"Saved per analysis: {results['fresh'] - results['registry']:.2f} ms")
+        llm_factory.close_http_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
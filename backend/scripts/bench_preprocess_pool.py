@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: предобработка множества логов подов (kind=k8s_logs) в пуле процессов при разном числе воркеров.
+
+Запуск (из каталога backend/):
+    python scripts/bench_preprocess_pool.py                          # 48 логов по 4 МБ, воркеры 1, 2, 4, … до числа ядер
+    python scripts/bench_preprocess_pool.py --files 200 --size-mb 2  # как после collect по namespace на 60 подов
+    python scripts/bench_preprocess_pool.py --workers 1 2 8 --memory-mb 1024
+
+Для каждого числа воркеров: время (лучшее из --repeat), пропускная способность в МБ/с и файлах/с,
+ускорение относительно одного воркера. Запуск пула (spawn, импорт модулей) измеряется отдельно.
+Результаты сверяются с однопоточным прогоном — порядок и содержимое должны совпасть.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def synthetic_pod_log(size_mb: int, seed: int) -> bytes:
+    """Spring-like pod log: повторяющиеся шаблоны, у каждого пода — свой набор чисел и id."""
+    rnd = random.Random(seed)
+    templates = [
+        "{ts} INFO  [http-nio-8080-exec-{t}] c.e.api.OrderController - GET /api/orders/{id} 200 {ms}ms",
+        "{ts} DEBUG [pool-{t}-thread-{t2}] c.e.cache.CacheService - cache miss key=order:{id}",
+        "{ts} WARN  [http-nio-8080-exec-{t}] c.e.db.Repository - slow query {ms}ms: SELECT * FROM orders WHERE id={id}",
+        "{ts} INFO  [kafka-consumer-{t}] c.e.events.Listener - consumed offset={id} partition={t2}",
+        "{ts} ERROR [http-nio-8080-exec-{t}] c.e.api.PaymentClient - call failed: java.net.SocketTimeoutException: Read timed out",
+    ]
+    target = size_mb * 1024 * 1024
+    buf = io.StringIO()
+    written = 0
+    sec = 0
+    while written < target:
+        sec += 1
+        ts = f"2025-02-15T10:{(sec // 60) % 60:02d}:{sec % 60:02d}.{rnd.randint(0, 999):03d}Z"
+        line = rnd.choice(templates).format(
+            ts=ts, t=rnd.randint(1, 200), t2=rnd.randint(1, 16), id=rnd.randint(1, 10**9), ms=rnd.randint(1, 3000)
+        ) + "\n"
+        buf.write(line)
+        written += len(line)
+    return buf.getvalue().encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=48, help="Number of pod logs")
+    parser.add_argument("--size-mb", type=int, default=4, help="Size of each log")
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts (default: 1, 2, 4, … up to CPU count)")
+    parser.add_argument("--memory-mb", type=int, default=2048, help="Per-worker memory limit (0 — no limit)")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *(2**i for i in range(1, cpus.bit_length()) if 2**i <= cpus), cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # До импорта app: воркеры (spawn) читают настройки из окружения
+        os.environ["STORAGE_PATH"] = tmp
+        os.environ["PREPROCESS_WORKER_MEMORY_MB"] = str(args.memory_mb)
+        from app.config import settings
+        from app.services import preprocessing
+        from app.services.artifacts import ArtifactsService
+
+        svc = ArtifactsService()
+        tasks = []
+        total_bytes = 0
+        for i in range(args.files):
+            data = synthetic_pod_log(args.size_mb, seed=i)
+            total_bytes += len(data)
+            rel_path, meta = svc.save_custom_artifact_stream(1, "k8s_logs", io.BytesIO(data), display_name=f"pod-{i}.log")
+            tasks.append((str(rel_path), "k8s_logs", meta["sha256"], f"pod-{i}.log"))
+        total_mb = total_bytes / 1024 / 1024
+
+        baseline = None
+        reference = None
+        print(f"Input: {args.files} pod logs, {total_mb:.0f} MB (stored zstd), CPUs: {cpus}, best of {args.repeat}")
+        print(f"{'workers':>7} {'startup, s':>11} {'time, s':>8} {'MB/s':>7} {'files/s':>8} {'speedup':>8}")
+        for w in workers:
+            settings.preprocess_workers = w
+            preprocessing.shutdown_pool()
+            startup = 0.0
+            if w > 1:
+                start = time.perf_counter()
+                pool = preprocessing._get_pool()
+                list(pool.map(preprocessing.digest_version, ["k8s_logs"] * w * 4))
+                startup = time.perf_counter() - start
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = preprocessing.preprocess_many(tasks)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                print(f"{w:>7} failed: {errors[0]!r} ({len(errors)} of {len(tasks)})")
+                continue
+            digests = [r["digest"]["text"] for r in results]
+            if reference is None:
+                reference = digests
+            assert digests == reference, "results differ from the first run (order or content)"
+            baseline = baseline or best
+            print(
+                f"{w:>7} {startup:11.2f} {best:8.2f} {total_mb / best:7.1f} {len(tasks) / best:8.1f} {baseline / best:7.2f}x"
+            )
+        preprocessing.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Общие фикстуры: БД и storage — во временном каталоге, фоновые прогревы и пулы процессов выключены.
+Переменные окружения задаются до импорта app (settings читаются при импорте).
+"""
+import os
+import tempfile
+from pathlib import Path
+
+_TMP = Path(tempfile.mkdtemp(prefix="ntview-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["STORAGE_PATH"] = str(_TMP / "storage")
+os.environ["OLLAMA_WARMUP_ON_STARTUP"] = "false"
+os.environ["PREPROCESS_WORKERS"] = "1"
+
+from typing import Any, Optional  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from pydantic import Field  # noqa: E402
+
+from app.config import settings  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch) -> Path:
+    """Отдельный storage на тест: артефакты, blob-ы, кэш и checkpoint-ы не видны другим тестам."""
+    monkeypatch.setattr(settings, "storage_path", tmp_path / "storage")
+    settings.artifacts_path().mkdir(parents=True)
+    return settings.storage_path
+
+
+@pytest.fixture
+def client(storage):
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def test_id(client) -> int:
+    """Проект и тест через API; возвращает id теста."""
+    project = client.post("/api/projects/", json={"name": "tests"}).json()
+    test = client.post("/api/tests/", json={"project_id": project["id"], "test_type": "load"}).json()
+    return test["id"]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Детерминированная модель вместо Ollama: map-вызов — «сводка» по заголовку артефакта,
+    анализ — отчёт с разделами ## META ... ## FULL_REPORT. fail_on — подстрока, на которой вызов падает.
+    """
+
+    model: str = "fake"
+    temperature: Optional[float] = None
+    prompts: list = Field(default_factory=list)
+    fail_on: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        from app.agent.nodes import MAP_SYSTEM
+
+        user = messages[-1].content
+        self.prompts.append(user)
+        if self.fail_on and self.fail_on in user:
+            raise ConnectionError("LLM backend unavailable")
+        if messages[0].content == MAP_SYSTEM:
+            header = next((line for line in user.splitlines() if line.startswith("[АРТЕФАКТ")), "?")
+            text = f"сводка {self.model}: {header}"
+        else:
+            text = (
+                f"## META\nмодель {self.model}\n## GOOD\n—\n## BAD\n—\n## ERRORS\n—\n## SOURCES\n—\n"
+                f"## FULL_REPORT\nсводок в промпте: {user.count('(сводка по файлу)')}"
+            )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+@pytest.fixture
+def fake_llm(storage, monkeypatch):
+    """FakeChatModel вместо клиента LLM; кэш ответов, checkpointer и реестр графов — свои на тест."""
+    from app.agent import checkpointer, llm_cache, llm_factory, registry
+
+    model = FakeChatModel()
+    monkeypatch.setattr(llm_factory, "get_llm", lambda *args, **kwargs: model)
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(checkpointer, "_saver", None)
+    registry.clear()
+    yield model
+    registry.clear()
+    if checkpointer._saver is not None:
+        checkpointer._saver.conn.close()
@@ -0,0 +1,55 @@
+"""Ограниченные выдержки из больших артефактов: голова, хвост, окна с ошибками (user-005)."""
+import io
+
+from app.services.artifact_sampler import resample_excerpt, sample_file, sample_stream
+
+
+def _big_log() -> bytes:
+    lines = [f"2024-05-01 12:00:{i % 60:02d} INFO request {i} ok\n" for i in range(200_000)]
+    lines[100_000] = "2024-05-01 12:30:00 ERROR java.lang.OutOfMemoryError: Java heap space\n"
+    lines[-1] = "2024-05-01 13:00:00 FATAL shutting down\n"
+    return "".join(lines).encode()
+
+
+def test_small_file_is_returned_whole(tmp_path):
+    path = tmp_path / "small.log"
+    path.write_bytes(b"one\ntwo\n")
+    text, info = sample_file(path, 1024)
+    assert text == "one\ntwo\n"
+    assert info["skipped_bytes"] == 0
+
+
+def test_large_file_excerpt_is_bounded_and_keeps_errors(tmp_path):
+    data = _big_log()
+    path = tmp_path / "big.log"
+    path.write_bytes(data)
+    text, info = sample_file(path, 64 * 1024)
+    assert info["size_bytes"] == len(data)
+    assert info["excerpt_bytes"] <= 64 * 1024 + 2048
+    assert "OutOfMemoryError" in text
+    assert "FATAL shutting down" in text
+    assert text.startswith("2024-05-01 12:00:00 INFO request 0 ok")
+    assert {s["reason"] for s in info["segments"]} >= {"head", "tail"}
+
+
+def test_stream_excerpt_matches_file_contract(tmp_path):
+    data = _big_log()
+    text, info = sample_stream(io.BytesIO(data), 64 * 1024, chunk_size=32 * 1024)
+    assert info["size_bytes"] == len(data)
+    assert info["excerpt_bytes"] <= 64 * 1024 + 2048
+    assert "OutOfMemoryError" in text and "FATAL shutting down" in text
+
+
+def test_resample_shrinks_stored_excerpt_keeping_head_tail_and_errors(tmp_path):
+    path = tmp_path / "big.log"
+    path.write_bytes(_big_log())
+    text, info = sample_file(path, 64 * 1024)
+    for seg in info["segments"]:
+        assert text[seg["text_start"] : seg["text_end"]].encode() == _big_log()[seg["start"] : seg["end"]]
+
+    small, small_info = resample_excerpt(text, info, 16 * 1024)
+    assert len(small) <= 16 * 1024
+    assert small.startswith("2024-05-01 12:00:00 INFO request 0 ok")
+    assert "OutOfMemoryError" in small and small.rstrip().endswith("FATAL shutting down")
+    assert small_info["skipped_bytes"] > info["skipped_bytes"]
+    assert resample_excerpt(text, info, len(text))[0] == text
@@ -0,0 +1,121 @@
+"""Content-addressed blob store: дедупликация, счётчик ссылок, сборка мусора (user-002)."""
+import hashlib
+import os
+
+import pytest
+
+from app.services import artifacts as artifacts_module
+from app.services.artifacts import BLOBS_DIR_NAME, ArtifactsService
+
+
+def _blobs(storage) -> list:
+    return sorted(p.name for p in (storage / "artifacts" / BLOBS_DIR_NAME).rglob("*") if p.is_file())
+
+
+def test_same_content_is_stored_once(storage):
+    svc = ArtifactsService()
+    data = b"-Xmx4g -XX:+UseG1GC\n"
+    sha = hashlib.sha256(data).hexdigest()
+    _, first = svc.save_custom_artifact(1, "custom_other", data, display_name="opts")
+    _, second = svc.save_custom_artifact(2, "custom_other", data, display_name="opts")
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert _blobs(storage) == [sha]
+    assert svc.blob_refcount(sha) == 2
+
+
+def test_blob_removed_with_last_reference(storage):
+    svc = ArtifactsService()
+    data = b"shared content"
+    sha = hashlib.sha256(data).hexdigest()
+    svc.save_custom_artifact(1, "custom_other", data, display_name="a")
+    svc.save_custom_artifact(2, "custom_other", data, display_name="b")
+
+    svc.delete_test_artifacts(1, [sha])
+    assert svc.blob_refcount(sha) == 1
+    svc.delete_test_artifacts(2, [sha])
+    assert _blobs(storage) == []
+
+
+def test_gc_checks_only_known_blobs(storage, monkeypatch):
+    svc = ArtifactsService()
+    data = b"only this test"
+    sha = hashlib.sha256(data).hexdigest()
+    svc.save_custom_artifact(1, "custom_other", data, display_name="a")
+    svc.save_custom_artifact(2, "custom_other", b"unrelated", display_name="b")
+
+    scandir = os.scandir
+
+    def no_scan(path=".", *args):
+        assert BLOBS_DIR_NAME not in str(path), f"blob store scanned: {path}"
+        return scandir(path, *args)
+
+    monkeypatch.setattr(artifacts_module.os, "scandir", no_scan)
+    svc.delete_test_artifacts(1, [sha])
+    assert not svc.has_blob(sha)
+
+
+def test_gc_falls_back_to_scan_for_unknown_sha(storage):
+    svc = ArtifactsService()
+    data = b"legacy artifact"
+    svc.save_custom_artifact(1, "custom_other", data, display_name="a")
+    svc.delete_test_artifacts(1)
+    assert _blobs(storage) == []
+
+
+def test_replacing_file_releases_old_blob(storage):
+    svc = ArtifactsService()
+    old = svc.save_custom_artifact(1, "custom_other", b"v1", display_name="same")[1]["sha256"]
+    svc.save_custom_artifact(1, "custom_other", b"v2", display_name="same")
+    assert not svc.has_blob(old)
+
+
+def test_link_failure_is_an_error_not_a_copy(storage, monkeypatch):
+    svc = ArtifactsService()
+
+    def no_links(src, dst):
+        raise PermissionError("hard links not supported")
+
+    monkeypatch.setattr(artifacts_module.os, "link", no_links)
+    with pytest.raises(OSError, match="hard links"):
+        svc.save_custom_artifact(1, "custom_other", b"content", display_name="a")
+    # Ни файла теста, ни осиротевшего blob-а
+    assert _blobs(storage) == []
+    assert [p.name for p in (storage / "artifacts" / "1").iterdir()] == []
+
+
+def test_upload_by_hash_is_scoped_to_project(client):
+    def new_test(project_name: str) -> int:
+        project = client.post("/api/projects/", json={"name": project_name}).json()
+        return client.post("/api/tests/", json={"project_id": project["id"], "test_type": "load"}).json()["id"]
+
+    owner = new_test("owner")
+    project_id = client.get(f"/api/tests/{owner}").json()["project_id"]
+    same_project_test = client.post("/api/tests/", json={"project_id": project_id, "test_type": "load"}).json()["id"]
+    other = new_test("other")
+
+    data = os.urandom(1024)
+    sha = hashlib.sha256(data).hexdigest()
+    client.post(f"/api/artifacts/test/{owner}/upload", data={"kind": "custom_other"}, files={"file": ("a.bin", data)})
+
+    form = {"kind": "custom_other", "sha256": sha, "display_name": "a.bin"}
+    assert client.post(f"/api/artifacts/test/{other}/upload-by-hash", data=form).status_code == 404
+    r = client.post(f"/api/artifacts/test/{same_project_test}/upload-by-hash", data=form)
+    assert r.status_code == 200, r.text
+    assert ArtifactsService().read_artifact(r.json()["file_path"]) == data
+
+
+def test_upload_by_hash_takes_size_from_existing_artifact(client, test_id, monkeypatch):
+    data = b"2024-01-01 12:00:00 INFO started\n" * 1000
+    sha = hashlib.sha256(data).hexdigest()
+    client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": "custom_java_log"}, files={"file": ("app.log", data)})
+
+    # Сжатый blob не распаковывается ради размера, а дубликат находится по колонке sha256
+    def no_decompress(self, path):
+        raise AssertionError("blob decompressed")
+
+    monkeypatch.setattr(ArtifactsService, "_content_size", no_decompress)
+    form = {"kind": "custom_java_log", "sha256": sha.upper(), "display_name": "copy.log"}
+    r = client.post(f"/api/artifacts/test/{test_id}/upload-by-hash", data=form)
+    assert r.status_code == 200, r.text
+    assert r.json()["metadata"]["size_bytes"] == len(data)
+    assert r.json()["metadata"]["compression"] == "zstd"
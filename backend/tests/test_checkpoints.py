@@ -0,0 +1,131 @@
+"""Продолжение прерванного анализа по checkpoint-ам в storage/checkpoints.sqlite (user-020)."""
+import threading
+
+import pytest
+
+from app.agent import checkpointer, registry
+from app.agent.graph import run_analysis
+from app.agent.nodes import is_transient
+
+
+def _chunk(index: int, name: str) -> dict:
+    header = f'[АРТЕФАКТ: файл="{name}" kind=custom_other id={index}]'
+    return {"index": index, "ids": [index], "label": name, "header": header, "text": f"ERROR в {name}", "part": 1, "parts": 1, "hash": name}
+
+
+def _run(chunks: list, events: list, **kwargs) -> dict:
+    return run_analysis(
+        test_meta={"project_name": "p"},
+        artifact_contents="",
+        llm_type="ollama",
+        llm_model="fake",
+        graph_mode="map_reduce",
+        artifact_chunks=chunks,
+        max_concurrency=1,
+        use_cache=False,
+        run_key="test-1",
+        on_event=lambda event, data: events.append((event, data)),
+        **kwargs,
+    )
+
+
+def _restart() -> None:
+    """Как после перезапуска процесса: новые граф и соединение с файлом checkpoint-ов."""
+    registry.clear()
+    checkpointer._saver.conn.close()
+    checkpointer._saver = None
+
+
+def test_failed_map_call_is_reissued_on_resume(fake_llm):
+    chunks = [_chunk(0, "a.log"), _chunk(1, "b.log")]
+    fake_llm.fail_on = "b.log"
+    with pytest.raises(ConnectionError):
+        _run(chunks, [])
+    assert len(fake_llm.prompts) == 2
+    # Недоступность модели не записана как готовая сводка: поток остался незавершённым
+    assert checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-")
+
+    _restart()
+    fake_llm.fail_on = None
+    events = []
+    result = _run(chunks, events)
+
+    assert [e for e, _ in events].count("resumed") == 1
+    # Заново — только сводка b.log и reduce; сводка a.log взята из checkpoint-а
+    assert [p.splitlines()[4] for p in fake_llm.prompts[2:-1]] == [chunks[1]["header"]]
+    assert not result["error"]
+    assert sorted(p["label"] for p in result["partials"]) == ["a.log", "b.log"]
+    assert all(p["summary"] and not p["error"] for p in result["partials"])
+    assert "сводок в промпте: 2" in result["report_text"]
+    assert checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-") == []
+
+
+def test_changed_inputs_start_over(fake_llm):
+    fake_llm.fail_on = "b.log"
+    with pytest.raises(ConnectionError):
+        _run([_chunk(0, "a.log"), _chunk(1, "b.log")], [])
+
+    fake_llm.fail_on = None
+    events = []
+    result = _run([_chunk(0, "a.log"), _chunk(1, "c.log")], events)
+    assert "resumed" not in [e for e, _ in events]
+    assert sorted(p["label"] for p in result["partials"]) == ["a.log", "c.log"]
+    assert checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-") == []
+
+
+@pytest.mark.parametrize("second_log", ["a.log", "c.log"])
+def test_overlapping_runs_keep_their_own_threads(fake_llm, monkeypatch, second_log):
+    entered, release = threading.Event(), threading.Event()
+    generate = type(fake_llm)._generate
+
+    def gated(self, messages, *args, **kwargs):
+        # Первый вызов (запуск 1) ждёт, пока не закончится запуск 2
+        if not entered.is_set():
+            entered.set()
+            assert release.wait(10)
+        return generate(self, messages, *args, **kwargs)
+
+    monkeypatch.setattr(type(fake_llm), "_generate", gated)
+    running = {"1"}
+    first: dict = {}
+    worker = threading.Thread(target=lambda: first.update(
+        _run([_chunk(0, "a.log")], [], run_id="1", run_finished=lambda run_id: run_id not in running)
+    ))
+    worker.start()
+    try:
+        assert entered.wait(10)
+        [first_thread] = checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-")
+        assert first_thread.endswith("-1")
+
+        # Тот же тест, те же или другие входные данные: поток выполняющегося запуска не продолжается и не удаляется
+        events = []
+        second = _run([_chunk(0, second_log)], events, run_id="2", run_finished=lambda run_id: run_id not in running)
+        assert "resumed" not in [e for e, _ in events]
+        assert not second["error"] and second["partials"][0]["label"] == second_log
+        assert checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-") == [first_thread]
+    finally:
+        release.set()
+        worker.join(10)
+    assert not first["error"] and first["partials"][0]["label"] == "a.log"
+    assert checkpointer.thread_ids(checkpointer.get_checkpointer(), "test-1-") == []
+
+
+def test_non_transient_map_error_is_reported_in_partial(fake_llm, monkeypatch):
+    def broken(self, messages, *args, **kwargs):
+        raise ValueError("prompt too long")
+
+    monkeypatch.setattr(type(fake_llm), "_generate", broken)
+    result = _run([_chunk(0, "a.log")], [])
+    assert result["error"] == "prompt too long"
+
+
+def test_transient_errors_include_wrapped_ones():
+    try:
+        try:
+            raise ConnectionRefusedError("refused")
+        except OSError as e:
+            raise RuntimeError("client error") from e
+    except RuntimeError as wrapped:
+        assert is_transient(wrapped)
+    assert is_transient(InterruptedError("cancelled"))
+    assert not is_transient(ValueError("bad request"))
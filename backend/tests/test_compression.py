@@ -0,0 +1,32 @@
+"""Сжатие текстовых артефактов zstd при хранении (user-003)."""
+from app.services.artifacts import ZSTD_SUFFIX, ArtifactsService
+
+
+def test_text_kinds_are_stored_compressed_and_read_transparently(storage):
+    svc = ArtifactsService()
+    data = b"2024-05-01 12:00:00 INFO request handled in 12 ms\n" * 20_000
+    path, meta = svc.save_custom_artifact(1, "custom_java_log", data, display_name="app")
+    assert str(path).endswith(ZSTD_SUFFIX)
+    assert meta["compression"] == "zstd"
+    assert meta["size_bytes"] == len(data)
+    assert meta["stored_size_bytes"] < len(data) // 10
+    assert svc.read_artifact(str(path)) == data
+    assert b"".join(svc.iter_artifact(str(path), chunk_size=4096)) == data
+    assert svc.original_name(str(path)) == "app.log"
+
+
+def test_binary_kinds_are_stored_as_is(storage):
+    svc = ArtifactsService()
+    path, meta = svc.save_custom_artifact(1, "custom_heap_dump", b"JAVA PROFILE 1.0.2\0", display_name="heap")
+    assert str(path).endswith(".hprof")
+    assert meta["compression"] is None
+
+
+def test_compress_file_in_place(storage):
+    svc = ArtifactsService()
+    plain = storage / "artifacts" / "1" / "k8s" / "logs_pod.txt"
+    plain.parent.mkdir(parents=True)
+    plain.write_bytes(b"line\n" * 1000)
+    compressed = svc.compress_file(str(plain), "k8s_logs")
+    assert compressed.endswith(ZSTD_SUFFIX) and not plain.exists()
+    assert svc.read_artifact(compressed) == b"line\n" * 1000
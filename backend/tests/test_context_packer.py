@@ -0,0 +1,76 @@
+"""Упаковка артефактов в бюджет токенов (user-011)."""
+import random
+
+from app.agent.context_packer import ArtifactBlock, TokenCounter, allocate, pack_artifacts, split_block
+
+
+def _block(i: int, text: str, fit=None) -> ArtifactBlock:
+    return ArtifactBlock(ids=[i], label=f"a{i}", kind="custom_other", header=f"--- a{i} ---", text=text, fit=fit)
+
+
+def _unique_text(lines: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    return "\n".join(f"{rnd.getrandbits(64):x} user={rnd.random():.6f} path=/api/{rnd.getrandbits(20)}" for _ in range(lines))
+
+
+def test_token_estimate_splits_digits_for_qwen():
+    text = "latency 1234567 ms"
+    assert TokenCounter("qwen2.5:14b").count(text) > TokenCounter("gpt-4o").count(text)
+    assert TokenCounter().count("") == 0
+
+
+def test_allocation_respects_floor_and_density():
+    repetitive = _block(1, "2024-01-01 INFO heartbeat ok\n" * 2000)
+    unique = _block(2, _unique_text(2000))
+    small = _block(3, "-Xmx4g -XX:+UseG1GC")
+    counter = TokenCounter()
+    budget = 3000
+    pack_artifacts([repetitive, unique, small], budget, counter, min_tokens_per_artifact=200)
+
+    assert small.tokens_allocated == small.tokens_needed and not small.truncated
+    assert repetitive.tokens_allocated >= 200
+    # Уникальные данные плотнее повторяющегося лога — им достаётся больше остатка
+    assert unique.density > repetitive.density
+    assert unique.tokens_allocated > repetitive.tokens_allocated
+    assert sum(b.tokens_allocated for b in (repetitive, unique, small)) <= budget
+    for b in (repetitive, unique):
+        assert b.truncated
+        assert b.tokens_used <= b.tokens_allocated * 1.1
+
+
+def test_everything_fits_without_truncation():
+    blocks = [_block(1, "short"), _block(2, "also short")]
+    text = pack_artifacts(blocks, 10_000, TokenCounter(), min_tokens_per_artifact=100)
+    assert not any(b.truncated for b in blocks)
+    assert "--- a1 ---\nshort" in text and "also short" in text
+
+
+def test_fit_rebuilds_block_instead_of_cutting_tail():
+    calls = []
+
+    def fit(max_chars: int) -> str:
+        calls.append(max_chars)
+        return "rebuilt excerpt\n" * (max_chars // 32)
+
+    block = _block(1, _unique_text(3000), fit=fit)
+    pack_artifacts([block], 500, TokenCounter(), min_tokens_per_artifact=100)
+    assert calls and block.packed_text.startswith("--- a1 ---\nrebuilt excerpt")
+
+
+def test_allocate_never_exceeds_need():
+    blocks = [_block(i, "") for i in range(3)]
+    for b, need in zip(blocks, (50, 5000, 5000)):
+        b.tokens_needed, b.density = need, 0.5
+    allocate(blocks, 2000, 400)
+    assert blocks[0].tokens_allocated == 50
+    assert sum(b.tokens_allocated for b in blocks) <= 2000
+    assert blocks[1].tokens_allocated == blocks[2].tokens_allocated
+
+
+def test_split_block_parts_fit_limit():
+    counter = TokenCounter()
+    block = _block(1, _unique_text(500))
+    parts = split_block(block, counter, 400)
+    assert block.chunks == len(parts) > 1
+    assert all(counter.count(block.header) + 1 + counter.count(p) <= 400 for p in parts)
+    assert "\n".join(parts) == block.text
@@ -0,0 +1,82 @@
+"""Разбор unified GC log в статистический дайджест (user-006)."""
+import io
+
+from app.services.digests.gc_log import format_gc_digest, gc_digest, parse_gc_log, parse_gc_log_stream
+
+
+def _g1_log() -> str:
+    lines = ["[0.001s][info][gc] Using G1", "[0.002s][info][gc,init] Heap Region Size: 4M"]
+    for i in range(1, 21):
+        t = i * 1.0
+        lines.append(f"[{t:.3f}s][info][gc] GC({i}) Pause Young (Normal) (G1 Evacuation Pause) 600M->200M(1024M) {10 + i:.3f}ms")
+    lines.append("[21.500s][info][gc] GC(21) Pause Full (G1 Compaction Pause) 1000M->900M(1024M) 1500.000ms")
+    lines.append("[21.600s][warning][gc] GC overhead limit nearly exceeded")
+    return "\n".join(lines) + "\n"
+
+
+def test_pause_statistics_by_kind():
+    d = gc_digest(parse_gc_log(_g1_log()))
+    assert d["collector"] == "G1"
+    assert d["pauses"]["count"] == 21
+    assert d["pauses_by_kind"]["young"]["count"] == 20
+    assert d["pauses_by_kind"]["young"]["max_ms"] == 30.0
+    assert d["full_gc_count"] == 1
+    assert d["longest_pauses"][0]["kind"] == "full"
+    assert d["longest_pauses"][0]["pause_ms"] == 1500.0
+    assert d["heap"]["after_full_gc_max_mb"] == 900.0
+    assert d["warnings"] == {"GC overhead limit nearly exceeded": 1}
+
+
+def test_streaming_parse_matches_whole_text_across_chunk_boundaries():
+    text = _g1_log()
+    whole = gc_digest(parse_gc_log(text))
+    # Маленькие чанки режут строки пополам — результат не должен меняться
+    streamed = gc_digest(parse_gc_log_stream(io.BytesIO(text.encode()), chunk_chars=97))
+    assert streamed == whole
+
+
+def test_digest_text_mentions_key_numbers():
+    text = format_gc_digest(gc_digest(parse_gc_log(_g1_log())))
+    assert "G1" in text
+    assert "1500" in text
+
+
+def test_empty_log():
+    d = gc_digest(parse_gc_log(""))
+    assert d["pauses"]["count"] == 0
+
+
+def _g1_phases_log() -> str:
+    lines = ["[0.001s][info][gc] Using G1"]
+    for i in range(1, 101):
+        t = f"[{i:.3f}s][info][gc,phases   ] GC({i})"
+        lines += [
+            f"[{i:.3f}s][info][gc,start    ] GC({i}) Pause Young (Normal) (G1 Evacuation Pause)",
+            f"{t}   Pre Evacuate Collection Set: 0.{i % 10}ms",
+            f"{t}   Merge Heap Roots: 0.2ms",
+            f"{t}   Evacuate Collection Set: {i}.5ms",
+            f"[{i:.3f}s][debug][gc,phases   ] GC({i})     Ext Root Scanning (ms):   Min:  0.1, Avg:  0.2, Max:  0.3",
+            f"[{i:.3f}s][debug][gc,phases   ] GC({i})     Prepare TLABs: 0.0ms",
+            f"{t}   Post Evacuate Collection Set: 1.25ms",
+            f"{t}   Other: 0.4ms",
+            f"[{i:.3f}s][info][gc          ] GC({i}) Pause Young (Normal) (G1 Evacuation Pause) 600M->200M(1024M) {i + 2.35:.3f}ms",
+        ]
+    lines.append("[101.000s][info][gc,phases   ] GC(101) Phase 1: Mark live objects 120.345ms")
+    return "\n".join(lines) + "\n"
+
+
+def test_phase_durations_per_phase():
+    d = gc_digest(parse_gc_log(_g1_phases_log()))
+    phases = d["phases"]
+    assert list(phases)[0] == "Evacuate Collection Set"
+    evac = phases["Evacuate Collection Set"]
+    assert evac["count"] == 100 and evac["max_ms"] == 100.5 and evac["p50_ms"] == 51.0
+    assert phases["Post Evacuate Collection Set"]["p99_ms"] == 1.25
+    assert phases["Other"]["count"] == 100
+    assert phases["Phase 1: Mark live objects"]["max_ms"] == 120.345
+    # Подфазы debug-уровня не смешиваются с фазами верхнего уровня
+    assert "Prepare TLABs" not in phases and "Ext Root Scanning (ms)" not in phases
+    assert d["pauses"]["count"] == 100
+    assert "Evacuate Collection Set: 100 шт." in format_gc_digest(d)
+    streamed = gc_digest(parse_gc_log_stream(io.BytesIO(_g1_phases_log().encode()), chunk_chars=211))
+    assert streamed == d
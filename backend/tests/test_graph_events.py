@@ -0,0 +1,43 @@
+"""События хода анализа для SSE: узлы графа и токены ответа модели (user-018)."""
+from app.agent.graph import run_analysis
+
+
+def test_run_analysis_emits_node_and_token_events(fake_llm):
+    events = []
+    result = run_analysis(
+        test_meta={"project_name": "p"},
+        artifact_contents="[АРТЕФАКТ: файл=\"app.log\"]\nERROR timeout",
+        llm_type="ollama",
+        llm_model="fake",
+        on_event=lambda event, data: events.append((event, data)),
+    )
+
+    nodes = [(d["node"], d["status"]) for e, d in events if e == "node"]
+    assert nodes == [("analyze", "start"), ("analyze", "end"), ("format", "start"), ("format", "end")]
+    tokens = "".join(d["text"] for e, d in events if e == "token")
+    assert "## META" in tokens
+    assert all(d["node"] == "analyze" for e, d in events if e == "token")
+    assert result["report_text"] and not result["error"]
+
+
+def test_cached_answer_has_no_token_events(fake_llm):
+    kwargs = dict(test_meta={"project_name": "p"}, artifact_contents="x", llm_type="ollama", llm_model="fake")
+    run_analysis(**kwargs)
+    events = []
+    run_analysis(**kwargs, on_event=lambda event, data: events.append(event))
+    assert "token" not in events and "node" in events
+    assert len(fake_llm.prompts) == 1
+
+
+def test_streamed_map_reduce_with_single_map_slot(fake_llm):
+    chunks = [
+        {"index": i, "ids": [i], "label": f"{i}.log", "header": f'[АРТЕФАКТ: файл="{i}.log"]', "text": "ERROR", "part": 1, "parts": 1}
+        for i in range(2)
+    ]
+    events = []
+    result = run_analysis(
+        test_meta={}, artifact_contents="", llm_type="ollama", llm_model="fake", graph_mode="map_reduce",
+        artifact_chunks=chunks, max_concurrency=1, on_event=lambda event, data: events.append(event),
+    )
+    assert "сводок в промпте: 2" in result["report_text"]
+    assert "token" in events
@@ -0,0 +1,92 @@
+"""Сводка HPROF: гистограмма, массивы, дубликаты строк при ограниченной памяти (user-009)."""
+import struct
+
+import pytest
+
+from app.services.digests.hprof import HprofError, HprofSummarizer, format_hprof_summary, summarize_hprof
+
+STRING_CLASS = 0x100
+FOO_CLASS = 0x200
+NAMES = {1: b"java/lang/String", 2: b"value", 3: b"hash", 4: b"com/example/Foo"}
+
+
+def _record(tag: int, body: bytes) -> bytes:
+    return struct.pack(">BII", tag, 0, len(body)) + body
+
+
+def _class_dump(class_id: int, fields: list[tuple[int, int]]) -> bytes:
+    out = struct.pack(">BII", 0x20, class_id, 0) + struct.pack(">6I", 0, 0, 0, 0, 0, 0)
+    out += struct.pack(">IHHH", 8, 0, 0, len(fields))
+    return out + b"".join(struct.pack(">IB", name, t) for name, t in fields)
+
+
+def _string(obj: int, value: int) -> bytes:
+    return struct.pack(">BIII", 0x21, obj, 0, STRING_CLASS) + struct.pack(">I", 8) + struct.pack(">II", value, 0)
+
+
+def _bytes_array(obj: int, data: bytes) -> bytes:
+    return struct.pack(">BIIIB", 0x23, obj, 0, len(data), 8) + data
+
+
+def _hprof(strings: list[bytes], extra: bytes = b"") -> bytes:
+    """Дамп с id size 4: класс String (value, hash), по экземпляру и byte[] на каждое значение."""
+    out = b"JAVA PROFILE 1.0.2\0" + struct.pack(">IQ", 4, 1_700_000_000_000)
+    for sid, name in NAMES.items():
+        out += _record(0x01, struct.pack(">I", sid) + name)
+    out += _record(0x02, struct.pack(">IIII", 1, STRING_CLASS, 0, 1))
+    out += _record(0x02, struct.pack(">IIII", 2, FOO_CLASS, 0, 4))
+    heap = _class_dump(STRING_CLASS, [(2, 2), (3, 10)])
+    for i, text in enumerate(strings):
+        heap += _bytes_array(0x10000 + i, text) + _string(0x80000 + i, 0x10000 + i)
+    heap += extra
+    return out + _record(0x1C, heap)
+
+
+def test_histogram_and_string_duplicates():
+    foo = b"".join(struct.pack(">BIIII", 0x21, 0x900 + i, 0, FOO_CLASS, 0) for i in range(3))
+    # byte[] с тем же содержимым, но не value строки — не дубликат строки
+    orphan = _bytes_array(0x700, b"hello")
+    d = summarize_hprof(_hprof([b"hello"] * 5 + [b"world"], extra=foo + orphan))
+
+    hist = {c["class"]: c for c in d["histogram"]}
+    assert hist["java.lang.String"]["instances"] == 6
+    assert hist["com.example.Foo"]["instances"] == 3
+    assert hist["byte[]"]["instances"] == 7
+    assert d["largest_arrays"][0]["type"] == "byte[]"
+
+    s = d["strings"]
+    assert s["count"] == 6
+    assert s["value_arrays"] == 6 and s["distinct"] == 2
+    assert s["duplicated_values"] == 1 and s["duplicate_copies"] == 4
+    assert s["sample_rate"] == 1
+    assert s["top_duplicates"][0]["copies"] == 5
+    assert s["top_duplicates"][0]["preview"] == "hello"
+    assert "5×" in format_hprof_summary(d)
+
+
+def test_string_buffers_are_bounded():
+    values = [f"value-{i % 10}".encode() for i in range(2000)]
+    summarizer = HprofSummarizer(_hprof(values), sample_max=64)
+    d = summarizer.run()
+
+    assert len(summarizer._text_ids) <= 64
+    assert len(summarizer._string_values) <= 64
+    s = d["strings"]
+    assert s["count"] == 2000
+    assert s["sample_rate"] < 1
+    # Оценка по выборке: порядок величины сохраняется, все значения — «тяжёлые» дубликаты
+    assert 1000 <= s["duplicate_copies"] <= 4000
+    assert {x["preview"] for x in s["top_duplicates"]} <= {f"value-{i}" for i in range(10)}
+    assert "оценка по выборке" in format_hprof_summary(d)
+
+
+def test_truncated_dump_is_summarized():
+    data = _hprof([b"abc"] * 20)
+    d = summarize_hprof(data[: len(data) - 30])
+    assert d["truncated"]
+    assert d["strings"]["count"] > 0
+
+
+def test_not_hprof():
+    with pytest.raises(HprofError):
+        summarize_hprof(b"PK\x03\x04 not a heap dump")
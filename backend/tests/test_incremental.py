@@ -0,0 +1,91 @@
+"""Инкрементальный повторный анализ map_reduce: сводки неизменившихся артефактов из artifact_findings (user-023)."""
+import pytest
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db import models
+from app.db.models import Artifact, ArtifactFinding
+from app.services.analysis_runner import run_analysis_for_test
+
+
+@pytest.fixture
+def incremental(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_graph_mode", "map_reduce")
+    # Без кэша ответов: вызов модели, которого нет в prompts, мог бы оказаться попаданием в кэш
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+
+
+def _upload(client, test_id: int, name: str, text: str) -> int:
+    r = client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": "custom_other"}, files={"file": (name, text.encode())})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _analyze(test_id: int, **kwargs) -> tuple[str, list[str]]:
+    """Report text and labels of stored findings after one analysis run."""
+    db = SessionLocal()
+    try:
+        report, _ = run_analysis_for_test(db, test_id, **kwargs)
+        labels = sorted(f.label for f in db.query(ArtifactFinding).filter(ArtifactFinding.test_id == test_id))
+        return report.report_text, labels
+    finally:
+        db.close()
+
+
+def _map_calls(llm) -> list[str]:
+    return [p for p in llm.prompts if "Объём сводки" in p]
+
+
+def test_only_new_artifact_is_summarized(client, test_id, fake_llm, incremental):
+    _upload(client, test_id, "a.txt", "ERROR in a\n")
+    _, findings = _analyze(test_id)
+    assert len(_map_calls(fake_llm)) == 1 and len(findings) == 1
+
+    _upload(client, test_id, "b.txt", "ERROR in b\n")
+    before = len(fake_llm.prompts)
+    report, findings = _analyze(test_id)
+    new_calls = _map_calls(fake_llm)[1:]
+    assert len(new_calls) == 1 and "b.txt" in new_calls[0]
+    assert len(fake_llm.prompts) - before == 2  # map b.txt + reduce
+    assert "сводок в промпте: 2" in report
+    assert len(findings) == 2
+
+
+def test_findings_of_removed_artifact_are_pruned(client, test_id, fake_llm, incremental):
+    a_id = _upload(client, test_id, "a.txt", "ERROR in a\n")
+    _upload(client, test_id, "b.txt", "ERROR in b\n")
+    _analyze(test_id)
+    db = SessionLocal()
+    try:
+        db.delete(db.get(Artifact, a_id))
+        db.commit()
+    finally:
+        db.close()
+
+    before = len(_map_calls(fake_llm))
+    report, findings = _analyze(test_id)
+    assert len(_map_calls(fake_llm)) == before
+    assert "сводок в промпте: 1" in report
+    assert len(findings) == 1
+
+
+def test_no_cache_recomputes_everything(client, test_id, fake_llm, incremental):
+    _upload(client, test_id, "a.txt", "ERROR in a\n")
+    _upload(client, test_id, "b.txt", "ERROR in b\n")
+    _analyze(test_id)
+    _analyze(test_id, use_cache=False)
+    assert len(_map_calls(fake_llm)) == 4
+
+
+def test_changed_engineer_context_invalidates_findings(client, test_id, fake_llm, incremental):
+    _upload(client, test_id, "a.txt", "ERROR in a\n")
+    _analyze(test_id)
+    db = SessionLocal()
+    try:
+        db.get(models.Test, test_id).system_prompt = "смотри на GC"
+        db.commit()
+    finally:
+        db.close()
+    _, findings = _analyze(test_id)
+    assert len(_map_calls(fake_llm)) == 2
+    assert len(findings) == 1
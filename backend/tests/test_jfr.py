@@ -0,0 +1,172 @@
+"""Разбор JFR по чанкам: CPU, аллокации, monitor, GC, оборванная запись (user-010)."""
+import struct
+
+import pytest
+
+from app.services.digests.jfr import JfrError, format_jfr_digest, parse_jfr
+
+LONG, STRING, CLASS, METHOD, FRAME, STACK = 20, 21, 22, 23, 24, 25
+EXEC, ALLOC, MONITOR, GC = 30, 31, 32, 33
+
+TYPES = [
+    (LONG, "long", []),
+    (STRING, "java.lang.String", []),
+    (CLASS, "java.lang.Class", [("name", STRING, True, False)]),
+    (METHOD, "jdk.types.Method", [("type", CLASS, True, False), ("name", STRING, True, False)]),
+    (FRAME, "jdk.types.StackFrame", [("method", METHOD, True, False), ("lineNumber", LONG, False, False)]),
+    (STACK, "jdk.types.StackTrace", [("frames", FRAME, False, True)]),
+    (EXEC, "jdk.ExecutionSample", [("startTime", LONG, False, False), ("stackTrace", STACK, True, False)]),
+    (
+        ALLOC,
+        "jdk.ObjectAllocationSample",
+        [("startTime", LONG, False, False), ("objectClass", CLASS, True, False), ("weight", LONG, False, False), ("stackTrace", STACK, True, False)],
+    ),
+    (
+        MONITOR,
+        "jdk.JavaMonitorEnter",
+        [("startTime", LONG, False, False), ("duration", LONG, False, False), ("monitorClass", CLASS, True, False), ("stackTrace", STACK, True, False)],
+    ),
+    (
+        GC,
+        "jdk.GarbageCollection",
+        [
+            ("startTime", LONG, False, False),
+            ("duration", LONG, False, False),
+            ("name", STRING, True, False),
+            ("cause", STRING, True, False),
+            ("sumOfPauses", LONG, False, False),
+            ("longestPause", LONG, False, False),
+        ],
+    ),
+]
+
+# Пулы констант: строки, классы (name), методы (class, name), стеки (методы сверху вниз)
+STRINGS = {1: "com/app/Hot", 2: "com/app/Main", 3: "loop", 4: "run", 5: "com/app/Lock", 6: "G1New", 7: "G1 Evacuation Pause"}
+CLASSES = {1: 1, 2: 2, 3: 5}
+METHODS = {1: (1, 3), 2: (2, 4)}
+STACKS = {1: [1, 2], 2: [2]}
+
+
+def _uleb(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b, n = n & 0x7F, n >> 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def _size(n: int) -> bytes:
+    """Размер события — LEB128 фиксированной ширины 4 байта (размер включает себя)."""
+    return bytes([(n & 0x7F) | 0x80, ((n >> 7) & 0x7F) | 0x80, ((n >> 14) & 0x7F) | 0x80, (n >> 21) & 0x7F])
+
+
+def _event(type_id: int, *values: int) -> bytes:
+    body = _uleb(type_id) + b"".join(_uleb(v) for v in values)
+    return _size(len(body) + 4) + body
+
+
+def _string(s: str) -> bytes:
+    b = s.encode()
+    return b"\x03" + _uleb(len(b)) + b
+
+
+def _metadata() -> bytes:
+    strings: list[str] = []
+
+    def idx(s: str) -> bytes:
+        if s not in strings:
+            strings.append(s)
+        return _uleb(strings.index(s))
+
+    def element(name: str, attrs: dict, children: list[bytes]) -> bytes:
+        out = idx(name) + _uleb(len(attrs))
+        for k, v in attrs.items():
+            out += idx(k) + idx(v)
+        return out + _uleb(len(children)) + b"".join(children)
+
+    classes = []
+    for type_id, name, fields in TYPES:
+        field_elements = []
+        for fname, ftype, cp, arr in fields:
+            attrs = {"name": fname, "class": str(ftype)}
+            if cp:
+                attrs["constantPool"] = "true"
+            if arr:
+                attrs["dimension"] = "1"
+            field_elements.append(element("field", attrs, []))
+        classes.append(element("class", {"id": str(type_id), "name": name}, field_elements))
+    root = element("root", {}, [element("metadata", {}, classes)])
+    body = _uleb(0) + _uleb(0) + _uleb(0) + _uleb(0) + _uleb(len(strings)) + b"".join(map(_string, strings)) + root
+    return _size(len(body) + 4) + body
+
+
+def _checkpoint() -> bytes:
+    pools = [
+        (STRING, {k: _string(v) for k, v in STRINGS.items()}),
+        (CLASS, {k: _uleb(v) for k, v in CLASSES.items()}),
+        (METHOD, {k: _uleb(c) + _uleb(n) for k, (c, n) in METHODS.items()}),
+        (STACK, {k: _uleb(len(ms)) + b"".join(_uleb(m) + _uleb(10) for m in ms) for k, ms in STACKS.items()}),
+    ]
+    body = _uleb(1) + _uleb(0) + _uleb(0) + _uleb(0) + b"\x01" + _uleb(len(pools))
+    for type_id, entries in pools:
+        body += _uleb(type_id) + _uleb(len(entries))
+        body += b"".join(_uleb(k) + v for k, v in entries.items())
+    return _size(len(body) + 4) + body
+
+
+def _chunk(events: bytes, start_nanos: int) -> bytes:
+    cp, meta = _checkpoint(), _metadata()
+    cp_offset = 68 + len(events)
+    meta_offset = cp_offset + len(cp)
+    size = meta_offset + len(meta)
+    header = struct.pack(">4sHHqqqqqqq", b"FLR\0", 2, 1, size, cp_offset, meta_offset, start_nanos, 10**9, 0, 10**9)
+    return header + b"\0\0\0\0" + events + cp + meta
+
+
+def _recording_chunk(start_nanos: int = 0) -> bytes:
+    events = _event(EXEC, 1, 1) * 3 + _event(EXEC, 2, 2)
+    events += _event(ALLOC, 3, 1, 4096, 1) + _event(ALLOC, 4, 2, 1024, 2)
+    events += _event(MONITOR, 5, 2_000_000, 3, 2) + _event(MONITOR, 6, 6_000_000, 3, 2)
+    events += _event(GC, 7, 0, 6, 7, 1_500_000, 1_000_000)
+    return _chunk(events, start_nanos)
+
+
+def test_recording_digest():
+    d = parse_jfr(_recording_chunk(0) + _recording_chunk(10**9))
+
+    assert d["chunks"] == 2 and d["incomplete_chunks"] == 0
+    assert d["duration_s"] == 2.0
+    cpu = d["cpu"]
+    assert cpu["samples"] == 8
+    assert cpu["top_self"][0] == {"method": "com.app.Hot.loop", "samples": 6, "percent": 75.0}
+    assert cpu["top_total"][0]["method"] == "com.app.Main.run" and cpu["top_total"][0]["percent"] == 100.0
+
+    alloc = d["allocation"]
+    assert alloc["total_bytes"] == 2 * (4096 + 1024)
+    assert alloc["by_class"][0] == ("com.app.Hot", 8192)
+    assert alloc["by_frame"][0] == ("com.app.Hot.loop", 8192)
+
+    monitor = d["monitor_enter"]["by_class"][0]
+    assert monitor == {"name": "com.app.Lock", "count": 4, "total_ms": 16.0, "max_ms": 6.0}
+    assert d["monitor_enter"]["by_frame"][0]["name"] == "com.app.Main.run"
+
+    assert d["gc"]["G1New"]["count"] == 2
+    assert d["gc"]["G1New"]["total_pause_ms"] == 3.0
+    assert d["gc"]["G1New"]["max_pause_ms"] == 1.0
+    assert d["gc_causes"] == [("G1 Evacuation Pause", 2)]
+
+    text = format_jfr_digest(d)
+    assert "com.app.Hot.loop" in text and "G1New" in text
+
+
+def test_truncated_last_chunk_is_skipped():
+    data = _recording_chunk(0) + _recording_chunk(10**9)[:200]
+    d = parse_jfr(data)
+    assert d["chunks"] == 1 and d["incomplete_chunks"] == 1
+    assert d["cpu"]["samples"] == 4
+
+
+def test_not_jfr():
+    with pytest.raises(JfrError):
+        parse_jfr(b"JAVA PROFILE 1.0.2\0")
@@ -0,0 +1,104 @@
+"""Фоновые задачи: запуск анализа POST-ом, подписка на события по job_id, отмена (user-019)."""
+import json
+import queue
+import threading
+import time
+
+from app.db.database import SessionLocal
+from app.db.models import Job
+from app.services import jobs
+
+
+def _wait_job(client, job_id: int, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in jobs.TERMINAL_STATUSES:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _sse_events(client, url: str) -> list[tuple[str, dict]]:
+    events = []
+    with client.stream("GET", url) as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        event = None
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_analysis_job_and_stream_by_id(client, test_id, fake_llm):
+    client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": "custom_other"}, files={"file": ("a.txt", b"ERROR x\n")})
+    r = client.post(f"/api/tests/{test_id}/run-analysis")
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+    job = _wait_job(client, job_id)
+    assert job["status"] == "done" and job["result"]["report_id"]
+
+    # Подписка (и переподключение EventSource) не запускает новый анализ
+    for _ in range(2):
+        events = _sse_events(client, f"/api/jobs/{job_id}/stream")
+        assert events == [("job", {"job_id": job_id, "status": "done", "result": job["result"], "error": None})]
+    assert len(client.get("/api/jobs/", params={"test_id": test_id}).json()) == 1
+    assert client.get(f"/api/tests/{test_id}/run-analysis/stream").status_code in (404, 405)
+
+
+def test_late_subscriber_receives_earlier_events():
+    ctx = jobs.JobContext(1, "analysis", None)
+    ctx.publish("stage", {"stage": "artifacts"})
+    ctx.publish("token", {"text": "## META"})
+    late: queue.Queue = queue.Queue()
+    ctx.subscribe(late)
+    ctx.publish("job", {"status": "done"})
+    ctx.close()
+
+    received = []
+    while (item := late.get(timeout=1)) is not None:
+        received.append(item[0])
+    assert received == ["stage", "token", "job"]
+
+
+def test_running_job_is_cancelled_at_checkpoint(client):
+    started = threading.Event()
+
+    def target(ctx: jobs.JobContext, db) -> dict:
+        started.set()
+        while True:
+            ctx.emit("progress", {})
+            time.sleep(0.01)
+
+    db = SessionLocal()
+    try:
+        job_id = jobs.submit(db, "collect_grafana", target).id
+    finally:
+        db.close()
+    assert started.wait(5)
+    assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 200
+    assert _wait_job(client, job_id)["status"] == "cancelled"
+
+
+def test_queued_job_is_cancelled_immediately(client, monkeypatch):
+    # Один поток на тип: вторая задача ждёт в очереди пула
+    monkeypatch.setitem(jobs.settings.job_concurrency, "collect_kubernetes", 1)
+    monkeypatch.setattr(jobs, "_executors", {})
+    release = threading.Event()
+    db = SessionLocal()
+    try:
+        blocker_id = jobs.submit(db, "collect_kubernetes", lambda ctx, db: release.wait(5)).id
+        queued_id = jobs.submit(db, "collect_kubernetes", lambda ctx, db: {"ran": True}).id
+        r = client.post(f"/api/jobs/{queued_id}/cancel")
+        assert r.json()["status"] == "cancelled"
+    finally:
+        release.set()
+        db.close()
+    assert _wait_job(client, blocker_id)["status"] == "done"
+    db = SessionLocal()
+    try:
+        assert db.get(Job, queued_id).result is None
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+"""Кэш ответов LLM в SQLite: попадания, вытеснение по размеру и возрасту (user-016)."""
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.agent.llm_cache import CachedChatModel, LLMCache, cache_key, model_params
+from app.agent.scheduler import BackendScheduler, ScheduledChatModel
+
+from conftest import FakeChatModel
+
+MESSAGES = [SystemMessage(content="system"), HumanMessage(content="question")]
+
+
+def test_cached_model_answers_from_cache(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=0, max_age_days=0)
+    llm = FakeChatModel()
+    cached = CachedChatModel(llm, cache)
+
+    first = cached.invoke(MESSAGES).content
+    second = cached.invoke(MESSAGES).content
+    assert first == second
+    assert len(llm.prompts) == 1
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+
+    # bypass: модель вызывается заново, ответ перезаписывается
+    CachedChatModel(llm, cache, bypass=True).invoke(MESSAGES)
+    assert len(llm.prompts) == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_models_behind_scheduler_do_not_share_entries(tmp_path):
+    # Как в графе: кэш снаружи планировщика, параметры ключа — от модели под обёрткой
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=0, max_age_days=0)
+    scheduler = BackendScheduler("test", limit=2, max_queue=0)
+    small, large = FakeChatModel(model="qwen2.5:7b"), FakeChatModel(model="qwen2.5:14b", temperature=0.1)
+    cached = [CachedChatModel(ScheduledChatModel(llm, scheduler), cache) for llm in (small, large)]
+
+    assert cached[0].params == model_params(small) and cached[0].params["model"] == "qwen2.5:7b"
+    assert cached[1].params["temperature"] == 0.1
+    assert cached[0].invoke(MESSAGES).content != cached[1].invoke(MESSAGES).content
+    assert len(small.prompts) == len(large.prompts) == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_different_messages_are_different_keys():
+    params = {"class": "FakeChatModel", "model": "fake"}
+    assert cache_key(params, MESSAGES) != cache_key(params, MESSAGES[:1] + [HumanMessage(content="other")])
+    assert cache_key(params, MESSAGES) == cache_key(dict(params), list(MESSAGES))
+
+
+def test_least_recently_read_evicted_over_size(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=250, max_age_days=0)
+    cache.put("a", "m", "x" * 100)
+    time.sleep(0.01)
+    cache.put("b", "m", "y" * 100)
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # a прочитан позже b
+    cache.put("c", "m", "z" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=0, max_age_days=1)
+    cache.put("old", "m", "answer")
+    with cache._connect() as conn:
+        conn.execute("UPDATE responses SET created_at = created_at - 2 * 86400 WHERE key = 'old'")
+    assert cache.get("old") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_clear(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=0, max_age_days=0)
+    cache.put("k", "m", "v")
+    assert cache.clear() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_same_model_on_other_server_is_another_key():
+    local = SimpleNamespace(model="qwen2.5:7b", base_url="http://localhost:11434")
+    remote = SimpleNamespace(model="qwen2.5:7b", base_url="http://gpu-2:11434/")
+    assert model_params(remote)["base_url"] == "http://gpu-2:11434"
+    assert cache_key(model_params(local), MESSAGES) != cache_key(model_params(remote), MESSAGES)
+
+
+def test_stream_and_batch_are_cached(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=0, max_age_days=0)
+    llm = FakeChatModel()
+    cached = CachedChatModel(llm, cache)
+
+    # Недочитанный поток ответ не записывает
+    next(iter(cached.stream(MESSAGES)))
+    assert cache.stats()["entries"] == 0
+    streamed = "".join(chunk.content for chunk in cached.stream(MESSAGES))
+    assert cache.stats()["entries"] == 1
+    assert "".join(chunk.content for chunk in cached.stream(MESSAGES)) == streamed
+    assert [m.content for m in cached.batch([MESSAGES, MESSAGES])] == [streamed, streamed]
+    assert len(llm.prompts) == 2
+    assert cache.stats()["hits"] == 3
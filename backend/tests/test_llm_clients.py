@@ -0,0 +1,55 @@
+"""Клиенты LLM из реестра: переиспользование и общий пул соединений Ollama (user-017)."""
+import json
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.agent import llm_factory, registry
+
+
+@pytest.fixture
+def ollama_server(monkeypatch):
+    """Ответы /api/chat в формате Ollama (NDJSON) через транспорт httpx, без сервера."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append((request.url.path, body))
+        lines = [
+            {"model": body["model"], "created_at": "2024-01-01T00:00:00Z", "message": {"role": "assistant", "content": "ok"}, "done": False},
+            {"model": body["model"], "created_at": "2024-01-01T00:00:00Z", "message": {"role": "assistant", "content": ""},
+             "done": True, "done_reason": "stop", "prompt_eval_count": 3, "eval_count": 1},
+        ]
+        return httpx.Response(200, content="\n".join(json.dumps(x) for x in lines).encode(), headers={"Content-Type": "application/x-ndjson"})
+
+    monkeypatch.setattr(llm_factory, "shared_ollama_transport", lambda: httpx.MockTransport(handler))
+    registry.clear()
+    yield requests
+    registry.clear()
+
+
+def test_ollama_client_chats_through_shared_transport(ollama_server):
+    llm = registry.get_llm_client("ollama", "qwen2.5:7b", base_url="http://ollama:11434")
+    assert llm.invoke([HumanMessage(content="hi")]).content == "ok"
+
+    path, body = ollama_server[0]
+    assert path == "/api/chat"
+    assert body["model"] == "qwen2.5:7b"
+    assert body["options"]["num_ctx"] == llm_factory.settings.ollama_num_ctx
+
+
+def test_clients_are_reused_by_key(ollama_server):
+    first = registry.get_llm_client("ollama", "qwen2.5:7b", base_url="http://ollama:11434")
+    assert registry.get_llm_client("ollama", "qwen2.5:7b", base_url="http://ollama:11434") is first
+    assert registry.get_llm_client("ollama", "qwen2.5:14b", base_url="http://ollama:11434") is not first
+
+
+def test_ollama_clients_share_one_transport():
+    llm_factory.close_http_clients()
+    try:
+        a = llm_factory.get_llm("ollama", "qwen2.5:7b")
+        b = llm_factory.get_llm("ollama", "qwen2.5:14b")
+        assert a._client._client._transport is b._client._client._transport is llm_factory.shared_ollama_transport()
+    finally:
+        llm_factory.close_http_clients()
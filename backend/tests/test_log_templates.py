@@ -0,0 +1,67 @@
+"""Сворачивание логов в шаблоны Drain (user-007)."""
+import io
+
+from app.services.digests.log_templates import (
+    OVERFLOW,
+    LogTemplateMiner,
+    format_templates_digest,
+    mine_stream,
+    templates_digest,
+)
+
+
+def _lines() -> list[str]:
+    lines = []
+    for i in range(1000):
+        lines.append(f"2024-05-01 12:00:{i % 60:02d},{i % 1000:03d} INFO [http-{i % 8}] GET /api/orders/{i} 200 in {i % 97} ms")
+    for i in range(5):
+        lines.append(
+            f"2024-05-01 12:01:0{i},000 ERROR [db-pool] Connection to 10.0.0.{i}:5432 refused "
+            f"for request 3f2a1c9e-0000-4000-8000-00000000000{i}"
+        )
+    return lines
+
+
+def test_repeated_lines_collapse_into_few_templates():
+    miner = LogTemplateMiner()
+    miner.add_lines(_lines())
+    d = templates_digest(miner)
+    assert d["lines"] == 1005
+    assert d["templates_total"] <= 4
+    assert d["levels"]["INFO"] == 1000 and d["levels"]["ERROR"] == 5
+
+
+def test_errors_rank_first_with_masked_variables():
+    miner = LogTemplateMiner()
+    miner.add_lines(_lines())
+    first = templates_digest(miner)["templates"][0]
+    assert first["level"] == "ERROR"
+    assert first["count"] == 5
+    assert "<IP>" in first["template"] and "<UUID>" in first["template"]
+    assert first["first_seen"] != first["last_seen"]
+
+
+def test_stream_mining_and_line_limit():
+    data = ("\n".join(_lines()) + "\n").encode()
+    assert templates_digest(mine_stream(io.BytesIO(data)))["lines"] == 1005
+    assert templates_digest(mine_stream(io.BytesIO(data), max_lines=100))["lines"] == 100
+
+
+def test_formatted_digest_respects_budget():
+    miner = LogTemplateMiner()
+    miner.add_lines(_lines())
+    text = format_templates_digest(templates_digest(miner), max_chars=2000)
+    assert len(text) <= 2100
+    assert "ERROR" in text or "refused" in text
+
+
+def test_cluster_cap_sends_new_shapes_to_overflow_template():
+    miner = LogTemplateMiner(max_clusters=5)
+    # Разное число токенов — разные листья дерева, каждая строка просит новый кластер
+    lines = [" ".join(["token"] * n) for n in range(1, 21)] + ["ERROR disk full"] * 3
+    miner.add_lines(lines)
+    assert len(miner._clusters) <= 5
+    d = templates_digest(miner)
+    assert sum(t["count"] for t in d["templates"]) == d["lines"] == 23
+    overflow = [t for t in d["templates"] if t["template"] == OVERFLOW]
+    assert len(overflow) == 1 and overflow[0]["count"] == 23 - 4
@@ -0,0 +1,43 @@
+"""Граф map_reduce: сводки по артефактам и распределение бюджета reduce в snapshot отчёта (user-015)."""
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.services.analysis_runner import run_analysis_for_test
+
+DATA = Path(__file__).parent / "data"
+JAVA_LOG = "".join(f"2024-03-01 12:00:{i % 60:02d} ERROR [http-{i % 4}] c.e.Pay - timeout after {i} ms\n" for i in range(300))
+
+
+@pytest.fixture
+def map_reduce(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_graph_mode", "map_reduce")
+
+
+def _upload(client, test_id: int, kind: str, name: str, data: bytes) -> int:
+    r = client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": kind}, files={"file": (name, data)})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_snapshot_records_reduce_allocation_by_artifact(client, test_id, fake_llm, map_reduce):
+    log_id = _upload(client, test_id, "custom_java_log", "app.log", JAVA_LOG.encode())
+    # Thread dump идёт первым блоком: позиция в промпте не совпадает с порядком артефактов
+    dump_id = _upload(client, test_id, "custom_thread_dump", "dump.txt", (DATA / "thread_dump.txt").read_bytes())
+
+    db = SessionLocal()
+    try:
+        report, used = run_analysis_for_test(db, test_id)
+        snapshot = {item["id"]: item for item in report.artifacts_used_snapshot}
+    finally:
+        db.close()
+
+    assert "сводок в промпте: 2" in report.report_text
+    for artifact_id in (log_id, dump_id):
+        context = snapshot[artifact_id]["context"]
+        assert context["tokens_allocated"] > 0
+        assert 0 < context["tokens_used"] <= context["tokens_needed"]
+        assert context["source_tokens"] > context["tokens_needed"]
+        assert context["chunks"] == 1
@@ -0,0 +1,76 @@
+"""Инвентарь подов из pods_list.json вместо PODS_TABLE от модели (user-014)."""
+import io
+import json
+
+import pytest
+
+from app.services.digests.pod_inventory import (
+    TABLE_HEADER,
+    build_inventory,
+    format_inventory,
+    inventory_digest,
+    inventory_table_rows,
+    load_pods,
+    pod_owner,
+)
+
+
+def _pod(name: str, owner=None, phase="Running", image="app:1.2", limits=None, ns="shop") -> dict:
+    return {
+        "name": name,
+        "namespace": ns,
+        "phase": phase,
+        "owner": owner,
+        "containers": [{"name": "app", "image": image, "limits": limits or {"cpu": "2", "memory": "4Gi"}, "requests": {"cpu": "1"}}],
+    }
+
+
+PODS = [
+    _pod("orders-7d9f8c6b5-abcde", {"kind": "ReplicaSet", "name": "orders"}),
+    _pod("orders-7d9f8c6b5-fghij", {"kind": "ReplicaSet", "name": "orders"}, phase="Pending"),
+    _pod("orders-7d9f8c6b5-abcde", {"kind": "ReplicaSet", "name": "orders"}),  # повтор — не считается
+    _pod("kafka-0"),
+    _pod("kafka-1", image="kafka:3.7"),
+    _pod("standalone"),
+]
+
+
+@pytest.mark.parametrize(
+    "pod,owner",
+    [
+        ({"name": "x", "owner": {"kind": "StatefulSet", "name": "db"}}, ("StatefulSet", "db")),
+        ({"name": "api-5c7b9d8f4-x2k9p"}, ("Deployment", "api")),
+        ({"name": "redis-2"}, ("StatefulSet", "redis")),
+        ({"name": "migrate-q8w2e"}, ("?", "migrate")),
+        ({"name": "standalone"}, ("Pod", "standalone")),
+    ],
+)
+def test_pod_owner(pod, owner):
+    assert pod_owner(pod) == owner
+
+
+def test_inventory_groups_and_counts():
+    d = inventory_digest(build_inventory(PODS))
+    assert d["pods"] == 5
+    groups = {g["name"]: g for g in d["groups"]}
+    assert groups["orders"]["pods"] == 2 and groups["orders"]["phases"] == {"Running": 1, "Pending": 1}
+    assert groups["orders"]["limits"] == "cpu=2, memory=4Gi"
+    assert groups["kafka"]["kind"] == "StatefulSet"
+    assert groups["kafka"]["images"] == "app:1.2 | kafka:3.7"
+
+
+def test_table_rows_and_text_are_deterministic():
+    d = inventory_digest(build_inventory(PODS))
+    rows = inventory_table_rows(d)
+    assert rows[0] == TABLE_HEADER
+    assert rows[-1] == ["Итого", "5", "", "", ""]
+    assert ["ReplicaSet orders", "2 (Pending: 1)", "cpu=2, memory=4Gi", "cpu=1", "app:1.2"] in rows
+    # Порядок подов во входе не влияет на результат
+    assert inventory_table_rows(inventory_digest(build_inventory(reversed(PODS)))) == rows
+    assert format_inventory(d).startswith("[ИНВЕНТАРЬ ПОДОВ — 5 подов в 3 группах")
+
+
+def test_load_pods_formats():
+    assert load_pods(io.BytesIO(json.dumps({"items": PODS}).encode())) == PODS
+    with pytest.raises(ValueError):
+        load_pods(io.BytesIO(b'{"kind": "NodeList"}'))
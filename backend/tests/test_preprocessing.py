@@ -0,0 +1,133 @@
+"""Предобработка при загрузке: сохранённые версионированные дайджесты (user-012), пул процессов (user-013)."""
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Artifact
+from app.services import preprocessing
+from app.services.artifacts import ArtifactsService
+
+JAVA_LOG = "".join(
+    f"2024-03-01 12:00:{i % 60:02d}.000 INFO  [http-{i % 8}] c.e.OrderService - order {i} processed in {i % 97} ms\n"
+    for i in range(600)
+)
+
+
+def _upload(client, test_id: int, kind: str, name: str, data: bytes) -> dict:
+    r = client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": kind}, files={"file": (name, data)})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _artifact(artifact_id: int) -> Artifact:
+    db = SessionLocal()
+    try:
+        return db.get(Artifact, artifact_id)
+    finally:
+        db.close()
+
+
+def test_digest_is_built_at_ingest(client, test_id):
+    art = _upload(client, test_id, "custom_java_log", "app.log", JAVA_LOG.encode())
+    # Фоновая задача TestClient выполняется до возврата ответа
+    listed = client.get(f"/api/artifacts/test/{test_id}").json()
+    ref = next(a for a in listed if a["id"] == art["id"])["metadata"]["preprocessed"]
+    assert ref["digest_type"] == "log_templates"
+    assert ref["lines"] == 600
+    assert ref["time_span"] == {"first": "2024-03-01 12:00:00.000", "last": "2024-03-01 12:00:59.000"}
+    assert ref["version"] == preprocessing.digest_version("custom_java_log")
+
+    record = preprocessing.load_preprocessed(ArtifactsService(), _artifact(art["id"]))
+    assert record is not None and "order <NUM> processed in <NUM> ms" in record["digest"]["text"]
+
+
+def test_stored_digest_is_reused(client, test_id, monkeypatch):
+    art = _upload(client, test_id, "custom_other", "notes.txt", b"GC overhead limit exceeded\n" * 10)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("digest rebuilt")
+
+    monkeypatch.setattr(preprocessing, "build_digest", fail)
+    db = SessionLocal()
+    try:
+        a = db.get(Artifact, art["id"])
+        records = preprocessing.preprocess_artifacts(db, [a])
+    finally:
+        db.close()
+    assert records[art["id"]]["digest"]["type"] == "excerpt"
+
+
+def test_version_change_rebuilds_digest(client, test_id, monkeypatch):
+    art = _upload(client, test_id, "custom_other", "notes.txt", b"line\n" * 10)
+    monkeypatch.setattr(preprocessing, "PREPROCESS_VERSION", preprocessing.PREPROCESS_VERSION + 1)
+    a = _artifact(art["id"])
+    assert preprocessing.load_preprocessed(ArtifactsService(), a) is None
+
+    db = SessionLocal()
+    try:
+        a = db.get(Artifact, art["id"])
+        records = preprocessing.preprocess_artifacts(db, [a])
+        assert records[a.id]["version"] == preprocessing.digest_version("custom_other")
+        assert a.metadata_["preprocessed"]["version"] == records[a.id]["version"]
+    finally:
+        db.close()
+
+
+def test_failed_artifact_is_left_out(storage):
+    results = preprocessing.preprocess_many([("1/missing.log", "custom_other", None, None)])
+    assert isinstance(results[0], FileNotFoundError)
+
+
+def test_pool_preprocesses_in_worker_processes(storage, monkeypatch):
+    svc = ArtifactsService()
+    paths = [str(svc.save_custom_artifact(1, "custom_other", f"log {i}\n".encode() * 50, display_name=f"{i}.txt")[0]) for i in range(3)]
+    # Воркеры (spawn) читают settings из окружения
+    monkeypatch.setenv("STORAGE_PATH", str(storage))
+    monkeypatch.setattr(settings, "preprocess_workers", 2)
+    try:
+        results = preprocessing.preprocess_many([(p, "custom_other", None, None) for p in paths] + [("1/missing.txt", "custom_other", None, None)])
+    finally:
+        preprocessing.shutdown_pool()
+    assert [r["digest"]["type"] for r in results[:3]] == ["excerpt"] * 3
+    assert isinstance(results[3], FileNotFoundError)
+    # Дайджесты, записанные воркерами, видны основному процессу
+    for p, r in zip(paths, results):
+        assert svc.load_digest(p, r["sha256"], r["version"]) is not None
+
+
+def test_broken_pool_retries_tasks_one_by_one(monkeypatch):
+    monkeypatch.setattr(settings, "preprocess_workers", 2)
+    calls = []
+
+    def run_in_pool(tasks):
+        calls.append(len(tasks))
+        if len(tasks) > 1:
+            # Один воркер убит по памяти — оборваны все незавершённые задачи
+            return [BrokenProcessPool("worker died")] * len(tasks)
+        path = tasks[0][0]
+        return [BrokenProcessPool("oom") if path == "huge.hprof" else {"path": path}]
+
+    monkeypatch.setattr(preprocessing, "_run_in_pool", run_in_pool)
+    tasks = [(p, "custom_other", None, None) for p in ("a.log", "huge.hprof", "b.log")]
+    results = preprocessing.preprocess_many(tasks)
+    assert calls == [3, 1, 1, 1]
+    assert results[0] == {"path": "a.log"} and results[2] == {"path": "b.log"}
+    assert isinstance(results[1], BrokenProcessPool)
+
+
+def test_excerpt_fit_does_not_read_the_file(client, test_id, monkeypatch):
+    lines = [f"2024-05-01 12:00:{i % 60:02d} worker {i} step ok\n" for i in range(5000)]
+    lines[2500] = "2024-05-01 12:30:00 ERROR java.lang.OutOfMemoryError: Java heap space\n"
+    art = _upload(client, test_id, "custom_other", "big.txt", "".join(lines).encode())
+    record = preprocessing.load_preprocessed(ArtifactsService(), _artifact(art["id"]))
+    digest = record["digest"]
+    assert digest["type"] == "excerpt" and digest["data"]["skipped_bytes"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("artifact re-read during packing")
+
+    monkeypatch.setattr(ArtifactsService, "sample_artifact", fail)
+    monkeypatch.setattr(ArtifactsService, "open_artifact", fail)
+    text = preprocessing.digest_fit(digest)(10_000)
+    assert len(text) <= 10_000
+    assert "OutOfMemoryError" in text and "worker 4999 step ok" in text and "[выдержка:" in text
@@ -0,0 +1,96 @@
+"""BM25-индекс по полному тексту артефактов: синхронизация, поиск фрагментов, вопрос по тесту (user-024)."""
+import io
+
+from app.agent.context_packer import TokenCounter
+from app.db.database import SessionLocal
+from app.db.models import Artifact
+from app.services import retrieval
+
+COUNTER = TokenCounter("qwen2.5:7b")
+LOG = "".join(
+    "java.lang.OutOfMemoryError: Java heap space\n" if i == 4000 else
+    f"2024-03-01 12:00:00 ERROR c.e.Pay - timeout after {i} ms\n" if i % 500 == 0 else
+    f"2024-03-01 12:00:00 INFO c.e.Pay - order {i} processed\n"
+    for i in range(1, 6001)
+)
+
+
+def _upload(client, test_id: int, name: str, text: str) -> int:
+    r = client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": "custom_java_log"}, files={"file": (name, text.encode())})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _index(test_id: int) -> retrieval.ArtifactIndex:
+    db = SessionLocal()
+    try:
+        return retrieval.get_test_index(db, test_id)
+    finally:
+        db.close()
+
+
+def test_match_query_quotes_terms():
+    assert retrieval.match_query('OOM "heap" AND x* heap') == '"oom" OR "heap" OR "and"'
+    assert retrieval.match_query("- * ") == ""
+
+
+def test_line_chunks_cover_all_lines():
+    text = "".join(f"line {i}\n" for i in range(1, 101))
+    chunks = list(retrieval._line_chunks(io.StringIO(text), 100))
+    assert chunks[0][0] == 1 and chunks[-1][1] == 100
+    assert all(len(c[2]) <= 100 for c in chunks)
+    assert all(b[0] == a[1] + 1 for a, b in zip(chunks, chunks[1:]))
+
+
+def test_index_is_synced_with_artifacts(client, test_id):
+    app_id = _upload(client, test_id, "app.log", LOG)
+    _upload(client, test_id, "other.log", "ERROR connection refused\n")
+    db = SessionLocal()
+    try:
+        index = retrieval.ArtifactIndex(retrieval.index_path(test_id))
+        stats = index.sync(db, test_id)
+        assert stats["indexed"] == 2 and stats["chunks"] > 2
+        assert index.sync(db, test_id)["reused"] == 2
+        db.delete(db.get(Artifact, app_id))
+        db.commit()
+        assert index.sync(db, test_id)["removed"] == 1
+    finally:
+        db.close()
+    assert {h.label for h in index.search("error timeout refused", 10_000, COUNTER)} == {"other.log"}
+
+
+def test_search_finds_rare_line_in_full_text(client, test_id):
+    _upload(client, test_id, "app.log", LOG)
+    index = _index(test_id)
+
+    hits = index.search("OutOfMemoryError heap", 2_000, COUNTER)
+    assert hits and "OutOfMemoryError" in hits[0].text
+    assert hits[0].line_start <= 4000 <= hits[0].line_end
+    # Бюджет меньше любого фрагмента — ничего
+    assert index.search("OutOfMemoryError heap", 5, COUNTER) == []
+
+
+def test_repeated_error_is_one_fragment(client, test_id, monkeypatch):
+    # Фрагмент — одна строка: повторы ошибки отличаются только числами
+    monkeypatch.setattr(retrieval.settings, "retrieval_chunk_chars", 60)
+    _upload(client, test_id, "app.log", "".join(f"12:00:{i % 60:02d} ERROR timeout after {i} ms\n" for i in range(200)))
+    hits = _index(test_id).search("timeout", 10_000, COUNTER, top_k=5)
+    assert len(hits) == 1
+
+
+def test_section_fragments_are_labelled(client, test_id):
+    _upload(client, test_id, "app.log", LOG)
+    text, sources = retrieval.section_fragments(_index(test_id), COUNTER, 3_000)
+    assert "ФРАГМЕНТЫ ДЛЯ РАЗДЕЛА ERRORS" in text and '[ФРАГМЕНТ: файл="app.log"' in text
+    assert {s["section"] for s in sources} <= set(retrieval.SECTION_QUERIES)
+    assert len({(s["artifact_id"], s["line_start"]) for s in sources}) == len(sources)
+
+
+def test_ask_answers_from_fragments(client, test_id, fake_llm):
+    _upload(client, test_id, "app.log", LOG)
+    r = client.post(f"/api/tests/{test_id}/ask", json={"question": "Был ли OutOfMemoryError?", "top_k": 2})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["answer"] and 1 <= len(body["sources"]) <= 2
+    assert body["sources"][0]["label"] == "app.log"
+    assert "OutOfMemoryError" in fake_llm.prompts[-1] and "Вопрос: Был ли OutOfMemoryError?" in fake_llm.prompts[-1]
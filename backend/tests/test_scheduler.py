@@ -0,0 +1,99 @@
+"""Очередь вызовов LLM одного бэкенда: приоритет, справедливость между проектами, отказ и отмена (user-022)."""
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.agent.scheduler import BackendScheduler, LLMQueueFull, ScheduledChatModel
+
+from conftest import FakeChatModel
+
+
+def _wait_queued(scheduler: BackendScheduler, n: int) -> None:
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["queued"] < n:
+        assert time.monotonic() < deadline, "calls did not reach the queue"
+        time.sleep(0.005)
+
+
+def _grant_order(scheduler: BackendScheduler, calls: list[tuple[str, str, int]]) -> list[str]:
+    """Слот занят проектом "a"; calls (метка, проект, приоритет) встают в очередь по порядку, затем слот освобождается."""
+    scheduler.acquire(project="a")
+    order = []
+
+    def call(label: str, project: str, priority: int) -> None:
+        scheduler.acquire(project=project, priority=priority)
+        order.append(label)
+        scheduler.release(project)
+
+    threads = []
+    for i, c in enumerate(calls, 1):
+        threads.append(threading.Thread(target=call, args=c))
+        threads[-1].start()
+        _wait_queued(scheduler, i)
+    scheduler.release("a")
+    for t in threads:
+        t.join(5)
+    return order
+
+
+def test_other_project_is_served_before_busy_one():
+    # Map-вызовы одного анализа (проект a) не задерживают единственный вызов проекта b
+    scheduler = BackendScheduler("test", limit=1, max_queue=0)
+    order = _grant_order(scheduler, [("a1", "a", 5), ("a2", "a", 5), ("a3", "a", 5), ("b1", "b", 5)])
+    assert order == ["b1", "a1", "a2", "a3"]
+
+
+def test_priority_comes_first():
+    scheduler = BackendScheduler("test", limit=1, max_queue=0)
+    order = _grant_order(scheduler, [("b1", "b", 5), ("c1", "c", 5), ("ask", "a", 0)])
+    assert order == ["ask", "b1", "c1"]
+
+
+def test_full_queue_rejects():
+    scheduler = BackendScheduler("test", limit=1, max_queue=1)
+    scheduler.acquire()
+    waiter = threading.Thread(target=lambda: (scheduler.acquire(), scheduler.release()))
+    waiter.start()
+    _wait_queued(scheduler, 1)
+    with pytest.raises(LLMQueueFull):
+        scheduler.check_capacity()
+    with pytest.raises(LLMQueueFull):
+        scheduler.acquire()
+    scheduler.release()
+    waiter.join(5)
+    stats = scheduler.stats()
+    assert stats["rejected"] == 2 and stats["admitted"] == 2 and stats["running"] == 0
+
+
+def test_cancel_and_timeout_leave_queue():
+    scheduler = BackendScheduler("test", limit=1, max_queue=0)
+    scheduler.acquire()
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(InterruptedError):
+        scheduler.acquire(cancelled=cancel.is_set)
+    with pytest.raises(LLMQueueFull):
+        scheduler.acquire(timeout=0.05)
+    stats = scheduler.stats()
+    assert stats["queued"] == 0 and stats["timeouts"] == 1
+
+
+def test_stream_batch_and_async_calls_go_through_queue():
+    scheduler = BackendScheduler("test", limit=1, max_queue=0)
+    model = ScheduledChatModel(FakeChatModel(), scheduler)
+    messages = [HumanMessage(content="question")]
+
+    stream = model.stream(messages)
+    first = next(stream)
+    # Слот занят, пока поток не дочитан
+    assert first.content and scheduler.stats()["running"] == 1
+    list(stream)
+    assert scheduler.stats()["running"] == 0
+
+    assert len(model.batch([messages, messages, messages])) == 3
+    asyncio.run(model.ainvoke(messages))
+    stats = scheduler.stats()
+    assert stats["admitted"] == 5 and stats["running"] == 0
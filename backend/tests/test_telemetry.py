@@ -0,0 +1,90 @@
+"""Телеметрия LLM: вызовы и узлы запуска, попадания в кэш, обрезка контекста, GET /metrics (user-025)."""
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from app.agent import telemetry
+from app.agent.graph import run_analysis
+
+RUN = dict(test_meta={"project_name": "p"}, artifact_contents="ERROR timeout\n" * 50, llm_type="ollama", llm_model="fake")
+
+
+def _ollama_result(text: str) -> LLMResult:
+    info = {
+        "prompt_eval_count": 1200, "eval_count": 40,
+        "load_duration": 500_000_000, "prompt_eval_duration": 1_500_000_000, "eval_duration": 2_000_000_000,
+    }
+    return LLMResult(generations=[[ChatGeneration(message=AIMessage(content=text), generation_info=info)]])
+
+
+def test_ollama_call_timings_from_server_durations():
+    run = telemetry.RunTelemetry()
+    run_id = uuid4()
+    run.on_chat_model_start({}, [[HumanMessage(content="hi")]], run_id=run_id, metadata={"langgraph_node": "analyze", "ls_model_name": "qwen2.5:7b"})
+    run.on_llm_end(_ollama_result("ok"), run_id=run_id)
+
+    call = run.summary()["calls"][0]
+    assert call["node"] == "analyze" and call["model"] == "qwen2.5:7b"
+    assert call["prompt_tokens"] == 1200 and call["completion_tokens"] == 40
+    # Без стриминга TTFT — загрузка модели и обработка промпта, скорость — по времени генерации на сервере
+    assert call["ttft_ms"] == 2000.0
+    assert call["tokens_per_second"] == 20.0
+
+
+def test_failed_call_is_counted():
+    run = telemetry.RunTelemetry(default_node="ask")
+    run_id = uuid4()
+    run.on_chat_model_start({}, [[HumanMessage(content="hi")]], run_id=run_id)
+    run.on_llm_error(ConnectionError("down"), run_id=run_id)
+    totals = run.summary()["totals"]
+    assert totals["llm_calls"] == 1 and totals["llm_errors"] == 1
+    assert run.summary()["calls"][0]["node"] == "ask"
+
+
+def test_run_summary_by_node_and_cache_hit(fake_llm):
+    first = telemetry.RunTelemetry()
+    run_analysis(**RUN, max_artifact_chars=100, callbacks=[first])
+    summary = first.summary()
+    assert summary["nodes"]["analyze"]["runs"] == 1 and summary["nodes"]["analyze"]["llm_calls"] == 1
+    assert summary["nodes"]["format"]["llm_calls"] == 0
+    assert summary["truncated_chars"]["max_artifact_chars"] == len(RUN["artifact_contents"]) - 100
+
+    second = telemetry.RunTelemetry()
+    run_analysis(**RUN, max_artifact_chars=100, callbacks=[second])
+    totals = second.summary()["totals"]
+    assert totals["llm_calls"] == 0 and totals["cache_hits"] == 1
+    assert second.summary()["nodes"]["analyze"]["cache_hits"] == 1
+
+
+def test_prometheus_export():
+    run = telemetry.RunTelemetry()
+    run_id = uuid4()
+    run.on_chat_model_start({}, [[HumanMessage(content="hi")]], run_id=run_id, metadata={"langgraph_node": "reduce"})
+    run.on_llm_end(_ollama_result("ok"), run_id=run_id)
+    run.add_truncation("pack", 300)
+
+    metrics = telemetry._Metrics()
+    metrics.record_run(run.summary(), "ollama", "qwen2.5:7b")
+    metrics.record_run(run.summary(), "ollama", "qwen2.5:7b")
+    text = metrics.prometheus()
+    labels = 'llm_type="ollama",model="qwen2.5:7b",node="reduce"'
+    assert f'ntview_llm_calls_total{{{labels},status="ok"}} 2' in text
+    assert f"ntview_llm_prompt_tokens_total{{{labels}}} 2400" in text
+    assert "# TYPE ntview_llm_call_seconds summary" in text
+    assert "# TYPE ntview_llm_calls_total counter" in text
+    assert 'ntview_context_truncated_chars_total{stage="pack"} 600' in text
+
+
+def test_prometheus_keeps_large_and_fractional_values_exact():
+    metrics = telemetry._Metrics()
+    metrics.inc("ntview_llm_prompt_tokens_total", 1_234_567, node="map")
+    metrics.inc("ntview_llm_call_seconds_sum", 1234.56789, node="map")
+    text = metrics.prometheus()
+    assert 'ntview_llm_prompt_tokens_total{node="map"} 1234567\n' in text
+    assert 'ntview_llm_call_seconds_sum{node="map"} 1234.56789\n' in text
+
+
+def test_metrics_endpoint(client):
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,49 @@
+"""Анализ HotSpot thread dump: группы стеков, граф блокировок, deadlock, зависшие потоки (user-008)."""
+import io
+from pathlib import Path
+
+from app.services.digests.thread_dump import format_thread_dump_digest, parse_thread_dump_stream, parse_thread_dumps, thread_dump_digest
+
+DUMP = (Path(__file__).parent / "data" / "thread_dump.txt").read_text()
+
+
+def _two_dumps_digest() -> dict:
+    return thread_dump_digest(parse_thread_dumps(DUMP + DUMP.replace("12:00:00", "12:00:10")))
+
+
+def test_states_and_stack_groups():
+    d = _two_dumps_digest()
+    assert [x["threads"] for x in d["dumps"]] == [4, 4]
+    assert d["dumps"][0]["states"] == {"BLOCKED": 2, "WAITING": 1, "RUNNABLE": 1}
+    # Одинаковые стеки двух потоков в двух дампах — одна группа
+    blocked = d["top_groups"][0]
+    assert blocked["state"] == "BLOCKED" and blocked["threads"] == 4
+    assert set(blocked["names"]) == {"worker-1", "worker-2"}
+
+
+def test_idle_pool_threads_are_not_reported_as_hot():
+    d = _two_dumps_digest()
+    assert d["idle_threads"] == 2
+    assert all("getTask" not in " ".join(g["frames"]) for g in d["top_groups"])
+
+
+def test_deadlock_found_from_lock_graph():
+    d = _two_dumps_digest()
+    assert len(d["deadlocks"]) == 1
+    cycle = d["deadlocks"][0]
+    assert cycle["dumps"] == [1, 2]
+    assert {t["name"] for t in cycle["threads"]} == {"worker-1", "worker-2"}
+    assert {c["owner"] for c in d["contended_locks"]} == {"worker-1", "worker-2"}
+
+
+def test_threads_in_same_frame_across_dumps_are_stuck():
+    stuck = _two_dumps_digest()["stuck"]
+    assert any(s["state"] == "RUNNABLE" and s["names"] == ["http-1"] for s in stuck)
+
+
+def test_several_files_share_one_parser():
+    parser = parse_thread_dump_stream(io.BytesIO(DUMP.encode()), source="a.txt")
+    parse_thread_dump_stream(io.BytesIO(DUMP.encode()), source="b.txt", parser=parser)
+    d = thread_dump_digest(parser)
+    assert [x["source"] for x in d["dumps"]] == ["a.txt", "b.txt"]
+    assert "worker-1" in format_thread_dump_digest(d)
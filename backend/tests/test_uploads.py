@@ -0,0 +1,113 @@
+"""Потоковая загрузка и resumable uploads (user-001)."""
+import hashlib
+import io
+import threading
+
+from app.services.artifacts import ArtifactsService
+
+
+def test_streaming_upload_stores_content_and_hash(client, test_id):
+    data = b"2024-01-01 INFO started\n" * 5000
+    r = client.post(
+        f"/api/artifacts/test/{test_id}/upload",
+        data={"kind": "custom_other", "display_name": "app.bin"},
+        files={"file": ("app.bin", data)},
+    )
+    assert r.status_code == 200, r.text
+    meta = r.json()["metadata"]
+    assert meta["sha256"] == hashlib.sha256(data).hexdigest()
+    assert meta["size_bytes"] == len(data)
+    assert ArtifactsService().read_artifact(r.json()["file_path"]) == data
+
+
+def test_resumable_upload_resumes_from_offset(client, test_id):
+    data = bytes(range(256)) * 1000
+    base = f"/api/artifacts/test/{test_id}/uploads"
+    upload_id = client.post(base).json()["upload_id"]
+
+    r = client.put(f"{base}/{upload_id}", params={"offset": 0}, files={"chunk": ("c", data[:100_000])})
+    assert r.json()["offset"] == 100_000
+    # Клиент «потерял» ответ и повторяет чанк с устаревшим offset
+    r = client.put(f"{base}/{upload_id}", params={"offset": 0}, files={"chunk": ("c", data[:100_000])})
+    assert r.status_code == 409
+    assert client.get(f"{base}/{upload_id}").json()["offset"] == 100_000
+    client.put(f"{base}/{upload_id}", params={"offset": 100_000}, files={"chunk": ("c", data[100_000:])})
+
+    r = client.post(
+        f"{base}/{upload_id}/complete",
+        data={"kind": "custom_other", "display_name": "dump.bin", "sha256": hashlib.sha256(data).hexdigest()},
+    )
+    assert r.status_code == 200, r.text
+    assert ArtifactsService().read_artifact(r.json()["file_path"]) == data
+    assert client.get(f"{base}/{upload_id}").status_code == 404
+
+
+def test_complete_rejects_sha256_mismatch(client, test_id):
+    base = f"/api/artifacts/test/{test_id}/uploads"
+    upload_id = client.post(base).json()["upload_id"]
+    client.put(f"{base}/{upload_id}", params={"offset": 0}, files={"chunk": ("c", b"abc")})
+    r = client.post(f"{base}/{upload_id}/complete", data={"kind": "custom_other", "sha256": "0" * 64})
+    assert r.status_code == 409
+
+
+def test_upload_endpoints_require_existing_test(client, storage):
+    missing = 999_999
+    assert client.get(f"/api/artifacts/test/{missing}/uploads/abc").status_code == 404
+    r = client.put(f"/api/artifacts/test/{missing}/uploads/abc", params={"offset": 0}, files={"chunk": ("c", b"x")})
+    assert r.status_code == 404
+    assert not (storage / "artifacts" / str(missing)).exists()
+
+
+def test_unknown_upload_is_not_created_by_append(storage):
+    svc = ArtifactsService()
+    svc.start_upload(1)
+    try:
+        svc.append_upload(1, "deadbeef", 0, io.BytesIO(b"x"))
+    except FileNotFoundError:
+        pass
+    assert not (storage / "artifacts" / "1" / ".uploads" / "deadbeef.part").exists()
+
+
+class _SlowStream(io.RawIOBase):
+    """Чанк, который отдаётся по частям с паузой: запись длится, пока второй запрос пытается писать по тому же offset."""
+
+    def __init__(self, data: bytes, started: threading.Event):
+        self._data = data
+        self._started = started
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._data:
+            return 0
+        self._started.set()
+        threading.Event().wait(0.01)
+        n = min(len(b), 1000, len(self._data))
+        b[:n] = self._data[:n]
+        self._data = self._data[n:]
+        return n
+
+
+def test_concurrent_appends_at_same_offset_do_not_interleave(storage):
+    svc = ArtifactsService()
+    upload_id = svc.start_upload(1)
+    started = threading.Event()
+    results: dict[str, object] = {}
+
+    def append(name: str, data: bytes, stream=None):
+        try:
+            results[name] = svc.append_upload(1, upload_id, 0, stream or io.BytesIO(data))
+        except ValueError as e:
+            results[name] = e
+
+    slow = threading.Thread(target=append, args=("a", b""), kwargs={"stream": _SlowStream(b"A" * 20_000, started)})
+    slow.start()
+    started.wait(5)
+    append("b", b"B" * 20_000)
+    slow.join(5)
+
+    assert results["a"] == 20_000
+    assert isinstance(results["b"], ValueError)
+    with open(storage / "artifacts" / "1" / ".uploads" / f"{upload_id}.part", "rb") as f:
+        assert f.read() == b"A" * 20_000
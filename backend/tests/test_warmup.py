@@ -0,0 +1,70 @@
+"""Общий префикс промпта, keep_alive и прогрев моделей Ollama (user-021)."""
+import json
+
+import httpx
+from structlog.testing import capture_logs
+
+from app.agent import llm_factory, warmup
+from app.agent.nodes import MAP_SYSTEM, REPORT_SYSTEM, REPORT_USER_HEAD, build_prompt
+
+
+def test_prompt_starts_with_the_same_prefix_for_every_test():
+    first = build_prompt({"project_name": "a"}, ["a.log"], "", "ERROR a")
+    second = build_prompt({"project_name": "b"}, ["b.log", "gc.log"], "смотри на GC", "ERROR b")
+    assert first[0] == second[0] == REPORT_SYSTEM
+    assert first[1].startswith(REPORT_USER_HEAD) and second[1].startswith(REPORT_USER_HEAD)
+
+
+def test_keep_alive_values(monkeypatch):
+    monkeypatch.setattr(llm_factory.settings, "ollama_keep_alive", "30m")
+    assert llm_factory.ollama_keep_alive() == "30m"
+    assert llm_factory.ollama_keep_alive("-1") == -1
+    assert llm_factory.ollama_keep_alive(0) == 0
+    assert llm_factory.get_llm("ollama", "qwen2.5:7b").keep_alive == "30m"
+    assert llm_factory.get_llm("ollama", "qwen2.5:7b", keep_alive="2h").keep_alive == "2h"
+
+
+def test_warm_up_loads_model_with_analysis_context(monkeypatch):
+    posts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        posts.append((str(request.url), json.loads(request.content)))
+        return httpx.Response(200, json={"load_duration": 2_000_000, "prompt_eval_count": 1000})
+
+    # Прогрев идёт через общий транспорт клиентов Ollama
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(warmup, "shared_ollama_transport", lambda: transport)
+    monkeypatch.setattr(warmup.settings, "analysis_graph_mode", "single")
+    warmup.warm_up("qwen2.5:7b", base_url="http://ollama:11434/")
+
+    url, body = posts[0]
+    assert url == "http://ollama:11434/api/chat"
+    assert body["model"] == "qwen2.5:7b"
+    assert body["keep_alive"] == llm_factory.ollama_keep_alive()
+    assert body["options"]["num_ctx"] == warmup.settings.ollama_num_ctx and body["options"]["num_predict"] == 1
+    assert body["messages"] == [{"role": "system", "content": REPORT_SYSTEM}, {"role": "user", "content": REPORT_USER_HEAD}]
+
+    monkeypatch.setattr(warmup.settings, "analysis_graph_mode", "map_reduce")
+    warmup.warm_up("qwen2.5:7b")
+    assert posts[1][1]["messages"] == [{"role": "system", "content": MAP_SYSTEM}]
+
+
+def test_configured_models(client, monkeypatch):
+    monkeypatch.setattr(warmup.settings, "default_llm_type", "ollama")
+    monkeypatch.setattr(warmup.settings, "default_llm_model", "qwen2.5:7b")
+    for name, model in [("a", "qwen2.5:14b"), ("b", "qwen2.5:7b"), ("c", "qwen2.5vl:7b")]:
+        client.post("/api/projects/", json={"name": name, "llm_type": "ollama", "llm_model": model})
+    assert warmup.configured_models() == ["qwen2.5:7b", "qwen2.5:14b"]
+
+
+def test_failed_warm_up_is_logged_not_raised(monkeypatch):
+    def unavailable(model, base_url=None):
+        raise ConnectionError("ollama is not running")
+
+    monkeypatch.setattr(warmup, "configured_models", lambda: ["qwen2.5:7b"])
+    monkeypatch.setattr(warmup, "warm_up", unavailable)
+    with capture_logs() as logs:
+        thread = warmup.start_warmup()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert [(e["event"], e["model"]) for e in logs] == [("llm_warmup_failed", "qwen2.5:7b")]
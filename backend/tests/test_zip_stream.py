@@ -0,0 +1,36 @@
+"""Потоковая выдача ZIP со всеми артефактами теста (user-004)."""
+import io
+import zipfile
+
+from app.services.artifacts import ArtifactsService
+
+
+def test_zip_is_streamed_in_pieces_and_valid(storage):
+    svc = ArtifactsService()
+    log, _ = svc.save_custom_artifact(1, "custom_java_log", b"ERROR boom\n" * 50_000, display_name="app")
+    heap, _ = svc.save_custom_artifact(1, "custom_heap_dump", bytes(range(256)) * 4096, display_name="heap")
+
+    pieces = list(svc.iter_zip([("app.log", str(log)), ("heap.hprof", str(heap))], chunk_size=64 * 1024))
+    assert len(pieces) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(pieces))) as zf:
+        assert zf.read("app.log") == b"ERROR boom\n" * 50_000
+        assert zf.read("heap.hprof") == bytes(range(256)) * 4096
+        # Бинарные форматы не сжимаются повторно, текст — deflate
+        assert zf.getinfo("heap.hprof").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("app.log").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_missing_files_are_skipped(storage):
+    svc = ArtifactsService()
+    log, _ = svc.save_custom_artifact(1, "custom_other", b"data", display_name="a")
+    data = b"".join(svc.iter_zip([("gone.bin", "1/gone.bin"), ("a.bin", str(log))]))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["a.bin"]
+
+
+def test_download_all_endpoint(client, test_id):
+    client.post(f"/api/artifacts/test/{test_id}/upload", data={"kind": "custom_gc"}, files={"file": ("gc.log", b"[0.1s] GC\n")})
+    r = client.get(f"/api/artifacts/download-all/{test_id}")
+    assert r.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        assert zf.read(zf.namelist()[0]) == b"[0.1s] GC\n"
@@ -6,6 +6,7 @@ import type {
   TestRead,
   ArtifactRead,
   ReportRead,
+  JobRead,
 } from '../types/api'
 
 const api = axios.create({
@@ -29,10 +30,7 @@ export const testsApi = {
     api.get<TestRead[]>('/api/tests/', projectId ? { params: { project_id: projectId } } : {}),
   get: (id: number) => api.get<TestRead>(`/api/tests/${id}`),
   create: (data: TestCreate) => api.post<TestRead>('/api/tests/', data),
-  runAnalysis: (id: number) =>
-    api.post<{ status: string; report_id: number; artifacts_used: unknown[] }>(
-      `/api/tests/${id}/run-analysis`
-    ),
+  runAnalysis: (id: number) => api.post<JobRead>(`/api/tests/${id}/run-analysis`),
   delete: (id: number) => api.delete(`/api/tests/${id}`),
 }
 
@@ -68,18 +66,42 @@ export const collectApi = {
     testId: number,
     params: { from_ts: string; to_ts: string; dashboard_uid: string; grafana_source_index?: number }
   ) =>
-    api.post(`/api/collect/test/${testId}/grafana`, null, {
+    api.post<JobRead>(`/api/collect/test/${testId}/grafana`, null, {
       params,
     }),
   kubernetes: (
     testId: number,
     params: { from_ts: string; to_ts: string; namespace?: string }
   ) =>
-    api.post(`/api/collect/test/${testId}/kubernetes`, null, {
+    api.post<JobRead>(`/api/collect/test/${testId}/kubernetes`, null, {
       params,
     }),
 }
 
+// Jobs (анализ и сбор идут в фоне: запуск возвращает задачу, результат — опросом)
+export const jobsApi = {
+  get: (id: number) => api.get<JobRead>(`/api/jobs/${id}`),
+  cancel: (id: number) => api.post<JobRead>(`/api/jobs/${id}/cancel`),
+}
+
+export const waitForJob = async (
+  job: JobRead,
+  onProgress?: (job: JobRead) => void,
+  intervalMs = 2000
+): Promise<JobRead> => {
+  let current = job
+  while (current.status === 'queued' || current.status === 'running') {
+    onProgress?.(current)
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+    current = (await jobsApi.get(current.id)).data
+  }
+  onProgress?.(current)
+  if (current.status !== 'done') {
+    throw new Error(current.error_message || (current.status === 'cancelled' ? 'Задача отменена' : 'Ошибка задачи'))
+  }
+  return current
+}
+
 // Health
 export const healthApi = {
   check: () => api.get<{ status: string }>('/health'),
@@ -1,7 +1,7 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
-import { testsApi } from '../api/client'
-import type { TestRead, TestCreate } from '../types/api'
+import { testsApi, waitForJob } from '../api/client'
+import type { TestRead, TestCreate, JobRead } from '../types/api'
 
 export const useTestsStore = defineStore('tests', () => {
   const tests = ref<TestRead[]>([])
@@ -50,12 +50,13 @@ export const useTestsStore = defineStore('tests', () => {
     }
   }
 
-  const runAnalysis = async (id: number) => {
+  const runAnalysis = async (id: number, onProgress?: (job: JobRead) => void) => {
     error.value = null
     try {
       const { data } = await testsApi.runAnalysis(id)
+      const job = await waitForJob(data, onProgress)
       await fetchTest(id)
-      return data
+      return job
     } catch (e: unknown) {
       error.value = e instanceof Error ? e.message : 'Ошибка запуска анализа'
       throw e
@@ -78,9 +78,29 @@ export type ReportRead = {
   report_text: string
   pdf_path?: string | null
   artifacts_used_snapshot?: Record<string, unknown>[] | null
+  llm_metrics?: Record<string, unknown> | null
   created_at: string
 }
 
+export type JobStatus = 'queued' | 'running' | 'done' | 'failed' | 'cancelled'
+
+export type JobRead = {
+  id: number
+  test_id?: number | null
+  job_type: string
+  status: JobStatus
+  phase?: string | null
+  progress: number
+  message?: string | null
+  params?: Record<string, unknown> | null
+  result?: Record<string, unknown> | null
+  error_message?: string | null
+  cancel_requested: boolean
+  created_at: string
+  started_at?: string | null
+  finished_at?: string | null
+}
+
 export const ARTIFACT_KINDS = {
   custom_java_log: 'Java лог',
   custom_gc: 'GC лог',